@@ -17,7 +17,7 @@ from decimal import Decimal, InvalidOperation
 from functools import wraps
 
 from flask import Blueprint, request, jsonify
-from sqlalchemy import func, or_, desc, asc
+from sqlalchemy import func, or_, desc, asc, literal
 
 from models import (
     db,
@@ -34,6 +34,9 @@ from models import (
 from time_utils import ist_to_utc, to_ist
 from stock_management import sync_central_stock, sync_multiple_barcodes
 from barcode_alias_helper import normalize_barcode
+from agent_paging import (
+    MIN_DATE, CursorError, etag_json, keyset_page, list_params, project, signature,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -152,6 +155,23 @@ def _degisim_to_dict(d):
     }
 
 
+def _cursor_error(e):
+    return jsonify(success=False, error=str(e)), 400
+
+
+def _page_payload(result, params, key, items):
+    """Liste yanıtının ortak sayfalama alanları."""
+    return {
+        'success': True,
+        'total': result['total'],
+        'page': result['page'],
+        'per_page': params['per_page'],
+        'total_pages': result['total_pages'],
+        'next_cursor': result['next_cursor'],
+        key: items,
+    }
+
+
 def _find_order_across_tables(order_number):
     """Sipariş numarasını tüm tablolarda ara."""
     for table_cls in ORDER_TABLES:
@@ -173,17 +193,20 @@ def list_orders():
     Query params:
       - status: Oluşturuldu | Hazırlanıyor | Kargoda | Teslim Edildi | İptal
       - search: sipariş no, müşteri adı, barkod ile arama
-      - page (default=1), per_page (default=50)
+      - page (default=1), per_page (default=50) ya da cursor (önceki yanıtın next_cursor'ı)
       - start_date, end_date: YYYY-MM-DD formatında tarih filtresi
       - sort: date_asc | date_desc (default: date_desc)
+      - fields: virgülle ayrılmış alan listesi (ör. order_number,status)
+
+    Sayfalama SQL'de yapılır: tablolar yalnız (tablo, id, tarih) kolonlarıyla
+    UNION ALL edilir, sayfadaki satırlar sonra id ile yüklenir.
     """
     status_filter = request.args.get('status', '').strip()
     search = request.args.get('search', '').strip()
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 50, type=int), 200)
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     sort = request.args.get('sort', 'date_desc')
+    params = list_params()
 
     status_map = {
         'Oluşturuldu': [OrderCreated],
@@ -193,12 +216,29 @@ def list_orders():
         'İptal': [OrderCancelled],
     }
 
-    tables = status_map.get(status_filter, ORDER_TABLES)
-    all_results = []
-
-    for table_cls in tables:
-        q = table_cls.query
+    # Gelen tarih İstanbul takvim günü; DB naive UTC → sınırı çevir
+    start_utc = end_utc = None
+    try:
+        if start_date:
+            start_utc = ist_to_utc(datetime.strptime(start_date, '%Y-%m-%d'))
+    except ValueError:
+        pass
+    try:
+        if end_date:
+            end_utc = ist_to_utc(datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1))
+    except ValueError:
+        pass
 
+    tables = status_map.get(status_filter, ORDER_TABLES)
+    parts = []
+    for idx, table_cls in enumerate(ORDER_TABLES):
+        if table_cls not in tables:
+            continue
+        q = db.session.query(
+            literal(idx).label('tbl'),
+            table_cls.id.label('id'),
+            func.coalesce(table_cls.order_date, MIN_DATE).label('sort_date'),
+        )
         if search:
             q = q.filter(or_(
                 table_cls.order_number.ilike(f'%{search}%'),
@@ -207,40 +247,36 @@ def list_orders():
                 table_cls.product_barcode.ilike(f'%{search}%'),
                 table_cls.merchant_sku.ilike(f'%{search}%'),
             ))
+        if start_utc:
+            q = q.filter(table_cls.order_date >= start_utc)
+        if end_utc:
+            q = q.filter(table_cls.order_date <= end_utc)
+        parts.append(q)
+
+    union = (parts[0].union_all(*parts[1:]) if len(parts) > 1 else parts[0]).subquery()
+    ascending = sort == 'date_asc'
+    order_cols = [(union.c.sort_date, ascending), (union.c.tbl, ascending), (union.c.id, ascending)]
+    try:
+        result = keyset_page(
+            db.session.query(union), order_cols, lambda r: [r.sort_date, r.tbl, r.id],
+            per_page=params['per_page'], page=params['page'], cursor=params['cursor'],
+            sig=signature('orders', status_filter, search, start_date, end_date, ascending),
+        )
+    except CursorError as e:
+        return _cursor_error(e)
 
-        if start_date:
-            try:
-                # Gelen tarih İstanbul takvim günü; DB naive UTC → sınırı çevir
-                q = q.filter(table_cls.order_date >= ist_to_utc(datetime.strptime(start_date, '%Y-%m-%d')))
-            except ValueError:
-                pass
-        if end_date:
-            try:
-                q = q.filter(table_cls.order_date <= ist_to_utc(datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)))
-            except ValueError:
-                pass
-
-        for order in q.all():
-            all_results.append(_order_to_dict(order, table_cls))
-
-    # Sıralama
-    reverse = sort != 'date_asc'
-    all_results.sort(key=lambda x: x.get('order_date') or '', reverse=reverse)
-
-    # Sayfalama
-    total = len(all_results)
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated = all_results[start:end]
+    ids_by_table = {}
+    for r in result['items']:
+        ids_by_table.setdefault(r.tbl, []).append(r.id)
+    loaded = {}
+    for idx, ids in ids_by_table.items():
+        table_cls = ORDER_TABLES[idx]
+        for order in table_cls.query.filter(table_cls.id.in_(ids)):
+            loaded[(idx, order.id)] = _order_to_dict(order, table_cls)
 
-    return jsonify(
-        success=True,
-        total=total,
-        page=page,
-        per_page=per_page,
-        total_pages=(total + per_page - 1) // per_page,
-        orders=paginated,
-    )
+    orders = [project(loaded[(r.tbl, r.id)], params['fields'])
+              for r in result['items'] if (r.tbl, r.id) in loaded]
+    return etag_json(**_page_payload(result, params, 'orders', orders))
 
 
 @agent_api.route('/orders/<order_number>', methods=['GET'])
@@ -286,8 +322,9 @@ def list_products():
       - color, size, brand: filtreler
       - in_stock: true ise sadece stokta olanlar
       - archived: true/false (default: false — arşivlenmemişler)
-      - page (default=1), per_page (default=50)
+      - page (default=1), per_page (default=50) ya da cursor
       - sort: title | price_asc | price_desc | barcode
+      - fields: virgülle ayrılmış alan listesi
     """
     search = request.args.get('search', '').strip()
     model = request.args.get('model', '').strip()
@@ -296,9 +333,8 @@ def list_products():
     brand = request.args.get('brand', '').strip()
     in_stock = request.args.get('in_stock', '').lower() == 'true'
     archived = request.args.get('archived', 'false').lower() == 'true'
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 50, type=int), 200)
     sort = request.args.get('sort', 'title')
+    params = list_params()
 
     q = Product.query
 
@@ -325,24 +361,33 @@ def list_products():
         stocked = db.session.query(CentralStock.barcode).filter(CentralStock.qty > 0).subquery()
         q = q.filter(Product.barcode.in_(db.session.query(stocked.c.barcode)))
 
+    # Keyset için NULL'suz sıralama ifadeleri + benzersiz kuyruk (barcode)
+    title_col = func.coalesce(Product.title, '')
+    price_col = func.coalesce(Product.sale_price, 0)
     sort_map = {
-        'title': Product.title.asc(),
-        'price_asc': Product.sale_price.asc(),
-        'price_desc': Product.sale_price.desc(),
-        'barcode': Product.barcode.asc(),
+        'title': ([(title_col, True), (Product.barcode, True)],
+                  lambda p: [p.title or '', p.barcode]),
+        'price_asc': ([(price_col, True), (Product.barcode, True)],
+                      lambda p: [p.sale_price or 0, p.barcode]),
+        'price_desc': ([(price_col, False), (Product.barcode, False)],
+                       lambda p: [p.sale_price or 0, p.barcode]),
+        'barcode': ([(Product.barcode, True)], lambda p: [p.barcode]),
     }
-    q = q.order_by(sort_map.get(sort, Product.title.asc()))
+    if sort not in sort_map:
+        sort = 'title'
+    order_cols, key = sort_map[sort]
 
-    pagination = q.paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        result = keyset_page(
+            q, order_cols, key,
+            per_page=params['per_page'], page=params['page'], cursor=params['cursor'],
+            sig=signature('products', search, model, color, size, brand, in_stock, archived, sort),
+        )
+    except CursorError as e:
+        return _cursor_error(e)
 
-    return jsonify(
-        success=True,
-        total=pagination.total,
-        page=page,
-        per_page=per_page,
-        total_pages=pagination.pages,
-        products=[_product_to_dict(p) for p in pagination.items],
-    )
+    products = [project(_product_to_dict(p), params['fields']) for p in result['items']]
+    return etag_json(**_page_payload(result, params, 'products', products))
 
 
 @agent_api.route('/products/<barcode>', methods=['GET'])
@@ -421,14 +466,14 @@ def list_stock():
       - search: barkod ile arama
       - min_qty, max_qty: stok miktarı filtresi
       - zero_stock: true ise sadece sıfır stoklular
-      - page (default=1), per_page (default=100)
+      - page (default=1), per_page (default=100) ya da cursor
+      - fields: virgülle ayrılmış alan listesi
     """
     search = request.args.get('search', '').strip()
     min_qty = request.args.get('min_qty', type=int)
     max_qty = request.args.get('max_qty', type=int)
     zero_stock = request.args.get('zero_stock', '').lower() == 'true'
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 100, type=int), 500)
+    params = list_params(default_per_page=100, max_per_page=500)
 
     q = db.session.query(CentralStock, Product).outerjoin(
         Product, CentralStock.barcode == Product.barcode
@@ -444,12 +489,18 @@ def list_stock():
         if max_qty is not None:
             q = q.filter(CentralStock.qty <= max_qty)
 
-    q = q.order_by(CentralStock.barcode.asc())
-    pagination = q.paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        result = keyset_page(
+            q, [(CentralStock.barcode, True)], lambda row: [row[0].barcode],
+            per_page=params['per_page'], page=params['page'], cursor=params['cursor'],
+            sig=signature('stock', search, min_qty, max_qty, zero_stock),
+        )
+    except CursorError as e:
+        return _cursor_error(e)
 
     items = []
-    for cs, product in pagination.items:
-        items.append({
+    for cs, product in result['items']:
+        items.append(project({
             'barcode': cs.barcode,
             'qty': cs.qty,
             'updated_at': cs.updated_at.isoformat() if cs.updated_at else None,
@@ -457,16 +508,9 @@ def list_stock():
             'product_main_id': product.product_main_id if product else None,
             'color': product.color if product else None,
             'size': product.size if product else None,
-        })
+        }, params['fields']))
 
-    return jsonify(
-        success=True,
-        total=pagination.total,
-        page=page,
-        per_page=per_page,
-        total_pages=pagination.pages,
-        items=items,
-    )
+    return etag_json(**_page_payload(result, params, 'items', items))
 
 
 @agent_api.route('/stock/<barcode>', methods=['GET'])
@@ -793,12 +837,12 @@ def list_returns():
     Query params:
       - status: filtre
       - search: sipariş no, müşteri adı
-      - page (default=1), per_page (default=50)
+      - page (default=1), per_page (default=50) ya da cursor
+      - fields: virgülle ayrılmış alan listesi
     """
     status = request.args.get('status', '').strip()
     search = request.args.get('search', '').strip()
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    params = list_params()
 
     q = ReturnOrder.query
 
@@ -812,13 +856,22 @@ def list_returns():
             ReturnOrder.return_request_number.ilike(f'%{search}%'),
         ))
 
-    q = q.order_by(ReturnOrder.return_date.desc())
-    pagination = q.paginate(page=page, per_page=per_page, error_out=False)
-
-    items = []
-    for r in pagination.items:
-        products = [
-            {
+    try:
+        result = keyset_page(
+            q, [(func.coalesce(ReturnOrder.return_date, MIN_DATE), False), (ReturnOrder.id, False)],
+            lambda r: [r.return_date or MIN_DATE, r.id],
+            per_page=params['per_page'], page=params['page'], cursor=params['cursor'],
+            sig=signature('returns', status, search),
+        )
+    except CursorError as e:
+        return _cursor_error(e)
+
+    # Sayfadaki iadelerin ürünleri tek sorguda (satır başına sorgu yok)
+    products_by_return = {}
+    page_ids = [r.id for r in result['items']]
+    if page_ids:
+        for rp in ReturnProduct.query.filter(ReturnProduct.return_order_id.in_(page_ids)):
+            products_by_return.setdefault(rp.return_order_id, []).append({
                 'barcode': rp.barcode,
                 'product_name': rp.product_name,
                 'size': rp.size,
@@ -826,10 +879,11 @@ def list_returns():
                 'quantity': rp.quantity,
                 'reason': rp.reason,
                 'return_to_stock': rp.return_to_stock,
-            }
-            for rp in r.products.all()
-        ]
-        items.append({
+            })
+
+    items = []
+    for r in result['items']:
+        items.append(project({
             'id': str(r.id),
             'order_number': r.order_number,
             'return_request_number': r.return_request_number,
@@ -840,17 +894,10 @@ def list_returns():
             'cargo_tracking_number': r.cargo_tracking_number,
             'return_reason': r.return_reason,
             'refund_amount': float(r.refund_amount) if r.refund_amount else None,
-            'products': products,
-        })
+            'products': products_by_return.get(r.id, []),
+        }, params['fields']))
 
-    return jsonify(
-        success=True,
-        total=pagination.total,
-        page=page,
-        per_page=per_page,
-        total_pages=pagination.pages,
-        returns=items,
-    )
+    return etag_json(**_page_payload(result, params, 'returns', items))
 
 
 @agent_api.route('/returns/<return_id>', methods=['GET'])
@@ -908,12 +955,12 @@ def list_manual_orders():
     Query params:
       - search: sipariş no, müşteri adı
       - status: durum filtresi
-      - page (default=1), per_page (default=50)
+      - page (default=1), per_page (default=50) ya da cursor
+      - fields: virgülle ayrılmış alan listesi
     """
     search = request.args.get('search', '').strip()
     status = request.args.get('status', '').strip()
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    params = list_params()
 
     q = YeniSiparis.query
 
@@ -926,23 +973,35 @@ def list_manual_orders():
     if status:
         q = q.filter(YeniSiparis.durum == status)
 
-    q = q.order_by(YeniSiparis.siparis_tarihi.desc())
-    pagination = q.paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        result = keyset_page(
+            q, [(func.coalesce(YeniSiparis.siparis_tarihi, MIN_DATE), False), (YeniSiparis.id, False)],
+            lambda s: [s.siparis_tarihi or MIN_DATE, s.id],
+            per_page=params['per_page'], page=params['page'], cursor=params['cursor'],
+            sig=signature('manual-orders', search, status),
+        )
+    except CursorError as e:
+        return _cursor_error(e)
+
+    # Sayfadaki siparişlerin ürünleri tek sorguda (satır başına lazy load yok)
+    urunler_by_siparis = {}
+    page_ids = [s.id for s in result['items']]
+    if page_ids:
+        for u in SiparisUrun.query.filter(SiparisUrun.siparis_id.in_(page_ids)).order_by(SiparisUrun.id):
+            urunler_by_siparis.setdefault(u.siparis_id, []).append({
+                'barkod': u.urun_barkod,
+                'urun_adi': u.urun_adi,
+                'adet': u.adet,
+                'birim_fiyat': float(u.birim_fiyat) if u.birim_fiyat else None,
+                'toplam_fiyat': float(u.toplam_fiyat) if u.toplam_fiyat else None,
+                'renk': u.renk,
+                'beden': u.beden,
+                'raf_kodu': u.raf_kodu,
+            })
 
     items = []
-    for s in pagination.items:
-        urunler = [{
-            'barkod': u.urun_barkod,
-            'urun_adi': u.urun_adi,
-            'adet': u.adet,
-            'birim_fiyat': float(u.birim_fiyat) if u.birim_fiyat else None,
-            'toplam_fiyat': float(u.toplam_fiyat) if u.toplam_fiyat else None,
-            'renk': u.renk,
-            'beden': u.beden,
-            'raf_kodu': u.raf_kodu,
-        } for u in s.urunler]
-
-        items.append({
+    for s in result['items']:
+        items.append(project({
             'id': s.id,
             'siparis_no': s.siparis_no,
             'musteri_adi': s.musteri_adi,
@@ -955,17 +1014,10 @@ def list_manual_orders():
             'notlar': s.notlar,
             'kapida_odeme': s.kapida_odeme,
             'kapida_odeme_tutari': float(s.kapida_odeme_tutari) if s.kapida_odeme_tutari else None,
-            'urunler': urunler,
-        })
+            'urunler': urunler_by_siparis.get(s.id, []),
+        }, params['fields']))
 
-    return jsonify(
-        success=True,
-        total=pagination.total,
-        page=page,
-        per_page=per_page,
-        total_pages=pagination.pages,
-        orders=items,
-    )
+    return etag_json(**_page_payload(result, params, 'orders', items))
 
 
 @agent_api.route('/manual-orders', methods=['POST'])
@@ -1105,15 +1157,15 @@ def list_transactions():
       - kategori: kategori filtresi
       - durum: odenmedi | kismi_odendi | tamamlandi
       - start_date, end_date: YYYY-MM-DD
-      - page (default=1), per_page (default=50)
+      - page (default=1), per_page (default=50) ya da cursor
+      - fields: virgülle ayrılmış alan listesi
     """
     tip = request.args.get('tip', '').strip()
     kategori = request.args.get('kategori', '').strip()
     durum = request.args.get('durum', '').strip()
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    params = list_params()
 
     q = Kasa.query
 
@@ -1140,12 +1192,31 @@ def list_transactions():
         except ValueError:
             pass
 
-    q = q.order_by(Kasa.tarih.desc())
-    pagination = q.paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        result = keyset_page(
+            q, [(func.coalesce(Kasa.tarih, MIN_DATE), False), (Kasa.id, False)],
+            lambda k: [k.tarih or MIN_DATE, k.id],
+            per_page=params['per_page'], page=params['page'], cursor=params['cursor'],
+            sig=signature('transactions', tip, kategori, durum, start_date, end_date),
+        )
+    except CursorError as e:
+        return _cursor_error(e)
+
+    # Ödenen tutarlar sayfa için tek GROUP BY sorgusu (kayıt başına odemeler taraması yok)
+    odenen_by_kasa = {}
+    page_ids = [k.id for k in result['items']]
+    if page_ids:
+        odenen_by_kasa = dict(
+            db.session.query(Odeme.kasa_id, func.coalesce(func.sum(Odeme.tutar), 0))
+            .filter(Odeme.kasa_id.in_(page_ids))
+            .group_by(Odeme.kasa_id)
+            .all()
+        )
 
     items = []
-    for k in pagination.items:
-        items.append({
+    for k in result['items']:
+        odenen = float(odenen_by_kasa.get(k.id, 0) or 0)
+        items.append(project({
             'id': k.id,
             'tip': k.tip,
             'aciklama': k.aciklama,
@@ -1153,19 +1224,12 @@ def list_transactions():
             'kategori': k.kategori,
             'tarih': k.tarih.isoformat() if k.tarih else None,
             'durum': k.durum.value if k.durum else None,
-            'odenen_tutar': float(k.odenen_tutar),
-            'kalan_tutar': float(k.kalan_tutar),
+            'odenen_tutar': odenen,
+            'kalan_tutar': float(k.tutar) - odenen,
             'ana_kasadan': k.ana_kasadan,
-        })
+        }, params['fields']))
 
-    return jsonify(
-        success=True,
-        total=pagination.total,
-        page=page,
-        per_page=per_page,
-        total_pages=pagination.pages,
-        transactions=items,
-    )
+    return etag_json(**_page_payload(result, params, 'transactions', items))
 
 
 @agent_api.route('/finance/categories', methods=['GET'])
@@ -1575,11 +1639,23 @@ def dashboard():
     # Kasa
     ana_kasa = AnaKasa.query.first()
 
+    # Ciro / adet KPI'ları — günlük özet tablosundan (hazır değilse null)
+    kpi = None
+    try:
+        import kpi_rollup
+        if kpi_rollup.is_ready():
+            month_kpi, today_kpi = kpi_rollup.month_and_day_totals()
+            kpi = {'today': today_kpi, 'month': month_kpi}
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"[AGENT] dashboard KPI okunamadı: {e}")
+
     return jsonify(
         success=True,
         timestamp=datetime.now().isoformat(),
         orders=order_counts,
         today_new_orders=today_orders,
+        kpi=kpi,
         total_stock=total_stock,
         total_products=total_products,
         active_exchanges=active_exchanges,
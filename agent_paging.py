@@ -0,0 +1,172 @@
+"""Agent API liste endpoint'leri için SQL tarafı sayfalama katmanı.
+
+SORUN
+-----
+``agent_api.list_orders`` her statü tablosunda ``q.all()`` çalıştırıp tüm
+satırları ``_order_to_dict`` ile dict'e çeviriyor, Python'da sıralayıp ancak
+sonra ``per_page`` kadarını kesiyordu — ``per_page=50`` bir çağrı bütün sipariş
+geçmişini belleğe alıyordu. Diğer listeler ``paginate`` kullansa da derin
+sayfalarda ``OFFSET`` taraması, satır başına ilişki sorguları (N+1) ve her
+çağrıda aynı gövdenin yeniden gönderilmesi vardı.
+
+ÇÖZÜM
+-----
+- ``keyset_page``: sıralama ifadeleri + benzersiz kuyruk kolonu üzerinde
+  seek (keyset) sayfalama. ``cursor`` verilirse ``OFFSET``/``COUNT`` yapılmaz;
+  verilmezse eski ``page`` parametresi (OFFSET + COUNT) aynen çalışır. Her
+  yanıtta ``next_cursor`` döner. Sorgu en fazla ``per_page + 1`` satır getirir.
+- ``list_params``: ``page`` / ``per_page`` (üst sınırlı) / ``cursor`` /
+  ``fields`` okuması tek yerde.
+- ``project``: ``fields=a,b`` ile yalnız istenen alanlar döner.
+- ``etag_json``: gövdeden ETag; ``If-None-Match`` eşleşirse 304 (gövdesiz).
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import jsonify, request
+from sqlalchemy import and_, or_
+
+# NULL sıralama değerleri için sabit uçlar (keyset karşılaştırması NULL'suz kalsın)
+MIN_DATE = datetime(1900, 1, 1)
+
+
+class CursorError(ValueError):
+    """Cursor çözülemedi ya da başka bir sıralama/filtreye ait."""
+
+
+def list_params(default_per_page: int = 50, max_per_page: int = 200) -> dict:
+    """Liste endpoint'lerinin ortak query parametreleri."""
+    per_page = request.args.get('per_page', default_per_page, type=int) or default_per_page
+    fields = request.args.get('fields', '').strip()
+    return {
+        'page': max(1, request.args.get('page', 1, type=int) or 1),
+        'per_page': max(1, min(per_page, max_per_page)),
+        'cursor': request.args.get('cursor', '').strip() or None,
+        'fields': [f.strip() for f in fields.split(',') if f.strip()] or None,
+    }
+
+
+def signature(*parts) -> str:
+    """Cursor'ın ait olduğu sıralama + filtre kombinasyonunun kısa özeti."""
+    raw = json.dumps([str(p) for p in parts], ensure_ascii=False)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+# ---------------------------------------------------------------------------
+# Cursor kodlama (datetime/Decimal/UUID değerleri tip etiketiyle taşınır)
+# ---------------------------------------------------------------------------
+def _enc(v):
+    if isinstance(v, datetime):
+        return {'$dt': v.isoformat()}
+    if isinstance(v, date):
+        return {'$d': v.isoformat()}
+    if isinstance(v, Decimal):
+        return {'$dec': str(v)}
+    if isinstance(v, uuid.UUID):
+        return {'$uuid': str(v)}
+    return v
+
+
+def _dec(v):
+    if isinstance(v, dict) and len(v) == 1:
+        (tag, raw), = v.items()
+        if tag == '$dt':
+            return datetime.fromisoformat(raw)
+        if tag == '$d':
+            return date.fromisoformat(raw)
+        if tag == '$dec':
+            return Decimal(raw)
+        if tag == '$uuid':
+            return uuid.UUID(raw)
+    return v
+
+
+def encode_cursor(values, page: int, sig: str) -> str:
+    raw = json.dumps({'k': [_enc(v) for v in values], 'p': page, 's': sig}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str, sig: str) -> tuple[list, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        values, page = [_dec(v) for v in data['k']], int(data['p'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorError('Geçersiz cursor.') from e
+    if data.get('s') != sig:
+        raise CursorError('Cursor bu sıralama/filtre için geçerli değil.')
+    return values, page
+
+
+def _seek_clause(order_cols, values):
+    """(k1, k2, ...) sırasında imleçten SONRAKİ satırlar (kolon başına yön)."""
+    clauses = []
+    for i, (expr, ascending) in enumerate(order_cols):
+        after = expr > values[i] if ascending else expr < values[i]
+        prefix = [order_cols[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*prefix, after))
+    return or_(*clauses)
+
+
+def keyset_page(q, order_cols, key, *, per_page: int, page: int = 1,
+                cursor: str | None = None, sig: str = '') -> dict:
+    """Sorgudan bir sayfa.
+
+    Args:
+        q: filtreleri uygulanmış, sıralanmamış sorgu.
+        order_cols: ``[(ifade, artan_mı), ...]`` — son eleman benzersiz olmalı,
+            ifadeler NULL üretmemeli (gerekirse ``coalesce``).
+        key: satırdan ``order_cols`` sırasıyla değer listesi üreten fonksiyon.
+
+    Returns:
+        ``{"items", "page", "total", "total_pages", "next_cursor"}`` — cursor
+        modunda ``total``/``total_pages`` None'dır (COUNT yapılmaz).
+
+    Raises:
+        CursorError: cursor geçersizse.
+    """
+    total = total_pages = None
+    if cursor:
+        values, cur_page = decode_cursor(cursor, sig)
+        if len(values) != len(order_cols):
+            raise CursorError('Geçersiz cursor.')
+        q = q.filter(_seek_clause(order_cols, values))
+        page = cur_page + 1
+        offset = 0
+    else:
+        total = q.order_by(None).count()
+        total_pages = (total + per_page - 1) // per_page
+        offset = (page - 1) * per_page
+
+    ordered = q.order_by(*(expr.asc() if asc else expr.desc() for expr, asc in order_cols))
+    rows = ordered.offset(offset).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    return {
+        'items': rows,
+        'page': page,
+        'total': total,
+        'total_pages': total_pages,
+        'next_cursor': encode_cursor(key(rows[-1]), page, sig) if has_more and rows else None,
+    }
+
+
+def project(item: dict, fields) -> dict:
+    """``fields`` verilmişse yalnız o anahtarlar (bilinmeyenler yok sayılır)."""
+    if not fields:
+        return item
+    return {f: item[f] for f in fields if f in item}
+
+
+def etag_json(**payload):
+    """JSON yanıt + gövde ETag'i; ``If-None-Match`` eşleşirse 304."""
+    resp = jsonify(**payload)
+    resp.add_etag()
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp.make_conditional(request)
@@ -22,9 +22,9 @@ from flask_restx import Api
 from routes import register_blueprints
 from user_logs import log_user_action
 from celery_app import init_celery
+import job_runner
 from sqlalchemy import text
 from trendyol_api import SUPPLIER_ID, API_KEY, API_SECRET
-from apscheduler.schedulers.background import BackgroundScheduler  # <-- DOĞRU YER
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Platform-safe lock import (Unix: fcntl, Windows: msvcrt+tempfile)
@@ -41,6 +41,12 @@ except ImportError:
 # ──────────────────────────────────────────────────────────────────────────────
 app = Flask(__name__)
 
+# Spawn süreç havuzları (kargo_fuzzy, image_pipeline) `python app.py` ile
+# çalışırken worker'larda bu dosyayı "__mp_main__" adıyla yeniden çalıştırır.
+# Süreç düzeyindeki init (tablo garantileri, listener'lar, yazıcı thread'leri,
+# bölümler, scheduler, anlık push, DB testi) yalnız asıl süreçte yapılır.
+IS_SPAWN_WORKER = __name__ == "__mp_main__"
+
 env = os.getenv('FLASK_ENV', 'development')
 app.config.from_object(
     __import__('config').config_map.get(env, __import__('config').DevelopmentConfig)
@@ -141,33 +147,153 @@ app.register_blueprint(ai_asistan_bp)
 from urun_yukleme.routes import urun_yukleme_bp
 app.register_blueprint(urun_yukleme_bp)
 
-# 🔎 Sipariş audit log: tablo + event listener'lar
-try:
-    from order_audit import ensure_table_exists as _audit_ensure, install_listeners as _audit_install
-    with app.app_context():
-        _audit_ensure()
-    _audit_install()
-except Exception as _e:
-    import logging as _logging
-    _logging.getLogger(__name__).exception("[ORDER_AUDIT] init başarısız: %s", _e)
+if not IS_SPAWN_WORKER:
+    # 🔎 Sipariş audit log: tablo + event listener'lar
+    try:
+        from order_audit import (ensure_table_exists as _audit_ensure, install_listeners as _audit_install,
+                                 start_writer as _audit_start_writer)
+        with app.app_context():
+            _audit_ensure()
+            _audit_start_writer()
+        _audit_install()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[ORDER_AUDIT] init başarısız: %s", _e)
+
+    # 📝 Kullanıcı/istek logu: istek thread'i dışında toplu yazıcı (user_logs)
+    try:
+        from user_logs import start_writer as _user_log_start_writer
+        with app.app_context():
+            _user_log_start_writer()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[USER_LOG] yazıcı init başarısız: %s", _e)
 
-# 💬 Trendyol Soru-Cevap: tablo garantisi
-try:
-    from trendyol_qna.qna_service import ensure_table_exists as _qna_ensure
-    with app.app_context():
-        _qna_ensure()
-except Exception as _e:
-    import logging as _logging
-    _logging.getLogger(__name__).exception("[QNA] init başarısız: %s", _e)
+    # 🗂️ Audit / kullanıcı logu aylık bölümleri (PostgreSQL): bu ay + 2 ay ileri
+    try:
+        from log_partitions import ensure_partitions as _log_part_ensure
+        with app.app_context():
+            _log_part_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[LOG-PART] init başarısız: %s", _e)
 
-# 🛍️ Shopify site soruları: tablo garantisi
-try:
-    from trendyol_qna.shopify_qna import ensure_table_exists as _shq_ensure
-    with app.app_context():
-        _shq_ensure()
-except Exception as _e:
-    import logging as _logging
-    _logging.getLogger(__name__).exception("[SHOPIFY-QNA] init başarısız: %s", _e)
+    # 📦 Rezerv projeksiyonu (reserved_stock): tablo + sipariş geçiş listener'ları
+    try:
+        from stock_sync.reservation import ensure_table_exists as _rezerv_ensure, install_listeners as _rezerv_install
+        _rezerv_install()
+        with app.app_context():
+            _rezerv_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[REZERV] init başarısız: %s", _e)
+
+    # 🏷️ Barkod çözümleme önbelleği: alias/ürün değişikliğinde geçersiz kılma listener'ları
+    try:
+        from barcode_alias_helper import install_listeners as _barcode_cache_install
+        _barcode_cache_install()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[BARKOD] önbellek init başarısız: %s", _e)
+
+    # 🖼️ Görsel türevleri: `derived` şablon filtresi + türevler için immutable önbellek başlığı
+    try:
+        import image_pipeline as _image_pipeline
+        _image_pipeline.init_app(app)
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[IMG] init başarısız: %s", _e)
+
+    # 🔍 Sipariş arama indeksi (order_search_index): tablo + sipariş geçiş listener'ları
+    try:
+        from order_search import ensure_table_exists as _osi_ensure, install_listeners as _osi_install
+        _osi_install()
+        with app.app_context():
+            _osi_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[ORDER-SEARCH] init başarısız: %s", _e)
+
+    # 🏷️ Ürün listesi model özeti (product_model_summary): tablo + ürün/stok listener'ları
+    try:
+        from product_summary import ensure_table_exists as _pms_ensure, install_listeners as _pms_install
+        _pms_install()
+        with app.app_context():
+            _pms_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[PRODUCT-SUMMARY] init başarısız: %s", _e)
+
+    # 📥 Akışlı Trendyol katalog içe aktarma: çalışma/ilerleme + içerik hash tabloları
+    try:
+        from product_import import ensure_tables_exist as _pimp_ensure
+        with app.app_context():
+            _pimp_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[URUN-IMPORT] init başarısız: %s", _e)
+
+    # 🚚 Kargo mutabakatı arka plan çalışmaları (aşama/ilerleme + sonuç dosyası)
+    try:
+        from kargo_mutabakat import ensure_table_exists as _km_ensure
+        with app.app_context():
+            _km_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[KARGO-MUTABAKAT] init başarısız: %s", _e)
+
+    # ⚡ Paylaşımlı JSON yanıt önbelleği: sipariş/stok yazımlarında geçersiz kılma listener'ları
+    try:
+        from response_cache import install_listeners as _resp_cache_install
+        _resp_cache_install()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[RESP-CACHE] init başarısız: %s", _e)
+
+    # 📊 Günlük KPI özeti (kpi_daily): ana sayfa / kâr raporu / agent dashboard
+    try:
+        from kpi_rollup import ensure_table_exists as _kpi_ensure
+        with app.app_context():
+            _kpi_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[KPI] init başarısız: %s", _e)
+
+    # 🧾 Sync detay özeti (sadece-hata modu): tablo garantisi
+    try:
+        from stock_sync.detail_writer import ensure_table_exists as _sync_summary_ensure
+        with app.app_context():
+            _sync_summary_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[SYNC] detay özeti init başarısız: %s", _e)
+
+    # 🔁 Trendyol batchRequestId mutabakatı: tablo garantisi
+    try:
+        from stock_sync.batch_reconcile import ensure_table_exists as _batch_reconcile_ensure
+        with app.app_context():
+            _batch_reconcile_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[BATCH-MUTABAKAT] init başarısız: %s", _e)
+
+    # 💬 Trendyol Soru-Cevap: tablo garantisi
+    try:
+        from trendyol_qna.qna_service import ensure_table_exists as _qna_ensure
+        with app.app_context():
+            _qna_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[QNA] init başarısız: %s", _e)
+
+    # 🛍️ Shopify site soruları: tablo garantisi
+    try:
+        from trendyol_qna.shopify_qna import ensure_table_exists as _shq_ensure
+        with app.app_context():
+            _shq_ensure()
+    except Exception as _e:
+        import logging as _logging
+        _logging.getLogger(__name__).exception("[SHOPIFY-QNA] init başarısız: %s", _e)
 
 # 🔥 Stok Senkronizasyon Blueprint
 
@@ -352,8 +478,15 @@ def pull_orders_job():
             if cfg and not cfg.is_active:
                 logger.info("[ORDER-PULL] Otomatik sipariş çekme devre dışı, atlanıyor.")
                 return
-            from order_service import fetch_trendyol_orders_async
-            asyncio.run(fetch_trendyol_orders_async())
+            from order_service import fetch_trendyol_orders_async, order_pull_lock
+            # Tam tarama sürüyorsa bu tur atlanır (bir sonraki tur zaten gelir)
+            if not order_pull_lock.acquire(blocking=False):
+                logger.info("[ORDER-PULL] Mutabakat taraması sürüyor, artımlı çekme atlanıyor.")
+                return
+            try:
+                asyncio.run(fetch_trendyol_orders_async())
+            finally:
+                order_pull_lock.release()
         except Exception as e:
             logger.error(f"pull_orders_job hata: {e}", exc_info=True)
 
@@ -379,11 +512,21 @@ def qna_reconcile_job():
 
 
 def reconcile_orders_job():
-    """Aktif tablolarda takılı kalan eski siparişleri Trendyol'da gerçek statüsüne göre senkronlar."""
+    """Tam statü taraması + aktif tablolarda takılı kalan eski siparişlerin mutabakatı.
+
+    pull_orders_job artımlı çalışır (yalnız filigrandan sonra değişen paketler);
+    kaçan değişiklikler burada tüm sayfalar yeniden okunarak yakalanır.
+    """
     with app.app_context():
         try:
-            from order_service import reconcile_active_orders_async
-            asyncio.run(reconcile_active_orders_async())
+            from models import PlatformConfig
+            from order_service import fetch_trendyol_orders_async, reconcile_active_orders_async, order_pull_lock
+            cfg = PlatformConfig.query.filter_by(platform='order_pull').first()
+            # Artımlı çekmeyle aynı anda çalışmaz: sürmekte olan turun bitmesi beklenir
+            with order_pull_lock:
+                if not cfg or cfg.is_active:
+                    asyncio.run(fetch_trendyol_orders_async(full=True))
+                asyncio.run(reconcile_active_orders_async())
         except Exception as e:
             logger.error(f"reconcile_orders_job hata: {e}", exc_info=True)
 
@@ -396,18 +539,33 @@ def _run_fcache_loop():
         # 14 günlük cache, her döngüde 50 barkod
         forecast_worker_loop(days=14, batch=50)
 
+def _refresh_forecast_cache():
+    # daily_sales değişti → tüm barkodlar için toplu (NumPy) tahmin; Prophet ayrı worker'da
+    from forecast_engine import run_batch_forecast
+    try:
+        run_batch_forecast(days=14)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"ForecastCache toplu tahmin hata: {e}", exc_info=True)
+
 def _nightly_rebuild():
     with app.app_context():
         # DailySales gece güvenlik senkronu (son 30 gün)
         rebuild_daily_sales(days=30)
+        _refresh_forecast_cache()
+
+def _incremental_daily_sales():
+    with app.app_context():
+        # Yalnız son çalışmadan beri siparişi değişen günler
+        result = rebuild_daily_sales(days=30, incremental=True) or {}
+        if result.get("days"):
+            _refresh_forecast_cache()
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Zamanlayıcı (ENV kontrollü) — ÇEK (0dk) ↔ PUSHA (2dk) ping-pong + iade cron + forecast jobs
 # ──────────────────────────────────────────────────────────────────────────────
-scheduler = BackgroundScheduler(
-    timezone="Europe/Istanbul",
-    job_defaults={"max_instances": 1, "coalesce": True, "misfire_grace_time": 60}
-)
+# Kuyruk (executor) başına ayrı thread havuzu + süre/aşım metrikleri: job_runner.py
+scheduler = job_runner.build_scheduler(timezone="Europe/Istanbul")
 
 # ENV bayrakları
 # DISABLE_JOBS=1  -> tüm job'lar kapalı (local test için birebir)
@@ -467,6 +625,8 @@ def _add_job_safe(func, *, trigger, id, **kw):
     if id in DISABLED_IDS:
         logger.info(f"Job disabled by DISABLE_JOBS_IDS: {id}")
         return
+    kw.setdefault("executor", job_runner.queue_for(id))
+    func = job_runner.timed(id, func, job_runner.interval_seconds(trigger, kw))
     scheduler.add_job(func, trigger=trigger, id=id, **kw)
 
 def schedule_jobs():
@@ -541,6 +701,14 @@ def schedule_jobs():
         minute=10
     )
 
+    # >>> DailySales artımlı güncelleme: 30 dakikada bir (gün içi öneriler taze kalsın)
+    _add_job_safe(
+        _incremental_daily_sales,
+        trigger='interval',
+        id="daily_sales_incremental",
+        minutes=30
+    )
+
     # >>> Stok Sync: 3 dakikada bir (Idefix hariç)
     # Önceden 15 dk idi — overselling penceresini küçültmek için 3 dk'ya indirildi.
     from stock_sync.service import auto_sync_platforms_except_idefix
@@ -557,6 +725,198 @@ def schedule_jobs():
         next_run_time=now + timedelta(minutes=2)  # İlk çalışma 2 dk sonra
     )
 
+    # >>> Rezerv projeksiyonu doğrulayıcı: her 30 dakikada bir
+    # reserved_stock'u sipariş tablolarından sıfırdan kurar; sapma varsa loglar.
+    def _reserved_stock_verify_job():
+        with app.app_context():
+            try:
+                from stock_sync.reservation import rebuild_reserved_stock
+                res = rebuild_reserved_stock()
+                if res["drift"]:
+                    logger.warning(f"[REZERV] doğrulayıcı {len(res['drift'])} barkodda sapma buldu")
+            except Exception:
+                db.session.rollback()
+                logger.exception("[REZERV] doğrulayıcı hatası (yutuldu)")
+
+    _add_job_safe(
+        _reserved_stock_verify_job,
+        trigger='interval',
+        id="reserved_stock_verify",
+        minutes=30,
+        next_run_time=now + timedelta(minutes=4)
+    )
+
+    # >>> Trendyol batch / Amazon feed mutabakatı: her dakika
+    # batchRequestId / feedId'leri backoff ile yoklar, FAILED ürünleri SyncDetail'e
+    # işler ve yalnız o barkodları yeniden gönderir.
+    def _sync_batch_reconcile_job():
+        with app.app_context():
+            try:
+                from stock_sync.batch_reconcile import reconcile_pending_batches
+                reconcile_pending_batches()
+            except Exception:
+                db.session.rollback()
+                logger.exception("[BATCH-MUTABAKAT] mutabakat hatası (yutuldu)")
+
+    _add_job_safe(
+        _sync_batch_reconcile_job,
+        trigger='interval',
+        id="sync_batch_reconcile",
+        minutes=1,
+        next_run_time=now + timedelta(minutes=3)
+    )
+
+    # >>> SyncDetail saklama temizliği: her gece 04:20
+    # SYNC_DETAIL_RETENTION_DAYS'ten (default 14) eski session'ların detayları silinir.
+    def _sync_detail_prune_job():
+        with app.app_context():
+            try:
+                from stock_sync.detail_writer import prune_sync_details
+                from stock_sync.batch_reconcile import prune_batch_requests
+                prune_sync_details()
+                prune_batch_requests()
+            except Exception:
+                db.session.rollback()
+                logger.exception("[SYNC] detay saklama temizliği hatası (yutuldu)")
+
+    _add_job_safe(
+        _sync_detail_prune_job,
+        trigger='cron',
+        id="sync_detail_prune",
+        hour=4,
+        minute=20
+    )
+
+    # >>> Audit / kullanıcı logu bölüm bakımı: her gece 04:50
+    # Gelecek ayların bölümlerini açar; saklama süresi dolan bölümleri/satırları
+    # gzip CSV'ye arşivleyip DB'den kaldırır (AUDIT_LOG_RETENTION_MONTHS,
+    # USER_LOG_RETENTION_MONTHS).
+    def _log_partition_maintenance_job():
+        with app.app_context():
+            try:
+                from log_partitions import run_maintenance
+                run_maintenance()
+            except Exception:
+                db.session.rollback()
+                logger.exception("[LOG-PART] gece bakım hatası (yutuldu)")
+
+    _add_job_safe(
+        _log_partition_maintenance_job,
+        trigger='cron',
+        id="log_partition_maintenance",
+        hour=4,
+        minute=50
+    )
+
+    # >>> Sipariş arama indeksi tam yeniden kurma: her gece 04:40
+    # Geçişler commit anında indekse yansır; bu job event'siz yollardan (ham SQL,
+    # script) kalan sapmayı temizler.
+    def _order_search_reindex_job():
+        with app.app_context():
+            try:
+                from order_search import rebuild_order_search_index
+                rebuild_order_search_index()
+            except Exception:
+                db.session.rollback()
+                logger.exception("[ORDER-SEARCH] gece yeniden kurma hatası (yutuldu)")
+
+    _add_job_safe(
+        _order_search_reindex_job,
+        trigger='cron',
+        id="order_search_reindex",
+        hour=4,
+        minute=40
+    )
+
+    # >>> Ürün listesi model özeti tam yeniden kurma: her gece 04:50
+    # Ürün/stok yazımları commit anında özete yansır; bu job ham SQL / script
+    # yollarından kalan sapmayı temizler.
+    def _product_summary_rebuild_job():
+        with app.app_context():
+            try:
+                from product_summary import rebuild_product_summary
+                rebuild_product_summary()
+            except Exception:
+                db.session.rollback()
+                logger.exception("[PRODUCT-SUMMARY] gece yeniden kurma hatası (yutuldu)")
+
+    _add_job_safe(
+        _product_summary_rebuild_job,
+        trigger='cron',
+        id="product_summary_rebuild",
+        hour=4,
+        minute=50
+    )
+
+    # >>> Model özeti bayat işareti: 10 dakikada bir (modeli bilinmeyen toplu DML
+    # commit içinde tam kurma yapmaz, yalnız işaret bırakır)
+    def _product_summary_stale_job():
+        with app.app_context():
+            try:
+                from product_summary import refresh_stale
+                refresh_stale()
+            except Exception:
+                db.session.rollback()
+                logger.exception("[PRODUCT-SUMMARY] bayat özet yenileme hatası (yutuldu)")
+
+    _add_job_safe(
+        _product_summary_stale_job,
+        trigger='interval',
+        id="product_summary_stale_refresh",
+        minutes=10
+    )
+
+    # >>> Görsel türevleri tamamlama: her gece 05:10
+    # Yeni indirilen görseller indirme sonunda işlenir; bu job elle yüklenen /
+    # eski görsellerin eksik thumb/medium türevlerini süreç havuzunda üretir.
+    def _image_derivatives_backfill_job():
+        try:
+            from image_pipeline import backfill
+            backfill()
+        except Exception:
+            logger.exception("[IMG] gece türev tamamlama hatası (yutuldu)")
+
+    _add_job_safe(
+        _image_derivatives_backfill_job,
+        trigger='cron',
+        id="image_derivatives_backfill",
+        hour=5,
+        minute=10
+    )
+
+    # >>> Günlük KPI özeti: 5 dakikada bir dokunulan günler, her gece 05:30 son N gün
+    def _kpi_refresh_job():
+        with app.app_context():
+            try:
+                from kpi_rollup import refresh_touched
+                refresh_touched()
+            except Exception:
+                db.session.rollback()
+                logger.exception("[KPI] artımlı güncelleme hatası (yutuldu)")
+
+    def _kpi_rebuild_job():
+        with app.app_context():
+            try:
+                from kpi_rollup import rebuild_days
+                rebuild_days()
+            except Exception:
+                db.session.rollback()
+                logger.exception("[KPI] gece yeniden kurma hatası (yutuldu)")
+
+    _add_job_safe(
+        _kpi_refresh_job,
+        trigger='interval',
+        id="kpi_rollup_refresh",
+        minutes=5
+    )
+    _add_job_safe(
+        _kpi_rebuild_job,
+        trigger='cron',
+        id="kpi_rollup_rebuild",
+        hour=5,
+        minute=30
+    )
+
     # >>> Shopify Stok Sağlık İzleme: her 6 saatte bir
     from stock_sync.health_monitor import run_all_checks as _stock_health_checks
 
@@ -609,6 +969,22 @@ def schedule_jobs():
         next_run_time=now + timedelta(minutes=15)
     )
 
+    # >>> Job metrikleri: 15 sn'de bir PlatformConfig('job_runner')'a (GET /health/jobs)
+    def _job_runner_heartbeat():
+        with app.app_context():
+            try:
+                job_runner.publish_status(scheduler)
+            finally:
+                db.session.remove()
+
+    _add_job_safe(
+        _job_runner_heartbeat,
+        trigger='interval',
+        id="job_runner_heartbeat",
+        seconds=job_runner.HEARTBEAT_SECONDS,
+        next_run_time=now + timedelta(seconds=5)
+    )
+
     # >>> WooCommerce sipariş senkronizasyonu: her 10 dakika - DEVRE DIŞI
     # _add_job_safe(
     #     sync_woo_orders_background,
@@ -618,16 +994,39 @@ def schedule_jobs():
     #     next_run_time=now + timedelta(minutes=1)  # 1 dk sonra başlasın
     # )
 
-# ENV ve liderlik kontrolü
-_leader_ok = False
-if ENABLE_JOBS and is_main_proc:
+def start_scheduler():
+    """Leader lock alınırsa scheduler'ı başlatıp job'ları kurar."""
+    global _leader_ok
     _leader_ok = become_leader()
     if _leader_ok:
         scheduler.start()
         schedule_jobs()
-        logger.info("Scheduler started (ENABLE_JOBS=on, leader ok).")
+        logger.info("Scheduler started (ENABLE_JOBS=on, leader ok, runner=%s).",
+                    "process" if job_runner.is_runner_process() else "inline")
     else:
         logger.info("Scheduler NOT started (ENABLE_JOBS=on, leader=false)")
+    return _leader_ok
+
+# ENV ve liderlik kontrolü
+# JOB_RUNNER=external → web worker'ları job çalıştırmaz; job'lar `python job_runner.py`
+# sürecindedir (runner kendi içinde start_scheduler() çağırır).
+_leader_ok = False
+if IS_SPAWN_WORKER:
+    pass
+elif ENABLE_JOBS and is_main_proc:
+    # ⚡ Anlık stok push: her süreç kendi commit'lerini gönderir (leader'dan bağımsız)
+    try:
+        from stock_sync.push_dispatcher import start as _event_push_start
+        _event_push_start(app)
+    except Exception as _e:
+        logger.exception("[EVENT-PUSH] başlatılamadı: %s", _e)
+
+    if job_runner.is_runner_process():
+        pass
+    elif job_runner.runner_mode() == "external":
+        logger.info("Scheduler NOT started (JOB_RUNNER=external — job'lar job_runner sürecinde)")
+    else:
+        start_scheduler()
 else:
     logger.info(
         "Scheduler NOT started (ENABLE_JOBS=%s, is_main_proc=%s, leader=%s)",
@@ -637,15 +1036,16 @@ else:
 # ──────────────────────────────────────────────────────────────────────────────
 # DB bağlantı testi
 # ──────────────────────────────────────────────────────────────────────────────
-with app.app_context():
-    try:
-        with db.engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
-        print("✅ Neon veritabanına bağlantı başarılı!")
-        print("✅ Veritabanı tabloları kontrol edildi (migrate ile yönetiliyor)")
-    except Exception as e:
-        print(f"❌ Veritabanı bağlantı hatası: {str(e)[:50]}...")
-        print("⚠️ Uygulama veritabanısız modda başlatılıyor")
+if not IS_SPAWN_WORKER:
+    with app.app_context():
+        try:
+            with db.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            print("✅ Neon veritabanına bağlantı başarılı!")
+            print("✅ Veritabanı tabloları kontrol edildi (migrate ile yönetiliyor)")
+        except Exception as e:
+            print(f"❌ Veritabanı bağlantı hatası: {str(e)[:50]}...")
+            print("⚠️ Uygulama veritabanısız modda başlatılıyor")
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Main
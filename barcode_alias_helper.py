@@ -4,11 +4,40 @@ Barkod Alias (Takma Ad) Yönetim Yardımcıları
 
 Bu modül barkod alias sistemini yönetir.
 Tüm barkod işlemlerinde normalize_barcode() kullanılmalıdır.
+
+Çözümleme önbelleği
+-------------------
+normalize_barcode() çağrı başına üç sorgu atabiliyordu (alias PK,
+lower(barcode), indekssiz lower(translate(barcode))) ve rezerv, ledger,
+toplama, sipariş çekme yollarında satır başına çağrılıyor. BarcodeResolver
+alias tablosunu + küçük harf ve ASCII'ye katlanmış ürün barkodu haritalarını
+süreç belleğine alır, O(1) cevap verir.
+
+- Geçersiz kılma: BarcodeAlias / Product ekleme-silme (ORM event'leri ya da
+  toplu yollarda invalidate_barcode_cache()) commit sonrası yerel önbelleği
+  düşürür ve PlatformConfig('barcode_cache') sürüm belirtecini değiştirir.
+  Diğer gunicorn worker'ları belirteci en geç VERSION_CHECK_SECONDS'ta bir
+  kontrol edip yeniden yükler.
+- Commit edilmemiş alias/ürün değişikliği olan session DB yoluna düşer
+  (kendi yazdığını görür).
+- install_listeners() çağrılmamışsa (script, izole test) önbellek devre
+  dışıdır, eski DB yolu çalışır. BARCODE_CACHE=0 ile kapatılabilir.
 """
 
+import logging
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import event, inspect as sa_inspect, select
+from sqlalchemy.orm import object_session
+
 from models import db, BarcodeAlias
 from functools import lru_cache
 
+logger = logging.getLogger(__name__)
+
 
 # Türkçe → ASCII karakter dönüşüm tablosu
 _TR_MAP = str.maketrans("çğıöşüÇĞİÖŞÜ", "cgiosuCGIOSU")
@@ -22,6 +51,207 @@ def strip_turkish(text: str) -> str:
     return text.translate(_TR_MAP)
 
 
+# ─── Süreç içi çözümleme önbelleği ───────────────────────────────────────────
+CACHE_ENABLED = os.getenv("BARCODE_CACHE", "1") != "0"
+VERSION_CHECK_SECONDS = float(os.getenv("BARCODE_CACHE_CHECK_SECONDS", "5"))
+MAX_AGE_SECONDS = 600           # belirteç okunamasa da en geç bu sürede tazele
+_VERSION_PLATFORM = "barcode_cache"
+_DIRTY_KEY = "_barcode_cache_dirty"
+
+_listeners_installed = False
+_resolvers: dict = {}
+_resolvers_lock = threading.Lock()
+
+
+class BarcodeResolver:
+    """Bir veritabanı (engine) için alias + ürün barkodu haritaları."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._maps = None           # (alias, lower, folded)
+        self._token = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    def _read_token(self, conn):
+        from models import PlatformConfig
+        t = PlatformConfig.__table__
+        cfg = conn.execute(
+            select(t.c.extra_config).where(t.c.platform == _VERSION_PLATFORM)
+        ).scalar()
+        return (cfg or {}).get("token") if isinstance(cfg, dict) else None
+
+    def _load(self) -> None:
+        from models import Product
+        with self.engine.connect() as conn:
+            try:
+                token = self._read_token(conn)   # haritalardan ÖNCE: arada gelen değişiklik kaçmaz
+            except Exception:
+                conn.rollback()
+                token = None
+            aliases = dict(conn.execute(
+                select(BarcodeAlias.alias_barcode, BarcodeAlias.main_barcode)).all())
+            lower, folded = {}, {}
+            for (bc,) in conn.execute(select(Product.barcode)):
+                if not bc:
+                    continue
+                lower.setdefault(bc.lower(), bc)
+                folded.setdefault(strip_turkish(bc).lower(), bc)
+        self._maps = (aliases, lower, folded)
+        self._token = token
+        self._loaded_at = self._checked_at = time.monotonic()
+        logger.info(f"[BARKOD] çözümleme önbelleği yüklendi: {len(aliases)} alias, {len(lower)} ürün")
+
+    def _stale(self, now: float) -> bool:
+        if self._maps is None or now - self._loaded_at > MAX_AGE_SECONDS:
+            return True
+        if now - self._checked_at < VERSION_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+        try:
+            with self.engine.connect() as conn:
+                return self._read_token(conn) != self._token
+        except Exception:
+            return False
+
+    def maps(self):
+        with self._lock:
+            if self._stale(time.monotonic()):
+                self._load()
+            return self._maps
+
+    def resolve(self, barcode: str) -> str:
+        """Temizlenmiş barkod → ana barkod (normalize_barcode ile aynı öncelik)."""
+        aliases, lower, folded = self.maps()
+        main = aliases.get(barcode)
+        if main is not None:
+            return main
+        key = barcode.lower()
+        hit = lower.get(key)
+        if hit is None:
+            hit = folded.get(strip_turkish(barcode).lower())
+        return hit if hit is not None else barcode
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._maps = None
+
+
+def _resolver():
+    engine = db.engine
+    key = str(engine.url)
+    r = _resolvers.get(key)
+    if r is None:
+        with _resolvers_lock:
+            r = _resolvers.setdefault(key, BarcodeResolver(engine))
+    return r
+
+
+def _cache_usable() -> bool:
+    return (CACHE_ENABLED and _listeners_installed
+            and not db.session().info.get(_DIRTY_KEY))
+
+
+def invalidate_barcode_cache(sess=None) -> None:
+    """Toplu ürün/alias yazımlarında (event tetiklemeyen yollar) commit ÖNCESİ çağrılır."""
+    (sess or db.session()).info[_DIRTY_KEY] = True
+
+
+def _bump_version(engine) -> None:
+    """Diğer worker'lar için sürüm belirtecini değiştirir (ayrı transaction)."""
+    from models import PlatformConfig
+    t = PlatformConfig.__table__
+    payload = {"token": uuid.uuid4().hex}
+    try:
+        with engine.begin() as conn:
+            res = conn.execute(t.update().where(t.c.platform == _VERSION_PLATFORM)
+                               .values(extra_config=payload))
+            if not res.rowcount:
+                conn.execute(t.insert().values(platform=_VERSION_PLATFORM, is_active=False,
+                                               extra_config=payload))
+    except Exception as e:
+        logger.warning(f"[BARKOD] önbellek sürümü yazılamadı: {e}")
+
+
+def _mark_dirty(mapper, connection, target):
+    sess = object_session(target)
+    if sess is not None:
+        sess.info[_DIRTY_KEY] = True
+
+
+def _mark_dirty_on_barcode_change(mapper, connection, target):
+    if sa_inspect(target).attrs.barcode.history.has_changes():
+        _mark_dirty(mapper, connection, target)
+
+
+def _on_orm_execute(state):
+    # query(...).delete()/update() mapper event'i tetiklemez
+    if (state.is_delete or state.is_update) and any(
+            m.class_.__name__ in ("BarcodeAlias", "Product") for m in state.all_mappers):
+        state.session.info[_DIRTY_KEY] = True
+
+
+def _after_commit(sess):
+    if sess.info.pop(_DIRTY_KEY, None):
+        engine = sess.get_bind()
+        r = _resolvers.get(str(engine.url))
+        if r is not None:
+            r.invalidate()
+        _bump_version(engine)
+
+
+def _after_rollback(sess):
+    sess.info.pop(_DIRTY_KEY, None)
+
+
+def install_listeners() -> None:
+    """Bir kez çağrılır (tekrar çağrı no-op); önbelleği de etkinleştirir."""
+    global _listeners_installed
+    from models import Product
+    if event.contains(BarcodeAlias, "after_insert", _mark_dirty):
+        return
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(BarcodeAlias, name, _mark_dirty)
+    event.listen(Product, "after_insert", _mark_dirty)
+    event.listen(Product, "after_delete", _mark_dirty)
+    event.listen(Product, "after_update", _mark_dirty_on_barcode_change)
+    event.listen(db.session, "do_orm_execute", _on_orm_execute)
+    event.listen(db.session, "after_commit", _after_commit)
+    event.listen(db.session, "after_rollback", _after_rollback)
+    _listeners_installed = True
+    logger.info("[BARKOD] çözümleme önbelleği listener'ları yüklendi.")
+
+
+def cached_maps():
+    """Önbellek kullanılabiliyorsa ``(alias, lower, folded)`` haritaları, yoksa None.
+
+    Harita demeti yeniden yüklenene dek aynı nesnedir; türetilmiş arama
+    tabloları kimliğine (``is``) bakarak yeniden kullanılabilir.
+    """
+    return _resolver().maps() if _cache_usable() else None
+
+
+def _clean(barcode) -> str:
+    return str(barcode).strip().replace(" ", "") if barcode else ""
+
+
+def normalize_many(barcodes) -> dict:
+    """Toplu çözümleme: {girdi: ana barkod}. Önbellek varsa tek harita okuması."""
+    out = {}
+    if _cache_usable():
+        r = _resolver()
+        for bc in barcodes:
+            if bc not in out:
+                cleaned = _clean(bc)
+                out[bc] = r.resolve(cleaned) if cleaned else ""
+        return out
+    for bc in barcodes:
+        if bc not in out:
+            out[bc] = _normalize_db(_clean(bc))
+    return out
+
+
 def normalize_barcode(barcode: str) -> str:
     """
     Verilen barkodu ana barkoda çevirir.
@@ -40,10 +270,18 @@ def normalize_barcode(barcode: str) -> str:
     Returns:
         Ana barkod (main_barcode) veya kendisi
     """
+    barcode = _clean(barcode)
     if not barcode:
         return ""
+    if _cache_usable():
+        return _resolver().resolve(barcode)
+    return _normalize_db(barcode)
 
-    barcode = str(barcode).strip().replace(" ", "")
+
+def _normalize_db(barcode: str) -> str:
+    """Önbelleksiz çözümleme (temizlenmiş barkod)."""
+    if not barcode:
+        return ""
 
     # 1) Tam eşleşme ile alias ara
     alias = BarcodeAlias.query.get(barcode)
@@ -0,0 +1,181 @@
+"""İstek thread'i dışında toplu (batch) yazım için sınırlı kuyruk + arka plan thread'i.
+
+SORUN
+-----
+Audit log yazımları (``order_audit.log_event`` / commit sonrası stok-raf
+event'leri) istek thread'inde ayrı bir session açıp satır başına INSERT +
+COMMIT yapıyordu; her sipariş geçişi / raf hareketi yanıt süresine bir DB
+gidiş-dönüşü ekliyordu.
+
+ÇÖZÜM
+-----
+``BatchWriter``: ``submit`` kaydı bellekteki sınırlı kuyruğa bırakır ve hemen
+döner. Arka plan thread'i ``max_batch`` kayıt birikince ya da
+``flush_interval`` saniyede bir kuyruğu boşaltıp ``write_fn``'e tek parti
+halinde verir. Kuyruk doluysa EN ESKİ kayıt atılır ve ``dropped`` sayacı
+artar (istek thread'i asla bloklanmaz). Parti yazımı hata verirse (tek bozuk
+satır tüm INSERT'i düşürür) ``write_fn`` kayıt başına yeniden çağrılır;
+yalnız hata veren kayıtlar loglanıp atılır (``write_fn`` hata durumunda
+kendi transaction'ını geri almalıdır). Gunicorn fork'undan sonra thread
+ilk ``submit``'te yeniden başlatılır; süreç kapanırken kuyruk boşaltılır.
+``metrics()`` kuyruk derinliği, atılan/yazılan/başarısız sayıları ve parti
+yazım süresini (son / EMA / en yüksek, ms) verir.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+_EMA_ALPHA = 0.2
+_writers: weakref.WeakSet = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    for writer in list(_writers):
+        writer._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class BatchWriter:
+    def __init__(self, name: str, write_fn: Callable[[list], None], *,
+                 max_batch: int = 500, flush_interval: float = 0.5, max_queue: int = 20000):
+        self.name = name
+        self.write_fn = write_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.retried_batches = 0
+        self.batches = 0
+        self.last_flush_ms: float | None = None
+        self.avg_flush_ms: float | None = None
+        self.max_flush_ms = 0.0
+        self.last_flush_at: float | None = None
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        atexit.register(self.flush)
+        _writers.add(self)
+
+    # ------------------------------------------------------------------
+    def submit(self, item) -> None:
+        self._ensure_thread()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 1000 == 0:
+                    logger.warning(f"[{self.name}] kuyruk dolu, en eski kayıt atıldı (toplam {self.dropped})")
+            self._queue.append(item)
+            if len(self._queue) >= self.max_batch:
+                self._cond.notify()
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": len(self._queue),
+            "queue_max": self.max_queue,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "retried_batches": self.retried_batches,
+            "batches": self.batches,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": self.avg_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "last_flush_at": self.last_flush_at,
+            "max_batch": self.max_batch,
+            "flush_interval": self.flush_interval,
+        }
+
+    def flush(self) -> int:
+        """Kuyruktaki her şeyi çağıran thread'de yazar (kapanış / test)."""
+        total = 0
+        while True:
+            batch = self._take(self.max_batch)
+            if not batch:
+                return total
+            self._write(batch)
+            total += len(batch)
+
+    # ------------------------------------------------------------------
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=f"batch-writer-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _after_fork(self) -> None:
+        # Çocuk süreçte ebeveynin thread'i yok, kilitleri tutulu kalmış olabilir;
+        # kuyruğun kopyası ebeveynde yazılacağı için atılır.
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def _take(self, n: int) -> list:
+        with self._cond:
+            batch = []
+            while self._queue and len(batch) < n:
+                batch.append(self._queue.popleft())
+            return batch
+
+    def _write(self, batch: list) -> None:
+        with self._write_lock:
+            started = time.perf_counter()
+            try:
+                self.write_fn(batch)
+                self.written += len(batch)
+            except Exception:
+                if len(batch) == 1:
+                    self.failed += 1
+                    logger.exception(f"[{self.name}] kayıt yazılamadı, atıldı: {batch[0]!r:.300}")
+                else:
+                    logger.warning(f"[{self.name}] {len(batch)} kayıtlık parti yazılamadı, "
+                                   f"kayıt kayıt yeniden deneniyor", exc_info=True)
+                    self.retried_batches += 1
+                    self._write_one_by_one(batch)
+            ms = round((time.perf_counter() - started) * 1000, 2)
+            self.batches += 1
+            self.last_flush_ms = ms
+            avg = self.avg_flush_ms
+            self.avg_flush_ms = round(ms if avg is None else avg + _EMA_ALPHA * (ms - avg), 2)
+            self.max_flush_ms = max(self.max_flush_ms, ms)
+            self.last_flush_at = time.time()
+
+    def _write_one_by_one(self, batch: list) -> None:
+        for item in batch:
+            try:
+                self.write_fn([item])
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"[{self.name}] kayıt yazılamadı, atıldı: {e} — {item!r:.300}")
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._queue) < self.max_batch:
+                    self._cond.wait(self.flush_interval)
+            batch = self._take(self.max_batch)
+            if batch:
+                self._write(batch)
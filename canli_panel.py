@@ -1,11 +1,13 @@
-﻿import json, time, hashlib, os
+﻿import json, time, hashlib, os, queue, threading
 from datetime import datetime, timedelta, date
 from zoneinfo import ZoneInfo
-from flask import Blueprint, Response, jsonify, request, stream_with_context, render_template, redirect, url_for
+from flask import Blueprint, Response, jsonify, request, render_template, redirect, url_for
 from sqlalchemy import func, literal, text, and_, or_
 from models import db, Product, CentralStock
 from models import OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped, OrderCancelled, Archive, ReturnOrder, ReturnProduct
 from login_logout import login_required, roles_required
+from image_pipeline import derived_url
+import response_cache
 try:
     from models import OrderDelivered
 except ImportError:
@@ -23,6 +25,7 @@ DUSUK_STOK_ESIK = 5
 AKIS_ARALIGI_SANIYE = 30
 PING_INTERVAL = 10
 IADE_UYARI_ORAN = 0.25
+OZET_CACHE_SANIYE = 20   # /api/canli/ozet paylaşımlı yanıt tazelik süresi
 
 # ▼▼ BUNU EKLE ▼▼
 ASSUME_DB_UTC = True  # Naive timestamp'lar UTC kabul edilip IST'ye çevrilsin
@@ -935,7 +938,7 @@ def _fetch_product_info_for_barcodes(barcodes):
         ted_kodu = r[ted_kodu_idx] if len(r) > ted_kodu_idx else None
         ted_adi = r[ted_kodu_idx + 1] if len(r) > ted_kodu_idx + 1 else None
         info[bc] = {
-            "model": model, "renk": renk, "beden": beden, "image": img,
+            "model": model, "renk": renk, "beden": beden, "image": derived_url(img, "thumb", "webp"),
             "tedarikci_kodu": ted_kodu or "", "tedarikci_adi": ted_adi or "",
         }
     return info
@@ -977,7 +980,7 @@ def _fetch_pinfo_for_model_color_pairs(pairs):
         ted_kodu = r[ted_kodu_idx] if len(r) > ted_kodu_idx else None
         ted_adi = r[ted_kodu_idx + 1] if len(r) > ted_kodu_idx + 1 else None
         info[bc] = {
-            "model": model, "renk": renk, "beden": beden, "image": img,
+            "model": model, "renk": renk, "beden": beden, "image": derived_url(img, "thumb", "webp"),
             "tedarikci_kodu": ted_kodu or "", "tedarikci_adi": ted_adi or "",
         }
     return info
@@ -1075,325 +1078,464 @@ def _build_cards_from_orders():
 @canli_panel_bp.route("/api/canli/ozet")
 @login_required
 def ozet_json():
-    t0=_t0()
+    accept = request.headers.get("Accept","")
+    if "text/html" in accept and "application/json" not in accept:
+        _info("ozet_json: redirect to page")
+        return redirect(url_for("canli_panel.canli_panel_sayfa"))
     try:
-        accept = request.headers.get("Accept","")
-        if "text/html" in accept and "application/json" not in accept:
-            _info("ozet_json: redirect to page")
-            return redirect(url_for("canli_panel.canli_panel_sayfa"))
-
-        # 1) aralık
+        # Aynı aralık/filtre için tüm sekmeler tek hesaplanmış yanıtı paylaşır (ETag/304 + gzip);
+        # sipariş/iade/stok yazımları commit'te geçersiz kılar
         start_ist, end_ist = _tr_range_from_params(request.args)
-        _info("ozet_json: start", start=str(start_ist), end=str(end_ist))
+        params = {
+            "start": start_ist.isoformat(), "end": end_ist.isoformat(),
+            "source": _normalize_source_filter(request.args.get("source")),
+            "group": "barcode" if _want_group_by_barcode() else "model",
+            "model": (request.args.get("model") or "").strip(),
+        }
+        return response_cache.serve("canli_ozet", _ozet_payload, params=params, ttl=OZET_CACHE_SANIYE,
+                                    tags=("orders", "stock"), volatile=("guncellendi",))
+    except Exception:
+        _exc("ozet_json: failed")
+        return jsonify({"error":"internal_error"}), 500
 
-        # 🔥 Kaynak filtresi
-        source_filter = _normalize_source_filter(request.args.get("source"))
 
-        # 2) satış (adet + NET tutar) — barcode→qty / barcode→net_tutar
-        t1=_t0()
-        qty_map, net_map = _collect_orders_between_strict(start_ist, end_ist, source_filter)   # ← net_map = amount - discount
-        _info("ozet_json: orders done", qty=len(qty_map), net=len(net_map), source=source_filter, ms=_dt_ms(t1))
-
-        # 3) sadece gösterilen siparişlerin iadeleri
-        t2=_t0()
-        ord_nos = _order_numbers_created_between(start_ist, end_ist, source_filter)
-        ret_qty_map, returned_orders = _collect_returns_for_order_numbers(ord_nos)
-        _info("ozet_json: returns done", ret=len(ret_qty_map), returned=len(returned_orders), ms=_dt_ms(t2))
-
-        # 4) ürün/stok
-        barcodes = set(qty_map.keys()) | set(net_map.keys()) | set(ret_qty_map.keys())
-        pinfo = _fetch_product_info_for_barcodes(barcodes)
-        sdict = _fetch_stock_for_barcodes(barcodes)
-
-        # 5) gruplama: default MODEL+RENK, ?group=barcode ise barkod
-        group_by_barcode = _want_group_by_barcode()
-
-        # Model+renk modunda: aynı (model,renk) için satışı olmayan barkodları
-        # da ekle ki tüm bedenlerin gerçek stoğu görünsün (modal/Tedarik Oluştur).
-        if not group_by_barcode:
-            barcodes = _expand_with_all_sizes(barcodes, pinfo, sdict)
-        tek_model = (request.args.get("model") or "").strip() or None
-
-        grp, rep_image, rep_tedarikci = {}, {}, {}
-        for bc in barcodes:
-            sat = int(qty_map.get(bc, 0))
-            iad = int(ret_qty_map.get(bc, 0))
-            sale_net = _to_number(net_map.get(bc, None), None)
-            net = _return_adjusted_amount(sat, iad, sale_net)
-            info = pinfo.get(bc, {"model":"Bilinmiyor","renk":"Bilinmiyor","beden":"—","image":None,
-                                  "tedarikci_kodu":"","tedarikci_adi":""})
-
-            if group_by_barcode:
-                rec = grp.setdefault(bc, {
-                    "model": info["model"], "renk": info["renk"], "beden": info["beden"],
-                    "image": info.get("image"),
-                    "siparis":0, "iade":0, "net_adet":0, "stok":0,
-                    "net_tutar":0.0, "tutarli_adet":0
-                })
-                rec["siparis"]  += sat
-                rec["iade"]     += iad
-                rec["net_adet"] += max(0, sat - iad)
-                rec["stok"]     += int(sdict.get(bc, 0))
-                if net is not None and sat > 0:
-                    rec["net_tutar"]   += float(net)
-                    rec["tutarli_adet"]+= max(0, sat - iad)
-            else:
-                key = (info["model"], info["renk"])
-                if key not in rep_image and info.get("image"): rep_image[key] = info["image"]
-                if info.get("tedarikci_kodu"):
-                    rep_tedarikci.setdefault(key, {})[str(info["tedarikci_kodu"])] = info.get("tedarikci_adi", "")
-                d = grp.setdefault(key, {})
-                b = info["beden"]
-                rec = d.setdefault(b, {"siparis":0,"iade":0,"net_adet":0,"stok":0,"net_tutar":0.0,"tutarli_adet":0})
-                rec["siparis"]  += sat
-                rec["iade"]     += iad
-                rec["net_adet"] += max(0, sat - iad)
-                rec["stok"]     += int(sdict.get(bc, 0))
-                if net is not None and sat > 0:
-                    rec["net_tutar"]   += float(net)
-                    rec["tutarli_adet"]+= max(0, sat - iad)
-
-        # 6) kartlar
-        now_tr = datetime.now(IST)
-        hours  = max(1.0, now_tr.hour + now_tr.minute/60.0)
-        kartlar = []
-        toplam_net_satis = 0
-        toplam_net_tutar_all, toplam_adet_all = 0.0, 0
+def _ozet_payload():
+    """/api/canli/ozet gövdesi (istek parametrelerinden; önbellek ıskasında çağrılır)."""
+    t0=_t0()
+    # 1) aralık
+    start_ist, end_ist = _tr_range_from_params(request.args)
+    _info("ozet_json: start", start=str(start_ist), end=str(end_ist))
+
+    # 🔥 Kaynak filtresi
+    source_filter = _normalize_source_filter(request.args.get("source"))
+
+    # 2) satış (adet + NET tutar) — barcode→qty / barcode→net_tutar
+    t1=_t0()
+    qty_map, net_map = _collect_orders_between_strict(start_ist, end_ist, source_filter)   # ← net_map = amount - discount
+    _info("ozet_json: orders done", qty=len(qty_map), net=len(net_map), source=source_filter, ms=_dt_ms(t1))
+
+    # 3) sadece gösterilen siparişlerin iadeleri
+    t2=_t0()
+    ord_nos = _order_numbers_created_between(start_ist, end_ist, source_filter)
+    ret_qty_map, returned_orders = _collect_returns_for_order_numbers(ord_nos)
+    _info("ozet_json: returns done", ret=len(ret_qty_map), returned=len(returned_orders), ms=_dt_ms(t2))
+
+    # 4) ürün/stok
+    barcodes = set(qty_map.keys()) | set(net_map.keys()) | set(ret_qty_map.keys())
+    pinfo = _fetch_product_info_for_barcodes(barcodes)
+    sdict = _fetch_stock_for_barcodes(barcodes)
+
+    # 5) gruplama: default MODEL+RENK, ?group=barcode ise barkod
+    group_by_barcode = _want_group_by_barcode()
+
+    # Model+renk modunda: aynı (model,renk) için satışı olmayan barkodları
+    # da ekle ki tüm bedenlerin gerçek stoğu görünsün (modal/Tedarik Oluştur).
+    if not group_by_barcode:
+        barcodes = _expand_with_all_sizes(barcodes, pinfo, sdict)
+    tek_model = (request.args.get("model") or "").strip() or None
+
+    grp, rep_image, rep_tedarikci = {}, {}, {}
+    for bc in barcodes:
+        sat = int(qty_map.get(bc, 0))
+        iad = int(ret_qty_map.get(bc, 0))
+        sale_net = _to_number(net_map.get(bc, None), None)
+        net = _return_adjusted_amount(sat, iad, sale_net)
+        info = pinfo.get(bc, {"model":"Bilinmiyor","renk":"Bilinmiyor","beden":"—","image":None,
+                              "tedarikci_kodu":"","tedarikci_adi":""})
 
         if group_by_barcode:
-            for bc, rec in grp.items():
-                model, renk, beden = rec["model"], rec["renk"], rec["beden"]
-                if not _model_matches(model, tek_model): continue
-                s = rec["siparis"]; r = rec["iade"]; n_adet = rec["net_adet"]
-                k = rec["stok"];    nt = rec["net_tutar"]; qa = rec["tutarli_adet"]
-
-                toplam_net_satis      += n_adet
-                toplam_net_tutar_all  += nt
-                toplam_adet_all       += qa
-
-                iade_oran  = (r/s) if s>0 else 0.0
-                ort_net    = (nt/qa) if qa>0 else 0.0
-                iade_uyari = (iade_oran >= IADE_UYARI_ORAN)
-
-                kartlar.append({
-                    "barcode": bc, "model": model, "renk": renk, "image": rec.get("image"),
-                    "toplam_siparis_bugun": s, "toplam_iade": r,
-                    "toplam_net_satis": n_adet, "iade_orani": round(iade_oran,2), "iade_uyari": iade_uyari,
-                    "toplam_stok": k, "ortalama_fiyat": round(ort_net, 2),   # NET ortalama
-                    "saatlik_hiz": round(n_adet / hours, 2), "dusuk_stok": k < DUSUK_STOK_ESIK,
-                    "detay": [{"beden": beden, "siparis": s, "iade": r, "net": n_adet, "stok": k}]
-                })
+            rec = grp.setdefault(bc, {
+                "model": info["model"], "renk": info["renk"], "beden": info["beden"],
+                "image": info.get("image"),
+                "siparis":0, "iade":0, "net_adet":0, "stok":0,
+                "net_tutar":0.0, "tutarli_adet":0
+            })
+            rec["siparis"]  += sat
+            rec["iade"]     += iad
+            rec["net_adet"] += max(0, sat - iad)
+            rec["stok"]     += int(sdict.get(bc, 0))
+            if net is not None and sat > 0:
+                rec["net_tutar"]   += float(net)
+                rec["tutarli_adet"]+= max(0, sat - iad)
         else:
-            def _beden_key(b):
-                try: return (0, float(str(b).replace(',','.')))
-                except: return (1, str(b))
-            for (model, renk), beden_map in grp.items():
-                if not _model_matches(model, tek_model): continue
-                detay=[]; top_sat=top_iade=top_net_adet=top_stok=0; top_net_tutar=0.0; top_tutarli_adet=0
-                for beden in sorted(beden_map.keys(), key=_beden_key):
-                    s = beden_map[beden]["siparis"]; r = beden_map[beden]["iade"]; n_adet = beden_map[beden]["net_adet"]
-                    k = beden_map[beden]["stok"];    nt= beden_map[beden]["net_tutar"]; qa     = beden_map[beden]["tutarli_adet"]
-                    top_sat+=s; top_iade+=r; top_net_adet+=n_adet; top_stok+=k; top_net_tutar+=nt; top_tutarli_adet+=qa
-                    detay.append({"beden":beden,"siparis":s,"iade":r,"net":n_adet,"stok":k})
-                toplam_net_satis     += top_net_adet
-                toplam_net_tutar_all += top_net_tutar
-                toplam_adet_all      += top_tutarli_adet
-
-                iade_oran  = (top_iade/top_sat) if top_sat>0 else 0.0
-                ort_net    = (top_net_tutar/top_tutarli_adet) if top_tutarli_adet>0 else 0.0
-                iade_uyari = (iade_oran >= IADE_UYARI_ORAN)
-
-                ted_map = rep_tedarikci.get((model, renk), {})
-                ted_codes = sorted(ted_map)
-                kartlar.append({
-                    "model":model,"renk":renk,"image":rep_image.get((model,renk)),
-                    "toplam_siparis_bugun":top_sat,"toplam_iade":top_iade,"toplam_net_satis":top_net_adet,
-                    "iade_orani":round(iade_oran,2),"iade_uyari":iade_uyari,
-                    "toplam_stok":top_stok,"ortalama_fiyat":round(ort_net,2),
-                    "saatlik_hiz":round(top_net_adet/hours,2),"dusuk_stok":top_stok < DUSUK_STOK_ESIK,
-                    "tedarikci_kodu": ted_codes[0] if len(ted_codes) == 1 else "",
-                    "tedarikci_adi": ted_map.get(ted_codes[0], "") if len(ted_codes) == 1 else "",
-                    "tedarikci_kodlari": ted_codes,
-                    "detay":detay
-                })
-
-        # En çok satan her zaman en üstte: net satış, brüt satış, stok
-        kartlar.sort(key=lambda k:(
-            k.get("toplam_net_satis",0),
-            k.get("toplam_siparis_bugun",0),
-            k.get("toplam_stok",0)
-        ), reverse=True)
-        genel_ortalama_fiyat = round((toplam_net_tutar_all / toplam_adet_all), 2) if toplam_adet_all > 0 else 0.0
-        toplam_ciro = round(toplam_net_tutar_all, 2)  # Toplam NET ciro
-
-        _info("ozet_json: done", cards=len(kartlar), ms=_dt_ms(t0))
-        return jsonify({
-            "guncellendi": now_tr.strftime("%d/%m/%Y %H:%M"),
-            "range": {"start": start_ist.strftime("%Y-%m-%d"), "end_exclusive": end_ist.strftime("%Y-%m-%d")},
-            "group": ("barcode" if group_by_barcode else "model"),
-            "toplam_net_satis": toplam_net_satis,
-            "toplam_siparis_sayisi": _count_orders_between_distinct(start_ist, end_ist, source_filter),
-            "genel_ortalama_fiyat": genel_ortalama_fiyat,        # NET
-            "toplam_ciro": toplam_ciro,                          # Toplam NET ciro
-            "kartlar": kartlar
-        })
-    except Exception:
-        _exc("ozet_json: failed")
-        return jsonify({"error":"internal_error"}), 500
+            key = (info["model"], info["renk"])
+            if key not in rep_image and info.get("image"): rep_image[key] = info["image"]
+            if info.get("tedarikci_kodu"):
+                rep_tedarikci.setdefault(key, {})[str(info["tedarikci_kodu"])] = info.get("tedarikci_adi", "")
+            d = grp.setdefault(key, {})
+            b = info["beden"]
+            rec = d.setdefault(b, {"siparis":0,"iade":0,"net_adet":0,"stok":0,"net_tutar":0.0,"tutarli_adet":0})
+            rec["siparis"]  += sat
+            rec["iade"]     += iad
+            rec["net_adet"] += max(0, sat - iad)
+            rec["stok"]     += int(sdict.get(bc, 0))
+            if net is not None and sat > 0:
+                rec["net_tutar"]   += float(net)
+                rec["tutarli_adet"]+= max(0, sat - iad)
+
+    # 6) kartlar
+    now_tr = datetime.now(IST)
+    hours  = max(1.0, now_tr.hour + now_tr.minute/60.0)
+    kartlar = []
+    toplam_net_satis = 0
+    toplam_net_tutar_all, toplam_adet_all = 0.0, 0
+
+    if group_by_barcode:
+        for bc, rec in grp.items():
+            model, renk, beden = rec["model"], rec["renk"], rec["beden"]
+            if not _model_matches(model, tek_model): continue
+            s = rec["siparis"]; r = rec["iade"]; n_adet = rec["net_adet"]
+            k = rec["stok"];    nt = rec["net_tutar"]; qa = rec["tutarli_adet"]
+
+            toplam_net_satis      += n_adet
+            toplam_net_tutar_all  += nt
+            toplam_adet_all       += qa
+
+            iade_oran  = (r/s) if s>0 else 0.0
+            ort_net    = (nt/qa) if qa>0 else 0.0
+            iade_uyari = (iade_oran >= IADE_UYARI_ORAN)
+
+            kartlar.append({
+                "barcode": bc, "model": model, "renk": renk, "image": rec.get("image"),
+                "toplam_siparis_bugun": s, "toplam_iade": r,
+                "toplam_net_satis": n_adet, "iade_orani": round(iade_oran,2), "iade_uyari": iade_uyari,
+                "toplam_stok": k, "ortalama_fiyat": round(ort_net, 2),   # NET ortalama
+                "saatlik_hiz": round(n_adet / hours, 2), "dusuk_stok": k < DUSUK_STOK_ESIK,
+                "detay": [{"beden": beden, "siparis": s, "iade": r, "net": n_adet, "stok": k}]
+            })
+    else:
+        def _beden_key(b):
+            try: return (0, float(str(b).replace(',','.')))
+            except: return (1, str(b))
+        for (model, renk), beden_map in grp.items():
+            if not _model_matches(model, tek_model): continue
+            detay=[]; top_sat=top_iade=top_net_adet=top_stok=0; top_net_tutar=0.0; top_tutarli_adet=0
+            for beden in sorted(beden_map.keys(), key=_beden_key):
+                s = beden_map[beden]["siparis"]; r = beden_map[beden]["iade"]; n_adet = beden_map[beden]["net_adet"]
+                k = beden_map[beden]["stok"];    nt= beden_map[beden]["net_tutar"]; qa     = beden_map[beden]["tutarli_adet"]
+                top_sat+=s; top_iade+=r; top_net_adet+=n_adet; top_stok+=k; top_net_tutar+=nt; top_tutarli_adet+=qa
+                detay.append({"beden":beden,"siparis":s,"iade":r,"net":n_adet,"stok":k})
+            toplam_net_satis     += top_net_adet
+            toplam_net_tutar_all += top_net_tutar
+            toplam_adet_all      += top_tutarli_adet
+
+            iade_oran  = (top_iade/top_sat) if top_sat>0 else 0.0
+            ort_net    = (top_net_tutar/top_tutarli_adet) if top_tutarli_adet>0 else 0.0
+            iade_uyari = (iade_oran >= IADE_UYARI_ORAN)
+
+            ted_map = rep_tedarikci.get((model, renk), {})
+            ted_codes = sorted(ted_map)
+            kartlar.append({
+                "model":model,"renk":renk,"image":rep_image.get((model,renk)),
+                "toplam_siparis_bugun":top_sat,"toplam_iade":top_iade,"toplam_net_satis":top_net_adet,
+                "iade_orani":round(iade_oran,2),"iade_uyari":iade_uyari,
+                "toplam_stok":top_stok,"ortalama_fiyat":round(ort_net,2),
+                "saatlik_hiz":round(top_net_adet/hours,2),"dusuk_stok":top_stok < DUSUK_STOK_ESIK,
+                "tedarikci_kodu": ted_codes[0] if len(ted_codes) == 1 else "",
+                "tedarikci_adi": ted_map.get(ted_codes[0], "") if len(ted_codes) == 1 else "",
+                "tedarikci_kodlari": ted_codes,
+                "detay":detay
+            })
+
+    # En çok satan her zaman en üstte: net satış, brüt satış, stok
+    kartlar.sort(key=lambda k:(
+        k.get("toplam_net_satis",0),
+        k.get("toplam_siparis_bugun",0),
+        k.get("toplam_stok",0)
+    ), reverse=True)
+    genel_ortalama_fiyat = round((toplam_net_tutar_all / toplam_adet_all), 2) if toplam_adet_all > 0 else 0.0
+    toplam_ciro = round(toplam_net_tutar_all, 2)  # Toplam NET ciro
+
+    _info("ozet_json: done", cards=len(kartlar), ms=_dt_ms(t0))
+    return {
+        "guncellendi": now_tr.strftime("%d/%m/%Y %H:%M"),
+        "range": {"start": start_ist.strftime("%Y-%m-%d"), "end_exclusive": end_ist.strftime("%Y-%m-%d")},
+        "group": ("barcode" if group_by_barcode else "model"),
+        "toplam_net_satis": toplam_net_satis,
+        "toplam_siparis_sayisi": _count_orders_between_distinct(start_ist, end_ist, source_filter),
+        "genel_ortalama_fiyat": genel_ortalama_fiyat,        # NET
+        "toplam_ciro": toplam_ciro,                          # Toplam NET ciro
+        "kartlar": kartlar
+    }
+
 
 
 
+def _akis_payload(start_ist, end_ist, source_filter, group_by_barcode, tek_model):
+    """SSE kart payload'unu hesaplar (request'ten bağımsız; yayın thread'i çağırır)."""
+    # satış (adet + NET tutar)
+    qty_map, net_map = _collect_orders_between_strict(start_ist, end_ist, source_filter)
+    # sadece gösterilen siparişlerin iadeleri
+    ord_nos = _order_numbers_created_between(start_ist, end_ist, source_filter)
+    ret_qty_map, returned_orders = _collect_returns_for_order_numbers(ord_nos)
+
+    barcodes = set(qty_map.keys()) | set(net_map.keys()) | set(ret_qty_map.keys())
+    pinfo = _fetch_product_info_for_barcodes(barcodes)
+    sdict = _fetch_stock_for_barcodes(barcodes)
+
+    # Model+renk modunda: aynı (model,renk) için satışı olmayan barkodları
+    # da ekle ki tüm bedenlerin gerçek stoğu modal/Tedarik Oluştur'da görünsün.
+    if not group_by_barcode:
+        barcodes = _expand_with_all_sizes(barcodes, pinfo, sdict)
+
+    grp, rep_image, rep_tedarikci = {}, {}, {}
+    for bc in barcodes:
+        sat=int(qty_map.get(bc,0))
+        iad=int(ret_qty_map.get(bc,0))
+        sale_net=_to_number(net_map.get(bc,None), None)
+        net=_return_adjusted_amount(sat, iad, sale_net)
+        info = pinfo.get(bc, {"model":"Bilinmiyor","renk":"Bilinmiyor","beden":"—","image":None,
+                              "tedarikci_kodu":"","tedarikci_adi":""})
+
+        if group_by_barcode:
+            rec = grp.setdefault(bc, {
+                "model":info["model"],"renk":info["renk"],"beden":info["beden"],"image":info.get("image"),
+                "siparis":0,"iade":0,"net_adet":0,"stok":0,"net_tutar":0.0,"tutarli_adet":0
+            })
+            rec["siparis"]+=sat; rec["iade"]+=iad; rec["net_adet"]+=max(0,sat-iad); rec["stok"]+=int(sdict.get(bc,0))
+            if net is not None and sat>0:
+                rec["net_tutar"]+=float(net)
+                rec["tutarli_adet"]+=max(0, sat-iad)
+        else:
+            key=(info["model"],info["renk"])
+            if key not in rep_image and info.get("image"): rep_image[key]=info["image"]
+            if info.get("tedarikci_kodu"):
+                rep_tedarikci.setdefault(key, {})[str(info["tedarikci_kodu"])] = info.get("tedarikci_adi", "")
+            d=grp.setdefault(key,{})
+            b=info["beden"]
+            rec=d.setdefault(b,{"siparis":0,"iade":0,"net_adet":0,"stok":0,"net_tutar":0.0,"tutarli_adet":0})
+            rec["siparis"]+=sat; rec["iade"]+=iad; rec["net_adet"]+=max(0,sat-iad); rec["stok"]+=int(sdict.get(bc,0))
+            if net is not None and sat>0:
+                rec["net_tutar"]+=float(net)
+                rec["tutarli_adet"]+=max(0, sat-iad)
+
+    now_tr=datetime.now(IST); hours=max(1.0, now_tr.hour + now_tr.minute/60.0)
+    kartlar=[]; toplam_net_satis=0; toplam_net_tutar_sse=0.0
+
+    if group_by_barcode:
+        for bc, rec in grp.items():
+            model,renk,beden = rec["model"], rec["renk"], rec["beden"]
+            if not _model_matches(model, tek_model): continue
+            s=rec["siparis"]; r=rec["iade"]; n_adet=rec["net_adet"]
+            k=rec["stok"];    nt=rec["net_tutar"]; qa=rec["tutarli_adet"]
+            toplam_net_satis += n_adet
+            toplam_net_tutar_sse += nt
+            iade_oran=(r/s) if s>0 else 0.0
+            ort_net=(nt/qa) if qa>0 else 0.0
+            iade_uyari=(iade_oran>=IADE_UYARI_ORAN)
+            kartlar.append({
+                "barcode": bc, "model": model, "renk": renk, "image": rec.get("image"),
+                "toplam_siparis_bugun": s, "toplam_iade": r,
+                "toplam_net_satis": n_adet, "iade_orani": round(iade_oran,2), "iade_uyari": iade_uyari,
+                "toplam_stok": k, "ortalama_fiyat": round(ort_net,2),
+                "saatlik_hiz": round(n_adet / hours, 2), "dusuk_stok": k < DUSUK_STOK_ESIK,
+                "detay": [{"beden": beden, "siparis": s, "iade": r, "net": n_adet, "stok": k}]
+            })
+    else:
+        def _beden_key(b):
+            try: return (0, float(str(b).replace(',','.')))
+            except: return (1, str(b))
+        for (model,renk), beden_map in grp.items():
+            if not _model_matches(model, tek_model): continue
+            detay=[]; top_sat=top_iade=top_net_adet=top_stok=0; top_net_tutar=0.0; top_tutarli_adet=0
+            for beden in sorted(beden_map.keys(), key=_beden_key):
+                s=beden_map[beden]["siparis"]; r=beden_map[beden]["iade"]; n_adet=beden_map[beden]["net_adet"]
+                k=beden_map[beden]["stok"];    nt=beden_map[beden]["net_tutar"]; qa=beden_map[beden]["tutarli_adet"]
+                top_sat+=s; top_iade+=r; top_net_adet+=n_adet; top_stok+=k; top_net_tutar+=nt; top_tutarli_adet+=qa
+                detay.append({"beden":beden,"siparis":s,"iade":r,"net":n_adet,"stok":k})
+            toplam_net_satis+=top_net_adet
+            toplam_net_tutar_sse+=top_net_tutar
+            iade_oran=(top_iade/top_sat) if top_sat>0 else 0.0
+            ort_net=(top_net_tutar/top_tutarli_adet) if top_tutarli_adet>0 else 0.0
+            iade_uyari=(iade_oran>=IADE_UYARI_ORAN)
+            ted_map = rep_tedarikci.get((model, renk), {})
+            ted_codes = sorted(ted_map)
+            kartlar.append({
+                "model":model,"renk":renk,"image":rep_image.get((model,renk)),
+                "toplam_siparis_bugun":top_sat,"toplam_iade":top_iade,"toplam_net_satis":top_net_adet,
+                "iade_orani":round(iade_oran,2),"iade_uyari":iade_uyari,
+                "toplam_stok":top_stok,"ortalama_fiyat":round(ort_net,2),
+                "saatlik_hiz":round(top_net_adet/hours,2),"dusuk_stok":top_stok < DUSUK_STOK_ESIK,
+                "tedarikci_kodu": ted_codes[0] if len(ted_codes) == 1 else "",
+                "tedarikci_adi": ted_map.get(ted_codes[0], "") if len(ted_codes) == 1 else "",
+                "tedarikci_kodlari": ted_codes,
+                "detay":detay
+            })
+
+    # En çok satan her zaman en üstte: net satış, brüt satış, stok
+    kartlar.sort(key=lambda k:(
+        k.get("toplam_net_satis",0),
+        k.get("toplam_siparis_bugun",0),
+        k.get("toplam_stok",0)
+    ), reverse=True)
+    _info("SSE: payload done", cards=len(kartlar), net=toplam_net_satis, uniq=len(barcodes))
+    return {
+        "guncellendi": now_tr_str(),
+        "group": ("barcode" if group_by_barcode else "model"),
+        "toplam_net_satis": toplam_net_satis,
+        "toplam_siparis_sayisi": _count_orders_between_distinct(start_ist, end_ist, source_filter),
+        "toplam_ciro": round(toplam_net_tutar_sse, 2),
+        "kartlar": kartlar
+    }
+
+
+# ── SSE yayın motoru
+# Her açık sekme kendi while-döngüsünde aynı sorguları çalıştırıyordu (15+ depo
+# ekranında DB yükü izleyici sayısıyla çarpılıyordu). Artık her (preset/aralık, kaynak,
+# gruplama, model) anahtarı için tek bir arka plan thread'i payload'u tick başına
+# bir kez hesaplar; serileştirilmiş frame tüm abonelerin kuyruğuna dağıtılır.
+# Dinleyicisi kalmayan anahtar AKIS_BOSTA_TUTMA_SANIYE sonra kapatılır.
+AKIS_BOSTA_TUTMA_SANIYE = 60
+AKIS_ABONE_KUYRUK = 4
+SSE_ERROR_FRAME = "event: error\ndata: {\"error\":\"internal_error\"}\n\n"
+
+
+class _AkisKanali:
+    """Tek bir anahtarın hesaplayıcı thread'i + abone kuyrukları."""
+
+    def __init__(self, yayin, key, app):
+        self.yayin = yayin
+        self.key = key
+        self.app = app
+        self.aboneler = set()
+        self.son_frame = None
+        self.bos_since = None
+        self.durdur = threading.Event()
+        self.thread = threading.Thread(
+            target=self._calis, name=f"canli-akis-{abs(hash(key)) % 10_000}", daemon=True
+        )
+
+    def _hesapla(self):
+        preset, start, end, source_filter, group_by_barcode, tek_model = self.key
+        try:
+            # Aralık her tick'te çözülür: gece yarısını geçen 'today' akışı yeni güne geçer
+            start_ist, end_ist = _tr_range_from_params({"preset": preset, "start": start, "end": end})
+            payload = _akis_payload(start_ist, end_ist, source_filter, group_by_barcode, tek_model)
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        except Exception:
+            _exc("SSE: yayın hesaplama hatası")
+            db.session.rollback()
+            return SSE_ERROR_FRAME
+        finally:
+            # Thread uzun yaşıyor; bağlantıyı tick'ler arasında havuza iade et
+            db.session.remove()
+
+    def _calis(self):
+        with self.app.app_context():
+            while not self.durdur.is_set():
+                t = _t0()
+                frame = self._hesapla()
+                if frame is not SSE_ERROR_FRAME:
+                    self.son_frame = frame
+                n = self.yayin._dagit(self, frame)
+                _info("SSE: tick yayınlandı", subscribers=n, ms=_dt_ms(t))
+                if self.yayin._bosta_ise_kapat(self):
+                    return
+                self.durdur.wait(AKIS_ARALIGI_SANIYE)
+
+
+class _AkisYayini:
+    """(ham preset/start/end, kaynak, gruplama, model) anahtarı başına paylaşılan SSE fan-out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kanallar = {}
+
+    def abone_ol(self, key, app):
+        q = queue.Queue(maxsize=AKIS_ABONE_KUYRUK)
+        with self._lock:
+            kanal = self._kanallar.get(key)
+            if kanal is None:
+                kanal = _AkisKanali(self, key, app)
+                self._kanallar[key] = kanal
+                kanal.thread.start()
+            kanal.aboneler.add(q)
+            kanal.bos_since = None
+            # Yeni sekme bir sonraki tick'i beklemesin
+            if kanal.son_frame is not None:
+                q.put_nowait(kanal.son_frame)
+        return q
+
+    def abone_birak(self, key, q):
+        with self._lock:
+            kanal = self._kanallar.get(key)
+            if kanal is None:
+                return
+            kanal.aboneler.discard(q)
+            if not kanal.aboneler:
+                kanal.bos_since = _pytime.monotonic()
+
+    def _dagit(self, kanal, frame):
+        with self._lock:
+            aboneler = list(kanal.aboneler)
+        for q in aboneler:
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                # Yavaş istemci: en eskiyi at, en güncel frame'i koru
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    q.put_nowait(frame)
+                except queue.Full:
+                    pass
+        return len(aboneler)
+
+    def _bosta_ise_kapat(self, kanal):
+        with self._lock:
+            if kanal.aboneler or kanal.bos_since is None:
+                return False
+            if _pytime.monotonic() - kanal.bos_since < AKIS_BOSTA_TUTMA_SANIYE:
+                return False
+            if self._kanallar.get(kanal.key) is kanal:
+                del self._kanallar[kanal.key]
+            kanal.durdur.set()
+        _info("SSE: boşta kanal kapatıldı", key=str(kanal.key))
+        return True
+
+    def durum(self):
+        with self._lock:
+            return [
+                {"key": [str(p) for p in k], "aboneler": len(c.aboneler)}
+                for k, c in self._kanallar.items()
+            ]
+
+
+_akis_yayini = _AkisYayini()
+
 
 @canli_panel_bp.route("/api/canli/akis")
 @login_required
 def akis_sse():
+    # Anahtar ham parametreler: tarih aralığı kanalın her tick'inde yeniden çözülür
+    preset = (request.args.get("preset") or "").lower().strip()
+    start, end = (request.args.get("start") or "").strip(), (request.args.get("end") or "").strip()
+    key = (
+        preset, start, end,
+        _normalize_source_filter(request.args.get("source")),
+        _want_group_by_barcode(),
+        (request.args.get("model") or "").strip() or None,
+    )
+    app = current_app._get_current_object()
+    remote_addr = request.remote_addr
+
     def _gen():
         conn_t0=_t0()
-        _info("SSE: client connected", ip=request.remote_addr)
+        _info("SSE: client connected", ip=remote_addr, preset=preset, start=start, end=end)
+        q = _akis_yayini.abone_ol(key, app)
         try:
             while True:
-                loop_t0=_t0()
+                # Proxy bağlantısını canlı tut; frame gelmezse PING_INTERVAL'de heartbeat
                 try:
-                    start_ist, end_ist = _tr_range_from_params(request.args)
-                    _info("SSE: loop start", start=str(start_ist), end=str(end_ist))
-
-                    # 🔥 Kaynak filtresi
-                    source_filter = _normalize_source_filter(request.args.get("source"))
-
-                    # satış (adet + NET tutar)
-                    qty_map, net_map = _collect_orders_between_strict(start_ist, end_ist, source_filter)
-                    # sadece gösterilen siparişlerin iadeleri
-                    ord_nos = _order_numbers_created_between(start_ist, end_ist, source_filter)
-                    ret_qty_map, returned_orders = _collect_returns_for_order_numbers(ord_nos)
-
-                    barcodes = set(qty_map.keys()) | set(net_map.keys()) | set(ret_qty_map.keys())
-                    pinfo = _fetch_product_info_for_barcodes(barcodes)
-                    sdict = _fetch_stock_for_barcodes(barcodes)
-
-                    group_by_barcode = _want_group_by_barcode()
-                    tek_model = (request.args.get("model") or "").strip() or None
-
-                    # Model+renk modunda: aynı (model,renk) için satışı olmayan barkodları
-                    # da ekle ki tüm bedenlerin gerçek stoğu modal/Tedarik Oluştur'da görünsün.
-                    if not group_by_barcode:
-                        barcodes = _expand_with_all_sizes(barcodes, pinfo, sdict)
-
-                    grp, rep_image, rep_tedarikci = {}, {}, {}
-                    for bc in barcodes:
-                        sat=int(qty_map.get(bc,0))
-                        iad=int(ret_qty_map.get(bc,0))
-                        sale_net=_to_number(net_map.get(bc,None), None)
-                        net=_return_adjusted_amount(sat, iad, sale_net)
-                        info = pinfo.get(bc, {"model":"Bilinmiyor","renk":"Bilinmiyor","beden":"—","image":None,
-                                              "tedarikci_kodu":"","tedarikci_adi":""})
-
-                        if group_by_barcode:
-                            rec = grp.setdefault(bc, {
-                                "model":info["model"],"renk":info["renk"],"beden":info["beden"],"image":info.get("image"),
-                                "siparis":0,"iade":0,"net_adet":0,"stok":0,"net_tutar":0.0,"tutarli_adet":0
-                            })
-                            rec["siparis"]+=sat; rec["iade"]+=iad; rec["net_adet"]+=max(0,sat-iad); rec["stok"]+=int(sdict.get(bc,0))
-                            if net is not None and sat>0:
-                                rec["net_tutar"]+=float(net)
-                                rec["tutarli_adet"]+=max(0, sat-iad)
-                        else:
-                            key=(info["model"],info["renk"])
-                            if key not in rep_image and info.get("image"): rep_image[key]=info["image"]
-                            if info.get("tedarikci_kodu"):
-                                rep_tedarikci.setdefault(key, {})[str(info["tedarikci_kodu"])] = info.get("tedarikci_adi", "")
-                            d=grp.setdefault(key,{})
-                            b=info["beden"]
-                            rec=d.setdefault(b,{"siparis":0,"iade":0,"net_adet":0,"stok":0,"net_tutar":0.0,"tutarli_adet":0})
-                            rec["siparis"]+=sat; rec["iade"]+=iad; rec["net_adet"]+=max(0,sat-iad); rec["stok"]+=int(sdict.get(bc,0))
-                            if net is not None and sat>0:
-                                rec["net_tutar"]+=float(net)
-                                rec["tutarli_adet"]+=max(0, sat-iad)
-
-                    now_tr=datetime.now(IST); hours=max(1.0, now_tr.hour + now_tr.minute/60.0)
-                    kartlar=[]; toplam_net_satis=0; toplam_net_tutar_sse=0.0
-
-                    if group_by_barcode:
-                        for bc, rec in grp.items():
-                            model,renk,beden = rec["model"], rec["renk"], rec["beden"]
-                            if not _model_matches(model, tek_model): continue
-                            s=rec["siparis"]; r=rec["iade"]; n_adet=rec["net_adet"]
-                            k=rec["stok"];    nt=rec["net_tutar"]; qa=rec["tutarli_adet"]
-                            toplam_net_satis += n_adet
-                            toplam_net_tutar_sse += nt
-                            iade_oran=(r/s) if s>0 else 0.0
-                            ort_net=(nt/qa) if qa>0 else 0.0
-                            iade_uyari=(iade_oran>=IADE_UYARI_ORAN)
-                            kartlar.append({
-                                "barcode": bc, "model": model, "renk": renk, "image": rec.get("image"),
-                                "toplam_siparis_bugun": s, "toplam_iade": r,
-                                "toplam_net_satis": n_adet, "iade_orani": round(iade_oran,2), "iade_uyari": iade_uyari,
-                                "toplam_stok": k, "ortalama_fiyat": round(ort_net,2),
-                                "saatlik_hiz": round(n_adet / hours, 2), "dusuk_stok": k < DUSUK_STOK_ESIK,
-                                "detay": [{"beden": beden, "siparis": s, "iade": r, "net": n_adet, "stok": k}]
-                            })
-                    else:
-                        def _beden_key(b):
-                            try: return (0, float(str(b).replace(',','.')))
-                            except: return (1, str(b))
-                        for (model,renk), beden_map in grp.items():
-                            if not _model_matches(model, tek_model): continue
-                            detay=[]; top_sat=top_iade=top_net_adet=top_stok=0; top_net_tutar=0.0; top_tutarli_adet=0
-                            for beden in sorted(beden_map.keys(), key=_beden_key):
-                                s=beden_map[beden]["siparis"]; r=beden_map[beden]["iade"]; n_adet=beden_map[beden]["net_adet"]
-                                k=beden_map[beden]["stok"];    nt=beden_map[beden]["net_tutar"]; qa=beden_map[beden]["tutarli_adet"]
-                                top_sat+=s; top_iade+=r; top_net_adet+=n_adet; top_stok+=k; top_net_tutar+=nt; top_tutarli_adet+=qa
-                                detay.append({"beden":beden,"siparis":s,"iade":r,"net":n_adet,"stok":k})
-                            toplam_net_satis+=top_net_adet
-                            toplam_net_tutar_sse+=top_net_tutar
-                            iade_oran=(top_iade/top_sat) if top_sat>0 else 0.0
-                            ort_net=(top_net_tutar/top_tutarli_adet) if top_tutarli_adet>0 else 0.0
-                            iade_uyari=(iade_oran>=IADE_UYARI_ORAN)
-                            ted_map = rep_tedarikci.get((model, renk), {})
-                            ted_codes = sorted(ted_map)
-                            kartlar.append({
-                                "model":model,"renk":renk,"image":rep_image.get((model,renk)),
-                                "toplam_siparis_bugun":top_sat,"toplam_iade":top_iade,"toplam_net_satis":top_net_adet,
-                                "iade_orani":round(iade_oran,2),"iade_uyari":iade_uyari,
-                                "toplam_stok":top_stok,"ortalama_fiyat":round(ort_net,2),
-                                "saatlik_hiz":round(top_net_adet/hours,2),"dusuk_stok":top_stok < DUSUK_STOK_ESIK,
-                                "tedarikci_kodu": ted_codes[0] if len(ted_codes) == 1 else "",
-                                "tedarikci_adi": ted_map.get(ted_codes[0], "") if len(ted_codes) == 1 else "",
-                                "tedarikci_kodlari": ted_codes,
-                                "detay":detay
-                            })
-
-                    # En çok satan her zaman en üstte: net satış, brüt satış, stok
-                    kartlar.sort(key=lambda k:(
-                        k.get("toplam_net_satis",0),
-                        k.get("toplam_siparis_bugun",0),
-                        k.get("toplam_stok",0)
-                    ), reverse=True)
-                    toplam_ciro_sse = round(toplam_net_tutar_sse, 2)
-                    payload={
-                        "guncellendi": now_tr_str(),
-                        "group": ("barcode" if group_by_barcode else "model"),
-                        "toplam_net_satis": toplam_net_satis,
-                        "toplam_siparis_sayisi": _count_orders_between_distinct(start_ist, end_ist, source_filter),
-                        "toplam_ciro": toplam_ciro_sse,
-                        "kartlar": kartlar
-                    }
-                    _info("SSE: loop done", cards=len(kartlar), net=toplam_net_satis, uniq=len(barcodes), ms=_dt_ms(loop_t0))
-
-                    yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
-                except GeneratorExit:
-                    _info("SSE: client disconnected"); return
-                except Exception:
-                    _exc("SSE: loop error")
-                    yield "event: error\ndata: {\"error\":\"internal_error\"}\n\n"
-
-                # Proxy bağlantısını canlı tut; veri yenilemeleri arasında 10 sn'de
-                # bir heartbeat gönder. PING_INTERVAL artık gerçekten kullanılıyor.
-                waited = 0
-                while waited < AKIS_ARALIGI_SANIYE:
-                    _pytime.sleep(min(PING_INTERVAL, AKIS_ARALIGI_SANIYE - waited))
-                    waited += PING_INTERVAL
+                    yield q.get(timeout=PING_INTERVAL)
+                except queue.Empty:
                     yield "event: ping\ndata: {}\n\n"
+        except GeneratorExit:
+            _info("SSE: client disconnected")
         finally:
+            _akis_yayini.abone_birak(key, q)
             _info("SSE: connection closed", alive_ms=_dt_ms(conn_t0))
 
     headers = {
@@ -1402,7 +1544,7 @@ def akis_sse():
         "Connection":"keep-alive",
         "X-Accel-Buffering":"no",
     }
-    return Response(stream_with_context(_gen()), headers=headers)
+    return Response(_gen(), headers=headers)
 
 
 
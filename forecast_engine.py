@@ -0,0 +1,236 @@
+"""ForecastCache için vektörel toplu tahmin motoru.
+
+SORUN
+-----
+``forecast_worker_loop`` 30 sn'de bir kirli kuyruktan 50 barkod alıp her biri
+için ayrı ``_daily_series_from_cache`` sorgusu atıyor, 5+ satışlı günü olan
+her barkodda web sürecinin scheduler thread'inde tam bir Prophet modeli
+eğitiyordu (barkod başına saniyeler, tek tek ``INSERT ... ON CONFLICT``).
+
+ÇÖZÜM
+-----
+- ``load_sales_matrix``: ``daily_sales`` TEK sorguda barkod × gün NumPy
+  matrisine dökülür (son ``HISTORY_DAYS`` gün).
+- ``batch_forecast``: tüm barkodlar için aynı anda
+  * hareketli ortalama (``avg_base`` — eski ``_moving_average`` ile aynı),
+  * haftalık mevsimsellik (gün-of-week endeksi, 1'e doğru büzülmüş),
+  * mevsimsellikten arındırılmış seride üstel düzleştirme
+  → ``avg_final``. Az satışlı (< ``MIN_NONZERO_DAYS``) barkodda ``avg_base``.
+- ``upsert_forecasts``: sonuçlar parça parça toplu upsert ile yazılır.
+- Prophet yalnız en çok satan ``FORECAST_PROPHET_TOP_N`` barkodda, web dışında
+  ayrı süreçte çalışır (``scripts/forecast_prophet_worker.py`` →
+  ``run_prophet_tier``). Toplu motor bu barkodların ``avg_final``'ını mevcut
+  ``avg_prophet`` değeriyle korur; listeden düşen barkodun Prophet değeri silinir.
+  Katman üyeliği yalnız tam koşuda hesaplanır; ``barcodes`` alt kümesiyle
+  yapılan koşu mevcut dolu ``avg_prophet`` değerlerini olduğu gibi taşır.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from models import db, DailySales, ForecastCache
+from time_utils import IST
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = 56           # 8 hafta: haftalık endeks için yeterli örnek
+MIN_NONZERO_DAYS = 5        # eski Prophet eşiğiyle aynı
+SMOOTHING_ALPHA = 0.3
+SEASON_SHRINK = 0.5         # ham haftalık endeksin ne kadarı kullanılsın
+UPSERT_CHUNK_SIZE = 1000
+DEFAULT_PROPHET_TOP_N = 50
+
+
+def prophet_top_n() -> int:
+    try:
+        return max(0, int(os.environ.get("FORECAST_PROPHET_TOP_N", DEFAULT_PROPHET_TOP_N)))
+    except (TypeError, ValueError):
+        return DEFAULT_PROPHET_TOP_N
+
+
+def load_sales_matrix(end_day: date, history_days: int = HISTORY_DAYS, barcodes=None):
+    """``(barkodlar, matris)`` — matris[i, j] = barkod i'nin (start + j). gün satışı.
+
+    Sütunlar eskiden yeniye, son sütun ``end_day``.
+    """
+    start_day = end_day - timedelta(days=history_days - 1)
+    q = (db.session.query(DailySales.barcode, DailySales.date, DailySales.qty)
+         .filter(DailySales.date >= start_day, DailySales.date <= end_day))
+    if barcodes is not None:
+        q = q.filter(DailySales.barcode.in_(list(barcodes)))
+    rows = q.all()
+
+    index = {bc: i for i, bc in enumerate(sorted({str(bc) for bc, _, _ in rows}))}
+    matrix = np.zeros((len(index), history_days), dtype=np.float64)
+    if rows:
+        r = np.fromiter((index[str(bc)] for bc, _, _ in rows), dtype=np.int64, count=len(rows))
+        c = np.fromiter(((d - start_day).days for _, d, _ in rows), dtype=np.int64, count=len(rows))
+        v = np.fromiter((q or 0 for _, _, q in rows), dtype=np.float64, count=len(rows))
+        np.add.at(matrix, (r, c), v)
+    return list(index), matrix
+
+
+def batch_forecast(matrix: np.ndarray, horizon: int, end_day: date) -> dict:
+    """Tüm satırlar için vektörel tahmin.
+
+    Returns:
+        ``{"avg_base", "avg_smooth", "avg_final", "nonzero", "recent_total"}``
+        — her biri satır sayısı uzunluğunda dizi.
+    """
+    n, hist = matrix.shape
+    recent = matrix[:, -horizon:]
+    avg_base = recent.sum(axis=1) / float(horizon)
+    nonzero = (recent > 0).sum(axis=1)
+
+    # İlk satıştan önceki günler (ürün henüz yokken) endeksi ve seviyeyi bozmasın
+    first_sale = np.where(matrix.any(axis=1), (matrix > 0).argmax(axis=1), hist)
+    active = np.arange(hist)[None, :] >= first_sale[:, None]          # (n, hist)
+
+    # Haftalık endeks: gün-of-week ortalaması / genel ortalama (aktif günlerde)
+    start_day = end_day - timedelta(days=hist - 1)
+    weekday = (np.arange(hist) + start_day.weekday()) % 7
+    onehot = np.eye(7)[weekday]                                        # (hist, 7)
+    dow_mean = (matrix @ onehot) / np.maximum(active @ onehot, 1)
+    overall = matrix.sum(axis=1, keepdims=True) / np.maximum(active.sum(axis=1, keepdims=True), 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw = np.where((overall > 0) & ((active @ onehot) > 0), dow_mean / overall, 1.0)
+    season = np.clip(1.0 + SEASON_SHRINK * (raw - 1.0), 0.2, 3.0)      # (n, 7)
+
+    # Arındırılmış seride basit üstel düzleştirme (zaman ekseninde döngü, barkodlar
+    # vektörel); seviye ilk satış gününde başlar
+    deseason = matrix / season[:, weekday]
+    level = np.zeros(n)
+    for t in range(hist):
+        x = deseason[:, t]
+        level = np.where(t == first_sale, x,
+                         np.where(active[:, t], SMOOTHING_ALPHA * x + (1.0 - SMOOTHING_ALPHA) * level, level))
+
+    future_weekday = (np.arange(1, horizon + 1) + end_day.weekday()) % 7
+    avg_smooth = np.maximum(level * season[:, future_weekday].mean(axis=1), 0.0)
+
+    avg_final = np.where(nonzero >= MIN_NONZERO_DAYS, avg_smooth, avg_base)
+    return {
+        "avg_base": avg_base,
+        "avg_smooth": avg_smooth,
+        "avg_final": avg_final,
+        "nonzero": nonzero,
+        "recent_total": recent.sum(axis=1),
+    }
+
+
+def top_seller_indices(result: dict, top_n: int) -> np.ndarray:
+    """Prophet katmanı: yeterli satış günü olanlar arasında en çok satan ``top_n``."""
+    if top_n <= 0:
+        return np.array([], dtype=np.int64)
+    eligible = np.flatnonzero(result["nonzero"] >= MIN_NONZERO_DAYS)
+    order = np.argsort(-result["recent_total"][eligible], kind="stable")
+    return eligible[order[:top_n]]
+
+
+def upsert_forecasts(rows: list[dict]) -> int:
+    """ForecastCache'e toplu upsert. Commit çağırana aittir."""
+    if not rows:
+        return 0
+    if db.session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    table = ForecastCache.__table__
+    now = datetime.now(IST)
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(table).values([{**r, "updated_at": now} for r in rows[i:i + UPSERT_CHUNK_SIZE]])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["barcode", "days"],
+            set_={c: stmt.excluded[c] for c in
+                  ("avg_base", "avg_prophet", "avg_ai_used", "avg_final", "updated_at")},
+        )
+        db.session.execute(stmt)
+    return len(rows)
+
+
+def _existing_prophet(days: int, barcodes) -> dict[str, float]:
+    if not barcodes:
+        return {}
+    rows = (db.session.query(ForecastCache.barcode, ForecastCache.avg_prophet)
+            .filter(ForecastCache.days == days,
+                    ForecastCache.barcode.in_(list(barcodes)),
+                    ForecastCache.avg_prophet.isnot(None))
+            .all())
+    return {bc: float(p) for bc, p in rows}
+
+
+def run_batch_forecast(days: int = 14, barcodes=None, end_day: date | None = None) -> dict:
+    """Tahminleri toplu hesaplayıp ForecastCache'e yazar (Prophet çalıştırmaz).
+
+    Args:
+        barcodes: ``None`` → satışı olan + cache'te kaydı olan tüm barkodlar.
+    """
+    end_day = end_day or datetime.now(IST).date()
+    history = max(HISTORY_DAYS, days)
+    sold_bcs, matrix = load_sales_matrix(end_day, history, barcodes)
+
+    # Penceresinde hiç satışı kalmamış ama cache'te duran barkodlar → 0'lanır
+    if barcodes is None:
+        cached = {bc for (bc,) in db.session.query(ForecastCache.barcode).filter(ForecastCache.days == days)}
+    else:
+        cached = {str(bc).strip() for bc in barcodes}
+    missing = sorted(cached - set(sold_bcs))
+    all_bcs = sold_bcs + missing
+    if missing:
+        matrix = np.vstack([matrix, np.zeros((len(missing), history))])
+    if not all_bcs:
+        return {"barcodes": 0, "written": 0, "prophet_kept": 0}
+
+    result = batch_forecast(matrix, days, end_day)
+    if barcodes is None:
+        tier = {all_bcs[i] for i in top_seller_indices(result, prophet_top_n())}
+    else:
+        # Alt kümedeki sıralama global katmanı temsil etmez: üyelik son tam
+        # koşunun / Prophet worker'ının bıraktığı dolu avg_prophet'ten okunur.
+        tier = all_bcs
+    prophet = _existing_prophet(days, tier)
+
+    rows = []
+    for i, bc in enumerate(all_bcs):
+        avg_prophet = prophet.get(bc)
+        avg_final = avg_prophet if avg_prophet is not None else float(result["avg_final"][i])
+        rows.append({"barcode": bc, "days": days, "avg_base": float(result["avg_base"][i]),
+                     "avg_prophet": avg_prophet, "avg_ai_used": None, "avg_final": avg_final})
+    written = upsert_forecasts(rows)
+    db.session.commit()
+    logger.info(f"[FCACHE] toplu tahmin: {written} barkod yazıldı (prophet korunan={len(prophet)}, days={days})")
+    return {"barcodes": len(all_bcs), "written": written, "prophet_kept": len(prophet)}
+
+
+def run_prophet_tier(days: int = 14, top_n: int | None = None, end_day: date | None = None) -> dict:
+    """En çok satan barkodlar için Prophet fit'i — ayrı worker sürecinde çağrılır."""
+    from uretim_oneri import prophet_forecast
+
+    end_day = end_day or datetime.now(IST).date()
+    history = max(HISTORY_DAYS, days)
+    barcodes, matrix = load_sales_matrix(end_day, history)
+    if not barcodes:
+        return {"barcodes": 0, "fitted": 0}
+    result = batch_forecast(matrix, days, end_day)
+    tier = top_seller_indices(result, prophet_top_n() if top_n is None else top_n)
+
+    start_day = end_day - timedelta(days=history - 1)
+    dates = [(start_day + timedelta(days=j)).isoformat() for j in range(history)]
+    rows = []
+    for i in tier:
+        series = [{"date": d, "qty": q} for d, q in zip(dates, matrix[i].tolist())]
+        avg_prophet = prophet_forecast(series, days)
+        rows.append({
+            "barcode": barcodes[i], "days": days, "avg_base": float(result["avg_base"][i]),
+            "avg_prophet": avg_prophet, "avg_ai_used": None,
+            "avg_final": avg_prophet if avg_prophet is not None else float(result["avg_final"][i]),
+        })
+    upsert_forecasts(rows)
+    db.session.commit()
+    fitted = sum(1 for r in rows if r["avg_prophet"] is not None)
+    logger.info(f"[FCACHE] Prophet katmanı: {fitted}/{len(rows)} barkod (days={days})")
+    return {"barcodes": len(rows), "fitted": fitted}
@@ -2,13 +2,11 @@ import asyncio
 import aiohttp
 import os
 import base64
-import json
 import logging
 import threading
 import qrcode
 import qrcode.constants
 from datetime import datetime
-from urllib.parse import urlparse
 from dotenv import load_dotenv
 from io import BytesIO
 from sqlalchemy import case
@@ -21,6 +19,10 @@ from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID
 from trendyol_v2 import flatten_v2_page, V2_MAX_PAGE_SIZE
 from models import db, Product, ProductArchive, RafUrun, CentralStock, ShopifyMapping
 from cache_config import cache, CACHE_TIMES
+from barcode_alias_helper import invalidate_barcode_cache
+import image_pipeline
+import product_summary
+import product_import
 from sqlalchemy import event
 
 get_products_bp = Blueprint('get_products', __name__)
@@ -169,51 +171,45 @@ def render_product_list(products, pagination=None):
 
 
 
+def _catalogue_import_worker(app, delete_missing, triggered_by):
+    """Akışlı katalog içe aktarımı (arka plan thread'i); tam senkronda arşivlileri de siler."""
+    with app.app_context():
+        try:
+            result = asyncio.run(product_import.run_import(
+                download=download_images_async, delete_missing=delete_missing, triggered_by=triggered_by))
+            if delete_missing and result['status'] == 'completed':
+                archived_barcodes = asyncio.run(fetch_archived_barcodes_async())
+                deleted_archived = delete_archived_in_db(archived_barcodes)
+                logger.info(f"Arşivde olanlardan silinen: {deleted_archived}")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Katalog içe aktarma hatası: {e}", exc_info=True)
+
+
+def _start_catalogue_import(delete_missing):
+    if product_import.is_running():
+        flash('Ürün içe aktarma zaten çalışıyor; ilerleme /api/product_import/status üzerinden izlenebilir.', 'warning')
+        return False
+    app = current_app._get_current_object()
+    threading.Thread(
+        target=_catalogue_import_worker, daemon=True, name='product-import',
+        args=(app, delete_missing, session.get('username')),
+    ).start()
+    flash('Ürün içe aktarma arka planda başladı; yarıda kalırsa bir sonraki çalıştırma kaldığı sayfadan devam eder.', 'info')
+    return True
+
+
 @get_products_bp.route('/update_products', methods=['POST'])
 async def update_products_route():
     """
-    Trendyol ürün senkronu (tam): 
-    1) approved=true & archived=false ürünleri çek
-    2) DB'ye upsert et
-    3) Trendyol'da archived=true olanları DB'den sil
-    4) Aktif listede görünmeyenleri (Trendyol'dan kalkmış) DB'den sil
+    Trendyol ürün senkronu (tam), akışlı:
+    1) approved=true & archived=false ürünler sayfa sayfa çekilip parça parça upsert edilir
+       (içeriği değişmeyen satırlar atlanır)
+    2) Aktif listede görünmeyenler (Trendyol'dan kalkmış) DB'den silinir
+    3) Trendyol'da archived=true olanlar DB'den silinir
     """
     try:
-        logger.debug("Trendyol'dan ürün çekme başlıyor (approved=true, archived=false).")
-        products = await fetch_all_products_async()
-
-        if products is None:
-            raise ValueError("Trendyol API yanıtı None döndü.")
-
-        if not isinstance(products, list):
-            logger.error(f"Beklenmeyen veri türü: {type(products)} - İçerik: {products}")
-            raise ValueError("Trendyol ürün verisi liste değil.")
-
-        logger.debug(f"Trendyol'dan çekilen aktif ürün sayısı: {len(products)}")
-
-        if products:
-            # 1) Upsert
-            logger.debug("Ürünler veritabanına kaydediliyor/güncelleniyor...")
-            await save_products_to_db_async(products)
-
-            # 2) Silinecekleri senkronla
-            logger.debug("Trendyol'da silinen/archived ürünlerin DB senkronu başlıyor...")
-            sync_result = await sync_trendyol_deletions(products)
-
-
-            msg = (f"Ürünler güncellendi. "
-                   f"Arşivde olanlardan silinen: {sync_result.get('deleted_archived', 0)}, "
-                   f"Aktif listede görünmeyip silinen: {sync_result.get('deleted_inactive', 0)}.")
-            logger.info(msg)
-            flash(msg, "info")
-
-            logger.info("Ürün senkronu başarıyla tamamlandı.")
-            flash('Ürünler başarıyla güncellendi.', 'success')
-        else:
-            logger.warning("Trendyol'dan ürün gelmedi (aktif liste boş).")
-            # Aktif liste boş gelirse, tüm DB’yi silmek istemeyiz; bilerek dokunmuyoruz.
-            flash('Aktif ürün bulunamadı. (Trendyol liste boş döndü)', 'warning')
-
+        _start_catalogue_import(delete_missing=True)
     except Exception as e:
         logger.error(f"update_products_route hata: {e}", exc_info=True)
         flash('Ürünler güncellenirken bir hata oluştu.', 'danger')
@@ -221,6 +217,13 @@ async def update_products_route():
     return redirect(url_for('get_products.product_list'))
 
 
+@get_products_bp.route('/api/product_import/status')
+def product_import_status():
+    run = product_import.latest_run()
+    return jsonify({'success': True, 'running': product_import.is_running(),
+                    'run': run.to_dict() if run else None})
+
+
 """@get_products_bp.route('/update_stocks_route', methods=['POST'])
 async def update_stocks_route():
     logger.info("Trendyol'dan stokları çekme ve veritabanını güncelleme işlemi başlatıldı.")
@@ -305,77 +308,10 @@ async def save_products_to_db_async(products):
             continue
         seen_barcodes.add(original_barcode)
 
-        def safe_datetime_from_timestamp(ts):
-            if not ts: return None
-            try: return datetime.fromtimestamp(int(ts) / 1000)
-            except (ValueError, TypeError, OSError): return None
-
-        last_update_date_obj = safe_datetime_from_timestamp(product_data.get('lastUpdateDate'))
-        create_date_time_obj = safe_datetime_from_timestamp(product_data.get('createDateTime'))
-
-        # DÜZELTME 1: GÖRSEL İNDİRME LİSTESİNİ DOLDURMA MANTIĞI EKLENDİ
-        image_urls = [img.get('url', '') for img in product_data.get('images', []) if isinstance(img, dict)]
-        images_path_db = ''
-        if image_urls and image_urls[0]:
-            image_url = image_urls[0]
-            parsed_url = urlparse(image_url)
-            image_extension = os.path.splitext(parsed_url.path)[1] or '.jpg'
-            image_filename = f"{original_barcode}{image_extension.lower()}"
-            image_path_local = os.path.join(images_folder, image_filename)
-            images_path_db = f"/static/images/{image_filename}"
-            # İndirme listesine (url, yerel_dosya_yolu) olarak ekle
-            image_downloads.append((image_url, image_path_local))
-
-        # DÜZELTME 2: STATÜ BİLGİSİNİ ANLAMLI METNE ÇEVİRME
-        status_str = "Beklemede" # Varsayılan
-        if product_data.get('rejected'):
-            status_str = "Reddedildi"
-        elif product_data.get('approved'):
-            status_str = "Onaylandı"
-        if product_data.get('archived'):
-            status_str = f"{status_str} (Arşivde)"
-
-        size = next((attr.get('attributeValue', 'N/A') for attr in product_data.get('attributes', []) if attr.get('attributeName') == 'Beden'), 'N/A')
-        color = next((attr.get('attributeValue', 'N/A') for attr in product_data.get('attributes', []) if attr.get('attributeName') == 'Renk'), 'N/A')
-
-        product_objects.append({
-            "barcode": original_barcode,
-            "title": product_data.get('title'),
-            "images": images_path_db, # Görselin veritabanına kaydedilecek yolu
-            "product_main_id": product_data.get('productMainId'),
-            "size": size, "color": color,
-            "archived": product_data.get('archived', False),
-            "locked": product_data.get('locked', False),
-            "on_sale": product_data.get('onSale', False),
-            "sale_price": product_data.get('salePrice', 0),
-            "list_price": product_data.get('listPrice', 0),
-            "currency_type": product_data.get('currencyType'),
-            "description": product_data.get('description'),
-            "attributes": json.dumps(product_data.get('attributes', [])),
-            "reject_reason": '; '.join([r.get('reason', 'N/A') for r in product_data.get('rejectReasonDetails', [])]),
-            "brand": product_data.get('brand'),
-            "category_name": product_data.get('categoryName'),
-            "vat_rate": product_data.get('vatRate'),
-            "status": status_str, # DÜZELTME: Artık anlamlı metin olarak kaydediliyor
-            "gtin": product_data.get('gtin'),
-            "last_update_date": last_update_date_obj,
-            "brand_id": product_data.get('brandId'),
-            "create_date_time": create_date_time_obj,
-            "gender": product_data.get('gender'),
-            "has_active_campaign": product_data.get('hasActiveCampaign'),
-            "trendyol_id": product_data.get('id'),
-            "pim_category_id": product_data.get('pimCategoryId'),
-            "platform_listing_id": product_data.get('platformListingId'),
-            "product_code": product_data.get('productCode'),
-            "product_content_id": product_data.get('productContentId'),
-            "stock_unit_type": product_data.get('stockUnitType'),
-            "supplier_id": product_data.get('supplierId'),
-            "is_rejected": product_data.get('rejected'),
-            "is_blacklisted": product_data.get('blacklisted'),
-            "has_html_content": product_data.get('hasHtmlContent'),
-            "product_url": product_data.get('productUrl'),
-            "is_approved": product_data.get('approved')
-        })
+        row, download = product_import.build_product_row(product_data, images_folder)
+        if download:
+            image_downloads.append(download)
+        product_objects.append(row)
 
     if not product_objects: return
 
@@ -385,27 +321,16 @@ async def save_products_to_db_async(products):
         batch = product_objects[i:i + batch_size]
         insert_stmt = insert(Product).values(batch)
 
-        set_payload = {
-            'title': insert_stmt.excluded.title, 
-            'sale_price': insert_stmt.excluded.sale_price, 'list_price': insert_stmt.excluded.list_price,
-            'on_sale': insert_stmt.excluded.on_sale, 'locked': insert_stmt.excluded.locked,
-            'is_approved': insert_stmt.excluded.is_approved, 'last_update_date': insert_stmt.excluded.last_update_date,
-            'vat_rate': insert_stmt.excluded.vat_rate, 'reject_reason': insert_stmt.excluded.reject_reason,
-            'description': insert_stmt.excluded.description, 'attributes': insert_stmt.excluded.attributes,
-            'is_rejected': insert_stmt.excluded.is_rejected, 'brand': insert_stmt.excluded.brand,
-            'category_name': insert_stmt.excluded.category_name, 'gender': insert_stmt.excluded.gender,
-            'product_url': insert_stmt.excluded.product_url,
-            'has_active_campaign': insert_stmt.excluded.has_active_campaign,
-            'is_blacklisted': insert_stmt.excluded.is_blacklisted, 'status': insert_stmt.excluded.status,
-            'images': insert_stmt.excluded.images # Görsel yolu değişirse diye bunu da ekleyelim
-        }
+        set_payload = {f: insert_stmt.excluded[f] for f in product_import.UPDATE_FIELDS}
 
         upsert_stmt = insert_stmt.on_conflict_do_update(
             index_elements=['barcode'],
             set_=set_payload
         )
-        db.session.execute(upsert_stmt)
+        product_summary.queue_product_rows(batch)
+        db.session.execute(upsert_stmt, execution_options={product_summary.SUMMARY_QUEUED_OPTION: True})
 
+    invalidate_barcode_cache()  # upsert event tetiklemez; yeni barkodlar çözümleme önbelleğine
     db.session.commit()
 
     # DÜZELTME 1 (devamı): GÖRSELLERİ İNDİRME KISMI EKLENDİ
@@ -506,23 +431,36 @@ async def download_images_async(image_urls):
         # Tüm indirmeleri bekle ve hataları yakala
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        success_count = sum(1 for r in results if r is True)
+        outcomes = [r[0] if isinstance(r, tuple) else False for r in results]
+        changed = [path for (_, path), r in zip(image_urls, outcomes) if r == 'changed']
+        success_count = sum(1 for r in outcomes if r in ('changed', 'unchanged'))
+        image_pipeline.record_validators({
+            path: r[1] for (_, path), r in zip(image_urls, results)
+            if isinstance(r, tuple) and r[1] != (None, None)
+        })
         error_count = len(results) - success_count
 
-        logger.info(f"Görsel indirme tamamlandı: {success_count} başarılı, {error_count} hatalı")
+        logger.info(f"Görsel indirme tamamlandı: {success_count} başarılı "
+                    f"({len(changed)} yeni/değişen), {error_count} hatalı")
+
+    # Değişen görsellerin thumb/medium türevleri süreç havuzunda
+    if changed:
+        await asyncio.get_running_loop().run_in_executor(None, image_pipeline.process_sources, changed)
 
 
 async def download_image(session, image_url, image_path, semaphore):
+    """Görseli indirir: ('changed' | 'unchanged', (etag, last_modified)) ya da False (hata)."""
     async with semaphore:
-        if os.path.exists(image_path):
-            logger.debug(f"Resim zaten mevcut, atlanıyor: {os.path.basename(image_path)}")
-            return True
-
         try:
             # Dizin yoksa oluştur
             os.makedirs(os.path.dirname(image_path), exist_ok=True)
 
-            async with session.get(image_url) as response:
+            # Dosya varsa koşullu GET: kaynak değişmediyse 304 → indirme/işleme yok
+            headers = image_pipeline.conditional_headers(image_path)
+            async with session.get(image_url, headers=headers) as response:
+                if response.status == 304:
+                    logger.debug(f"Resim değişmemiş, atlanıyor: {os.path.basename(image_path)}")
+                    return 'unchanged', (None, None)
                 if response.status != 200:
                     logger.warning(f"Resim indirme hatası: {response.status} - {image_url}")
                     return False
@@ -532,11 +470,17 @@ async def download_image(session, image_url, image_path, semaphore):
                     logger.warning(f"Geçersiz görsel boyutu: {len(content)} bytes - {image_url}")
                     return False
 
+                validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                if os.path.exists(image_path):
+                    with open(image_path, 'rb') as img_file:
+                        if img_file.read() == content:
+                            return 'unchanged', validators
+
                 with open(image_path, 'wb') as img_file:
                     img_file.write(content)
 
                 logger.debug(f"Resim kaydedildi: {os.path.basename(image_path)}")
-                return True
+                return 'changed', validators
 
         except Exception as e:
             logger.error(f"Resim indirme hatası ({os.path.basename(image_path)}): {e}")
@@ -575,35 +519,28 @@ def upsert_products(products):
             'attributes': insert_stmt.excluded.attributes,
         }
     )
-    db.session.execute(upsert_stmt)
+    product_summary.queue_product_rows(products)
+    db.session.execute(upsert_stmt, execution_options={product_summary.SUMMARY_QUEUED_OPTION: True})
+    invalidate_barcode_cache()
     db.session.commit()
 
 
 @get_products_bp.route('/fetch-products')
 async def fetch_products_route():
     try:
-        products = await fetch_all_products_async()  # filtreli çağrı (approved=true, archived=false)
-        if products:
-            await save_products_to_db_async(products)  # save içi: archived/approved/blacklisted ikinci süzgeç
-            
-            # Kullanıcı işlemini logla
+        # Yalnız upsert (silme yok); akışlı, değişmeyen satırlar atlanır
+        if _start_catalogue_import(delete_missing=False):
             try:
                 from user_logs import log_user_action
-                log_details = {
-                    'sayfa': 'Ürün Listesi',
-                    'çekilen_ürün_sayısı': len(products),
-                    'işlem_açıklaması': f'Trendyol\'dan {len(products)} ürün başarıyla çekildi ve veritabanına kaydedildi'
-                }
                 log_user_action(
                     action='FETCH',
-                    details=log_details
+                    details={
+                        'sayfa': 'Ürün Listesi',
+                        'işlem_açıklaması': "Trendyol'dan ürün içe aktarma arka planda başlatıldı",
+                    }
                 )
             except Exception as e:
                 logger.error(f"Kullanıcı log hatası: {e}")
-                
-            flash('Ürünler başarıyla güncellendi.', 'success')
-        else:
-            flash('Ürünler bulunamadı veya güncelleme sırasında bir hata oluştu.', 'danger')
     except Exception as e:
         logger.error(f"fetch_products_route hata: {e}", exc_info=True)
         flash('Ürünler güncellenirken bir hata oluştu.', 'danger')
@@ -813,6 +750,56 @@ def _page_bounds(page, per_page, total):
     return page, total_pages
 
 
+def _pagination_dict(page, per_page, total_models, total_pages):
+    return {
+        'page': page,
+        'per_page': per_page,
+        'total': total_models,
+        'pages': total_pages,
+        'has_prev': page > 1,
+        'has_next': page < total_pages,
+        'prev_num': page - 1 if page > 1 else None,
+        'next_num': page + 1 if page < total_pages else None,
+        'iter_pages': lambda left_edge=1, right_edge=1, left_current=2, right_current=2:
+            range(max(1, page - left_current), min(total_pages, page + right_current) + 1)
+    }
+
+
+def _card_state_models():
+    # 🏭 Üretim modundaki modeller (kartta toggle durumunu göstermek için)
+    try:
+        from uretim_modu import get_uretim_models
+        uretim_models = get_uretim_models()
+    except Exception:
+        uretim_models = set()
+
+    # 📌 Takibe alınan modeller (kart menüsünde "(Takipte)" etiketi için)
+    try:
+        from takip_notu import get_takip_models
+        takip_models = get_takip_models()
+    except Exception:
+        takip_models = set()
+    return uretim_models, takip_models
+
+
+def _product_list_from_summary(page, per_page, marketplace_filter):
+    """Sayfa yalnız product_model_summary'den; bedenler kart açılınca JSON ile gelir."""
+    total_models = product_summary.count_models(marketplace_filter)
+    page, total_pages = _page_bounds(page, per_page, total_models)
+    summaries = product_summary.page_summaries(page, per_page, marketplace_filter) if total_models else []
+    uretim_models, takip_models = _card_state_models()
+    return render_template(
+        'product_list.html',
+        grouped_products={},
+        model_summaries=summaries,
+        pagination=_pagination_dict(page, per_page, total_models, total_pages),
+        search_mode=False,
+        marketplace_filter=marketplace_filter,
+        uretim_models=uretim_models,
+        takip_models=takip_models
+    )
+
+
 # get_products.py içindeki GÜNCELLENECEK ROUTE
 @get_products_bp.route('/product_list')
 def product_list():
@@ -821,6 +808,9 @@ def product_list():
         per_page = 12
         marketplace_filter = _get_marketplace_filter()
 
+        if product_summary.is_ready():
+            return _product_list_from_summary(page, per_page, marketplace_filter)
+
         base_query = Product.query.filter(
             Product.product_main_id.isnot(None),
             Product.product_main_id != ''
@@ -878,32 +868,8 @@ def product_list():
         # Model → Renk → Ürün hiyerarşisi
         hierarchical_products = group_products_by_model_and_then_color(page_products)
 
-        pagination = {
-            'page': page,
-            'per_page': per_page,
-            'total': total_models,
-            'pages': total_pages,
-            'has_prev': page > 1,
-            'has_next': page < total_pages,
-            'prev_num': page - 1 if page > 1 else None,
-            'next_num': page + 1 if page < total_pages else None,
-            'iter_pages': lambda left_edge=1, right_edge=1, left_current=2, right_current=2:
-                range(max(1, page - left_current), min(total_pages, page + right_current) + 1)
-        }
-
-        # 🏭 Üretim modundaki modeller (kartta toggle durumunu göstermek için)
-        try:
-            from uretim_modu import get_uretim_models
-            uretim_models = get_uretim_models()
-        except Exception:
-            uretim_models = set()
-
-        # 📌 Takibe alınan modeller (kart menüsünde "(Takipte)" etiketi için)
-        try:
-            from takip_notu import get_takip_models
-            takip_models = get_takip_models()
-        except Exception:
-            takip_models = set()
+        pagination = _pagination_dict(page, per_page, total_models, total_pages)
+        uretim_models, takip_models = _card_state_models()
 
         return render_template(
             'product_list.html',
@@ -959,6 +925,58 @@ def get_product_variants():
         return jsonify({'success': False, 'message': 'Sunucu hatası.'}), 500
 
 
+@get_products_bp.route('/api/product_model_variants', methods=['GET'])
+def product_model_variants():
+    """Liste kartı açılınca bir modelin (opsiyonel: tek rengin) beden detayı."""
+    model_id = request.args.get('model', '').strip()
+    color = request.args.get('color', '').strip()
+    if not model_id:
+        return jsonify({'success': False, 'message': 'Model bilgisi eksik.'})
+
+    try:
+        query = _apply_marketplace_filter(
+            Product.query.filter(Product.product_main_id == model_id), _get_marketplace_filter())
+        if color:
+            query = query.filter(
+                or_(Product.color.is_(None), Product.color == '', Product.color == color)
+                if color == 'Diğer' else Product.color == color
+            )
+        products = query.order_by(Product.color, Product.size).all()
+
+        barcodes = [p.barcode for p in products if p.barcode]
+        cs_map, raf_map = {}, {}
+        if barcodes:
+            cs_map = dict(
+                db.session.query(CentralStock.barcode, CentralStock.qty)
+                .filter(CentralStock.barcode.in_(barcodes)).all()
+            )
+            raf_map = dict(
+                db.session.query(RafUrun.urun_barkodu, RafUrun.raf_kodu)
+                .filter(RafUrun.urun_barkodu.in_(barcodes)).all()
+            )
+        _attach_shopify_mappings(products)
+
+        colors = {}
+        for p in products:
+            colors.setdefault(p.color or 'Diğer', []).append({
+                'size': p.size,
+                'barcode': p.barcode,
+                'quantity': int(cs_map.get(p.barcode) or 0),
+                'sale_price': float(p.sale_price or 0),
+                'shopify': p.shopify_sku or p.shopify_barcode or p.shopify_variant_id,
+                'raf': raf_map.get(p.barcode),
+            })
+        result = []
+        for name, variants in colors.items():
+            order = product_summary.sort_sizes([v['size'] for v in variants])
+            variants.sort(key=lambda v: order.index(v['size']))
+            result.append({'color': name, 'variants': variants})
+        return jsonify({'success': True, 'model': model_id, 'colors': result})
+    except Exception as e:
+        logger.error(f"product_model_variants hata: {e}", exc_info=True)
+        return jsonify({'success': False, 'message': 'Sunucu hatası.'}), 500
+
+
 @get_products_bp.route('/delete_product_variants', methods=['POST'])
 @roles_required('admin', 'manager')
 def delete_product_variants():
@@ -1756,7 +1774,10 @@ async def fetch_archived_barcodes_async():
 
 def delete_archived_in_db(barcodes: set) -> int:
     if not barcodes: return 0
-    deleted = Product.query.filter(Product.barcode.in_(barcodes)).delete(synchronize_session=False)
+    product_summary.queue_product_rows({"barcode": b} for b in barcodes)
+    deleted = (Product.query.filter(Product.barcode.in_(barcodes))
+               .execution_options(**{product_summary.SUMMARY_QUEUED_OPTION: True})
+               .delete(synchronize_session=False))
     db.session.commit()
     return deleted
 
@@ -21,6 +21,9 @@ from weather_service import get_weather_info, get_istanbul_time
 # --- Geciken (teslim süresi dolmuş) sipariş sayıları ---
 from overdue_orders import overdue_counts
 
+# --- Paylaşımlı JSON yanıt önbelleği (ETag/304 + gzip) ---
+import response_cache
+
 # --- Shopify Servisi ---
 try:
     from shopify_site.shopify_service import shopify_service
@@ -32,6 +35,7 @@ except ImportError:
 # ── Ayarlar
 LIVE_REFRESH_SECONDS = 150  # 2,5 dk. İstersen 120-180 arası ver
 USE_MONTH_WINDOW = False    # True yaparsan sadece içinde bulunulan ayı sayar
+STATUS_COUNTS_CACHE_SECONDS = 30  # /api/home/status-counts paylaşımlı yanıt tazelik süresi
 
 # --- Görünüm ---
 home_bp = Blueprint("home", __name__)
@@ -69,27 +73,30 @@ def index():
     gun_basi = datetime(now.year, now.month, now.day, tzinfo=IST)
     gun_sonu = datetime(now.year, now.month, now.day, tzinfo=IST).replace(hour=23, minute=59, second=59, microsecond=999000)
 
-    # 1) Birleşik sipariş kümesi (CANLI PANEL MANTIĞIyla) - Trendyol
-    best_rows = _collect_month_orders_unified(ay_basi, sonraki_ay)
-
-    # 2) Toplam sipariş sayısı (benzersiz order_id) - Trendyol
-    aylik_trendyol_siparis = len(best_rows)
-
-    # 3) Shopify aylık sipariş sayısı
+    # 1) Trendyol aylık / günlük sipariş + ortalama (CANLI PANEL MANTIĞIyla):
+    #    kpi_daily özetinden; özet hazır değilse ayın siparişleri baştan taranır
+    kpi = _kpi_from_rollup(now)
+    if kpi is not None:
+        ay_kpi, gun_kpi = kpi
+        aylik_trendyol_siparis = ay_kpi["orders"]
+        gunluk_trendyol_siparis = gun_kpi["orders"]
+        ortalama_siparis_tutari, toplam_ciro, siparis_sayisi = ay_kpi["avg_unit_net"], ay_kpi["net"], ay_kpi["units"]
+    else:
+        # Birleşik sipariş kümesi; toplam = benzersiz order_id
+        best_rows = _collect_month_orders_unified(ay_basi, sonraki_ay)
+        aylik_trendyol_siparis = len(best_rows)
+        gunluk_trendyol_siparis = len(_collect_month_orders_unified(gun_basi, gun_sonu))
+        # avg_per_order, total_net_ciro, order_count
+        ortalama_siparis_tutari, toplam_ciro, siparis_sayisi = _monthly_aov_from_unified_rows(best_rows)
+
+    # 2) Shopify aylık / günlük sipariş sayısı
     aylik_shopify_siparis = _get_shopify_monthly_count(ay_basi, sonraki_ay)
+    gunluk_shopify_siparis = _get_shopify_daily_count(gun_basi, gun_sonu)
 
     # Toplam sipariş (tüm pazaryerleri)
     aylik_toplam_siparis = aylik_trendyol_siparis + aylik_shopify_siparis
-
-    # GÜNLÜK sipariş sayıları (bugün)
-    gunluk_trendyol_siparis = len(_collect_month_orders_unified(gun_basi, gun_sonu))
-    gunluk_shopify_siparis = _get_shopify_daily_count(gun_basi, gun_sonu)
     gunluk_toplam_siparis = gunluk_trendyol_siparis + gunluk_shopify_siparis
 
-    # 3) Ortalama sipariş tutarı (CANLI PANEL MANTIĞIyla - sipariş başına NET)
-    # avg_per_order, total_net_ciro, order_count
-    ortalama_siparis_tutari, toplam_ciro, siparis_sayisi = _monthly_aov_from_unified_rows(best_rows)
-
     # Created, Hazırlanıyor ve Picking sayıları - Trendyol
     created_count = db.session.query(func.count()).select_from(OrderCreated).scalar() or 0
     hazirlaniyor_count = db.session.query(func.count()).select_from(OrderHazirlaniyor).scalar() or 0
@@ -483,6 +490,19 @@ def _get_shopify_status_counts():
         return {"shopify_beklemede": 0, "shopify_hazirlaniyor": 0, "shopify_kargoda": 0}
 
 
+def _kpi_from_rollup(now):
+    """(ay, bugün) KPI toplamları ``kpi_daily``'den; hazır değil / hata → None."""
+    try:
+        import kpi_rollup
+        if not kpi_rollup.is_ready():
+            return None
+        return kpi_rollup.month_and_day_totals(now.date())
+    except Exception as exc:
+        db.session.rollback()
+        logger.warning("[HOME] kpi_daily okunamadı, tam taramaya düşülüyor: %s", exc)
+        return None
+
+
 def _collect_month_orders_unified(start_ist, end_ist):
     """
     [start,end) IST penceresinde 4 tabloda görünen siparişleri TEK kümeye indirger.
@@ -563,4 +583,6 @@ def api_status_counts():
     """AJAX/Fetch için hafif JSON endpoint."""
     if not current_user.is_authenticated or not session.get("totp_verified"):
         return jsonify({"error": "Yetkisiz erişim"}), 401
-    return _status_counts_now()
+    # Tüm sekmeler/worker'lar tek hesaplanmış yanıtı paylaşır (ETag/304); sipariş yazımları geçersiz kılar
+    return response_cache.serve("home_status_counts", _status_counts_now, params={},
+                                ttl=STATUS_COUNTS_CACHE_SECONDS, tags=("orders",))
@@ -257,6 +257,8 @@ def save_to_database(data: dict, session):
                 "cargo_provider_name": safe_strip(item.get("cargoProviderName")),
                 "cargo_sender_number": safe_strip(item.get("cargoSenderNumber")),
                 "cargo_tracking_link": safe_strip(item.get("cargoTrackingLink")),
+                # ON CONFLICT set_ kolonun onupdate'ini uygulamaz; açıkça yazılır
+                "updated_at": datetime.utcnow(),
             }
         )
 
@@ -0,0 +1,360 @@
+"""Ürün görselleri için türev (thumbnail / medium) üretim hattı.
+
+SORUN
+-----
+``get_products.save_products_to_db_async`` barkod başına pazaryeri görselini
+tam çözünürlükte ``static/images/``'a indiriyor (dosya varsa bir daha hiç
+bakmıyor, değişen görsel de güncellenmiyor). ``image_manager.optimize_image``
+yalnız elle yüklemede küçültüyor. Sipariş listesi, canlı panel, sipariş
+hazırlama ve ürün listesi 40 px'lik küçük resimler için megabaytlık dosyaları
+gönderiyordu; URL'ler sabit olduğu için tarayıcı önbelleği de kısa tutuluyordu.
+
+ÇÖZÜM
+-----
+- ``build_derivatives``: kaynaktan sabit boyutlu ``thumb`` / ``medium``
+  türevleri, WebP + JPEG olarak üretir. Dosya adı kaynağın içerik özetini
+  taşır (``<ad>-thumb-<hash>.webp``) → içerik değişince URL değişir, türevler
+  ``Cache-Control: immutable`` ile bir yıl önbelleklenir.
+- ``process_sources`` / ``backfill``: türev üretimi ayrı süreç havuzunda
+  (spawn) koşar; web/job thread'leri Pillow ile GIL için yarışmaz.
+  ``manifest.json`` kaynak → hash/türev/ETag kaydını tutar; mtime+boyut
+  değişmemiş kaynak yeniden işlenmez.
+- İndirme: ``conditional_headers`` kayıtlı ETag / Last-Modified ile koşullu
+  GET başlıkları üretir; 304 dönen görsel yeniden indirilmez/işlenmez.
+- Şablonlar ``derived`` filtresi ile türev URL'sini alır; türev yoksa orijinal
+  URL aynen döner (geri uyumlu).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import formatdate
+
+logger = logging.getLogger(__name__)
+
+STATIC_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+SOURCE_SUBDIR = "images"
+DERIVED_SUBDIR = "images/derived"
+MANIFEST_NAME = "manifest.json"
+
+# Türev adı → uzun kenar (px)
+SIZES = {"thumb": 200, "medium": 640}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+HASH_LEN = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MANIFEST_CHECK_SECONDS = 2.0
+
+
+def pool_workers() -> int:
+    try:
+        return max(1, int(os.environ.get("IMAGE_PIPELINE_WORKERS", max(1, (os.cpu_count() or 2) // 2))))
+    except ValueError:
+        return 1
+
+
+# ---------------------------------------------------------------------------
+# Yol / anahtar yardımcıları
+# ---------------------------------------------------------------------------
+def source_key(src: str | None) -> str | None:
+    """``/static/images/x.jpg`` → ``images/x.jpg``; uzak URL / boş için None."""
+    if not src:
+        return None
+    s = str(src).strip().split("?", 1)[0]
+    if s.startswith(("http://", "https://", "//", "data:")):
+        return None
+    s = s.lstrip("/")
+    if s.startswith("static/"):
+        s = s[len("static/"):]
+    if not s.startswith(SOURCE_SUBDIR + "/") or s.startswith(DERIVED_SUBDIR + "/"):
+        return None
+    return s
+
+
+def key_for_path(path: str, root: str | None = None) -> str:
+    return os.path.relpath(os.path.abspath(path), root or STATIC_ROOT).replace(os.sep, "/")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:HASH_LEN]
+
+
+# ---------------------------------------------------------------------------
+# Türev üretimi (süreç havuzunda çalışır — yalnız stdlib + Pillow)
+# ---------------------------------------------------------------------------
+def build_derivatives(source_path: str, out_dir: str, root: str) -> dict:
+    """Tek kaynaktan tüm türevleri üretir; manifest kaydını döndürür."""
+    from PIL import Image, ImageOps
+
+    with open(source_path, "rb") as f:
+        data = f.read()
+    digest = content_hash(data)
+    st = os.stat(source_path)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    os.makedirs(out_dir, exist_ok=True)
+
+    variants: dict[str, dict[str, str]] = {}
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            bg = Image.new("RGB", img.size, (255, 255, 255))
+            bg.paste(img, mask=img.split()[-1])
+            img = bg
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        for size_name, edge in SIZES.items():
+            resized = img.copy()
+            resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            variants[size_name] = {}
+            for ext, (fmt, opts) in FORMATS.items():
+                name = f"{stem}-{size_name}-{digest}.{ext}"
+                path = os.path.join(out_dir, name)
+                if not os.path.exists(path):
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    resized.save(tmp, fmt, **opts)
+                    os.replace(tmp, path)
+                variants[size_name][ext] = key_for_path(path, root)
+    return {"hash": digest, "mtime": st.st_mtime, "size": st.st_size, "variants": variants}
+
+
+def _build_safe(args):
+    source_path, out_dir, root = args
+    try:
+        return source_path, build_derivatives(source_path, out_dir, root), None
+    except Exception as e:  # bozuk/desteklenmeyen görsel tüm partiyi düşürmesin
+        return source_path, None, f"{type(e).__name__}: {e}"
+
+
+# ---------------------------------------------------------------------------
+# Manifest (disk üzerinde; worker'lar arası paylaşılır)
+# ---------------------------------------------------------------------------
+class Manifest:
+    """``static/images/derived/manifest.json`` — okuma önbellekli, kilitli yazım."""
+
+    def __init__(self, root: str | None = None):
+        self.root = root or STATIC_ROOT
+        self.path = os.path.join(self.root, DERIVED_SUBDIR, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._data: dict = {}
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def entries(self) -> dict:
+        now = time.monotonic()
+        if now - self._checked_at >= MANIFEST_CHECK_SECONDS or self._mtime is None:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self._data, self._mtime = self._read(), mtime
+        return self._data
+
+    def get(self, key: str) -> dict | None:
+        return self.entries().get(key)
+
+    def update(self, changes: dict) -> None:
+        """``{anahtar: kayıt | None}`` birleştirir (None → sil); dosya kilidi altında."""
+        if not changes:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, _file_lock(self.path + ".lock"):
+            data = self._read()
+            for key, entry in changes.items():
+                if entry is None:
+                    data.pop(key, None)
+                else:
+                    data[key] = {**data.get(key, {}), **entry}
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._data, self._mtime = data, os.stat(self.path).st_mtime
+
+
+class _file_lock:
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = open(self.path, "a+")
+        try:
+            import fcntl
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        except ImportError:  # Windows: süreç içi kilit yeterli kabul edilir
+            pass
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            import fcntl
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        except ImportError:
+            pass
+        self.fd.close()
+
+
+_manifests: dict[str, Manifest] = {}
+
+
+def manifest(root: str | None = None) -> Manifest:
+    root = root or STATIC_ROOT
+    m = _manifests.get(root)
+    if m is None:
+        m = _manifests.setdefault(root, Manifest(root))
+    return m
+
+
+# ---------------------------------------------------------------------------
+# İşleme
+# ---------------------------------------------------------------------------
+def _remove_stale(root: str, old: dict | None, new: dict) -> None:
+    if not old or old.get("hash") == new.get("hash"):
+        return
+    for formats in (old.get("variants") or {}).values():
+        for rel in formats.values():
+            try:
+                os.remove(os.path.join(root, rel))
+            except OSError:
+                pass
+
+
+def process_sources(paths, root: str | None = None, workers: int | None = None) -> dict:
+    """Verilen kaynak dosyaların türevlerini üretir ve manifest'i günceller.
+
+    Returns:
+        ``{"processed", "failed"}``
+    """
+    root = root or STATIC_ROOT
+    paths = [p for p in dict.fromkeys(paths) if p and os.path.isfile(p)]
+    if not paths:
+        return {"processed": 0, "failed": 0}
+    out_dir = os.path.join(root, DERIVED_SUBDIR)
+    jobs = [(p, out_dir, root) for p in paths]
+    workers = workers or pool_workers()
+
+    if workers > 1 and len(jobs) > 1:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx) as pool:
+            results = list(pool.map(_build_safe, jobs, chunksize=8))
+    else:
+        results = [_build_safe(j) for j in jobs]
+
+    m = manifest(root)
+    changes, failed = {}, 0
+    for source_path, entry, error in results:
+        if entry is None:
+            failed += 1
+            logger.warning(f"[IMG] türev üretilemedi: {os.path.basename(source_path)} ({error})")
+            continue
+        key = key_for_path(source_path, root)
+        _remove_stale(root, m.get(key), entry)
+        changes[key] = entry
+    m.update(changes)
+    logger.info(f"[IMG] {len(changes)} görsel türevi üretildi, {failed} hata")
+    return {"processed": len(changes), "failed": failed}
+
+
+def pending_sources(root: str | None = None, limit: int | None = None) -> list[str]:
+    """Türevi olmayan ya da mtime/boyutu değişmiş kaynak dosyalar."""
+    root = root or STATIC_ROOT
+    src_dir = os.path.join(root, SOURCE_SUBDIR)
+    entries = manifest(root).entries()
+    pending = []
+    try:
+        names = sorted(os.listdir(src_dir))
+    except OSError:
+        return []
+    for name in names:
+        if not name.lower().endswith(SOURCE_EXTENSIONS):
+            continue
+        path = os.path.join(src_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entry = entries.get(f"{SOURCE_SUBDIR}/{name}") or {}
+        if entry.get("variants") and entry.get("mtime") == st.st_mtime and entry.get("size") == st.st_size:
+            continue
+        pending.append(path)
+        if limit and len(pending) >= limit:
+            break
+    return pending
+
+
+def backfill(root: str | None = None, workers: int | None = None, limit: int | None = None) -> dict:
+    """Eksik/eskimiş türevleri toplu üretir (gece job'ı)."""
+    return process_sources(pending_sources(root, limit), root=root, workers=workers)
+
+
+# ---------------------------------------------------------------------------
+# Koşullu indirme (ETag / Last-Modified)
+# ---------------------------------------------------------------------------
+def conditional_headers(image_path: str, root: str | None = None) -> dict:
+    """Var olan kaynak için koşullu GET başlıkları (yoksa boş dict)."""
+    if not os.path.exists(image_path):
+        return {}
+    entry = manifest(root).get(key_for_path(image_path, root)) or {}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    headers["If-Modified-Since"] = entry.get("last_modified") or formatdate(
+        os.stat(image_path).st_mtime, usegmt=True)
+    return headers
+
+
+def record_validators(validators: dict, root: str | None = None) -> None:
+    """``{yerel_yol: (etag, last_modified)}`` — indirme partisi sonunda tek yazım."""
+    manifest(root).update({
+        key_for_path(path, root): {"etag": etag, "last_modified": last_modified}
+        for path, (etag, last_modified) in validators.items()
+    })
+
+
+# ---------------------------------------------------------------------------
+# URL üretimi + Flask entegrasyonu
+# ---------------------------------------------------------------------------
+def derived_url(src, size: str = "thumb", fmt: str = "jpg") -> str:
+    """Türev URL'si; türev yoksa ``src`` aynen (uzak URL'ler dahil)."""
+    key = source_key(src)
+    if key is None:
+        return src or ""
+    entry = manifest().get(key)
+    rel = ((entry or {}).get("variants") or {}).get(size, {}).get(fmt)
+    return f"/static/{rel}" if rel else src
+
+
+def init_app(app) -> None:
+    """``derived`` şablon filtresi + türevler için kalıcı önbellek başlığı."""
+    app.jinja_env.filters["derived"] = derived_url
+    prefix = f"/static/{DERIVED_SUBDIR}/"
+
+    @app.after_request
+    def _immutable_derivatives(response):
+        from flask import request
+        if (request.path.startswith(prefix) and response.status_code == 200
+                and not request.path.endswith(MANIFEST_NAME)):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
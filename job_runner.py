@@ -0,0 +1,280 @@
+"""Periyodik job'lar için ayrı süreç (job runner) + kuyruk/metrik altyapısı.
+
+SORUN
+-----
+``pull_orders``, 10 sn'lik ``pull_qna``, ``fcache_loop``, ``stock_sync_auto``,
+``daily_sales_rebuild`` vb. tüm APScheduler job'ları, ``become_leader`` flock'unu
+kapan gunicorn worker'ının içinde tek bir thread havuzunda koşuyordu. Prophet
+fit'i ya da tam stok senkronu istek karşılamayla GIL için yarışıyor, o worker
+ölünce/yeniden başlayınca job'lar da ölüyordu. Bir job'ın ne kadar sürdüğü,
+aralığını aşıp aşmadığı hiçbir yerde görünmüyordu.
+
+ÇÖZÜM
+-----
+- ``JOB_RUNNER=external``: web worker'ları scheduler başlatmaz, yalnız istek
+  karşılar. Job'ların hepsi ``python job_runner.py`` sürecine geçer (aynı
+  ``schedule_jobs`` tanımları; leader lock ile tek runner, diğeri yedekte
+  bekler). Default ``inline`` — eski davranış (leader web worker'ı).
+- Kuyruklar: her job bir kuyruğa (APScheduler executor'ı) düşer; kuyrukların
+  kendi thread havuzu vardır (``JOB_QUEUE_<AD>_WORKERS``). 10 sn'lik çekme
+  job'ları uzun süren forecast/sync job'larının arkasında beklemez.
+- Metrik: job başına çalışma/hata sayısı, son/ortalama/maks süre, aşım
+  (süre > aralık ya da önceki çalışma bitmediği için atlanan tur).
+  ``job_runner_heartbeat`` job'ı özetini ``PlatformConfig('job_runner')``'a
+  yazar; ``GET /health/jobs`` oradan okur (web ve runner ayrı süreçte olsa da).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+STATUS_PLATFORM = "job_runner"
+HEARTBEAT_SECONDS = 15
+STALE_SECONDS = 60
+_EMA_ALPHA = 0.2
+
+# Kuyruk adı → varsayılan eşzamanlı çalışma sayısı
+QUEUES = {
+    "default": 2,
+    "pull": 2,       # sipariş / soru-cevap / iade çekme (kısa, sık)
+    "sync": 1,       # stok push, rezerv doğrulama, stok sağlık
+    "forecast": 1,   # daily_sales + forecast cache (CPU ağırlıklı)
+}
+
+JOB_QUEUES = {
+    "pull_orders": "pull",
+    "pull_returns_daily": "pull",
+    "reconcile_orders": "pull",
+    "pull_qna": "pull",
+    "qna_reconcile": "pull",
+    "stock_sync_auto": "sync",
+    "reserved_stock_verify": "sync",
+    "stock_sync_health_monitor": "sync",
+    "sync_detail_prune": "sync",
+    "sync_batch_reconcile": "sync",
+    "fcache_loop": "forecast",
+    "daily_sales_rebuild": "forecast",
+    "daily_sales_incremental": "forecast",
+    "image_derivatives_backfill": "forecast",
+    "kpi_rollup_refresh": "forecast",
+    "kpi_rollup_rebuild": "forecast",
+}
+
+
+def runner_mode() -> str:
+    """``inline`` (leader web worker job'ları çalıştırır) | ``external`` (ayrı süreç)."""
+    mode = os.environ.get("JOB_RUNNER", "inline").strip().lower()
+    return mode if mode in ("inline", "external") else "inline"
+
+
+def is_runner_process() -> bool:
+    return os.environ.get("JOB_RUNNER_PROCESS") == "1"
+
+
+def queue_for(job_id: str) -> str:
+    return JOB_QUEUES.get(job_id, "default")
+
+
+def queue_workers(name: str) -> int:
+    try:
+        return max(1, int(os.environ.get(f"JOB_QUEUE_{name.upper()}_WORKERS", QUEUES[name])))
+    except (TypeError, ValueError):
+        return QUEUES[name]
+
+
+def interval_seconds(trigger: str, kw: dict) -> float | None:
+    """interval trigger'ın periyodu (cron için None)."""
+    if trigger != "interval":
+        return None
+    return (kw.get("weeks", 0) * 604800 + kw.get("days", 0) * 86400 + kw.get("hours", 0) * 3600
+            + kw.get("minutes", 0) * 60 + kw.get("seconds", 0)) or None
+
+
+class JobMetrics:
+    """Süreç içi job metrikleri (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: dict[str, dict] = {}
+
+    def _job(self, job_id: str) -> dict:
+        return self._jobs.setdefault(job_id, {
+            "queue": queue_for(job_id), "interval": None, "runs": 0, "errors": 0,
+            "overruns": 0, "skipped": 0, "missed": 0, "running": 0,
+            "last_started_at": None, "last_duration": None, "avg_duration": None,
+            "max_duration": None, "last_error": None, "last_error_at": None,
+        })
+
+    def register(self, job_id: str, interval: float | None) -> None:
+        with self._lock:
+            self._job(job_id)["interval"] = interval
+
+    def started(self, job_id: str) -> None:
+        with self._lock:
+            j = self._job(job_id)
+            j["running"] += 1
+            j["last_started_at"] = datetime.utcnow().isoformat()
+
+    def finished(self, job_id: str, duration: float, error: BaseException | None = None) -> None:
+        with self._lock:
+            j = self._job(job_id)
+            j["running"] = max(0, j["running"] - 1)
+            j["runs"] += 1
+            j["last_duration"] = round(duration, 3)
+            j["max_duration"] = round(max(j["max_duration"] or 0.0, duration), 3)
+            avg = j["avg_duration"]
+            j["avg_duration"] = round(duration if avg is None else avg + _EMA_ALPHA * (duration - avg), 3)
+            interval = j["interval"]
+            if interval and duration > interval:
+                j["overruns"] += 1
+            if error is not None:
+                j["errors"] += 1
+                j["last_error"] = f"{type(error).__name__}: {error}"[:300]
+                j["last_error_at"] = datetime.utcnow().isoformat()
+        if interval and duration > interval:
+            logger.warning(f"[JOBS] {job_id} aralığını aştı: {duration:.1f}s > {interval:.0f}s")
+
+    def skipped(self, job_id: str) -> None:
+        """Önceki çalışma bitmediği için tur atlandı (max_instances) → aşım."""
+        with self._lock:
+            j = self._job(job_id)
+            j["skipped"] += 1
+            j["overruns"] += 1
+
+    def missed(self, job_id: str) -> None:
+        with self._lock:
+            self._job(job_id)["missed"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: dict(v) for k, v in self._jobs.items()}
+
+
+metrics = JobMetrics()
+
+
+def timed(job_id: str, func, interval: float | None = None):
+    """Job fonksiyonunu süre/hata metriği toplayan sarmalayıcıyla döndürür."""
+    metrics.register(job_id, interval)
+
+    def _run(*args, **kwargs):
+        metrics.started(job_id)
+        start = time.monotonic()
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            metrics.finished(job_id, time.monotonic() - start, error)
+
+    _run.__name__ = getattr(func, "__name__", job_id)
+    return _run
+
+
+def _on_scheduler_event(event):
+    from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        metrics.skipped(event.job_id)
+    elif event.code == EVENT_JOB_MISSED:
+        metrics.missed(event.job_id)
+
+
+def build_scheduler(timezone: str = "Europe/Istanbul"):
+    """Kuyruk başına ayrı thread havuzlu BackgroundScheduler."""
+    from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+    from apscheduler.executors.pool import ThreadPoolExecutor
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    scheduler = BackgroundScheduler(
+        timezone=timezone,
+        executors={name: ThreadPoolExecutor(queue_workers(name)) for name in QUEUES},
+        job_defaults={"max_instances": 1, "coalesce": True, "misfire_grace_time": 60},
+    )
+    scheduler.add_listener(_on_scheduler_event, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+    return scheduler
+
+
+def publish_status(scheduler=None) -> None:
+    """Metrik özetini PlatformConfig('job_runner').extra_config'e yazar (app context içinde)."""
+    from models import db, PlatformConfig
+
+    jobs = metrics.snapshot()
+    if scheduler is not None:
+        for job in scheduler.get_jobs():
+            nrt = job.next_run_time
+            jobs.setdefault(job.id, {"queue": queue_for(job.id)})["next_run_at"] = (
+                nrt.isoformat() if nrt else None)
+    try:
+        cfg = PlatformConfig.query.filter_by(platform=STATUS_PLATFORM).first()
+        if not cfg:
+            cfg = PlatformConfig(platform=STATUS_PLATFORM)
+            db.session.add(cfg)
+        cfg.extra_config = {  # JSON kolonu: yeni dict ata ki değişiklik algılansın
+            "mode": runner_mode(),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "heartbeat_at": datetime.utcnow().isoformat(),
+            "queues": {name: queue_workers(name) for name in QUEUES},
+            "jobs": jobs,
+        }
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"[JOBS] durum yazılamadı: {e}")
+
+
+def read_status(now: datetime | None = None) -> dict:
+    """Son yayınlanan durum + ``alive`` (heartbeat STALE_SECONDS içinde mi)."""
+    from models import PlatformConfig
+
+    cfg = PlatformConfig.query.filter_by(platform=STATUS_PLATFORM).first()
+    status = dict(cfg.extra_config or {}) if cfg else {}
+    alive = False
+    if status.get("heartbeat_at"):
+        try:
+            age = ((now or datetime.utcnow()) - datetime.fromisoformat(status["heartbeat_at"])).total_seconds()
+            status["heartbeat_age"] = round(age, 1)
+            alive = age <= STALE_SECONDS
+        except (TypeError, ValueError):
+            pass
+    status["alive"] = alive
+    return status
+
+
+def main() -> None:
+    """``python job_runner.py`` — tüm periyodik job'ları bu süreçte çalıştırır."""
+    os.environ["JOB_RUNNER_PROCESS"] = "1"
+    os.environ.setdefault("FORCE_SCHEDULER", "1")
+    import app as app_module
+
+    if not app_module.ENABLE_JOBS:
+        logger.error("[JOBS] DISABLE_JOBS açık — runner çıkıyor")
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    # Leader lock: ikinci runner yedekte bekler, birincisi ölünce devralır
+    while not stop.is_set() and not app_module.start_scheduler():
+        logger.info("[JOBS] başka bir runner lider — yedekte bekleniyor")
+        stop.wait(30)
+
+    while not stop.is_set():
+        stop.wait(1)
+    if app_module.scheduler.running:
+        app_module.scheduler.shutdown(wait=True)
+    logger.info("[JOBS] runner durdu")
+
+
+if __name__ == "__main__":
+    main()
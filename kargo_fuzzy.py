@@ -0,0 +1,230 @@
+"""Kargo mutabakatı için bloklu, paralel ad+tarih bulanık eşleştirme motoru.
+
+SORUN
+-----
+``kargo_mutabakat._best_fuzzy_match`` eşleşmeyen her fatura satırının
+normalize alıcı adını tarih penceresindeki TÜM adaylarla ``SequenceMatcher``
+ile karşılaştırıyordu: satır × aday (binlerce × on binlerce) karesel iş,
+üstelik isteği karşılayan thread'de. Aylık MNG faturasında analiz dakikalar
+sürüp gunicorn timeout'una takılıyordu.
+
+ÇÖZÜM
+-----
+- ``CandidateIndex``: adaylar ada göre tekilleştirilir (aynı müşteri birden
+  çok tabloda), her ad için karakter 3-gram'ları çıkarılır ve ters indeks
+  tarih kovalarına (``BUCKET_DAYS``) bölünür: ``(kova, 3-gram) → ad id``.
+  Tarihsiz adaylar ayrı kovadadır ve her sorguda taranır.
+- Bloklama: sorgu yalnız fatura tarihinin ±``DATE_WINDOW_DAYS`` kovalarındaki
+  posting'leri sayar; ortak 3-gram sayısından Dice benzerliği hesaplanır ve
+  ``BLOCK_DICE_MIN`` altı çiftler ile uzunlukları eşiği imkânsız kılan
+  çiftler (``2·min(a, b) / (a + b)`` < eşik — ratio'nun üst sınırı) hiç
+  puanlanmaz; sabit uzunluk farkı kullanılmaz, uzun adlar da eşleşir. Kalan (az sayıda) çift eski ölçüyle —
+  ``SequenceMatcher.ratio`` ≥ ``NAME_SIMILARITY_THRESHOLD`` — doğrulanır;
+  ekrandaki "Benzerlik %" anlamı değişmez.
+- Birebir ad eşitliği önce (1.0) denenir; eşit puanda aday listesindeki ilk
+  kayıt seçilir — eski sıralı taramayla aynı sonuç.
+- ``match_all`` sorguları ``CHUNK_ROWS``'luk parçalara böler; parça sayısı
+  yeterliyse ``ProcessPoolExecutor`` (spawn) ile dağıtır — indeks her
+  worker'a bir kez gönderilir. Her biten parçada ``progress(done, total)``.
+
+Modül Flask / model import etmez; ancak spawn worker'ları ana betiği de
+``__mp_main__`` adıyla yeniden çalıştırır (``python app.py`` → app.py'nin
+tamamı). app.py bu durumda süreç düzeyindeki yan etkileri (scheduler, anlık
+push, DB testi) atlar — ``app.IS_SPAWN_WORKER``.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from difflib import SequenceMatcher
+
+logger = logging.getLogger(__name__)
+
+NAME_SIMILARITY_THRESHOLD = 0.85
+DATE_WINDOW_DAYS = 15
+BUCKET_DAYS = DATE_WINDOW_DAYS        # pencere en çok 3 kovaya yayılır
+NGRAM = 3
+BLOCK_DICE_MIN = 0.4                  # 3-gram Dice bunun altındaysa ratio ≥ 0.85 pratikte imkânsız
+CHUNK_ROWS = 250
+PARALLEL_MIN_ROWS = 2 * CHUNK_ROWS    # bunun altında süreç açmanın maliyeti kazançtan büyük
+
+_NO_DATE = None
+_worker_index = None
+
+
+def worker_count() -> int:
+    """``KARGO_FUZZY_WORKERS`` (default: min(4, CPU)). 1 → süreç havuzu kullanılmaz."""
+    raw = os.environ.get("KARGO_FUZZY_WORKERS")
+    if not raw:
+        return min(4, os.cpu_count() or 1)
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        return 1
+
+
+def ngrams(name: str) -> frozenset:
+    padded = f" {name} "
+    return frozenset(padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1)))
+
+
+def _day(value):
+    """datetime/date → gün sırası (int); None → None."""
+    if value is None:
+        return None
+    return value.toordinal() if hasattr(value, "toordinal") else None
+
+
+def _bucket(day):
+    return _NO_DATE if day is None else day // BUCKET_DAYS
+
+
+class CandidateIndex:
+    """Aday havuzunun tarih kovalı 3-gram ters indeksi (pickle'lanabilir)."""
+
+    def __init__(self, candidates):
+        self.names: list[str] = []
+        self.grams: list[frozenset] = []
+        # ad id → [(aday sırası, gün, kaynak etiketi, sipariş no)] (aday sırasına göre)
+        self.entries: list[list[tuple]] = []
+        self.by_name: dict[str, int] = {}
+        self.postings: dict[tuple, list[int]] = {}
+        self.buckets: set = set()
+        indexed: set[tuple] = set()      # (ad id, kova): posting'e bir kez girer
+        for pos, (name, date, label, order_no) in enumerate(candidates):
+            if not name:
+                continue
+            name_id = self.by_name.get(name)
+            if name_id is None:
+                name_id = self.by_name[name] = len(self.names)
+                self.names.append(name)
+                self.grams.append(ngrams(name))
+                self.entries.append([])
+            day = _day(date)
+            bucket = _bucket(day)
+            if (name_id, bucket) not in indexed:
+                indexed.add((name_id, bucket))
+                for gram in self.grams[name_id]:
+                    self.postings.setdefault((bucket, gram), []).append(name_id)
+            self.buckets.add(bucket)
+            self.entries[name_id].append((pos, day, label, order_no))
+
+    def __len__(self):
+        return sum(len(e) for e in self.entries)
+
+    def _query_buckets(self, day):
+        if day is None:
+            return self.buckets
+        first, last = _bucket(day - DATE_WINDOW_DAYS), _bucket(day + DATE_WINDOW_DAYS)
+        wanted = set(range(first, last + 1))
+        wanted.add(_NO_DATE)
+        return wanted & self.buckets
+
+    def _first_entry(self, name_id, day):
+        """Tarih penceresine giren ilk aday kaydı (tarih bilinmiyorsa karar insanın)."""
+        for entry in self.entries[name_id]:
+            if day is None or entry[1] is None or abs(day - entry[1]) <= DATE_WINDOW_DAYS:
+                return entry
+        return None
+
+    def blocked(self, name: str, day) -> list[tuple[float, int]]:
+        """Bloklamadan geçen (Dice, ad id) çiftleri — büyükten küçüğe."""
+        grams = ngrams(name)
+        shared: dict[int, int] = {}
+        for bucket in self._query_buckets(day):
+            counts: dict[int, int] = {}
+            for gram in grams:
+                for name_id in self.postings.get((bucket, gram), ()):
+                    counts[name_id] = counts.get(name_id, 0) + 1
+            for name_id, count in counts.items():
+                if count > shared.get(name_id, 0):
+                    shared[name_id] = count
+        size, length = len(grams), len(name)
+        out = []
+        for name_id, count in shared.items():
+            other = len(self.names[name_id])
+            if 2.0 * min(other, length) < NAME_SIMILARITY_THRESHOLD * (other + length):
+                continue                  # ratio ≤ 2·min/(a+b): eşiğe ulaşamaz
+            dice = 2.0 * count / (size + len(self.grams[name_id]))
+            if dice >= BLOCK_DICE_MIN:
+                out.append((dice, name_id))
+        out.sort(reverse=True)
+        return out
+
+    def best_match(self, name: str, date):
+        """En iyi aday: (aday adı, benzerlik, kaynak, sipariş no) veya None."""
+        if not name:
+            return None
+        day = _day(date)
+        name_id = self.by_name.get(name)
+        if name_id is not None:
+            entry = self._first_entry(name_id, day)
+            if entry:
+                return (name, 1.0, entry[2], entry[3])
+
+        best, best_key = None, None
+        sm = SequenceMatcher()
+        sm.set_seq2(name)
+        for _, cand_id in self.blocked(name, day):
+            entry = self._first_entry(cand_id, day)
+            if entry is None:
+                continue
+            sm.set_seq1(self.names[cand_id])
+            if sm.real_quick_ratio() < NAME_SIMILARITY_THRESHOLD or sm.quick_ratio() < NAME_SIMILARITY_THRESHOLD:
+                continue
+            ratio = sm.ratio()
+            if ratio < NAME_SIMILARITY_THRESHOLD:
+                continue
+            key = (ratio, -entry[0])
+            if best_key is None or key > best_key:
+                best_key = key
+                best = (self.names[cand_id], ratio, entry[2], entry[3])
+        return best
+
+
+def match_chunk(index: CandidateIndex, queries) -> list:
+    return [index.best_match(name, date) for name, date in queries]
+
+
+def _init_worker(index: CandidateIndex) -> None:
+    global _worker_index
+    _worker_index = index
+
+
+def _worker_chunk(start: int, queries) -> tuple[int, list]:
+    return start, match_chunk(_worker_index, queries)
+
+
+def match_all(index: CandidateIndex, queries, workers: int | None = None, progress=None) -> list:
+    """Her sorgu (normalize ad, tarih) için ``best_match`` sonucu — sıra korunur.
+
+    ``progress(done, total)`` her biten parçadan sonra çağrılır (çağıranın thread'inde).
+    """
+    queries = list(queries)
+    total = len(queries)
+    results: list = [None] * total
+    chunks = [(i, queries[i:i + CHUNK_ROWS]) for i in range(0, total, CHUNK_ROWS)]
+    workers = worker_count() if workers is None else workers
+    done = 0
+
+    if workers <= 1 or total < PARALLEL_MIN_ROWS:
+        for start, chunk in chunks:
+            results[start:start + len(chunk)] = match_chunk(index, chunk)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+        return results
+
+    ctx = multiprocessing.get_context("spawn")   # web sürecindeki thread/bağlantılar fork'lanmasın
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx,
+                             initializer=_init_worker, initargs=(index,)) as pool:
+        futures = [pool.submit(_worker_chunk, start, chunk) for start, chunk in chunks]
+        for future in as_completed(futures):
+            start, chunk_results = future.result()
+            results[start:start + len(chunk_results)] = chunk_results
+            done += len(chunk_results)
+            if progress:
+                progress(done, total)
+    return results
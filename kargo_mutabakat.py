@@ -1,18 +1,22 @@
 # kargo_mutabakat.py — 🚚 Kargo Fatura Mutabakatı (MNG)
 # Kargo firmasının fatura Excel'ini sistemdeki kargolarla karşılaştırır:
 #  - Birebir eşleşme (takip no / müşteri ref no)
-#  - Bulanık eşleşme (alıcı adı + tarih yakınlığı) → "Şüpheli" listesi
+#  - Bulanık eşleşme (alıcı adı + tarih yakınlığı) → "Şüpheli" listesi (kargo_fuzzy motoru)
 #  - Desi bazlı tarife fiyat kontrolü
-from flask import Blueprint, request, render_template, redirect, url_for, flash, send_file
+# Analiz arka plan thread'inde koşar (KargoMutabakatRun: aşama/ilerleme); sonuç
+# JSON olarak saklanır, ekran ve itiraz Excel'i analizi tekrarlamadan oradan okur.
+from flask import (Blueprint, request, render_template, redirect, url_for, flash, send_file,
+                   jsonify, current_app, session)
 import pandas as pd
 import os
 import json
 import logging
+import threading
 from io import BytesIO
 from datetime import datetime, timedelta
-from difflib import SequenceMatcher
 from werkzeug.utils import secure_filename
 
+import kargo_fuzzy
 from user_logs import log_user_action
 from login_logout import login_required, roles_required
 
@@ -22,13 +26,13 @@ try:
     from .models import (
         db, OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped, OrderDelivered,
         OrderCancelled, OrderArchived, OrderReadyToShip, Archive, ReturnOrder,
-        Degisim, YeniSiparis, Order, UretimSiparis,
+        Degisim, YeniSiparis, Order, UretimSiparis, KargoMutabakatRun,
     )
 except ImportError:
     from models import (
         db, OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped, OrderDelivered,
         OrderCancelled, OrderArchived, OrderReadyToShip, Archive, ReturnOrder,
-        Degisim, YeniSiparis, Order, UretimSiparis,
+        Degisim, YeniSiparis, Order, UretimSiparis, KargoMutabakatRun,
     )
 
 kargo_mutabakat_bp = Blueprint('kargo_mutabakat_bp', __name__)
@@ -61,11 +65,10 @@ def _platform_label(source, status_label):
         platform = 'Trendyol Siparişi'
     return f"{platform} ({status_label})" if status_label else platform
 
-# Bulanık eşleşme eşikleri (ayar için tek yer)
-NAME_SIMILARITY_THRESHOLD = 0.85
-DATE_WINDOW_DAYS = 15
+# Bulanık eşleşme eşikleri (ad benzerliği / tarih penceresi: kargo_fuzzy)
 CANDIDATE_LOOKBACK_DAYS = 45   # fatura aralığından ne kadar geriye aday taransın
 PRICE_TOLERANCE_TL = 0.05
+STALE_RUN = timedelta(minutes=15)   # bu süre ilerleme yoksa 'running' çalışma ölü sayılır
 
 
 # ──────────────────────────── Yardımcılar ────────────────────────────
@@ -371,38 +374,6 @@ def _shopify_live_sources(window_start):
         return {}, []
 
 
-def _best_fuzzy_match(norm_name, invoice_date, candidates, exact_name_index):
-    """En iyi aday: (aday adı, benzerlik, kaynak, sipariş no) veya None.
-    Önce ucuz birebir-ad eşitliği, sonra SequenceMatcher."""
-
-    def _date_ok(cand_date):
-        if invoice_date is None or cand_date is None:
-            return True  # tarih bilinmiyorsa ada göre karar insanın
-        return abs((invoice_date - cand_date).days) <= DATE_WINDOW_DAYS
-
-    for cand in exact_name_index.get(norm_name, []):
-        if _date_ok(cand[1]):
-            return (cand[0], 1.0, cand[2], cand[3])
-
-    best = None
-    sm = SequenceMatcher()
-    sm.set_seq2(norm_name)
-    for cand_name, cand_date, label, on in candidates:
-        if abs(len(cand_name) - len(norm_name)) > 6:
-            continue
-        if not _date_ok(cand_date):
-            continue
-        sm.set_seq1(cand_name)
-        if sm.real_quick_ratio() < NAME_SIMILARITY_THRESHOLD:
-            continue
-        if sm.quick_ratio() < NAME_SIMILARITY_THRESHOLD:
-            continue
-        ratio = sm.ratio()
-        if ratio >= NAME_SIMILARITY_THRESHOLD and (best is None or ratio > best[1]):
-            best = (cand_name, ratio, label, on)
-    return best
-
-
 def _check_tarife(desi, tasima_ucreti, bands):
     """Tarife kontrolü: (durum, beklenen) — durum: 'ok' | 'anomali' | 'tarife_disi' | None."""
     if desi is None or tasima_ucreti is None or not bands:
@@ -419,8 +390,15 @@ def _check_tarife(desi, tasima_ucreti, bands):
     return 'tarife_disi', None
 
 
-def _analyze(df):
-    """Fatura DataFrame'ini analiz eder; kova sözlüğü döner."""
+def _analyze(df, progress=None):
+    """Fatura DataFrame'ini analiz eder; kova sözlüğü döner.
+
+    progress(aşama, done=None, total=None) — arka plan çalışmasının ilerlemesi için.
+    """
+    def _step(phase, done=None, total=None):
+        if progress:
+            progress(phase, done, total)
+
     bands = _load_tarife()
 
     rows = []
@@ -431,6 +409,7 @@ def _analyze(df):
         d['_tarih'] = _parse_tr_date(d['fatura_tarihi'])
         rows.append(d)
 
+    _step('birebir', 0, len(rows))
     tracking_set = {d['gonderi_no'] for d in rows}
     ref_set = {d['ref_no'] for d in rows if d['ref_no']}
     tracking_map, ref_map = _exact_match_maps(tracking_set, ref_set)
@@ -448,12 +427,12 @@ def _analyze(df):
     for k, v in shopify_tracking.items():
         tracking_map.setdefault(k, v)
 
+    _step('adaylar')
     candidates = _fuzzy_candidates(window_start, window_end) + shopify_cands
-    exact_name_index = {}
-    for c in candidates:
-        exact_name_index.setdefault(c[0], []).append(c)
+    index = kargo_fuzzy.CandidateIndex(candidates)
 
     eslesen, supheli, bizde_yok, fiyat_anomali = [], [], [], []
+    fuzzy_rows = []
 
     # 1. Adım: bizde var mı? Birebir eşleşenler sonraki işleme, olmayanlar 2. adıma
     for d in rows:
@@ -467,9 +446,14 @@ def _analyze(df):
             d.update(match_type='ref_no', kaynak=label, siparis_no=on)
             eslesen.append(d)
             continue
-
-        # 2. Adım: şüpheli mi? (ad + tarih benzerliği) Değilse → Bizde Yok
-        best = _best_fuzzy_match(_tr_upper(d['alici']), d['_tarih'], candidates, exact_name_index)
+        fuzzy_rows.append(d)
+
+    # 2. Adım: şüpheli mi? (ad + tarih benzerliği, bloklu + paralel) Değilse → Bizde Yok
+    _step('bulanik', 0, len(fuzzy_rows))
+    matches = kargo_fuzzy.match_all(
+        index, [(_tr_upper(d['alici']), d['_tarih']) for d in fuzzy_rows],
+        progress=lambda done, total: _step('bulanik', done, total))
+    for d, best in zip(fuzzy_rows, matches):
         if best:
             d.update(match_type='ad_tarih', aday_ad=best[0], benzerlik=round(best[1] * 100),
                      kaynak=best[2], siparis_no=best[3])
@@ -479,6 +463,7 @@ def _analyze(df):
 
     # 3. Adım: fiyat kontrolü — yalnızca bizim olan (eşleşen + şüpheli) kargolarda.
     # "Bizde Yok" satırları zaten komple itiraz konusu, fiyatına ayrıca bakılmaz.
+    _step('fiyat')
     for d in eslesen + supheli:
         durum, beklenen = _check_tarife(d['desi'], d['tasima_ucreti'], bands)
         d['tarife_durum'] = durum
@@ -501,13 +486,132 @@ def _analyze(df):
     }
 
 
+# ──────────────────────────── Arka plan çalışması ────────────────────────────
+
+def _result_path(saved_filename):
+    return os.path.join(MUTABAKAT_UPLOAD_DIR, f"{saved_filename}.sonuc.json")
+
+
+def _save_result(path, sonuc):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(sonuc, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)   # yarım dosya okunmasın
+
+
+def _load_result(run):
+    if not run or run.status != 'completed' or not run.result_path or not os.path.isfile(run.result_path):
+        return None
+    with open(run.result_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _mark_stale(run, now=None):
+    """Thread'i ölen (worker yeniden başladı) çalışmayı 'failed' işaretler."""
+    now = now or datetime.utcnow()
+    if run and run.status in ('queued', 'running') and run.updated_at and now - run.updated_at > STALE_RUN:
+        run.status = 'failed'
+        run.error_message = 'Çalışma yarıda kaldı (sunucu yeniden başlamış olabilir) — Excel\'i yeniden yükleyin'
+        run.finished_at = now
+        db.session.commit()
+    return run
+
+
+def latest_completed_run(saved_filename):
+    return (KargoMutabakatRun.query
+            .filter_by(filename=saved_filename, status='completed')
+            .order_by(KargoMutabakatRun.id.desc())
+            .first())
+
+
+def run_analysis(run_id):
+    """Çalışmayı yürütür: Excel okuma → analiz (ilerleme DB'ye) → sonuç JSON. App context içinde çağrılır."""
+    run = db.session.get(KargoMutabakatRun, run_id)
+    if run is None:
+        return None
+
+    def _progress(phase, done=None, total=None):
+        run.phase = phase
+        if phase == 'birebir' and total is not None:
+            run.total_rows = total
+        if phase == 'bulanik':
+            run.fuzzy_total, run.fuzzy_done = total or 0, done or 0
+        run.updated_at = datetime.utcnow()
+        db.session.commit()
+
+    run.status, run.phase = 'running', 'okuma'
+    db.session.commit()
+    try:
+        df = _read_invoice(os.path.join(MUTABAKAT_UPLOAD_DIR, run.filename))
+        sonuc = _analyze(df, progress=_progress)
+        path = _result_path(run.filename)
+        _save_result(path, sonuc)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Kargo mutabakat analiz hatası ({run.filename}): {e}", exc_info=True)
+        run.status, run.error_message, run.finished_at = 'failed', str(e)[:1000], datetime.utcnow()
+        db.session.commit()
+        return run
+
+    run.status, run.phase = 'completed', 'bitti'
+    run.result_path = path
+    run.candidate_count = sonuc['aday_sayisi']
+    run.matched, run.suspicious = len(sonuc['eslesen']), len(sonuc['supheli'])
+    run.missing, run.price_anomalies = len(sonuc['bizde_yok']), len(sonuc['fiyat_anomali'])
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"[KARGO-MUTABAKAT] {run.filename}: {run.total_rows} satır, {run.matched} eşleşti, "
+                f"{run.suspicious} şüpheli, {run.missing} bizde yok "
+                f"({(run.finished_at - run.started_at).total_seconds():.1f} sn)")
+    return run
+
+
+def _analysis_worker(app, run_id):
+    with app.app_context():
+        try:
+            run_analysis(run_id)
+        except Exception:
+            db.session.rollback()
+            logger.exception(f"[KARGO-MUTABAKAT] çalışma {run_id} başarısız (yutuldu)")
+
+
+def start_analysis(saved_filename, triggered_by=None):
+    """Çalışma kaydını açar ve analizi arka plan thread'inde başlatır."""
+    run = KargoMutabakatRun(filename=saved_filename, status='queued', phase='okuma', triggered_by=triggered_by)
+    db.session.add(run)
+    db.session.commit()
+    threading.Thread(
+        target=_analysis_worker, daemon=True, name=f'kargo-mutabakat-{run.id}',
+        args=(current_app._get_current_object(), run.id),
+    ).start()
+    return run
+
+
+def ensure_table_exists():
+    """kargo_mutabakat_runs yoksa oluşturur (migration yapılmamış ortam)."""
+    from sqlalchemy import inspect as sa_inspect
+    try:
+        bind = db.session.get_bind()
+        if not sa_inspect(bind).has_table(KargoMutabakatRun.__tablename__):
+            KargoMutabakatRun.__table__.create(bind=bind, checkfirst=True)
+    except Exception:
+        db.session.rollback()
+        logger.exception("[KARGO-MUTABAKAT] kargo_mutabakat_runs oluşturulamadı")
+
+
 # ──────────────────────────── Route'lar ────────────────────────────
 
 @kargo_mutabakat_bp.route('/kargo-mutabakat', methods=['GET'])
 @login_required
 @roles_required('admin')
 def kargo_mutabakat_page():
-    return render_template('kargo_mutabakat.html', tarife=_load_tarife(), sonuc=None, saved_filename=None)
+    run_id = request.args.get('run', type=int)
+    run = _mark_stale(db.session.get(KargoMutabakatRun, run_id)) if run_id else None
+    sonuc = _load_result(run)
+    if run and run.status == 'failed':
+        flash(f'Analiz hatası: {run.error_message}', 'danger')
+    return render_template('kargo_mutabakat.html', tarife=_load_tarife(), sonuc=sonuc,
+                           saved_filename=run.filename if sonuc else None, run=run)
 
 
 @kargo_mutabakat_bp.route('/kargo-mutabakat/analiz', methods=['POST'])
@@ -530,27 +634,32 @@ def kargo_mutabakat_analiz():
     f.save(save_path)
 
     try:
-        df = _read_invoice(save_path)
-        sonuc = _analyze(df)
+        run = start_analysis(saved_filename, triggered_by=session.get('username'))
     except Exception as e:
-        logger.error(f"Kargo mutabakat analiz hatası ({saved_filename}): {e}", exc_info=True)
-        flash(f'Analiz hatası: {e}', 'danger')
+        db.session.rollback()
+        logger.error(f"Kargo mutabakat başlatılamadı ({saved_filename}): {e}", exc_info=True)
+        flash(f'Analiz başlatılamadı: {e}', 'danger')
         return redirect(url_for('kargo_mutabakat_bp.kargo_mutabakat_page'))
 
     try:
         log_user_action("UPLOAD", {
-            "işlem_açıklaması": (
-                f"Kargo mutabakat analizi — {filename}: {sonuc['toplam']} satır, "
-                f"{len(sonuc['eslesen'])} eşleşti, {len(sonuc['supheli'])} şüpheli, "
-                f"{len(sonuc['bizde_yok'])} bizde yok"
-            ),
+            "işlem_açıklaması": f"Kargo mutabakat analizi başlatıldı — {filename} (çalışma #{run.id})",
             "sayfa": "Kargo Mutabakat",
         })
     except Exception:
         pass
 
-    return render_template('kargo_mutabakat.html', tarife=_load_tarife(),
-                           sonuc=sonuc, saved_filename=saved_filename)
+    return redirect(url_for('kargo_mutabakat_bp.kargo_mutabakat_page', run=run.id))
+
+
+@kargo_mutabakat_bp.route('/kargo-mutabakat/durum/<int:run_id>', methods=['GET'])
+@login_required
+@roles_required('admin')
+def kargo_mutabakat_durum(run_id):
+    run = _mark_stale(db.session.get(KargoMutabakatRun, run_id))
+    if run is None:
+        return jsonify({'success': False, 'error': 'Çalışma bulunamadı'}), 404
+    return jsonify({'success': True, 'run': run.to_dict()})
 
 
 @kargo_mutabakat_bp.route('/kargo-mutabakat/tarife', methods=['POST'])
@@ -572,25 +681,8 @@ def kargo_mutabakat_tarife():
     return redirect(url_for('kargo_mutabakat_bp.kargo_mutabakat_page'))
 
 
-@kargo_mutabakat_bp.route('/kargo-mutabakat/itiraz-excel/<filename>', methods=['GET'])
-@login_required
-@roles_required('admin')
-def kargo_mutabakat_itiraz_excel(filename):
-    # Path traversal koruması: sadece MUTABAKAT_UPLOAD_DIR içindeki kayıtlı dosyalar
-    safe_name = secure_filename(filename)
-    save_path = os.path.join(MUTABAKAT_UPLOAD_DIR, safe_name)
-    if safe_name != filename or not os.path.isfile(save_path):
-        flash('Dosya bulunamadı — lütfen Excel\'i yeniden yükleyin', 'danger')
-        return redirect(url_for('kargo_mutabakat_bp.kargo_mutabakat_page'))
-
-    try:
-        df = _read_invoice(save_path)
-        sonuc = _analyze(df)
-    except Exception as e:
-        logger.error(f"Kargo mutabakat itiraz-excel hatası ({safe_name}): {e}", exc_info=True)
-        flash(f'İtiraz listesi oluşturulamadı: {e}', 'danger')
-        return redirect(url_for('kargo_mutabakat_bp.kargo_mutabakat_page'))
-
+def _itiraz_workbook(sonuc):
+    """Bizde Yok / Şüpheli / Fiyat Anomalileri sayfalı itiraz Excel'i (BytesIO)."""
     from openpyxl import Workbook
     from openpyxl.styles import Font
 
@@ -635,8 +727,32 @@ def kargo_mutabakat_itiraz_excel(filename):
     buf = BytesIO()
     wb.save(buf)
     buf.seek(0)
+    return buf
+
+
+@kargo_mutabakat_bp.route('/kargo-mutabakat/itiraz-excel/<filename>', methods=['GET'])
+@login_required
+@roles_required('admin')
+def kargo_mutabakat_itiraz_excel(filename):
+    # Path traversal koruması: sadece MUTABAKAT_UPLOAD_DIR içindeki kayıtlı dosyalar
+    safe_name = secure_filename(filename)
+    save_path = os.path.join(MUTABAKAT_UPLOAD_DIR, safe_name)
+    if safe_name != filename or not os.path.isfile(save_path):
+        flash('Dosya bulunamadı — lütfen Excel\'i yeniden yükleyin', 'danger')
+        return redirect(url_for('kargo_mutabakat_bp.kargo_mutabakat_page'))
+
+    try:
+        # Arka plan çalışmasının sonucu varsa analiz tekrarlanmaz; yoksa (eski yükleme) burada çalışır
+        sonuc = _load_result(latest_completed_run(safe_name))
+        if sonuc is None:
+            sonuc = _analyze(_read_invoice(save_path))
+    except Exception as e:
+        logger.error(f"Kargo mutabakat itiraz-excel hatası ({safe_name}): {e}", exc_info=True)
+        flash(f'İtiraz listesi oluşturulamadı: {e}', 'danger')
+        return redirect(url_for('kargo_mutabakat_bp.kargo_mutabakat_page'))
+
     return send_file(
-        buf,
+        _itiraz_workbook(sonuc),
         as_attachment=True,
         download_name=f"itiraz_listesi_{datetime.now().strftime('%Y%m%d')}.xlsx",
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
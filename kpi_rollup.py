@@ -0,0 +1,365 @@
+"""Ana sayfa / kâr raporu / agent dashboard için günlük KPI özeti (``kpi_daily``).
+
+SORUN
+-----
+``home.index`` her açılışta ayın (ve ayrıca bugünün) tüm siparişlerini beş
+statü tablosundan tam ORM satırı olarak yükleyip ``details`` JSON'unu
+Python'da yeniden çözüyordu. ``profit.profit_report`` aralığın tüm
+siparişlerini + barkod/model maliyet eşlemelerini tarıyor, agent
+``/dashboard`` statü tablolarını ``COUNT(*)`` ile sayıyordu. Ay ilerledikçe
+ana sayfa açılışı siparişlerle doğru orantılı yavaşlıyordu.
+
+ÇÖZÜM
+-----
+- ``kpi_daily``: (kaynak, İstanbul günü) başına tek satır — sipariş, adet,
+  brüt/indirim/net ciro, komisyon, üretim maliyeti (USD), iade ve iptal adedi.
+  Gün hesabı ana sayfanın birleşik mantığıyla aynıdır: order_number başına tek
+  satır (Delivered > Shipped > Picking > Hazirlaniyor > Created), net ciro ve
+  adet ``home._monthly_aov_from_unified_rows`` ile.
+- Artımlı: ``refresh_touched`` ``daily_sales`` artımlısıyla aynı yolu izler —
+  son yenilemeden (örtüşme payıyla) beri ``updated_at``'i değişen siparişlerin
+  ve iade tarihi ya da ``updated_at``'i o andan sonra olan iadelerin (geç
+  gelen / sonradan düzenlenen iade) günlerini yeniden hesaplar; ``updated_at``
+  kolonları indekslidir.
+  Filigran ``platform_configs.kpi_rollup.extra_config``'te ayrıca tutulur;
+  ``computed_at`` okuma yolunda da ilerlediği için filigran olamaz.
+  ``rebuild_days`` son N günü baştan kurar (gece; silinen/arşivlenen siparişler
+  ve maliyet değişiklikleri böylece yansır).
+- Okuma: ``range_totals`` aralığın satırlarını toplar; eksik geçmiş günleri
+  anında hesaplayıp isteğin session'ından bağımsız kendi transaction'ında
+  yazar (isteğin bekleyen durumu commit'lenmez), BUGÜN'ü her zaman canlı
+  hesaplar ve yazmaz — bugünün satırı zamanlanmış job'a aittir.
+  Aylık değer = günlük satırların toplamı (ayrı tablo yok).
+
+Not: barkod bazında "net > 0" filtresi ana sayfada ay üzerinden, burada gün
+üzerinden uygulanır; yalnız negatif netli (iade düzeltmesi vb.) barkodlarda
+kuruş düzeyinde fark çıkabilir.
+
+Tablo hazır değilse okuyucular eski (tam tarama) yoluna düşer.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, inspect as sa_inspect, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from home import _monthly_aov_from_unified_rows
+from models import (
+    db, KpiDaily, PlatformConfig, OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped,
+    OrderDelivered, OrderCancelled, ReturnOrder, Product, ModelMaliyet, ModelDirekMaliyet,
+)
+from time_utils import ist_to_utc, to_ist
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TRENDYOL = "trendyol"
+
+# Öncelik sırası: aynı sipariş birden çok tabloda görünürse ilk gelen kazanır
+PRIORITY_TABLES = (OrderDelivered, OrderShipped, OrderPicking, OrderHazirlaniyor, OrderCreated)
+TOUCH_TABLES = PRIORITY_TABLES + (OrderCancelled,)
+# Commit'i okuma anından sonra görünen satırlar kaçmasın diye watermark geriye kaydırılır
+TOUCH_OVERLAP = timedelta(minutes=5)
+WATERMARK_PLATFORM = "kpi_rollup"
+COMPUTE_CHUNK_DAYS = 7
+
+INT_FIELDS = ("orders", "units", "returns", "cancelled")
+MONEY_FIELDS = ("gross", "discount", "net", "commission", "cost_usd")
+
+_ORDER_FIELDS = ("order_number", "order_date", "amount", "discount", "commission",
+                 "details", "product_barcode")
+
+_ready_urls: set[str] = set()
+
+
+def is_ready(sess=None) -> bool:
+    sess = sess or db.session
+    return str(sess.get_bind().url) in _ready_urls
+
+
+def _mark_ready(sess) -> None:
+    _ready_urls.add(str(sess.get_bind().url))
+
+
+def rebuild_window_days() -> int:
+    try:
+        return max(1, int(os.environ.get("KPI_REBUILD_DAYS", 45)))
+    except ValueError:
+        return 45
+
+
+def today_ist() -> date:
+    return to_ist(datetime.utcnow()).date()
+
+
+def _day_start_utc(day: date) -> datetime:
+    return ist_to_utc(datetime.combine(day, time.min))
+
+
+def _day_of(ts) -> date | None:
+    local = to_ist(ts)
+    return local.date() if local else None
+
+
+def _empty() -> dict:
+    return {**{f: 0 for f in INT_FIELDS}, **{f: 0.0 for f in MONEY_FIELDS}}
+
+
+# ---------------------------------------------------------------------------
+# Gün hesabı
+# ---------------------------------------------------------------------------
+def _model_costs_usd() -> dict[str, float]:
+    """model_id → USD üretim maliyeti (kâr raporuyla aynı: direkt > kalem toplamı)."""
+    costs = {}
+    for model_id, deger in db.session.query(ModelDirekMaliyet.model_id, ModelDirekMaliyet.deger):
+        if deger and deger > 0:
+            costs[model_id] = float(deger)
+    kalem = (db.session.query(ModelMaliyet.model_id, func.sum(ModelMaliyet.deger))
+             .group_by(ModelMaliyet.model_id))
+    for model_id, toplam in kalem:
+        if model_id not in costs and toplam and toplam > 0:
+            costs[model_id] = float(toplam)
+    return costs
+
+
+def _split_barcodes(raw) -> list[str]:
+    return [b.strip() for b in (raw or "").split(",") if b.strip()]
+
+
+def compute_days(days) -> dict[date, dict]:
+    """Verilen İstanbul günlerinin KPI'larını kaynak tablolardan hesaplar (yazmaz)."""
+    days = set(days)
+    if not days:
+        return {}
+    start_utc = _day_start_utc(min(days))
+    end_utc = _day_start_utc(max(days) + timedelta(days=1))
+
+    # order_number başına tek satır (öncelik sırasıyla), güne göre kovalanır
+    best: dict[str, object] = {}
+    for model in PRIORITY_TABLES:
+        q = (db.session.query(*(getattr(model, f) for f in _ORDER_FIELDS))
+             .filter(model.order_date >= start_utc, model.order_date < end_utc))
+        for r in q:
+            if r.order_number and r.order_number not in best:
+                best[r.order_number] = r
+    by_day: dict[date, dict] = {d: {} for d in days}
+    for number, r in best.items():
+        d = _day_of(r.order_date)
+        if d in by_day:
+            by_day[d][number] = r
+
+    barcodes = {bc for r in best.values() for bc in _split_barcodes(r.product_barcode)}
+    barcode_model = {}
+    if barcodes:
+        for bc, mid in (db.session.query(Product.barcode, Product.product_main_id)
+                        .filter(Product.barcode.in_(list(barcodes)))):
+            if bc and mid:
+                barcode_model[bc.strip()] = mid.strip()
+    model_costs = _model_costs_usd() if barcode_model else {}
+
+    result = {d: _empty() for d in days}
+    for d, rows in by_day.items():
+        k = result[d]
+        k["orders"] = len(rows)
+        for r in rows.values():
+            k["gross"] += float(r.amount or 0)
+            k["discount"] += float(r.discount or 0)
+            k["commission"] += float(r.commission or 0)
+            # Kâr raporundaki gibi: sipariş başına her model bir kez
+            models = {barcode_model.get(bc) for bc in _split_barcodes(r.product_barcode)} - {None}
+            k["cost_usd"] += sum(model_costs.get(m, 0.0) for m in models)
+        _, k["net"], k["units"] = _monthly_aov_from_unified_rows(rows)
+
+    cancelled = (db.session.query(OrderCancelled.order_number, OrderCancelled.order_date)
+                 .filter(OrderCancelled.order_date >= start_utc, OrderCancelled.order_date < end_utc))
+    returned = (db.session.query(ReturnOrder.order_number, ReturnOrder.return_date)
+                .filter(ReturnOrder.return_date >= start_utc, ReturnOrder.return_date < end_utc))
+    for field, q in (("cancelled", cancelled), ("returns", returned)):
+        seen: dict[date, set] = {}
+        for number, ts in q:
+            d = _day_of(ts)
+            if d in result and number:
+                seen.setdefault(d, set()).add(number)
+        for d, numbers in seen.items():
+            result[d][field] = len(numbers)
+
+    for k in result.values():
+        for f in MONEY_FIELDS:
+            k[f] = round(k[f], 2)
+    return result
+
+
+def _compute_chunked(days) -> dict[date, dict]:
+    # Ardışık günler en çok haftalık dilimlerle: aradaki boşluk günleri taranmaz,
+    # uzun aralıkta details JSON'ları aynı anda bellekte tutulmaz
+    result, chunk = {}, []
+    for d in sorted(set(days)):
+        if chunk and (d - chunk[-1] > timedelta(days=1) or len(chunk) >= COMPUTE_CHUNK_DAYS):
+            result.update(compute_days(chunk))
+            chunk = []
+        chunk.append(d)
+    result.update(compute_days(chunk))
+    return result
+
+
+def write_days(results: dict[date, dict], source: str = SOURCE_TRENDYOL,
+               computed_at: datetime | None = None, conn=None) -> int:
+    """Günlerin satırlarını toplu sil + toplu yaz (commit çağırana ait).
+
+    ``conn`` verilmezse ``db.session`` üzerinden yazılır.
+    """
+    if not results:
+        return 0
+    conn = conn if conn is not None else db.session
+    computed_at = computed_at or datetime.utcnow()
+    table = KpiDaily.__table__
+    days = sorted(results)
+    conn.execute(table.delete().where(table.c.source == source, table.c.day.in_(days)))
+    conn.execute(table.insert(), [
+        {"source": source, "day": d, "computed_at": computed_at, **results[d]} for d in days
+    ])
+    return len(days)
+
+
+# ---------------------------------------------------------------------------
+# Artımlı + tam yeniden kurma
+# ---------------------------------------------------------------------------
+def rebuild_days(days: int | None = None, commit: bool = True) -> dict:
+    """Son ``days`` İstanbul gününü (bugün dahil) baştan hesaplar."""
+    days = days or rebuild_window_days()
+    started = datetime.utcnow()
+    today = today_ist()
+    written = write_days(_compute_chunked(today - timedelta(days=i) for i in range(days)),
+                         computed_at=started)
+    _save_watermark(SOURCE_TRENDYOL, started)
+    if commit:
+        db.session.commit()
+    _mark_ready(db.session)
+    logger.info(f"[KPI] son {days} gün yeniden kuruldu ({written} satır)")
+    return {"days": written}
+
+
+def touched_days(since_utc: datetime) -> set[date]:
+    """since_utc'den beri değişen siparişlerin / iadelerin İstanbul günleri."""
+    days = set()
+    for model in TOUCH_TABLES:
+        q = db.session.query(model.order_date).distinct().filter(model.updated_at >= since_utc)
+        days.update(_day_of(ts) for (ts,) in q if ts)
+    q = (db.session.query(ReturnOrder.return_date).distinct()
+         .filter(or_(ReturnOrder.return_date >= since_utc, ReturnOrder.updated_at >= since_utc)))
+    days.update(_day_of(ts) for (ts,) in q if ts)
+    today = today_ist()
+    return {d for d in days if d <= today}
+
+
+def _load_watermark(source: str) -> datetime | None:
+    cfg = PlatformConfig.query.filter_by(platform=WATERMARK_PLATFORM).first()
+    value = (cfg.extra_config or {}).get(source) if cfg else None
+    return datetime.fromisoformat(value) if value else None
+
+
+def _save_watermark(source: str, started: datetime) -> None:
+    """Yenilemenin başladığı an (commit çağırana ait)."""
+    cfg = PlatformConfig.query.filter_by(platform=WATERMARK_PLATFORM).first()
+    if not cfg:
+        cfg = PlatformConfig(platform=WATERMARK_PLATFORM, is_active=True)
+        db.session.add(cfg)
+    extra = dict(cfg.extra_config or {})
+    extra[source] = started.isoformat()
+    cfg.extra_config = extra  # JSON kolonu: yeni dict ata ki değişiklik algılansın
+
+
+def refresh_touched(source: str = SOURCE_TRENDYOL) -> dict:
+    """Son yenilemeden beri dokunulan günleri yeniden yazar; ilk çalışmada tam kurar."""
+    watermark = _load_watermark(source)
+    if watermark is None:
+        return rebuild_days()
+    started = datetime.utcnow()
+    days = touched_days(watermark - TOUCH_OVERLAP)
+    written = write_days(_compute_chunked(days), source, computed_at=started)
+    _save_watermark(source, started)
+    db.session.commit()
+    if written:
+        logger.info(f"[KPI] {written} gün güncellendi: {min(days)} … {max(days)}")
+    return {"days": written}
+
+
+# ---------------------------------------------------------------------------
+# Okuma
+# ---------------------------------------------------------------------------
+def day_rows(start: date, end: date, source: str = SOURCE_TRENDYOL) -> dict[date, dict]:
+    """[start, end] (dahil) günlerinin KPI'ları; eksik günler ve BUGÜN anında hesaplanır.
+
+    Yalnız eksik geçmiş günler yazılır, o da ayrı bir bağlantıda: isteğin
+    session'ı commit edilmez, bugünü okuyan sayfa açılışı yazma yapmaz.
+    """
+    today = today_ist()
+    end = min(end, today)
+    if end < start:
+        return {}
+    rows = {
+        r.day: {f: getattr(r, f) for f in INT_FIELDS + MONEY_FIELDS}
+        for r in KpiDaily.query.filter(KpiDaily.source == source,
+                                       KpiDaily.day >= start, KpiDaily.day <= end)
+    }
+    wanted = {start + timedelta(days=i) for i in range((end - start).days + 1)}
+    stale = (wanted - set(rows)) | ({today} & wanted)
+    if stale:
+        fresh = _compute_chunked(stale)
+        rows.update(fresh)
+        missing = {d: k for d, k in fresh.items() if d != today}
+        if missing:
+            try:
+                with db.engine.begin() as conn:
+                    write_days(missing, source, conn=conn)
+            except SQLAlchemyError:
+                # Eşzamanlı yazan (job / başka istek) aynı günü yazmış olabilir; değerler zaten elde
+                logger.debug("[KPI] eksik günler yazılamadı", exc_info=True)
+    return rows
+
+
+def sum_rows(rows) -> dict:
+    """Gün KPI'larının toplamı + adet başı ortalama net (``avg_unit_net``)."""
+    totals = _empty()
+    for k in rows:
+        for f in INT_FIELDS + MONEY_FIELDS:
+            totals[f] += k[f] or 0
+    for f in MONEY_FIELDS:
+        totals[f] = round(totals[f], 2)
+    totals["avg_unit_net"] = round(totals["net"] / totals["units"], 2) if totals["units"] else 0.0
+    return totals
+
+
+def range_totals(start: date, end: date, source: str = SOURCE_TRENDYOL) -> dict:
+    """[start, end] (dahil) aralığının toplamları."""
+    return sum_rows(day_rows(start, end, source).values())
+
+
+def month_bounds(day: date) -> tuple[date, date]:
+    first = day.replace(day=1)
+    nxt = date(first.year + (first.month == 12), first.month % 12 + 1, 1)
+    return first, nxt - timedelta(days=1)
+
+
+def month_and_day_totals(day: date | None = None, source: str = SOURCE_TRENDYOL) -> tuple[dict, dict]:
+    """(günün ayı, gün) toplamları — tek okuma; bugün bir kez canlı hesaplanır."""
+    day = day or today_ist()
+    rows = day_rows(*month_bounds(day), source=source)
+    return sum_rows(rows.values()), sum_rows([rows[day]] if day in rows else [])
+
+
+# ---------------------------------------------------------------------------
+# Tablo garantisi
+# ---------------------------------------------------------------------------
+def ensure_table_exists() -> None:
+    """Tablo yoksa oluşturur ve okumayı etkinleştirir; eksik günler ilk okumada dolar."""
+    try:
+        bind = db.session.get_bind()
+        if not sa_inspect(bind).has_table(KpiDaily.__tablename__):
+            KpiDaily.__table__.create(bind=bind, checkfirst=True)
+        _mark_ready(db.session)
+    except Exception:
+        db.session.rollback()
+        logger.exception("[KPI] kpi_daily hazırlanamadı (tam tarama yoluna düşülür)")
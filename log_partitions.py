@@ -0,0 +1,320 @@
+"""order_audit_logs / user_logs için aylık bölümleme (partition) + saklama/arşiv.
+
+SORUN
+-----
+``OrderAuditLog`` her statü değişimi / toplama / paketleme adımında, ``UserLog``
+her istekte bir satır alıyor. İki tablo da tek parça ve sınırsız büyüyordu;
+üç-dört B-tree indeksinin her insert'teki maliyeti ve indeks şişmesi zamanla
+artıyor, eski satırları silmek de tabloyu kilitleyen dev DELETE'ler demekti.
+
+ÇÖZÜM
+-----
+- PostgreSQL: ``partition_audit_and_user_logs`` migration'ı iki tabloyu zaman
+  kolonunda aylık RANGE bölümlü tabloya çevirir (mevcut veri tek
+  ``<tablo>_legacy`` bölümüne bağlanır, bir de DEFAULT bölüm). Bileşik
+  indekslerin kapsadığı tek kolonlu audit indeksleri kaldırılır.
+- ``ensure_partitions``: önümüzdeki ``PRECREATE_MONTHS`` ayın bölümlerini önceden
+  açar (açılışta + gece job'ında).
+- ``archive_expired``: saklama süresinden (``AUDIT_LOG_RETENTION_MONTHS`` = 12,
+  ``USER_LOG_RETENTION_MONTHS`` = 6) tamamen eski kalan bölümleri DETACH eder,
+  ``COPY`` ile ``LOG_ARCHIVE_DIR/<tablo>/<bölüm>.csv.gz``'ye yazar ve DROP eder.
+  Kısmen eski bölümlerde (legacy/default) ve bölümlenmemiş tablolarda (sqlite,
+  migration çalışmamış ortam) eski satırlar ay ay gzip CSV'ye yazılıp parça
+  parça silinir — aynı saklama politikası, kayan tablo şeklinde.
+- ``retention_floor``: okuma sorguları bu alt sınırı taşır → partition pruning
+  yalnız ilgili ayları tarar.
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from sqlalchemy import func, select, text
+
+logger = logging.getLogger(__name__)
+
+PRECREATE_MONTHS = 2
+ARCHIVE_CHUNK_SIZE = 5000
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_archive")
+
+
+@dataclass(frozen=True)
+class LogTable:
+    name: str
+    column: str
+    retention_env: str
+    default_retention: int
+
+    def table(self):
+        from models import OrderAuditLog, UserLog
+        return {m.__tablename__: m for m in (OrderAuditLog, UserLog)}[self.name].__table__
+
+
+TABLES = (
+    LogTable("order_audit_logs", "ts", "AUDIT_LOG_RETENTION_MONTHS", 12),
+    LogTable("user_logs", "timestamp", "USER_LOG_RETENTION_MONTHS", 6),
+)
+_BY_NAME = {t.name: t for t in TABLES}
+
+
+# ---------------------------------------------------------------------------
+# Tarih yardımcıları (naive UTC)
+# ---------------------------------------------------------------------------
+def month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+def add_months(dt: datetime, n: int) -> datetime:
+    idx = dt.year * 12 + dt.month - 1 + n
+    return datetime(idx // 12, idx % 12 + 1, 1)
+
+
+def retention_months(spec: LogTable) -> int:
+    try:
+        return max(1, int(os.environ.get(spec.retention_env, spec.default_retention)))
+    except (TypeError, ValueError):
+        return spec.default_retention
+
+
+def retention_floor(table_name: str, now: datetime | None = None) -> datetime:
+    """Saklanan en eski ay başı; bundan eski satırlar arşivdedir."""
+    spec = _BY_NAME[table_name]
+    return add_months(month_start(now or datetime.utcnow()), -retention_months(spec))
+
+
+def archive_dir() -> str:
+    return os.environ.get("LOG_ARCHIVE_DIR") or DEFAULT_ARCHIVE_DIR
+
+
+def partition_name(table_name: str, month: datetime) -> str:
+    return f"{table_name}_y{month.year}m{month.month:02d}"
+
+
+# ---------------------------------------------------------------------------
+# PostgreSQL katalog sorguları
+# ---------------------------------------------------------------------------
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def _bound(raw: str) -> datetime | None:
+    raw = raw.strip()
+    if raw in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(raw.strip("'")[:19])
+
+
+def is_partitioned(conn, table_name: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = :t AND n.nspname = current_schema()"), {"t": table_name}).scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn, table_name: str) -> list[dict]:
+    """``[{"name", "lower", "upper", "default"}]`` — MINVALUE/MAXVALUE → None."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE p.relname = :t AND n.nspname = current_schema() ORDER BY c.relname"),
+        {"t": table_name}).fetchall()
+    out = []
+    for name, expr in rows:
+        m = _BOUND_RE.search(expr or "")
+        out.append({
+            "name": name,
+            "lower": _bound(m.group(1)) if m else None,
+            "upper": _bound(m.group(2)) if m else None,
+            "default": not m,
+        })
+    return out
+
+
+def _detached_orphans(conn, table_name: str) -> list[str]:
+    """DETACH edilmiş ama arşivlenip DROP edilememiş (yarıda kalmış) aylık bölümler."""
+    return list(conn.execute(text(
+        "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = current_schema() AND c.relkind = 'r' AND NOT c.relispartition "
+        "AND c.relname ~ :pat ORDER BY c.relname"),
+        {"pat": f"^{table_name}_y[0-9]{{4}}m[0-9]{{2}}$"}).scalars())
+
+
+def _engine(engine):
+    if engine is not None:
+        return engine
+    from models import db
+    return db.engine
+
+
+# ---------------------------------------------------------------------------
+# Bölüm açma
+# ---------------------------------------------------------------------------
+def ensure_partitions(engine=None, now: datetime | None = None,
+                      months_ahead: int = PRECREATE_MONTHS) -> list[str]:
+    """Bölümlü tablolarda bu ay + ``months_ahead`` ayın bölümlerini açar."""
+    engine = _engine(engine)
+    now = now or datetime.utcnow()
+    created = []
+    for spec in TABLES:
+        with engine.begin() as conn:
+            if not is_partitioned(conn, spec.name):
+                continue
+            existing = list_partitions(conn, spec.name)
+        for i in range(months_ahead + 1):
+            lo = add_months(month_start(now), i)
+            hi = add_months(lo, 1)
+            if any(not p["default"]
+                   and (p["lower"] is None or p["lower"] < hi)
+                   and (p["upper"] is None or p["upper"] > lo) for p in existing):
+                continue
+            name = partition_name(spec.name, lo)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {spec.name} "
+                        f"FOR VALUES FROM ('{lo.isoformat(sep=' ')}') TO ('{hi.isoformat(sep=' ')}')"))
+                created.append(name)
+            except Exception:
+                # Genelde DEFAULT bölümde bu aya düşmüş satır varsa olur
+                logger.exception(f"[LOG-PART] {name} açılamadı")
+    if created:
+        logger.info(f"[LOG-PART] yeni bölümler: {', '.join(created)}")
+    return created
+
+
+# ---------------------------------------------------------------------------
+# Arşiv + saklama
+# ---------------------------------------------------------------------------
+def _archive_path(table_name: str, stem: str) -> str:
+    folder = os.path.join(archive_dir(), table_name)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{stem}.csv.gz")
+    if os.path.exists(path):  # aynı ay ikinci kez (legacy/default artığı)
+        path = os.path.join(folder, f"{stem}-{datetime.utcnow():%Y%m%d%H%M%S}.csv.gz")
+    return path
+
+
+def _csv_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return value
+
+
+def _archive_partition(engine, spec: LogTable, name: str, detach: bool = True) -> str:
+    """Bölümü ayır → COPY ile gzip CSV → DROP. Dosya tamamlanmadan DROP yok."""
+    if detach:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {spec.name} DETACH PARTITION {name}"))
+    path = _archive_path(spec.name, name)
+    tmp = path + ".tmp"
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        with gzip.open(tmp, "wb") as f:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", f)
+        cursor.close()
+        raw.commit()
+    finally:
+        raw.close()
+    os.replace(tmp, path)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {name}"))
+    logger.info(f"[LOG-PART] {name} arşivlendi → {path}")
+    return path
+
+
+def _archive_rows(engine, spec: LogTable, cutoff: datetime) -> int:
+    """``cutoff``'tan eski satırları ay ay gzip CSV'ye yazıp parça parça siler."""
+    table = spec.table()
+    col, pk = table.c[spec.column], table.c.id
+    with engine.connect() as conn:
+        oldest = conn.execute(select(func.min(col)).where(col < cutoff)).scalar()
+    if oldest is None:
+        return 0
+
+    total = 0
+    month = month_start(oldest)
+    while month < cutoff:
+        hi = min(add_months(month, 1), cutoff)
+        in_month = (col >= month) & (col < hi)
+        path, count = _archive_path(spec.name, f"{partition_name(spec.name, month)}_rows"), 0
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", newline="") as f, engine.connect() as conn:
+            writer = csv.writer(f)
+            writer.writerow([c.name for c in table.columns])
+            result = conn.execution_options(stream_results=True).execute(
+                select(table).where(in_month).order_by(pk))
+            while True:
+                chunk = result.fetchmany(ARCHIVE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.writerows([[_csv_value(v) for v in row] for row in chunk])
+                count += len(chunk)
+        if count:
+            os.replace(tmp, path)
+            while True:
+                with engine.begin() as conn:
+                    ids = conn.execute(select(pk).where(in_month).limit(ARCHIVE_CHUNK_SIZE)).scalars().all()
+                    if not ids:
+                        break
+                    conn.execute(table.delete().where(pk.in_(ids)))
+            logger.info(f"[LOG-PART] {spec.name} {month:%Y-%m}: {count} satır arşivlendi → {path}")
+        else:
+            os.remove(tmp)
+        total += count
+        month = hi
+    return total
+
+
+def archive_expired(engine=None, now: datetime | None = None) -> dict:
+    """Saklama süresi dolan audit / kullanıcı loglarını arşivleyip DB'den kaldırır.
+
+    Returns:
+        ``{tablo: {"partitions": [...], "rows": n, "cutoff": iso}}``
+    """
+    engine = _engine(engine)
+    out = {}
+    for spec in TABLES:
+        cutoff = retention_floor(spec.name, now)
+        archived = []
+        with engine.connect() as conn:
+            partitioned = is_partitioned(conn, spec.name)
+            parts = list_partitions(conn, spec.name) if partitioned else []
+            orphans = _detached_orphans(conn, spec.name) if conn.dialect.name == "postgresql" else []
+        for name in orphans:
+            try:
+                archived.append(_archive_partition(engine, spec, name, detach=False))
+            except Exception:
+                logger.exception(f"[LOG-PART] yarım kalmış {name} arşivlenemedi")
+        for p in parts:
+            if p["default"] or p["upper"] is None or p["upper"] > cutoff:
+                continue
+            try:
+                archived.append(_archive_partition(engine, spec, p["name"]))
+            except Exception:
+                logger.exception(f"[LOG-PART] {p['name']} arşivlenemedi")
+        try:
+            rows = _archive_rows(engine, spec, cutoff)
+        except Exception:
+            logger.exception(f"[LOG-PART] {spec.name} satır arşivi başarısız")
+            rows = 0
+        out[spec.name] = {"partitions": archived, "rows": rows, "cutoff": cutoff.isoformat()}
+    return out
+
+
+def run_maintenance(engine=None, now: datetime | None = None) -> dict:
+    """Gece job'ı: gelecek ayların bölümleri + saklama/arşiv."""
+    created = ensure_partitions(engine, now)
+    return {"created": created, "archived": archive_expired(engine, now)}
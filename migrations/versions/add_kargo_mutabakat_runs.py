@@ -0,0 +1,50 @@
+"""Add kargo_mutabakat_runs (arka plan kargo fatura mutabakatı)
+
+Revision ID: add_kargo_mutabakat_runs
+Revises: add_sync_batch_requests
+Create Date: 2026-10-18
+
+Additive — yalnız yeni tablo; mevcut sipariş tablolarına dokunmaz.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_kargo_mutabakat_runs'
+down_revision = 'add_sync_batch_requests'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if 'kargo_mutabakat_runs' in insp.get_table_names():
+        return
+    op.create_table(
+        'kargo_mutabakat_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('phase', sa.String(length=32), nullable=True),
+        sa.Column('triggered_by', sa.String(length=100), nullable=True),
+        sa.Column('total_rows', sa.Integer(), nullable=False),
+        sa.Column('fuzzy_total', sa.Integer(), nullable=False),
+        sa.Column('fuzzy_done', sa.Integer(), nullable=False),
+        sa.Column('candidate_count', sa.Integer(), nullable=False),
+        sa.Column('matched', sa.Integer(), nullable=False),
+        sa.Column('suspicious', sa.Integer(), nullable=False),
+        sa.Column('missing', sa.Integer(), nullable=False),
+        sa.Column('price_anomalies', sa.Integer(), nullable=False),
+        sa.Column('result_path', sa.String(length=500), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_kargo_mutabakat_runs_filename', 'kargo_mutabakat_runs', ['filename'])
+
+
+def downgrade():
+    op.drop_index('ix_kargo_mutabakat_runs_filename', table_name='kargo_mutabakat_runs')
+    op.drop_table('kargo_mutabakat_runs')
@@ -0,0 +1,43 @@
+"""Add kpi_daily table (ana sayfa / kâr raporu / agent dashboard günlük KPI özeti)
+
+Revision ID: add_kpi_daily
+Revises: partition_audit_and_user_logs
+Create Date: 2026-10-18
+
+Additive — sipariş tablolarına dokunmaz. Tablo boş oluşturulur; eksik günler
+ilk okumada, son N gün gece job'ında (kpi_rollup.rebuild_days) doldurulur.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_kpi_daily'
+down_revision = 'partition_audit_and_user_logs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if 'kpi_daily' in insp.get_table_names():
+        return
+    op.create_table(
+        'kpi_daily',
+        sa.Column('source', sa.String(length=16), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('gross', sa.Float(), nullable=False),
+        sa.Column('discount', sa.Float(), nullable=False),
+        sa.Column('net', sa.Float(), nullable=False),
+        sa.Column('commission', sa.Float(), nullable=False),
+        sa.Column('cost_usd', sa.Float(), nullable=False),
+        sa.Column('returns', sa.Integer(), nullable=False),
+        sa.Column('cancelled', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('source', 'day'),
+    )
+
+
+def downgrade():
+    op.drop_table('kpi_daily')
@@ -0,0 +1,57 @@
+"""Add order_search_index table (sipariş listesi arama + keyset sayfalama)
+
+Revision ID: add_order_search_index
+Revises: add_sync_session_summary
+Create Date: 2026-10-18
+
+Additive — statü tablolarına dokunmaz. Tablo boş oluşturulur; uygulama
+açılışta (order_search.ensure_table_exists) boş görürse doldurur. PostgreSQL'de
+search_text için pg_trgm GIN indeksi eklenir (ILIKE '%q%' aramaları).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_order_search_index'
+down_revision = 'add_sync_session_summary'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if 'order_search_index' not in insp.get_table_names():
+        op.create_table(
+            'order_search_index',
+            sa.Column('order_number', sa.String(), nullable=False),
+            sa.Column('status', sa.String(length=16), nullable=False),
+            sa.Column('customer_name', sa.String(), nullable=True),
+            sa.Column('customer_surname', sa.String(), nullable=True),
+            sa.Column('barcodes', sa.Text(), nullable=True),
+            sa.Column('skus', sa.Text(), nullable=True),
+            sa.Column('search_text', sa.Text(), nullable=False),
+            sa.Column('order_date', sa.DateTime(), nullable=True),
+            sa.Column('deadline_min', sa.DateTime(), nullable=True),
+            sa.Column('deadline_max', sa.DateTime(), nullable=True),
+            sa.Column('sort_date', sa.DateTime(), nullable=False),
+            sa.Column('sort_deadline_asc', sa.DateTime(), nullable=False),
+            sa.Column('sort_deadline_desc', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('order_number'),
+        )
+        op.create_index('ix_osi_date', 'order_search_index', ['sort_date', 'order_number'])
+        op.create_index('ix_osi_deadline_asc', 'order_search_index',
+                        ['sort_deadline_asc', 'sort_date', 'order_number'])
+        op.create_index('ix_osi_deadline_desc', 'order_search_index',
+                        ['sort_deadline_desc', 'sort_date', 'order_number'])
+        op.create_index('ix_osi_status', 'order_search_index', ['status'])
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_osi_search_trgm ON order_search_index "
+                   "USING gin (search_text gin_trgm_ops)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_osi_search_trgm")
+    op.drop_table('order_search_index')
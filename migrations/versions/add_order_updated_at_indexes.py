@@ -0,0 +1,41 @@
+"""Index updated_at on order status tables; add return_orders.updated_at
+
+Revision ID: add_order_updated_at_indexes
+Revises: add_sync_batch_items
+Create Date: 2026-10-18
+
+kpi_rollup.touched_days her 5 dakikada statü tablolarını ``updated_at >= t``
+ile süzüyor; indeks olmadan her çalışma tam tablo taraması. İadelerde
+değişiklik izi yoktu (yalnız return_date) — geç gelen / düzenlenen iade
+kaçıyordu; return_orders.updated_at eklenir (mevcut satırlar NULL kalır).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_order_updated_at_indexes'
+down_revision = 'add_sync_batch_items'
+branch_labels = None
+depends_on = None
+
+ORDER_TABLES = (
+    'orders_created', 'orders_hazirlaniyor', 'orders_picking', 'orders_shipped',
+    'orders_delivered', 'orders_cancelled', 'orders_archived', 'orders_ready_to_ship',
+)
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    tables = set(insp.get_table_names())
+    if 'return_orders' in tables and 'updated_at' not in {
+            c['name'] for c in insp.get_columns('return_orders')}:
+        op.add_column('return_orders', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    for table in ORDER_TABLES + ('return_orders',):
+        if table in tables:
+            op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)")
+
+
+def downgrade():
+    for table in ORDER_TABLES + ('return_orders',):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_updated_at")
+    op.drop_column('return_orders', 'updated_at')
@@ -0,0 +1,58 @@
+"""Add product_import_runs + product_import_hashes (akışlı Trendyol katalog içe aktarma)
+
+Revision ID: add_product_import_state
+Revises: add_product_model_summary
+Create Date: 2026-10-18
+
+Additive — products tablosuna dokunmaz. Hash tablosu boş başlar; ilk
+çalışmada tüm satırlar "değişmiş" sayılıp yazılır, sonrakiler yalnız farkı yazar.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_import_state'
+down_revision = 'add_product_model_summary'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    tables = insp.get_table_names()
+    if 'product_import_runs' not in tables:
+        op.create_table(
+            'product_import_runs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(length=16), nullable=False),
+            sa.Column('triggered_by', sa.String(length=100), nullable=True),
+            sa.Column('total_pages', sa.Integer(), nullable=True),
+            sa.Column('last_page', sa.Integer(), nullable=False),
+            sa.Column('fetched', sa.Integer(), nullable=False),
+            sa.Column('changed', sa.Integer(), nullable=False),
+            sa.Column('unchanged', sa.Integer(), nullable=False),
+            sa.Column('skipped', sa.Integer(), nullable=False),
+            sa.Column('deleted', sa.Integer(), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('error_message', sa.Text(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'product_import_hashes' not in tables:
+        op.create_table(
+            'product_import_hashes',
+            sa.Column('barcode', sa.String(), nullable=False),
+            sa.Column('content_hash', sa.String(length=40), nullable=False),
+            sa.Column('seen_run', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('barcode'),
+        )
+        op.create_index('ix_product_import_hashes_seen_run', 'product_import_hashes', ['seen_run'])
+
+
+def downgrade():
+    op.drop_index('ix_product_import_hashes_seen_run', table_name='product_import_hashes')
+    op.drop_table('product_import_hashes')
+    op.drop_table('product_import_runs')
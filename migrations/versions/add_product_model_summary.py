@@ -0,0 +1,47 @@
+"""Add product_model_summary table (ürün listesi model özeti)
+
+Revision ID: add_product_model_summary
+Revises: add_kpi_daily
+Create Date: 2026-10-18
+
+Additive — products tablosuna dokunmaz. Tablo boş oluşturulur; uygulama
+açılışında product_summary.ensure_table_exists tüm modellerden doldurur.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_model_summary'
+down_revision = 'add_kpi_daily'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if 'product_model_summary' in insp.get_table_names():
+        return
+    op.create_table(
+        'product_model_summary',
+        sa.Column('model_id', sa.String(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('image', sa.String(), nullable=True),
+        sa.Column('colors', sa.Text(), nullable=False),
+        sa.Column('sizes', sa.Text(), nullable=False),
+        sa.Column('variant_count', sa.Integer(), nullable=False),
+        sa.Column('total_stock', sa.Integer(), nullable=False),
+        sa.Column('min_price', sa.Float(), nullable=True),
+        sa.Column('max_price', sa.Float(), nullable=True),
+        sa.Column('on_trendyol', sa.Boolean(), nullable=False),
+        sa.Column('on_amazon', sa.Boolean(), nullable=False),
+        sa.Column('on_idefix', sa.Boolean(), nullable=False),
+        sa.Column('on_hepsiburada', sa.Boolean(), nullable=False),
+        sa.Column('on_shopify', sa.Boolean(), nullable=False),
+        sa.Column('unlisted', sa.Boolean(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('model_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('product_model_summary')
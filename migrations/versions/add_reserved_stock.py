@@ -0,0 +1,36 @@
+"""Add reserved_stock table (açık sipariş rezervi projeksiyonu)
+
+Revision ID: add_reserved_stock
+Revises: add_stock_listing_policy
+Create Date: 2026-10-18
+
+Additive — mevcut tablolara dokunmaz. Tablo boş oluşturulur; uygulama ilk
+açılışta (stock_sync.reservation.ensure_table_exists) sipariş tablolarından
+doldurur. Tablo yoksa get_reserved_barcodes eski JSON taramasıyla çalışır.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_reserved_stock'
+down_revision = 'add_stock_listing_policy'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if 'reserved_stock' in insp.get_table_names():
+        return
+    op.create_table(
+        'reserved_stock',
+        sa.Column('barcode', sa.String(), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('barcode'),
+    )
+
+
+def downgrade():
+    op.drop_table('reserved_stock')
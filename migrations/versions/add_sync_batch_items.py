@@ -0,0 +1,28 @@
+"""Add sync_batch_requests.items (Amazon feed mutabakatı)
+
+Revision ID: add_sync_batch_items
+Revises: add_kargo_mutabakat_runs
+Create Date: 2026-10-18
+
+Additive — nullable JSON kolon. Amazon feed'inin [messageId, barkod, adet]
+listesini tutar; Trendyol kayıtlarında NULL kalır.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_sync_batch_items'
+down_revision = 'add_kargo_mutabakat_runs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if 'items' in {c['name'] for c in insp.get_columns('sync_batch_requests')}:
+        return
+    op.add_column('sync_batch_requests', sa.Column('items', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('sync_batch_requests', 'items')
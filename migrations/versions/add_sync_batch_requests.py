@@ -0,0 +1,52 @@
+"""Add sync_batch_requests (Trendyol batchRequestId mutabakatı)
+
+Revision ID: add_sync_batch_requests
+Revises: add_product_import_state
+Create Date: 2026-10-18
+
+Additive — mevcut sync tablolarına dokunmaz. Kayıtlar yalnız yeni senkronlarda
+oluşur; eski session'lar mutabakata girmez.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_sync_batch_requests'
+down_revision = 'add_product_import_state'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if 'sync_batch_requests' in insp.get_table_names():
+        return
+    op.create_table(
+        'sync_batch_requests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('platform', sa.String(length=50), nullable=False),
+        sa.Column('batch_request_id', sa.String(length=100), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('success_count', sa.Integer(), nullable=True),
+        sa.Column('failed_count', sa.Integer(), nullable=True),
+        sa.Column('requeued_count', sa.Integer(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('next_check_at', sa.DateTime(), nullable=True),
+        sa.Column('last_checked_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['sync_sessions.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('batch_request_id'),
+    )
+    op.create_index('ix_sync_batch_requests_session_id', 'sync_batch_requests', ['session_id'])
+    op.create_index('ix_sync_batch_status_next', 'sync_batch_requests', ['status', 'next_check_at'])
+
+
+def downgrade():
+    op.drop_index('ix_sync_batch_status_next', table_name='sync_batch_requests')
+    op.drop_index('ix_sync_batch_requests_session_id', table_name='sync_batch_requests')
+    op.drop_table('sync_batch_requests')
@@ -0,0 +1,39 @@
+"""Add sync_session_summaries table (sadece-hata SyncDetail modu özeti)
+
+Revision ID: add_sync_session_summary
+Revises: add_reserved_stock
+Create Date: 2026-10-18
+
+Additive — mevcut tablolara dokunmaz. SYNC_DETAIL_MODE=errors_only iken
+başarılı satırlar sync_details yerine session başına tek özet kaydına yazılır.
+Uygulama açılışta (stock_sync.detail_writer.ensure_table_exists) da oluşturur.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_sync_session_summary'
+down_revision = 'add_reserved_stock'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if 'sync_session_summaries' in insp.get_table_names():
+        return
+    op.create_table(
+        'sync_session_summaries',
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('platform', sa.String(length=50), nullable=False),
+        sa.Column('success_count', sa.Integer(), nullable=True),
+        sa.Column('stocks', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['sync_sessions.id']),
+        sa.PrimaryKeyConstraint('session_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('sync_session_summaries')
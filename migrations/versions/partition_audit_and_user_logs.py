@@ -0,0 +1,144 @@
+"""Partition order_audit_logs and user_logs by month (PostgreSQL)
+
+Revision ID: partition_audit_and_user_logs
+Revises: add_order_search_index
+Create Date: 2026-10-18
+
+Yalnız PostgreSQL. Mevcut tablo ``<tablo>_legacy`` adıyla yeni aylık RANGE
+bölümlü tablonun ilk bölümü olarak bağlanır (MINVALUE → gelecek ay başı);
+veri kopyalanmaz. Ardından sonraki iki ayın bölümleri ve DEFAULT bölüm açılır.
+PK (id, zaman) olur; id sırası (sequence) yeni ana tabloya devredilir.
+Audit tablosunda bileşik (order_number/package_number/barcode, ts)
+indekslerinin kapsadığı tek kolonlu indeksler kaldırılır.
+
+ATTACH sırasında legacy tablo bir kez taranır (bölüm sınırı doğrulaması);
+bakım penceresinde çalıştırılmalı. Diğer dialect'lerde no-op —
+``log_partitions`` saklamayı satır bazında yapar.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'partition_audit_and_user_logs'
+down_revision = 'add_order_search_index'
+branch_labels = None
+depends_on = None
+
+TABLES = (('order_audit_logs', 'ts'), ('user_logs', 'timestamp'))
+# ad → kolon (downgrade'de geri açmak için)
+REDUNDANT_INDEXES = {
+    'order_audit_logs': {
+        'ix_order_audit_logs_order_number': 'order_number',
+        'ix_order_audit_logs_package_number': 'package_number',
+        'ix_order_audit_logs_barcode': 'barcode',
+    },
+}
+PRECREATE_MONTHS = 2
+
+
+def _add_months(dt, n):
+    idx = dt.year * 12 + dt.month - 1 + n
+    return datetime(idx // 12, idx % 12 + 1, 1)
+
+
+def _relkind(bind, table):
+    return bind.execute(sa.text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = :t AND n.nspname = current_schema()"), {'t': table}).scalar()
+
+
+def _indexes(bind, table):
+    return bind.execute(sa.text(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = :t"), {'t': table}).fetchall()
+
+
+def _constraints(bind, table, kind):
+    return bind.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = CAST(:t AS regclass) AND contype = :k"), {'t': table, 'k': kind}).fetchall()
+
+
+def _convert(bind, table, col):
+    legacy = f'{table}_legacy'
+    pkeys = {name for name, _ in _constraints(bind, table, 'p')}
+    fks = [definition for _, definition in _constraints(bind, table, 'f')]
+    seq = bind.execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {'t': table}).scalar()
+
+    redundant = set(REDUNDANT_INDEXES.get(table, {}))
+    for name in redundant:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    indexes = [(n, d) for n, d in _indexes(bind, table) if n not in pkeys and n not in redundant]
+
+    # Bölüm anahtarı NULL olamaz (user_logs.timestamp nullable tanımlı)
+    op.execute(f'''UPDATE {table} SET "{col}" = (now() at time zone 'utc') WHERE "{col}" IS NULL''')
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN "{col}" SET NOT NULL')
+
+    if seq:
+        op.execute(f'ALTER SEQUENCE {seq} OWNED BY NONE')
+    op.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+    for name in pkeys:
+        op.execute(f'ALTER TABLE {legacy} RENAME CONSTRAINT {name} TO {(name + "_legacy")[:63]}')
+    for name, _ in indexes:
+        op.execute(f'ALTER INDEX {name} RENAME TO {(name + "_legacy")[:63]}')
+
+    op.execute(f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING STORAGE) '
+               f'PARTITION BY RANGE ("{col}")')
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, "{col}")')
+    for definition in fks:
+        op.execute(f'ALTER TABLE {table} ADD {definition}')
+    if seq:
+        op.execute(f'ALTER SEQUENCE {seq} OWNED BY {table}.id')
+    for _, definition in indexes:
+        op.execute(definition)  # eski ad + eski tablo adı → yeni ana tablo
+
+    first = _add_months(datetime.utcnow().replace(day=1), 1)
+    op.execute(f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+               f"FOR VALUES FROM (MINVALUE) TO ('{first:%Y-%m-%d %H:%M:%S}')")
+    for i in range(PRECREATE_MONTHS):
+        lo, hi = _add_months(first, i), _add_months(first, i + 1)
+        op.execute(f"CREATE TABLE {table}_y{lo.year}m{lo.month:02d} PARTITION OF {table} "
+                   f"FOR VALUES FROM ('{lo:%Y-%m-%d %H:%M:%S}') TO ('{hi:%Y-%m-%d %H:%M:%S}')")
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    for table, col in TABLES:
+        if _relkind(bind, table) == 'r':
+            _convert(bind, table, col)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    for table, col in TABLES:
+        if _relkind(bind, table) != 'p':
+            continue
+        flat = f'{table}_flat'
+        indexes = [(n, d) for n, d in _indexes(bind, table) if n != f'{table}_pkey']
+        fks = [definition for _, definition in _constraints(bind, table, 'f')]
+        seq = bind.execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {'t': table}).scalar()
+
+        op.execute(f'CREATE TABLE {flat} (LIKE {table} INCLUDING DEFAULTS INCLUDING STORAGE)')
+        op.execute(f'INSERT INTO {flat} SELECT * FROM {table}')
+        if seq:
+            op.execute(f'ALTER SEQUENCE {seq} OWNED BY NONE')
+        op.execute(f'DROP TABLE {table} CASCADE')
+        op.execute(f'ALTER TABLE {flat} RENAME TO {table}')
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)')
+        if table == 'user_logs':
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN "{col}" DROP NOT NULL')
+        for definition in fks:
+            op.execute(f'ALTER TABLE {table} ADD {definition}')
+        if seq:
+            op.execute(f'ALTER SEQUENCE {seq} OWNED BY {table}.id')
+        for _, definition in indexes:
+            op.execute(definition)
+        for name, column in REDUNDANT_INDEXES.get(table, {}).items():
+            op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})')
@@ -198,6 +198,221 @@ class StockListingPolicy(db.Model):
         return f"<StockListingPolicy {self.barcode} +{self.extra_buffer} auto={self.auto}>"
 
 
+class ReservedStock(db.Model):
+    """Barkod bazlı açık sipariş rezervi — ``get_reserved_barcodes`` projeksiyonu.
+
+    REZERV = Yeni (Created) + Hazırlanıyor (henüz TOPLANMAMIŞ) siparişlerin
+    ``details`` satırları (normalize barkod). Sipariş geçişleri aynı transaction
+    içinde ``stock_sync.reservation`` üzerinden ``qty``'yi artırıp azaltır;
+    periyodik doğrulayıcı tabloyu sıfırdan yeniden kurup sapmayı raporlar.
+    """
+    __tablename__ = "reserved_stock"
+
+    barcode = db.Column(db.String, primary_key=True)
+    qty = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ReservedStock {self.barcode} {self.qty}>"
+
+
+class OrderSearchIndex(db.Model):
+    """Sipariş listesi için tek tablo arama/sıralama indeksi (order_number başına 1 satır).
+
+    Altı statü tablosunun UNION ALL'u yerine sipariş listesi bu tablodan
+    aranır ve keyset ile sayfalanır. Sipariş geçişleriyle aynı transaction
+    içinde ``order_search`` üzerinden yenilenir. ``search_text`` PostgreSQL'de
+    pg_trgm GIN indeksi taşır (``ILIKE '%q%'``).
+    """
+    __tablename__ = "order_search_index"
+
+    order_number = db.Column(db.String, primary_key=True)
+    status = db.Column(db.String(16), nullable=False)       # en yeni satırın statüsü (Created/Picking/...)
+    customer_name = db.Column(db.String, nullable=True)
+    customer_surname = db.Column(db.String, nullable=True)
+    barcodes = db.Column(db.Text, nullable=True)            # boşlukla ayrılmış
+    skus = db.Column(db.Text, nullable=True)
+    search_text = db.Column(db.Text, nullable=False, default="")
+    order_date = db.Column(db.DateTime, nullable=True)      # max(order_date)
+    deadline_min = db.Column(db.DateTime, nullable=True)    # min(coalesce(agreed, estimated))
+    deadline_max = db.Column(db.DateTime, nullable=True)
+    # Keyset sıralama anahtarları (NULL yok → satır karşılaştırması basit kalır)
+    sort_date = db.Column(db.DateTime, nullable=False)
+    sort_deadline_asc = db.Column(db.DateTime, nullable=False)
+    sort_deadline_desc = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_osi_date", "sort_date", "order_number"),
+        db.Index("ix_osi_deadline_asc", "sort_deadline_asc", "sort_date", "order_number"),
+        db.Index("ix_osi_deadline_desc", "sort_deadline_desc", "sort_date", "order_number"),
+        db.Index("ix_osi_status", "status"),
+    )
+
+    def __repr__(self):
+        return f"<OrderSearchIndex {self.order_number} {self.status}>"
+
+
+class KpiDaily(db.Model):
+    """Günlük KPI özeti — (kaynak, İstanbul günü) başına tek satır.
+
+    Ana sayfa, kâr raporu özeti ve agent ``/dashboard`` sipariş tablolarını
+    taramak yerine buradan okur. ``kpi_rollup`` yazar: dokunulan günler
+    artımlı, son N gün gece baştan. Aylık değerler günlük satırların toplamıdır.
+    """
+    __tablename__ = "kpi_daily"
+
+    source = db.Column(db.String(16), primary_key=True)     # trendyol
+    day = db.Column(db.Date, primary_key=True)              # İstanbul takvim günü
+    orders = db.Column(db.Integer, nullable=False, default=0)       # benzersiz sipariş (iptal hariç)
+    units = db.Column(db.Integer, nullable=False, default=0)        # net'i pozitif barkodların adedi
+    gross = db.Column(db.Float, nullable=False, default=0.0)        # sum(amount)
+    discount = db.Column(db.Float, nullable=False, default=0.0)     # sum(discount)
+    net = db.Column(db.Float, nullable=False, default=0.0)          # ana sayfa NET ciro (amount - discount)
+    commission = db.Column(db.Float, nullable=False, default=0.0)
+    cost_usd = db.Column(db.Float, nullable=False, default=0.0)     # model üretim maliyeti (USD)
+    returns = db.Column(db.Integer, nullable=False, default=0)      # o gün iade açılan sipariş
+    cancelled = db.Column(db.Integer, nullable=False, default=0)    # o gün tarihli iptal sipariş
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<KpiDaily {self.source} {self.day} {self.orders}>"
+
+
+class ProductModelSummary(db.Model):
+    """Ürün listesi için model başına tek satır özet (renkler, bedenler, stok, fiyat aralığı).
+
+    ``/product_list`` sayfası varyantları yüklemek yerine buradan render edilir;
+    beden detayı açılınca JSON uç noktasından gelir. ``product_summary`` yazar:
+    ürün / merkez stok / Shopify eşleşmesi değişiklikleriyle aynı transaction içinde.
+    """
+    __tablename__ = "product_model_summary"
+
+    model_id = db.Column(db.String, primary_key=True)       # Product.product_main_id
+    title = db.Column(db.String, nullable=True)             # temsilci varyantın başlığı
+    image = db.Column(db.String, nullable=True)             # temsilci varyantın ilk görseli
+    colors = db.Column(db.Text, nullable=False, default="[]")   # JSON: [{"color","image","stock","variants"}]
+    sizes = db.Column(db.Text, nullable=False, default="[]")    # JSON: büyükten küçüğe bedenler
+    variant_count = db.Column(db.Integer, nullable=False, default=0)
+    total_stock = db.Column(db.Integer, nullable=False, default=0)   # central_stock toplamı
+    min_price = db.Column(db.Float, nullable=True)
+    max_price = db.Column(db.Float, nullable=True)
+    # Pazaryeri bayrakları: en az bir varyant o pazaryerinde mi (liste filtresi)
+    on_trendyol = db.Column(db.Boolean, nullable=False, default=False)
+    on_amazon = db.Column(db.Boolean, nullable=False, default=False)
+    on_idefix = db.Column(db.Boolean, nullable=False, default=False)
+    on_hepsiburada = db.Column(db.Boolean, nullable=False, default=False)
+    on_shopify = db.Column(db.Boolean, nullable=False, default=False)
+    unlisted = db.Column(db.Boolean, nullable=False, default=False)  # hiçbir pazaryerinde olmayan varyant var
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ProductModelSummary {self.model_id} {self.variant_count}>"
+
+
+class ProductImportRun(db.Model):
+    """Trendyol katalog içe aktarma çalışması — ilerleme + kaldığı yerden devam noktası.
+
+    ``last_page`` son COMMIT edilen sayfadır; başarısız çalışma bir sonraki
+    tetiklemede ``last_page + 1``'den devam eder (``product_import``).
+    """
+    __tablename__ = "product_import_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(16), nullable=False, default="running")   # running/completed/failed
+    triggered_by = db.Column(db.String(100))
+    total_pages = db.Column(db.Integer)
+    last_page = db.Column(db.Integer, nullable=False, default=-1)
+    fetched = db.Column(db.Integer, nullable=False, default=0)      # API'den gelen varyant satırı
+    changed = db.Column(db.Integer, nullable=False, default=0)      # yeni / içeriği değişip yazılan
+    unchanged = db.Column(db.Integer, nullable=False, default=0)    # hash aynı → atlanan
+    skipped = db.Column(db.Integer, nullable=False, default=0)      # geçersiz / arşivde / tekrar
+    deleted = db.Column(db.Integer, nullable=False, default=0)      # aktif listede görünmeyip silinen
+    attempts = db.Column(db.Integer, nullable=False, default=1)
+    error_message = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def progress_percent(self):
+        if not self.total_pages:
+            return 0
+        return round(min(self.last_page + 1, self.total_pages) / self.total_pages * 100, 1)
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'status': self.status, 'triggered_by': self.triggered_by,
+            'total_pages': self.total_pages, 'last_page': self.last_page,
+            'progress_percent': self.progress_percent,
+            'fetched': self.fetched, 'changed': self.changed, 'unchanged': self.unchanged,
+            'skipped': self.skipped, 'deleted': self.deleted, 'attempts': self.attempts,
+            'error_message': self.error_message,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class KargoMutabakatRun(db.Model):
+    """Kargo fatura mutabakatı arka plan çalışması — aşama/ilerleme + sonuç dosyası.
+
+    Sonuç (kova listeleri) ``result_path``'teki JSON'dadır; ekran ve itiraz
+    Excel'i analizi tekrar çalıştırmadan oradan okur (``kargo_mutabakat``).
+    """
+    __tablename__ = "kargo_mutabakat_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False, index=True)   # uploads/kargo_mutabakat içindeki ad
+    status = db.Column(db.String(16), nullable=False, default="queued")  # queued/running/completed/failed
+    phase = db.Column(db.String(32))                                # okuma/birebir/adaylar/bulanik/fiyat
+    triggered_by = db.Column(db.String(100))
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    fuzzy_total = db.Column(db.Integer, nullable=False, default=0)  # bulanık eşleşmeye kalan satır
+    fuzzy_done = db.Column(db.Integer, nullable=False, default=0)
+    candidate_count = db.Column(db.Integer, nullable=False, default=0)
+    matched = db.Column(db.Integer, nullable=False, default=0)
+    suspicious = db.Column(db.Integer, nullable=False, default=0)
+    missing = db.Column(db.Integer, nullable=False, default=0)
+    price_anomalies = db.Column(db.Integer, nullable=False, default=0)
+    result_path = db.Column(db.String(500))
+    error_message = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def progress_percent(self):
+        if self.status == "completed":
+            return 100.0
+        if not self.fuzzy_total:
+            return 0
+        return round(min(self.fuzzy_done, self.fuzzy_total) / self.fuzzy_total * 100, 1)
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'filename': self.filename, 'status': self.status, 'phase': self.phase,
+            'triggered_by': self.triggered_by, 'total_rows': self.total_rows,
+            'fuzzy_total': self.fuzzy_total, 'fuzzy_done': self.fuzzy_done,
+            'progress_percent': self.progress_percent, 'candidate_count': self.candidate_count,
+            'matched': self.matched, 'suspicious': self.suspicious, 'missing': self.missing,
+            'price_anomalies': self.price_anomalies, 'error_message': self.error_message,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ProductImportHash(db.Model):
+    """Barkod başına son içe aktarılan Trendyol içeriğinin hash'i (değişmeyen satır atlanır)."""
+    __tablename__ = "product_import_hashes"
+
+    barcode = db.Column(db.String, primary_key=True)
+    content_hash = db.Column(db.String(40), nullable=False)
+    seen_run = db.Column(db.Integer, nullable=False, index=True)    # barkodu son gören çalışma
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 ### --- STOK HAREKET DEFTERİ (LEDGER) ---
 # Append-only fiziksel stok hareketleri. Her giriş/çıkış (mal kabul, paketleme,
 # kargo, iptal iadesi, manuel düzeltme) buraya bir satır olarak yazılır.
@@ -265,10 +480,11 @@ class OrderAuditLog(db.Model):
     id = db.Column(db.BigInteger().with_variant(db.Integer(), "sqlite"), primary_key=True)
     ts = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 
-    # Sipariş kimlikleri (en az biri olmalı; index'li arama)
-    order_number = db.Column(db.String(64), index=True, nullable=True)
-    package_number = db.Column(db.String(64), index=True, nullable=True)
-    barcode = db.Column(db.String(64), index=True, nullable=True)
+    # Sipariş kimlikleri (en az biri olmalı). Aramalar aşağıdaki (kolon, ts)
+    # bileşik indekslerini kullanır; ayrı tek kolonlu indeks tutulmaz.
+    order_number = db.Column(db.String(64), nullable=True)
+    package_number = db.Column(db.String(64), nullable=True)
+    barcode = db.Column(db.String(64), nullable=True)
 
     # event_type — küçük bir kontrollü kelime listesi:
     # "order_received"    → Trendyol'dan ilk kez DB'ye yazıldı
@@ -543,6 +759,9 @@ class ReturnOrder(db.Model): # db.Model'dan türedi
     notes = db.Column(db.Text, nullable=True) # Text daha uygun olabilir
     approval_reason = db.Column(db.Text, nullable=True) # Text daha uygun olabilir
     refund_amount = db.Column(db.Float, nullable=True)
+    # Son ekleme/güncelleme anı (kpi_rollup artımlı yenilemesi; eski satırlarda NULL)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           nullable=True, index=True)
     products = db.relationship('ReturnProduct', backref='return_order', lazy='dynamic', cascade="all, delete-orphan") # lazy='dynamic' çok ürün varsa iyi
 
 
@@ -674,7 +893,8 @@ class OrderBase(db.Model):
 
     # Kayıt Zaman Damgaları
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False,
+                           index=True)  # kpi_rollup.touched_days artımlı taraması
     
     # 🆕 Sipariş Kaynağı (TRENDYOL / WOOCOMMERCE)
     source = db.Column(db.String(20), default='TRENDYOL', nullable=False)
@@ -1467,6 +1687,52 @@ class SyncDetail(db.Model):
         }
 
 
+class SyncSessionSummary(db.Model):
+    """Sadece-hata modunda başarılı satırların session başına özeti.
+
+    Başarılı her barkod için ayrı SyncDetail satırı yerine tek kayıt:
+    ``stocks`` = {barkod: gönderilen_adet}. Diff push defteri bunu da okur.
+    """
+    __tablename__ = 'sync_session_summaries'
+
+    session_id = db.Column(db.Integer, db.ForeignKey('sync_sessions.id'), primary_key=True)
+    platform = db.Column(db.String(50), nullable=False)
+    success_count = db.Column(db.Integer, default=0)
+    stocks = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SyncBatchRequest(db.Model):
+    """Platformun asenkron işlediği batch isteği (Trendyol ``batchRequestId``, Amazon ``feedId``).
+
+    POST 200 dönünce ürünler iyimser olarak başarılı yazılır; mutabakat job'ı
+    (``stock_sync.batch_reconcile``) gerçek ürün sonuçlarını yoklayıp SyncDetail'i
+    düzeltir ve yalnız hatalı barkodları yeniden kuyruğa alır.
+    """
+    __tablename__ = 'sync_batch_requests'
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('sync_sessions.id'), nullable=False, index=True)
+    platform = db.Column(db.String(50), nullable=False)
+    batch_request_id = db.Column(db.String(100), nullable=False, unique=True)
+    item_count = db.Column(db.Integer, default=0)
+    items = db.Column(db.JSON)   # Amazon feed: [[messageId, barkod, adet], ...] (rapor messageId verir)
+    status = db.Column(db.String(20), nullable=False, default='pending')   # pending/completed/expired
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    success_count = db.Column(db.Integer, default=0)
+    failed_count = db.Column(db.Integer, default=0)
+    requeued_count = db.Column(db.Integer, default=0)
+    error_message = db.Column(db.Text)
+    next_check_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_checked_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_sync_batch_status_next', 'status', 'next_check_at'),
+    )
+
+
 class ShopifyMapping(db.Model):
     """Shopify barkod eşleştirme tablosu - Panel barkodu <-> Shopify variant eşleşmesi"""
     __tablename__ = 'shopify_mappings'
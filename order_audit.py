@@ -6,6 +6,11 @@ verilmezse fonksiyon barkoddan kendi başına çekmeyi dener.
 Bağımsız bir SQLAlchemy session kullanır — log yazımı asıl işlemi
 zincirlemez (rollback olsa bile log atılmış olur). Hata olursa sadece
 loglar, asıl akışı kırmaz.
+
+``start_writer()`` çağrıldıysa (app açılışı) event'ler istek thread'inde
+yalnız hazırlanıp ``batch_writer.BatchWriter`` kuyruğuna bırakılır; arka plan
+thread'i partiler halinde çok satırlı INSERT ile yazar. Çağrılmadıysa
+(script / izole test) yazım eskisi gibi senkron.
 """
 from __future__ import annotations
 
@@ -17,12 +22,15 @@ from flask import g, has_request_context, session
 from sqlalchemy import event, func
 from sqlalchemy.orm import Session as SaSession
 
+from batch_writer import BatchWriter
 from models import CentralStock, OrderAuditLog, RafUrun, db
 
 logger = logging.getLogger(__name__)
 
 VALID_SEVERITY = {"info", "warning", "critical"}
 
+_writer: BatchWriter | None = None
+
 
 def _bind() -> Any:
     return db.session.get_bind()
@@ -154,6 +162,19 @@ def log_event(
     if user_id is None:
         user_id = _current_user_id()
 
+    if _writer is not None:
+        ev = _prepare(dict(
+            event_type=event_type, order_number=order_number, package_number=package_number,
+            barcode=barcode, quantity=quantity, central_qty_before=central_qty_before,
+            central_qty_after=central_qty_after, raf_total_before=raf_total_before,
+            raf_total_after=raf_total_after, raf_kodu=raf_kodu, status_from=status_from,
+            status_to=status_to, source=source, user_id=user_id, severity=severity,
+            message=message, details=details, snapshot=snapshot,
+        ))
+        _capture_snapshots([ev])
+        _writer.submit(ev)
+        return None
+
     sa_sess = SaSession(bind=_bind())
     try:
         if snapshot and barcode:
@@ -194,30 +215,82 @@ def log_event(
         sa_sess.close()
 
 
+_INSERT_COLUMNS = tuple(
+    c.name for c in OrderAuditLog.__table__.columns if c.name != "id"
+)
+
+
+def _prepare(ev: dict) -> dict:
+    """Event'i istek bağlamında tamamlar (kullanıcı, zaman, severity)."""
+    ev = dict(ev)
+    if ev.get("severity") not in VALID_SEVERITY:
+        ev["severity"] = "info"
+    if ev.get("user_id") is None:
+        ev["user_id"] = _current_user_id()
+    ev["ts"] = datetime.utcnow()
+    for key in ("order_number", "package_number", "barcode"):
+        if ev.get(key):
+            ev[key] = str(ev[key])
+    return ev
+
+
+def _fill_snapshot(ev: dict, sa_sess: SaSession) -> None:
+    if ev.pop("snapshot", False) and ev.get("barcode"):
+        c, r = _snapshot(ev["barcode"], sa_sess)
+        if ev.get("central_qty_after") is None:
+            ev["central_qty_after"] = c
+        if ev.get("raf_total_after") is None:
+            ev["raf_total_after"] = r
+
+
+def _capture_snapshots(events: list[dict]) -> None:
+    """Kuyruğa girmeden önce snapshot'ı olay anındaki stoktan doldurur.
+
+    Yazıcı thread'i partiyi saniyeler sonra yazar; snapshot orada alınırsa
+    aradaki hareketler ``_after`` değerine karışır.
+    """
+    if not any(ev.get("snapshot") and ev.get("barcode") for ev in events):
+        return
+    sa_sess = SaSession(bind=_bind())
+    try:
+        for ev in events:
+            _fill_snapshot(ev, sa_sess)
+    finally:
+        sa_sess.close()
+
+
+def _write_prepared(sa_sess: SaSession, events: list[dict]) -> int:
+    """Hazırlanmış event'leri tek çok satırlı INSERT ile yazar (commit çağırana ait)."""
+    # None alanlar gönderilmez (details → SQL NULL, JSON 'null' değil); aynı
+    # kolon kümesine sahip satırlar tek executemany'de gider.
+    groups: dict[tuple, list[dict]] = {}
+    for ev in events:
+        _fill_snapshot(ev, sa_sess)
+        row = {col: ev[col] for col in _INSERT_COLUMNS if ev.get(col) is not None}
+        groups.setdefault(tuple(row), []).append(row)
+    for rows in groups.values():
+        sa_sess.execute(OrderAuditLog.__table__.insert(), rows)
+    return len(events)
+
+
 def log_many(events: list[dict]) -> int:
     """Birden çok event'i tek transaction'da yazar.
 
     Her dict, ``log_event`` argümanlarıyla aynıdır (ama snapshot=True
-    gibi yan etkiler tek tek hesaplanır).
+    gibi yan etkiler tek tek hesaplanır). Yazıcı çalışıyorsa kuyruğa
+    bırakılır ve kuyruğa giren sayı döner.
     """
     if not events:
         return 0
+    prepared = [_prepare(ev) for ev in events]
+    if _writer is not None:
+        _capture_snapshots(prepared)
+        for ev in prepared:
+            _writer.submit(ev)
+        return len(prepared)
     sa_sess = SaSession(bind=_bind())
-    written = 0
     try:
-        for ev in events:
-            if ev.get("snapshot") and ev.get("barcode"):
-                c, r = _snapshot(ev["barcode"], sa_sess)
-                ev.setdefault("central_qty_after", c)
-                ev.setdefault("raf_total_after", r)
-            ev_clean = {k: v for k, v in ev.items() if k != "snapshot"}
-            sev = ev_clean.get("severity", "info")
-            if sev not in VALID_SEVERITY:
-                ev_clean["severity"] = "info"
-            ev_clean.setdefault("user_id", _current_user_id())
-            ev_clean["ts"] = datetime.utcnow()
-            sa_sess.add(OrderAuditLog(**ev_clean))
-            written += 1
+        written = _write_prepared(sa_sess, prepared)
         sa_sess.commit()
     except Exception:
         sa_sess.rollback()
@@ -228,6 +301,39 @@ def log_many(events: list[dict]) -> int:
     return written
 
 
+def start_writer(engine=None, **kw) -> BatchWriter:
+    """Arka plan toplu yazıcıyı başlatır (app context içinde, bir kez)."""
+    global _writer
+    if _writer is None:
+        engine = engine or _bind()
+
+        def _write(batch: list[dict]) -> None:
+            sa_sess = SaSession(bind=engine)
+            try:
+                _write_prepared(sa_sess, batch)
+                sa_sess.commit()
+            except Exception:
+                sa_sess.rollback()
+                raise
+            finally:
+                sa_sess.close()
+
+        _writer = BatchWriter("ORDER_AUDIT", _write, **kw)
+    return _writer
+
+
+def writer_metrics() -> dict | None:
+    return _writer.metrics() if _writer is not None else None
+
+
+def stop_writer() -> None:
+    """Kuyruğu boşaltıp senkron yazıma döner."""
+    global _writer
+    if _writer is not None:
+        _writer.flush()
+        _writer = None
+
+
 # ════════════════════════════════════════════════════════════════════
 # Otomatik dinleyiciler — CentralStock ve RafUrun değiştiğinde
 # audit log'a işle. Aynı session'ın info dict'ine snapshot bırakırız,
@@ -28,7 +28,8 @@ from models import (
     UserLog,
     db,
 )
-from time_utils import fmt_ist, to_ist
+from log_partitions import retention_floor
+from time_utils import fmt_ist, ist_to_utc, to_ist
 
 logger = logging.getLogger(__name__)
 order_audit_bp = Blueprint("order_audit", __name__)
@@ -257,8 +258,33 @@ def _barcode_snapshot(barcode: str) -> dict:
     }
 
 
-def _audit_events(needle: str, barcodes: list[str], limit: int = 500) -> list[dict]:
+# Sipariş tarihinden bu kadar önceki barkod hareketleri de iz sürmeye dahil
+LOOKUP_LEAD_DAYS = 30
+
+
+def _lookup_since(order_records: list[dict], table_name: str) -> datetime:
+    """Log sorgularının zaman alt sınırı (partition pruning).
+
+    Sipariş bulunduysa en eski sipariş tarihinden ``LOOKUP_LEAD_DAYS`` önce;
+    değilse / daha eskiyse saklama sınırı (ötesi zaten arşivde).
+    """
+    floor = retention_floor(table_name)
+    dates = []
+    for rec in order_records:
+        raw = (rec.get("order_date") or "")[:19]
+        try:
+            dates.append(ist_to_utc(datetime.strptime(raw, "%Y-%m-%d %H:%M:%S")))
+        except ValueError:
+            continue
+    if not dates:
+        return floor
+    return max(floor, min(dates) - timedelta(days=LOOKUP_LEAD_DAYS))
+
+
+def _audit_events(needle: str, barcodes: list[str], limit: int = 500,
+                  since: datetime | None = None) -> list[dict]:
     q = db.session.query(OrderAuditLog).filter(
+        OrderAuditLog.ts >= (since or retention_floor(OrderAuditLog.__tablename__)),
         or_(
             OrderAuditLog.order_number == needle,
             OrderAuditLog.package_number == needle,
@@ -328,9 +354,10 @@ def _ledger_movements(needle: str, barcodes: list[str], limit: int = 500) -> lis
     ]
 
 
-def _user_logs(needle: str, limit: int = 50) -> list[dict]:
+def _user_logs(needle: str, limit: int = 50, since: datetime | None = None) -> list[dict]:
     rows = (
         db.session.query(UserLog)
+        .filter(UserLog.timestamp >= (since or retention_floor(UserLog.__tablename__)))
         .filter(UserLog.details.like(f"%{needle}%"))
         .order_by(UserLog.timestamp.desc())
         .limit(limit)
@@ -464,9 +491,10 @@ def lookup():
         order_records = _find_order_records(needle)
         barcodes = _extract_barcodes(order_records)
         snapshots = [_barcode_snapshot(b) for b in barcodes]
-        events = _audit_events(needle, barcodes)
+        events = _audit_events(needle, barcodes,
+                               since=_lookup_since(order_records, OrderAuditLog.__tablename__))
         movements = _ledger_movements(needle, barcodes)
-        ulogs = _user_logs(needle)
+        ulogs = _user_logs(needle, since=_lookup_since(order_records, UserLog.__tablename__))
 
         return jsonify(
             {
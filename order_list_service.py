@@ -14,6 +14,7 @@ from barcode_utils import generate_barcode_data_uri
 from models import db, Product, OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled, PlatformConfig, Archive
 from overdue_orders import OVERDUE_STATUSES, STATUS_CODE, overdue_orders_query
 from barcode_utils import generate_barcode
+import order_search
 import qrcode
 import os
 
@@ -367,6 +368,12 @@ def get_order_list():
         AllOrders = aliased(sub)
         q = db.session.query(AllOrders)
 
+        if order_search.is_ready():
+            return _render_indexed_order_list(
+                q, AllOrders, per_page, search_query, sort_key,
+                show_overdue, overdue_orders, overdue_numbers,
+            )
+
         # Geciken = SADECE Yeni/Hazırlanıyor/İşleme Alındı statülerinde teslim
         # süresi geçmiş sipariş. (Teslim Edildi/Kargoda/İptal asla geciken sayılmaz.)
         _overdue_clause = (
@@ -447,6 +454,60 @@ def get_order_list():
         return redirect(url_for('siparis_hazirla.index'))
 
 
+def _render_indexed_order_list(q, AllOrders, per_page, search_query, sort_key,
+                               show_overdue, overdue_orders, overdue_numbers):
+    """order_search_index üzerinden keyset sayfalama (tüm siparişler listesi).
+
+    Sayfanın order_number'ları indeksten (trigram arama + sıralama kolonları)
+    gelir; satırlar yalnız o numaralar için UNION'dan çekilir. ``page`` yerine
+    ``after``/``before`` imleci kullanılır, toplam sayı tahminidir.
+    """
+    search_query = (search_query or '').strip() or None
+    active = ('Created', 'Hazirlaniyor', 'Picking')
+    filters = dict(search=search_query, active_statuses=active)
+    if show_overdue:
+        filters['only_numbers'] = overdue_numbers
+    elif overdue_numbers and not search_query:
+        # Normal liste → geciken siparişler ayrı rozette; aramada gizleme yok
+        filters['exclude_numbers'] = overdue_numbers
+
+    result = order_search.page_orders(
+        sort_key, per_page,
+        after=request.args.get('after'), before=request.args.get('before'),
+        **filters,
+    )
+    total_orders_count, total_is_estimate = order_search.estimate_total(**filters)
+    page_order_numbers = result['order_numbers']
+
+    rows = []
+    if page_order_numbers:
+        order_index = {order_number: idx for idx, order_number in enumerate(page_order_numbers)}
+        rows = (
+            q.filter(AllOrders.c.order_number.in_(page_order_numbers))
+            .order_by(*_sort_clause(
+                sort_key, AllOrders.c.order_date,
+                AllOrders.c.agreed_delivery_date, AllOrders.c.estimated_delivery_end
+            ))
+            .all()
+        )
+        rows.sort(key=lambda r: order_index.get(r.order_number, len(order_index)))
+
+    orders = _merge_order_rows(rows, lambda r: r.status_name)
+    process_order_details(orders)
+    _decorate_order_priority(orders)
+
+    return render_template(
+        'order_list.html', orders=orders, page=result['page'], total_pages=0,
+        total_orders_count=total_orders_count, total_is_estimate=total_is_estimate,
+        cursor_mode=True, next_cursor=result['next_cursor'], prev_cursor=result['prev_cursor'],
+        search_query=search_query, sort_key=sort_key, overdue_orders=overdue_orders,
+        active_list='all', per_page=per_page, per_page_options=PER_PAGE_OPTIONS,
+        show_overdue=show_overdue,
+        archived_matches=_archived_search_matches(search_query),
+        order_pull_enabled=_get_order_pull_enabled()
+    )
+
+
 # --- BU FONKSİYON GÜNCELLENDİ ---
 def process_order_details(orders):
     """
@@ -0,0 +1,421 @@
+"""Sipariş listesi için ``order_search_index`` — tek tablo arama + keyset sayfalama.
+
+SORUN
+-----
+``order_list_service.get_order_list`` her sayfa görüntülemede altı statü
+tablosunun ``UNION ALL``'unu kuruyor, sipariş no / müşteri adında
+``ILIKE '%q%'`` ile tarıyor, ``GROUP BY order_number`` + ``COUNT`` + ``OFFSET``
+ile sayfalıyordu. ``orders_delivered`` büyüdükçe her sayfa — N. sayfa daha da
+pahalı — tüm tabloları baştan tarıyordu.
+
+ÇÖZÜM
+-----
+- ``order_search_index``: order_number başına tek satır (son statü, müşteri,
+  barkodlar, SKU'lar, tarih ve teslim süresi sıralama anahtarları).
+  ``search_text`` PostgreSQL'de ``pg_trgm`` GIN indeksi taşır.
+- Senkron: sipariş tablolarındaki ORM insert/update/delete mapper event'leri ve
+  ``queue_bulk_insert`` / ``queue_bulk_delete`` (toplu yollar) order_number'ı
+  session kuyruğuna ekler; ``before_commit`` anında bu siparişlerin indeks
+  satırları kaynak tablolardan (order_number indeksiyle) yeniden hesaplanır ve
+  ``INSERT … ON CONFLICT (order_number) DO UPDATE`` ile yazılır (aynı siparişi
+  eşzamanlı yenileyen iki işlem PK çakışmasıyla iş commit'ini düşürmez).
+  ``rebuild_order_search_index`` gece tam yeniden kurar (güvenlik ağı);
+  kaynak satırları parça parça okur, tümünü belleğe almaz.
+- ``page_orders``: sıralama anahtarı + order_number üzerinde seek (keyset)
+  sayfalama — N. sayfa 1. sayfayla aynı maliyette. Toplam adet
+  ``estimate_total`` ile ucuz tahmin (arama varken üst sınırlı sayım).
+
+Tablo hazır değilse (migration/oluşturma yok) liste eski UNION yoluna düşer.
+Boş tablonun ilk doldurulması PG'de advisory lock altında yapılır; tablo,
+doldurmayı hangi worker yaparsa yapsın her süreçte hazır işaretlenir.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import and_, event, inspect as sa_inspect, or_, text
+from sqlalchemy.orm import object_session
+
+from models import (
+    db, OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped,
+    OrderDelivered, OrderCancelled, OrderSearchIndex,
+)
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "_order_search_dirty"
+_ready_urls: set[str] = set()
+
+# Kaynak tablo → liste statü adı (get_union_all_orders ile aynı literal'ler)
+STATUS_BY_MODEL = {
+    OrderCreated: "Created",
+    OrderHazirlaniyor: "Hazirlaniyor",
+    OrderPicking: "Picking",
+    OrderShipped: "Shipped",
+    OrderDelivered: "Delivered",
+    OrderCancelled: "Cancelled",
+}
+
+REBUILD_LOCK_KEY = 0x6F7369  # pg_advisory_xact_lock anahtarı ("osi")
+
+MIN_DATE = datetime(1900, 1, 1)
+MAX_DATE = datetime(9999, 12, 31)
+COUNT_CAP = 1000
+REBUILD_CHUNK_SIZE = 1000
+
+# sort_key → [(kolon, artan_mı)]; son eleman her zaman order_number (benzersiz)
+_SORT_COLUMNS = {
+    "date_desc": [("sort_date", False), ("order_number", False)],
+    "deadline_asc": [("sort_deadline_asc", True), ("sort_date", False), ("order_number", False)],
+    "deadline_desc": [("sort_deadline_desc", False), ("sort_date", False), ("order_number", False)],
+}
+
+
+def is_ready(sess=None) -> bool:
+    sess = sess or db.session
+    return str(sess.get_bind().url) in _ready_urls
+
+
+def _mark_ready(sess) -> None:
+    _ready_urls.add(str(sess.get_bind().url))
+
+
+# ---------------------------------------------------------------------------
+# İndeks satırı hesaplama
+# ---------------------------------------------------------------------------
+def _split(value) -> list[str]:
+    return [p.strip() for p in str(value or "").split(",") if p.strip()]
+
+
+def _detail_items(details) -> list[dict]:
+    if not details:
+        return []
+    try:
+        parsed = json.loads(details) if isinstance(details, str) else details
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return []
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    return [it for it in parsed if isinstance(it, dict)] if isinstance(parsed, list) else []
+
+
+def build_index_row(order_number: str, rows) -> dict | None:
+    """Bir siparişin kaynak satırlarından (``(statü, satır)`` listesi) indeks satırı."""
+    if not rows:
+        return None
+    latest_status, latest = max(rows, key=lambda sr: sr[1].order_date or MIN_DATE)
+    barcodes, skus = [], []
+    deadlines = []
+    for _status, r in rows:
+        barcodes.extend(_split(r.product_barcode))
+        skus.extend(_split(r.merchant_sku))
+        for it in _detail_items(r.details):
+            barcodes.append(str(it.get("barcode") or "").strip())
+            skus.append(str(it.get("sku") or "").strip())
+        dl = r.agreed_delivery_date or r.estimated_delivery_end
+        if dl:
+            deadlines.append(dl)
+    barcodes = " ".join(dict.fromkeys(b for b in barcodes if b))
+    skus = " ".join(dict.fromkeys(s for s in skus if s))
+    name = (latest.customer_name or "").strip()
+    surname = (latest.customer_surname or "").strip()
+    order_date = max((r.order_date for _, r in rows if r.order_date), default=None)
+    dl_min = min(deadlines, default=None)
+    dl_max = max(deadlines, default=None)
+    return {
+        "order_number": order_number,
+        "status": latest_status,
+        "customer_name": name or None,
+        "customer_surname": surname or None,
+        "barcodes": barcodes or None,
+        "skus": skus or None,
+        "search_text": " ".join(p for p in (order_number, f"{name} {surname}".strip(), barcodes, skus) if p).lower(),
+        "order_date": order_date,
+        "deadline_min": dl_min,
+        "deadline_max": dl_max,
+        "sort_date": order_date or MIN_DATE,
+        "sort_deadline_asc": dl_min or MAX_DATE,
+        "sort_deadline_desc": dl_max or MIN_DATE,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+_SOURCE_FIELDS = (
+    "order_number", "order_date", "customer_name", "customer_surname", "details",
+    "merchant_sku", "product_barcode", "agreed_delivery_date", "estimated_delivery_end",
+)
+
+
+def _source_query(sess, model):
+    # Yalnız gereken kolonlar: ORM nesnesi/identity map yükü yok
+    return sess.query(*(getattr(model, f) for f in _SOURCE_FIELDS))
+
+
+def _source_rows(sess, numbers) -> dict[str, list]:
+    by_number: dict[str, list] = {}
+    for model, status in STATUS_BY_MODEL.items():
+        for r in _source_query(sess, model).filter(model.order_number.in_(list(numbers))).all():
+            by_number.setdefault(r.order_number, []).append((status, r))
+    return by_number
+
+
+def _upsert_rows(sess, rows) -> None:
+    if sess.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(OrderSearchIndex.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["order_number"],
+        set_={c: stmt.excluded[c] for c in rows[0] if c != "order_number"},
+    )
+    sess.execute(stmt)
+
+
+def refresh_orders(numbers, sess=None) -> int:
+    """Verilen siparişlerin indeks satırlarını kaynak tablolardan yeniden yazar (upsert)."""
+    sess = sess or db.session
+    numbers = {n for n in numbers if n}
+    if not numbers:
+        return 0
+    table = OrderSearchIndex.__table__
+    written = 0
+    ordered = sorted(numbers)
+    for i in range(0, len(ordered), REBUILD_CHUNK_SIZE):
+        chunk = ordered[i:i + REBUILD_CHUNK_SIZE]
+        with sess.no_autoflush:
+            by_number = _source_rows(sess, chunk)
+        gone = [n for n in chunk if n not in by_number]
+        if gone:
+            sess.execute(table.delete().where(table.c.order_number.in_(gone)))
+        rows = [r for r in (build_index_row(n, by_number.get(n)) for n in chunk) if r]
+        if rows:
+            _upsert_rows(sess, rows)
+        written += len(rows)
+    return written
+
+
+# ---------------------------------------------------------------------------
+# Senkron: event'ler + toplu yollar
+# ---------------------------------------------------------------------------
+def _queue(sess, numbers) -> None:
+    if sess is None:
+        return
+    sess.info.setdefault(_PENDING_KEY, set()).update(n for n in numbers if n)
+
+
+def _track(mapper, connection, target):
+    _queue(object_session(target), [target.order_number])
+
+
+def queue_bulk_insert(model, mappings) -> None:
+    """``bulk_insert_mappings`` yanında çağrılır (event tetiklenmez)."""
+    if model in STATUS_BY_MODEL:
+        _queue(db.session(), [m.get("order_number") for m in mappings])
+
+
+def queue_bulk_delete(model, ids) -> None:
+    """``query.filter(id.in_(ids)).delete()`` ÖNCESİ çağrılır."""
+    if model not in STATUS_BY_MODEL or not ids:
+        return
+    rows = db.session.query(model.order_number).filter(model.id.in_(ids)).all()
+    _queue(db.session(), [n for (n,) in rows])
+
+
+def _apply_pending(sess):
+    if not is_ready(sess):
+        sess.info.pop(_PENDING_KEY, None)
+        return
+    if sess.new or sess.dirty or sess.deleted:
+        sess.flush()
+    numbers = sess.info.pop(_PENDING_KEY, None)
+    if numbers:
+        refresh_orders(numbers, sess)
+
+
+def _discard_pending(sess):
+    sess.info.pop(_PENDING_KEY, None)
+
+
+def install_listeners() -> None:
+    """Bir kez çağrılır (tekrar çağrı no-op)."""
+    if event.contains(OrderCreated, "after_insert", _track):
+        return
+    for model in STATUS_BY_MODEL:
+        for name in ("after_insert", "after_update", "after_delete"):
+            event.listen(model, name, _track)
+    event.listen(db.session, "before_commit", _apply_pending)
+    event.listen(db.session, "after_rollback", _discard_pending)
+    logger.info("[ORDER-SEARCH] event listeners yüklendi.")
+
+
+# ---------------------------------------------------------------------------
+# Tam yeniden kurma + tablo garantisi
+# ---------------------------------------------------------------------------
+def rebuild_order_search_index(commit: bool = True) -> dict:
+    """İndeksi tüm statü tablolarından sıfırdan kurar.
+
+    Bellekte yalnız order_number kümesi tutulur; kaynak satırlar
+    ``REBUILD_CHUNK_SIZE``'lık sipariş parçalarıyla okunup yazılır.
+    """
+    numbers: set[str] = set()
+    for model in STATUS_BY_MODEL:
+        for (number,) in db.session.query(model.order_number).yield_per(REBUILD_CHUNK_SIZE * 5):
+            if number:
+                numbers.add(number)
+    db.session.query(OrderSearchIndex).delete(synchronize_session=False)
+    written = refresh_orders(numbers, db.session)
+    if commit:
+        db.session.commit()
+    _mark_ready(db.session)
+    logger.info(f"[ORDER-SEARCH] indeks yeniden kuruldu: {written} sipariş")
+    return {"orders": written}
+
+
+def _is_empty() -> bool:
+    return db.session.query(OrderSearchIndex.order_number).first() is None
+
+
+def ensure_table_exists() -> None:
+    """Tablo (+ PG'de pg_trgm GIN indeksi) yoksa oluşturup doldurur; varsa etkinleştirir."""
+    try:
+        bind = db.session.get_bind()
+        created = not sa_inspect(bind).has_table(OrderSearchIndex.__tablename__)
+        if created:
+            OrderSearchIndex.__table__.create(bind=bind, checkfirst=True)
+        if bind.dialect.name == "postgresql":
+            db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_osi_search_trgm ON order_search_index "
+                "USING gin (search_text gin_trgm_ops)"))
+            db.session.commit()
+        # Tablo var: bakım bu süreçte de açık (doldurmayı başka worker yapsa bile)
+        _mark_ready(db.session)
+        # Migration ile boş açılan tablo da ilk açılışta doldurulur; worker'lar
+        # yarışmasın diye PG'de kilit alınıp boşluk kilit altında yeniden sorulur
+        if _is_empty():
+            if bind.dialect.name == "postgresql":
+                db.session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": REBUILD_LOCK_KEY})
+            if _is_empty():
+                rebuild_order_search_index()
+            else:
+                db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("[ORDER-SEARCH] order_search_index hazırlanamadı (UNION listesine düşülür)")
+
+
+# ---------------------------------------------------------------------------
+# Arama + keyset sayfalama
+# ---------------------------------------------------------------------------
+def encode_cursor(values: list, page: int) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values] + [page])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None, sort_key: str):
+    """``(değerler, sayfa)`` — bozuk/uyumsuz imleç → ``None``."""
+    if not cursor:
+        return None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        *values, page = raw
+        cols = _SORT_COLUMNS[sort_key]
+        if len(values) != len(cols):
+            return None
+        values = [datetime.fromisoformat(v) if name != "order_number" else str(v)
+                  for (name, _), v in zip(cols, values)]
+        return values, int(page)
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError):
+        return None
+
+
+def _seek_clause(cols, values, forward: bool):
+    """(k1, k2, ...) sırasında imlecin sonrası (forward) / öncesi için OR-genişletilmiş koşul."""
+    clauses = []
+    for i, (name, asc) in enumerate(cols):
+        col = getattr(OrderSearchIndex, name)
+        after = (col > values[i]) if asc == forward else (col < values[i])
+        prefix = [getattr(OrderSearchIndex, n) == values[j] for j, (n, _) in enumerate(cols[:i])]
+        clauses.append(and_(*prefix, after))
+    return or_(*clauses)
+
+
+def _filtered_query(search=None, exclude_numbers=None, only_numbers=None, active_statuses=()):
+    q = db.session.query(OrderSearchIndex)
+    if only_numbers is not None:
+        q = q.filter(OrderSearchIndex.order_number.in_(list(only_numbers) or [""]))
+        if active_statuses:
+            q = q.filter(OrderSearchIndex.status.in_(active_statuses))
+    if exclude_numbers:
+        q = q.filter(~and_(OrderSearchIndex.status.in_(active_statuses),
+                           OrderSearchIndex.order_number.in_(list(exclude_numbers))))
+    if search:
+        q = q.filter(OrderSearchIndex.search_text.ilike(f"%{search.strip().lower()}%"))
+    return q
+
+
+def page_orders(sort_key: str, per_page: int, *, search=None, exclude_numbers=None,
+                only_numbers=None, active_statuses=(), after=None, before=None) -> dict:
+    """Bir sayfa order_number'ı döndürür (keyset).
+
+    Returns:
+        ``{"order_numbers", "page", "next_cursor", "prev_cursor"}``
+    """
+    cols = _SORT_COLUMNS.get(sort_key) or _SORT_COLUMNS["date_desc"]
+    q = _filtered_query(search, exclude_numbers, only_numbers, active_statuses)
+
+    cursor = decode_cursor(before, sort_key) if before else decode_cursor(after, sort_key)
+    forward = not (before and cursor)
+    page = 1
+    if cursor:
+        values, cur_page = cursor
+        q = q.filter(_seek_clause(cols, values, forward))
+        page = cur_page + 1 if forward else max(1, cur_page - 1)
+
+    order = []
+    for name, asc in cols:
+        col = getattr(OrderSearchIndex, name)
+        order.append(col.asc() if asc == forward else col.desc())
+    rows = q.order_by(*order).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def _key(r):
+        return [getattr(r, name) for name, _ in cols]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if (forward and has_more) or (not forward):
+            next_cursor = encode_cursor(_key(rows[-1]), page)
+        if (forward and cursor) or (not forward and has_more):
+            prev_cursor = encode_cursor(_key(rows[0]), page)
+    return {
+        "order_numbers": [r.order_number for r in rows],
+        "page": page,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
+def estimate_total(*, search=None, exclude_numbers=None, only_numbers=None,
+                   active_statuses=()) -> tuple[int, bool]:
+    """``(adet, tahmini_mi)`` — filtre yoksa PG istatistiği, aramada ``COUNT_CAP`` üst sınırlı sayım."""
+    if not search and only_numbers is None:
+        if db.session.get_bind().dialect.name == "postgresql":
+            est = db.session.execute(text(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = 'order_search_index'"
+            )).scalar()
+            if est and est > 0:
+                return max(0, int(est) - len(exclude_numbers or ())), True
+        q = _filtered_query(None, exclude_numbers, None, active_statuses)
+        return q.count(), False
+    q = _filtered_query(search, exclude_numbers, only_numbers, active_statuses)
+    n = q.with_entities(OrderSearchIndex.order_number).limit(COUNT_CAP + 1).count()
+    return min(n, COUNT_CAP), n > COUNT_CAP
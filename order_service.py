@@ -27,6 +27,15 @@ from models import (
     Archive
 )
 from stock_management import allocate_stock_for_order_details, restore_stock_for_order_details
+from stock_sync.reservation import (
+    queue_bulk_delete as queue_reserved_bulk_delete,
+    queue_bulk_insert as queue_reserved_bulk_insert,
+)
+from order_search import (
+    queue_bulk_delete as queue_search_bulk_delete,
+    queue_bulk_insert as queue_search_bulk_insert,
+)
+from response_cache import invalidate as invalidate_response_cache
 
 # Trendyol API kimlik bilgileri
 # trendyol_api.py dosyasından import ediliyorsa:
@@ -95,7 +104,68 @@ async def fetch_trendyol_orders_route():
     return redirect(url_for('order_list_service.order_list_all'))
 
 
-async def fetch_trendyol_orders_async():
+# Artımlı çekme: son görülen PackageLastModifiedDate (Trendyol epoch ms, ham)
+# platform_configs.order_pull.extra_config içinde saklanır. Sonraki turda sayfalar
+# PackageLastModifiedDate DESC geldiği için filigrandan (örtüşme payı düşülmüş)
+# eski bir sayfaya ulaşınca sayfalama durur. Tam tarama yalnız filigran yoksa
+# veya reconcile_orders_job içinde (full=True) yapılır.
+ORDER_PULL_WATERMARK_KEY = 'package_last_modified_ms'
+ORDER_PULL_OVERLAP_MS = 15 * 60 * 1000
+# pull_orders_job (artımlı) ile reconcile_orders_job (tam tarama) aynı siparişleri
+# ve filigranı yazar; "pull" kuyruğu 2 worker'lı olduğundan ikisi bu kilitle sıralanır.
+order_pull_lock = threading.Lock()
+
+
+def _package_modified_ms(order_data):
+    try:
+        return int(order_data.get('lastModifiedDate') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _load_order_pull_watermark():
+    from models import PlatformConfig
+    cfg = PlatformConfig.query.filter_by(platform='order_pull').first()
+    if not cfg or not cfg.extra_config:
+        return None
+    value = (cfg.extra_config or {}).get(ORDER_PULL_WATERMARK_KEY)
+    return int(value) if value else None
+
+
+def _save_order_pull_watermark(watermark_ms):
+    from models import PlatformConfig
+    try:
+        cfg = PlatformConfig.query.filter_by(platform='order_pull').first()
+        if not cfg:
+            cfg = PlatformConfig(platform='order_pull', is_active=True, batch_size=100, rate_limit_delay=0.1, max_retries=3)
+            db.session.add(cfg)
+        extra = dict(cfg.extra_config or {})
+        if int(extra.get(ORDER_PULL_WATERMARK_KEY) or 0) >= watermark_ms:
+            return
+        extra[ORDER_PULL_WATERMARK_KEY] = watermark_ms
+        cfg.extra_config = extra  # JSON kolonu: yeni dict ata ki değişiklik algılansın
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Sipariş çekme filigranı kaydedilemedi: {e}")
+
+
+def _filter_since(content, threshold_ms):
+    """threshold_ms'den eski paketleri ayıklar; sayfa tümüyle eskiyse True döner.
+    lastModifiedDate taşımayan paketler güvenli tarafta kalıp işlenir."""
+    kept = [o for o in content if _package_modified_ms(o) == 0 or _package_modified_ms(o) >= threshold_ms]
+    stamped = [_package_modified_ms(o) for o in content if _package_modified_ms(o)]
+    page_is_old = bool(stamped) and max(stamped) < threshold_ms
+    return kept, page_is_old
+
+
+async def fetch_trendyol_orders_async(full=False):
+    """Trendyol siparişlerini çekip process_all_orders'a verir.
+
+    full=False (varsayılan, pull_orders_job): kayıtlı filigrandan bu yana
+    değişen paketler; filigran yoksa otomatik tam tarama.
+    full=True (reconcile_orders_job): tüm sayfalar.
+    """
     logger.info("Asenkron Trendyol sipariş çekme işlemi başlıyor...")
     try:
         auth_str = f"{API_KEY}:{API_SECRET}"
@@ -116,8 +186,15 @@ async def fetch_trendyol_orders_async():
             "orderByDirection": "DESC"
         }
 
+        watermark_ms = None if full else _load_order_pull_watermark()
+        threshold_ms = (watermark_ms - ORDER_PULL_OVERLAP_MS) if watermark_ms else None
+        logger.info(
+            "Çekme modu: %s", f"artımlı (filigran={watermark_ms})" if threshold_ms else "tam tarama"
+        )
+
         all_orders_data = []
         total_pages = 1
+        fetch_failed = False  # okunamayan sayfa varsa filigran ilerlemez
 
         async with aiohttp.ClientSession() as session:
             logger.info("İlk sayfa çekiliyor...")
@@ -136,29 +213,57 @@ async def fetch_trendyol_orders_async():
                     return
 
                 content = data.get('content', []) or []
-                all_orders_data.extend(content)
                 total_pages = data.get('totalPages', 1)
                 logger.info(f"Toplam sipariş sayısı (API): {data.get('totalElements', 0)}, Toplam sayfa sayısı: {total_pages}")
 
-            if total_pages > 1:
-                from asyncio import Semaphore, gather
-                sem = Semaphore(10)
-                tasks = []
-                logger.info(f"Kalan {total_pages - 1} sayfa paralel olarak çekiliyor...")
-                for page_num in range(1, total_pages):
-                    params_page = dict(params, page=page_num)
-                    tasks.append(fetch_orders_page(session, url, headers, params_page, sem))
-                pages_results = await gather(*tasks, return_exceptions=True)
-                for result in pages_results:
-                    if isinstance(result, list):
-                        all_orders_data.extend(result)
-                    elif isinstance(result, Exception):
-                        logger.error(f"Paralel sayfa çekme sırasında hata: {result}")
+            if threshold_ms:
+                # Sayfalar DESC: filigrandan eski bir sayfaya gelince dur (sıralı çekim)
+                page_num = 0
+                while True:
+                    kept, page_is_old = _filter_since(content, threshold_ms)
+                    all_orders_data.extend(kept)
+                    page_num += 1
+                    if page_is_old or page_num >= total_pages:
+                        break
+                    content = await fetch_orders_page(
+                        session, url, headers, dict(params, page=page_num), asyncio.Semaphore(1)
+                    )
+                    if content is None:
+                        fetch_failed = True
+                        break
+                    if not content:
+                        break
+                logger.info(f"Artımlı çekme: {page_num}/{total_pages} sayfa okundu.")
+            else:
+                all_orders_data.extend(content)
+                if total_pages > 1:
+                    from asyncio import Semaphore, gather
+                    sem = Semaphore(10)
+                    tasks = []
+                    logger.info(f"Kalan {total_pages - 1} sayfa paralel olarak çekiliyor...")
+                    for page_num in range(1, total_pages):
+                        params_page = dict(params, page=page_num)
+                        tasks.append(fetch_orders_page(session, url, headers, params_page, sem))
+                    pages_results = await gather(*tasks, return_exceptions=True)
+                    for result in pages_results:
+                        if isinstance(result, list):
+                            all_orders_data.extend(result)
+                        else:
+                            fetch_failed = True
+                            if isinstance(result, Exception):
+                                logger.error(f"Paralel sayfa çekme sırasında hata: {result}")
 
             logger.info(f"Toplam {len(all_orders_data)} sipariş verisi çekildi.")
             if all_orders_data:
                 with current_app.app_context():
                     process_all_orders(all_orders_data)
+                    # Filigran yalnız tüm sayfalar okunup işlendikten sonra ilerler;
+                    # okunamayan sayfalardaki değişiklikler sonraki turda yeniden denenir.
+                    newest_ms = max((_package_modified_ms(o) for o in all_orders_data), default=0)
+                    if fetch_failed:
+                        logger.warning("Bazı sayfalar okunamadı; sipariş çekme filigranı ilerletilmedi.")
+                    elif newest_ms:
+                        _save_order_pull_watermark(newest_ms)
                     # 🔁 Stoğu teyit edilen Yeni siparişleri otomatik Hazırlanıyor'a (Trendyol Picking) çek.
                     try:
                         from promotion_service import promote_eligible_orders
@@ -178,6 +283,7 @@ async def fetch_trendyol_orders_async():
 
 
 async def fetch_orders_page(session, url, headers, params, semaphore):
+    """Tek sayfa içeriği; HTTP/zaman aşımı/parse hatasında None (boş sayfa [] ile karışmasın)."""
     page_num_log = params.get('page', '?')
     async with semaphore:
         try:
@@ -189,20 +295,20 @@ async def fetch_orders_page(session, url, headers, params, semaphore):
                         return content
                     except Exception as json_e:
                         logger.error(f"API JSON parse hatası (Sayfa {page_num_log}): {json_e}")
-                        return []
+                        return None
                 else:
                     error_text = await response.text()
                     logger.error(f"API isteği başarısız (Sayfa {page_num_log}): {response.status} - {error_text[:500]}")
-                    return []
+                    return None
         except asyncio.TimeoutError:
             logger.error(f"API isteği zaman aşımı (Sayfa {page_num_log}).")
-            return []
+            return None
         except aiohttp.ClientError as client_e:
             logger.error(f"API bağlantı hatası (Sayfa {page_num_log}): {client_e}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"Hata: fetch_orders_page (Sayfa {page_num_log}) - {e}", exc_info=True)
-            return []
+            return None
 
 
 ############################
@@ -463,6 +569,8 @@ def _process_sync_orders_bulk(sync_orders):
         for table_name, ids in to_delete_ids.items():
             if ids:
                 model = next(t for t in relevant_tables if t.__tablename__ == table_name)
+                queue_reserved_bulk_delete(model, ids)  # toplu silme event tetiklemez
+                queue_search_bulk_delete(model, ids)
                 model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
                 logger.info(f"{len(ids)} kayıt {table_name} tablosundan silindi.")
 
@@ -606,10 +714,16 @@ def _process_sync_orders_bulk(sync_orders):
 
         if to_insert_created:
             db.session.bulk_insert_mappings(OrderCreated, to_insert_created)
+            queue_reserved_bulk_insert(OrderCreated, to_insert_created)
+            queue_search_bulk_insert(OrderCreated, to_insert_created)
         if to_insert_picking:
             db.session.bulk_insert_mappings(OrderPicking, to_insert_picking)
+            queue_search_bulk_insert(OrderPicking, to_insert_picking)
         if to_insert_cancelled:
             db.session.bulk_insert_mappings(OrderCancelled, to_insert_cancelled)
+            queue_search_bulk_insert(OrderCancelled, to_insert_cancelled)
+        if to_insert_created or to_insert_picking or to_insert_cancelled:
+            invalidate_response_cache("orders")  # bulk_insert_mappings event tetiklemez
 
         # OrderCreated → OrderCancelled: Stok iadesi gerekmiyor
         # (Stok düşümü yalnızca paketleme onayında yapılır, Created aşamasında stok düşülmez)
@@ -905,12 +1019,18 @@ def process_bg_orders_bulk(bg_orders, app):
             for table_name, ids in to_delete_ids.items():
                 if ids:
                     model = next(t for t in relevant_tables if t.__tablename__ == table_name)
+                    queue_reserved_bulk_delete(model, ids)
+                    queue_search_bulk_delete(model, ids)
                     model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
 
             if to_insert_shipped:
                 db.session.bulk_insert_mappings(OrderShipped, to_insert_shipped)
+                queue_search_bulk_insert(OrderShipped, to_insert_shipped)
             if to_insert_delivered:
                 db.session.bulk_insert_mappings(OrderDelivered, to_insert_delivered)
+                queue_search_bulk_insert(OrderDelivered, to_insert_delivered)
+            if to_insert_shipped or to_insert_delivered:
+                invalidate_response_cache("orders")
 
             db.session.commit()
             logger.info("BG: Tüm işlemler tamamlandı.")
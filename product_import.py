@@ -0,0 +1,409 @@
+"""Trendyol ürün kataloğunun akışlı (sınırlı bellek) içe aktarımı.
+
+SORUN
+-----
+``get_products.fetch_all_products_async`` tüm sayfaları ``asyncio.gather`` ile
+tek listede topluyor, ``save_products_to_db_async`` bu listeyi gezerken tüm
+arşiv barkodlarını sete çekiyor, her ürün için satır sözlüğü kurup hepsini tek
+transaction'da upsert ediyordu. Büyük katalogda worker belleği zirve yapıyor,
+tek dev transaction kilit tutuyor; ortada bir sayfa hata verirse tüm iş baştan.
+İçeriği değişmemiş binlerce satır da her seferinde yeniden yazılıyordu.
+
+ÇÖZÜM
+-----
+- ``iter_pages``: sayfalar async generator'dan sırayla akar; en fazla
+  PREFETCH_PAGES sayfa önden çekilir (bellek sabit), sayfa hatası
+  PAGE_RETRIES kez tekrar denenir.
+- Sayfalar CHUNK_ROWS satırlık parçalarda (sayfa sınırında) işlenir:
+  doğrulama → arşiv kontrolü (yalnız parçanın barkodları) → içerik hash'i
+  ``product_import_hashes`` ile karşılaştırılır; yalnız yeni/değişen satırlar
+  upsert edilir. Parçanın ürün yazımı, hash'leri ve ``ProductImportRun``
+  ilerlemesi (``last_page``) aynı commit'te — yarım parça kalmaz.
+- Hata: çalışma ``failed`` işaretlenir; RESUME_WINDOW içinde bir sonraki
+  tetikleme aynı çalışmayı ``last_page + 1``'den sürdürür.
+- Aktif listede görünmeyen ürünlerin silinmesi (``delete_missing``) bellekteki
+  barkod seti yerine ``seen_run`` ile DB'de seçilir; sayfa kayması riski
+  nedeniyle yalnız kesintisiz tamamlanan çalışmada yapılır; silinenlerin
+  hash satırları da atılır. Hash eşleşse bile ``products``'ta satırı olmayan
+  barkod (panelden silinmiş, arşivden dönmüş) "değişmemiş" sayılmaz.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from flask import current_app
+
+from models import db, Product, ProductArchive, ProductImportRun, ProductImportHash
+import product_summary
+from trendyol_v2 import flatten_v2_page, V2_MAX_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 500
+PREFETCH_PAGES = 3
+PAGE_RETRIES = 3
+PAGE_TIMEOUT_SECONDS = 60
+RESUME_WINDOW = timedelta(hours=6)
+STALE_RUN = timedelta(minutes=15)     # bu süre ilerleme yoksa 'running' çalışma ölü sayılır
+UPSERT_BATCH = 200
+
+# Upsert'te güncellenen alanlar (save_products_to_db_async ile aynı)
+UPDATE_FIELDS = (
+    "title", "sale_price", "list_price", "on_sale", "locked", "is_approved", "last_update_date",
+    "vat_rate", "reject_reason", "description", "attributes", "is_rejected", "brand",
+    "category_name", "gender", "product_url", "has_active_campaign", "is_blacklisted",
+    "status", "images",
+)
+
+
+# ---------------------------------------------------------------------------
+# Satır kurma + doğrulama
+# ---------------------------------------------------------------------------
+def _ts(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromtimestamp(int(value) / 1000)
+    except (ValueError, TypeError, OSError):
+        return None
+
+
+def _attr(product_data, name):
+    return next((a.get('attributeValue', 'N/A') for a in product_data.get('attributes', [])
+                 if a.get('attributeName') == name), 'N/A')
+
+
+def build_product_row(product_data: dict, images_folder: str):
+    """Trendyol (v1 düz) ürün sözlüğü → (products satırı, (görsel_url, yerel_yol) | None).
+
+    Barkodsuz kayıt için ``(None, None)``.
+    """
+    barcode = (product_data.get('barcode') or '').strip()
+    if not barcode:
+        return None, None
+
+    image_urls = [img.get('url', '') for img in product_data.get('images', []) if isinstance(img, dict)]
+    images_path_db = ''
+    download = None
+    if image_urls and image_urls[0]:
+        image_url = image_urls[0]
+        ext = os.path.splitext(urlparse(image_url).path)[1] or '.jpg'
+        image_filename = f"{barcode}{ext.lower()}"
+        images_path_db = f"/static/images/{image_filename}"
+        download = (image_url, os.path.join(images_folder, image_filename))
+
+    status_str = "Beklemede"
+    if product_data.get('rejected'):
+        status_str = "Reddedildi"
+    elif product_data.get('approved'):
+        status_str = "Onaylandı"
+    if product_data.get('archived'):
+        status_str = f"{status_str} (Arşivde)"
+
+    row = {
+        "barcode": barcode,
+        "title": product_data.get('title'),
+        "images": images_path_db,
+        "product_main_id": product_data.get('productMainId'),
+        "size": _attr(product_data, 'Beden'), "color": _attr(product_data, 'Renk'),
+        "archived": product_data.get('archived', False),
+        "locked": product_data.get('locked', False),
+        "on_sale": product_data.get('onSale', False),
+        "sale_price": product_data.get('salePrice', 0),
+        "list_price": product_data.get('listPrice', 0),
+        "currency_type": product_data.get('currencyType'),
+        "description": product_data.get('description'),
+        "attributes": json.dumps(product_data.get('attributes', [])),
+        "reject_reason": '; '.join([r.get('reason', 'N/A') for r in product_data.get('rejectReasonDetails', [])]),
+        "brand": product_data.get('brand'),
+        "category_name": product_data.get('categoryName'),
+        "vat_rate": product_data.get('vatRate'),
+        "status": status_str,
+        "gtin": product_data.get('gtin'),
+        "last_update_date": _ts(product_data.get('lastUpdateDate')),
+        "brand_id": product_data.get('brandId'),
+        "create_date_time": _ts(product_data.get('createDateTime')),
+        "gender": product_data.get('gender'),
+        "has_active_campaign": product_data.get('hasActiveCampaign'),
+        "trendyol_id": product_data.get('id'),
+        "pim_category_id": product_data.get('pimCategoryId'),
+        "platform_listing_id": product_data.get('platformListingId'),
+        "product_code": product_data.get('productCode'),
+        "product_content_id": product_data.get('productContentId'),
+        "stock_unit_type": product_data.get('stockUnitType'),
+        "supplier_id": product_data.get('supplierId'),
+        "is_rejected": product_data.get('rejected'),
+        "is_blacklisted": product_data.get('blacklisted'),
+        "has_html_content": product_data.get('hasHtmlContent'),
+        "product_url": product_data.get('productUrl'),
+        "is_approved": product_data.get('approved'),
+    }
+    return row, download
+
+
+def content_hash(row: dict, download=None) -> str:
+    """Satır + kaynak görsel URL'si üzerinden kararlı hash (değişmeyen satırı atlamak için)."""
+    payload = json.dumps([row, download[0] if download else None], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _upsert(model, rows, update_fields, **options):
+    """Dialect'e göre ON CONFLICT upsert (PG prod, sqlite test)."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    pk = [c.name for c in model.__table__.primary_key]
+    for i in range(0, len(rows), UPSERT_BATCH):
+        stmt = insert(model.__table__).values(rows[i:i + UPSERT_BATCH])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=pk, set_={f: stmt.excluded[f] for f in update_fields})
+        db.session.execute(stmt.execution_options(**options) if options else stmt)
+
+
+# ---------------------------------------------------------------------------
+# Sayfa akışı
+# ---------------------------------------------------------------------------
+def http_page_fetcher(session):
+    """aiohttp session'ı ile V2 /products/approved sayfa çekici (hata → exception)."""
+    from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID
+    url = f"https://apigw.trendyol.com/integration/product/sellers/{SUPPLIER_ID}/products/approved"
+    token = base64.b64encode(f"{API_KEY}:{API_SECRET}".encode("utf-8")).decode("utf-8")
+    headers = {"Authorization": f"Basic {token}"}
+    import aiohttp
+    timeout = aiohttp.ClientTimeout(total=PAGE_TIMEOUT_SECONDS)
+
+    async def fetch(page: int) -> dict:
+        params = {"page": page, "size": V2_MAX_PAGE_SIZE}
+        async with session.get(url, headers=headers, params=params, timeout=timeout) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+        if not isinstance(data.get("content"), list):
+            raise ValueError(f"Sayfa {page}: content liste değil")
+        return data
+
+    return fetch
+
+
+async def _fetch_with_retry(fetch_page, page: int) -> dict:
+    for attempt in range(1, PAGE_RETRIES + 1):
+        try:
+            return await fetch_page(page)
+        except Exception as e:
+            if attempt == PAGE_RETRIES:
+                raise
+            logger.warning(f"[URUN-IMPORT] sayfa {page} hata ({attempt}/{PAGE_RETRIES}): {e}")
+            await asyncio.sleep(2 ** attempt)
+
+
+async def iter_pages(fetch_page, start_page: int = 0):
+    """(sayfa_no, toplam_sayfa, düz ürün listesi) üretir; en fazla PREFETCH_PAGES sayfa önden."""
+    first = await _fetch_with_retry(fetch_page, start_page)
+    total_pages = int(first.get("totalPages") or 0)
+    if int(first.get("totalElements") or 0) > 10000:
+        logger.warning("[URUN-IMPORT] V2 sayfalama limiti: 10.000+ içerik var, nextPageToken desteği gerekebilir.")
+    yield start_page, total_pages, _active(flatten_v2_page(first))
+
+    inflight: deque = deque()
+    next_page = start_page + 1
+    try:
+        while next_page < total_pages or inflight:
+            while next_page < total_pages and len(inflight) < PREFETCH_PAGES:
+                inflight.append((next_page, asyncio.ensure_future(_fetch_with_retry(fetch_page, next_page))))
+                next_page += 1
+            page, task = inflight.popleft()
+            yield page, total_pages, _active(flatten_v2_page(await task))
+    finally:
+        for _, task in inflight:
+            task.cancel()
+
+
+def _active(products) -> list[dict]:
+    # v1'deki archived=false filtresinin V2 karşılığı: arşivli varyantları ele
+    return [p for p in products if isinstance(p, dict) and not p.get("archived")]
+
+
+# ---------------------------------------------------------------------------
+# Parça işleme
+# ---------------------------------------------------------------------------
+def import_chunk(run: ProductImportRun, products: list[dict], last_page: int, images_folder: str) -> list:
+    """Bir parçayı doğrular, hash ile ayıklar, yazar ve ilerlemeyle birlikte commit eder.
+
+    Dönüş: değişen satırların görsel indirme listesi.
+    """
+    built: dict[str, tuple] = {}
+    skipped = 0
+    for pd in products:
+        row, download = build_product_row(pd, images_folder)
+        if row is None or row["barcode"] in built:
+            skipped += 1
+            continue
+        built[row["barcode"]] = (row, download, content_hash(row, download))
+
+    barcodes = list(built)
+    archived = {b for (b,) in db.session.query(ProductArchive.barcode)
+                .filter(ProductArchive.barcode.in_(barcodes)).all()} if barcodes else set()
+    stored = {b: (h, seen) for b, h, seen in db.session.query(
+        ProductImportHash.barcode, ProductImportHash.content_hash, ProductImportHash.seen_run)
+        .filter(ProductImportHash.barcode.in_(barcodes)).all()} if barcodes else {}
+    # Ürün başka yoldan (panel/arşiv/ham SQL) silinmişse hash tek başına
+    # "değişmedi" demeye yetmez: satır yoksa yeniden yazılır.
+    existing = {b for (b,) in db.session.query(Product.barcode)
+                .filter(Product.barcode.in_(list(stored))).all()} if stored else set()
+
+    changed, unchanged, downloads = [], [], []
+    for barcode, (row, download, digest) in built.items():
+        prev = stored.get(barcode)
+        if prev and barcode not in existing:
+            prev = None
+        if barcode in archived or (prev and prev[1] == run.id and prev[0] == digest):
+            skipped += 1                 # arşivde ya da bu çalışmada zaten işlendi
+        elif prev and prev[0] == digest:
+            unchanged.append(barcode)
+        else:
+            changed.append(row)
+            if download:
+                downloads.append(download)
+
+    if changed:
+        product_summary.queue_models(r["product_main_id"] for r in changed)
+        _upsert(Product, changed, UPDATE_FIELDS, **{product_summary.SUMMARY_QUEUED_OPTION: True})
+        now = datetime.utcnow()
+        _upsert(ProductImportHash,
+                [{"barcode": r["barcode"], "content_hash": built[r["barcode"]][2],
+                  "seen_run": run.id, "updated_at": now} for r in changed],
+                ("content_hash", "seen_run", "updated_at"))
+        from barcode_alias_helper import invalidate_barcode_cache
+        invalidate_barcode_cache()       # upsert event tetiklemez; yeni barkodlar çözümleme önbelleğine
+    if unchanged:
+        (db.session.query(ProductImportHash)
+         .filter(ProductImportHash.barcode.in_(unchanged))
+         .update({ProductImportHash.seen_run: run.id}, synchronize_session=False))
+
+    run.last_page = last_page
+    run.fetched += len(products)
+    run.changed += len(changed)
+    run.unchanged += len(unchanged)
+    run.skipped += skipped
+    run.updated_at = datetime.utcnow()
+    db.session.commit()
+    return downloads
+
+
+def delete_unseen(run: ProductImportRun) -> int:
+    """Bu çalışmada aktif listede görünmeyen ürünleri siler (ORM: görsel temizliği event'i çalışır)."""
+    seen = db.session.query(ProductImportHash.barcode).filter(ProductImportHash.seen_run == run.id)
+    to_delete = Product.query.filter(~Product.barcode.in_(seen)).all()
+    for p in to_delete:
+        db.session.delete(p)
+    (db.session.query(ProductImportHash)
+     .filter(ProductImportHash.seen_run != run.id)
+     .delete(synchronize_session=False))
+    return len(to_delete)
+
+
+# ---------------------------------------------------------------------------
+# Çalışma yaşam döngüsü
+# ---------------------------------------------------------------------------
+def latest_run() -> ProductImportRun | None:
+    return ProductImportRun.query.order_by(ProductImportRun.id.desc()).first()
+
+
+def is_running(now: datetime | None = None) -> bool:
+    run = latest_run()
+    now = now or datetime.utcnow()
+    return bool(run and run.status == "running" and run.updated_at and now - run.updated_at < STALE_RUN)
+
+
+def _resumable(now: datetime) -> ProductImportRun | None:
+    run = latest_run()
+    if not run or run.status == "completed" or now - (run.started_at or now) > RESUME_WINDOW:
+        return None
+    if run.status == "running" and run.updated_at and now - run.updated_at < STALE_RUN:
+        return None                      # başka worker hâlâ çalışıyor
+    return run
+
+
+async def run_import(fetch_page=None, *, download=None, delete_missing: bool = False,
+                     triggered_by: str | None = None, resume: bool = True) -> dict:
+    """Kataloğu akışlı içe aktarır; ``ProductImportRun.to_dict()`` döner.
+
+    ``fetch_page(page) -> dict`` verilmezse Trendyol V2 HTTP çekicisi kullanılır;
+    ``download(list)`` (async) değişen satırların görsellerini indirir.
+    """
+    now = datetime.utcnow()
+    run = _resumable(now) if resume else None
+    resumed = run is not None
+    if resumed:
+        run.status, run.error_message = "running", None
+        run.attempts += 1
+        run.updated_at = now
+        logger.info(f"[URUN-IMPORT] çalışma #{run.id} sayfa {run.last_page + 1}'den devam ediyor")
+    else:
+        run = ProductImportRun(status="running", triggered_by=triggered_by, last_page=-1,
+                               started_at=now, updated_at=now)
+        db.session.add(run)
+    db.session.commit()
+    run_id = run.id
+
+    images_folder = os.path.join(current_app.root_path, 'static', 'images')
+    session = None
+    try:
+        if fetch_page is None:
+            import aiohttp
+            session = aiohttp.ClientSession()
+            fetch_page = http_page_fetcher(session)
+        buffer: list[dict] = []
+        last_page = run.last_page
+        async for page, total_pages, products in iter_pages(fetch_page, run.last_page + 1):
+            run.total_pages = total_pages
+            buffer.extend(products)
+            last_page = page
+            if len(buffer) >= CHUNK_ROWS:
+                downloads = import_chunk(run, buffer, last_page, images_folder)
+                buffer = []
+                if downloads and download:
+                    await download(downloads)
+        downloads = import_chunk(run, buffer, last_page, images_folder)
+        if downloads and download:
+            await download(downloads)
+
+        if delete_missing and not resumed and run.fetched:
+            run.deleted = delete_unseen(run)
+        elif delete_missing:
+            logger.warning(f"[URUN-IMPORT] çalışma #{run.id}: devam eden/boş çalışmada silme atlandı")
+        run.status = "completed"
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"[URUN-IMPORT] çalışma #{run.id} tamamlandı: {run.fetched} satır, "
+                    f"{run.changed} yazıldı, {run.unchanged} değişmedi, {run.skipped} atlandı, "
+                    f"{run.deleted} silindi")
+    except Exception as e:
+        db.session.rollback()
+        run = db.session.get(ProductImportRun, run_id)
+        run.status = "failed"
+        run.error_message = str(e)[:1000]
+        db.session.commit()
+        logger.exception(f"[URUN-IMPORT] çalışma #{run_id} sayfa {run.last_page + 1}'de durdu")
+    finally:
+        if session is not None:
+            await session.close()
+    return run.to_dict()
+
+
+def ensure_tables_exist() -> None:
+    try:
+        bind = db.session.get_bind()
+        for model in (ProductImportRun, ProductImportHash):
+            model.__table__.create(bind=bind, checkfirst=True)
+    except Exception:
+        db.session.rollback()
+        logger.exception("[URUN-IMPORT] içe aktarma tabloları hazırlanamadı")
@@ -5,6 +5,7 @@ import asyncio
 import json
 from datetime import datetime
 from models import db, Product
+from barcode_alias_helper import invalidate_barcode_cache
 from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID
 from trendyol_v2 import flatten_v2_page, V2_MAX_PAGE_SIZE
 import logging
@@ -147,6 +148,7 @@ def process_all_products(all_products_data):
 
         if new_products:
             db.session.bulk_save_objects(new_products)
+            invalidate_barcode_cache()  # bulk_save_objects event tetiklemez
             logger.info(f"Toplam {len(new_products)} yeni ürün eklendi")
 
         if updated_products:
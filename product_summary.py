@@ -0,0 +1,423 @@
+"""Ürün listesi için ``product_model_summary`` — model başına tek satır özet.
+
+SORUN
+-----
+``get_products.product_list`` model bazında sayfalayıp her sayfada sayfadaki
+tüm varyantları, merkez stokları, raf bilgisini ve Shopify eşleşmelerini ayrı
+``.all()`` sorgularıyla yüklüyor, ardından Python'da model → renk → beden
+hiyerarşisine grupluyordu. Kartların çoğu hiç açılmadığı halde her sayfa
+yüzlerce varyant satırı taşıyordu; pazaryeri filtresi de products üzerinde
+``ILIKE`` + alt sorgularla sayım yapıyordu.
+
+ÇÖZÜM
+-----
+- ``product_model_summary``: model başına başlık, ilk görsel, renkler (renk
+  başına görsel / stok / varyant sayısı), bedenler, toplam merkez stok, fiyat
+  aralığı ve pazaryeri bayrakları. Liste sayfası yalnızca bu tabloyu okur;
+  beden detayı kart açılınca ``/api/product_model_variants`` ile gelir.
+- Senkron: Product / CentralStock / ShopifyMapping ORM yazımları etkilenen
+  modeli (stok ve eşleşmede barkod → model) session kuyruğuna ekler;
+  ``before_commit`` anında yalnız bu modellerin satırları yeniden hesaplanır.
+  Session üzerinden toplu DML'i çalıştıran bilinen yollar (Trendyol upsert'i,
+  arşiv silme, katalog içe aktarma) etkilenen modelleri ``queue_models`` ile
+  ekleyip ``SUMMARY_QUEUED_OPTION`` verir. Seçeneksiz toplu DML hangi
+  modellere dokunduğunu taşımaz: çağıranın commit'inde tam yeniden kurma
+  yapılmaz, aynı işlemde ``platform_configs(product_summary)`` üzerine
+  "bayat" işareti yazılır ve ``refresh_stale`` (zamanlanmış job) özeti
+  yeniden kurar. ``rebuild_product_summary`` gece tam yeniden kurar.
+
+Tablo hazır değilse (migration/oluşturma yok) liste eski varyant yoluna düşer.
+Boş tablonun ilk doldurulması PG'de advisory lock altında yapılır; tablo,
+doldurmayı hangi worker yaparsa yapsın her süreçte hazır işaretlenir.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, inspect as sa_inspect, text
+from sqlalchemy.orm import object_session
+
+from models import db, Product, CentralStock, ShopifyMapping, ProductModelSummary, PlatformConfig
+
+logger = logging.getLogger(__name__)
+
+_PENDING_MODELS_KEY = "_product_summary_models"
+_PENDING_BARCODES_KEY = "_product_summary_barcodes"
+_STALE_KEY = "_product_summary_stale"
+_ready_urls: set[str] = set()
+
+STALE_PLATFORM = "product_summary"   # platform_configs satırı: extra_config.stale_since
+REBUILD_LOCK_KEY = 0x706D73          # pg_advisory_xact_lock anahtarı ("pms")
+
+REFRESH_CHUNK_SIZE = 500
+_WATCHED_TABLES = {
+    Product.__tablename__, CentralStock.__tablename__, ShopifyMapping.__tablename__,
+}
+_DEFAULT_COLOR = "Diğer"
+# Toplu DML'de bu execution option verilirse tam yeniden kurma tetiklenmez
+SUMMARY_QUEUED_OPTION = "product_summary_queued"
+
+_SOURCE_FIELDS = (
+    "barcode", "product_main_id", "title", "images", "color", "size", "sale_price",
+    "platforms", "trendyol_id", "amazon_asin", "idefix_product_id",
+)
+
+
+def is_ready(sess=None) -> bool:
+    sess = sess or db.session
+    return str(sess.get_bind().url) in _ready_urls
+
+
+def _mark_ready(sess) -> None:
+    _ready_urls.add(str(sess.get_bind().url))
+
+
+# ---------------------------------------------------------------------------
+# Özet satırı hesaplama
+# ---------------------------------------------------------------------------
+def first_image(images) -> str | None:
+    first = str(images or "").split(",")[0].strip()
+    return first or None
+
+
+def sort_sizes(sizes) -> list:
+    """Bedenleri büyükten küçüğe sıralar (sayısal değilse metin olarak)."""
+    try:
+        return sorted(sizes, key=lambda s: float(s), reverse=True)
+    except (ValueError, TypeError):
+        return sorted(sizes, key=lambda s: str(s), reverse=True)
+
+
+def _platform_flags(row, shopify_barcodes) -> dict:
+    text = row.platforms or ""
+    flags = {
+        "on_trendyol": bool(row.trendyol_id or '"trendyol"' in text),
+        "on_amazon": bool(row.amazon_asin),
+        "on_idefix": bool(row.idefix_product_id or '"idefix"' in text),
+        "on_hepsiburada": '"hepsiburada"' in text,
+        "on_shopify": row.barcode in shopify_barcodes or '"shopify"' in text,
+    }
+    # _apply_marketplace_filter('none') ile aynı tanım
+    flags["unlisted"] = (
+        row.amazon_asin is None and row.idefix_product_id is None
+        and row.barcode not in shopify_barcodes
+        and not row.trendyol_id and text in ("", "[]")
+    )
+    return flags
+
+
+def build_summary_row(model_id: str, rows, stock_by_barcode: dict, shopify_barcodes: set) -> dict | None:
+    """Bir modelin varyant satırlarından özet satırı (varyant yoksa None)."""
+    if not rows:
+        return None
+    rows = sorted(rows, key=lambda r: (r.color or "", r.size or ""))
+    rep = rows[0]
+    colors: dict[str, dict] = {}
+    flags = dict.fromkeys(("on_trendyol", "on_amazon", "on_idefix", "on_hepsiburada",
+                           "on_shopify", "unlisted"), False)
+    prices = []
+    total_stock = 0
+    for r in rows:
+        qty = int(stock_by_barcode.get(r.barcode) or 0)
+        total_stock += qty
+        c = colors.setdefault(r.color or _DEFAULT_COLOR,
+                              {"color": r.color or _DEFAULT_COLOR, "image": first_image(r.images),
+                               "stock": 0, "variants": 0})
+        c["stock"] += qty
+        c["variants"] += 1
+        if r.sale_price is not None:
+            prices.append(float(r.sale_price))
+        for k, v in _platform_flags(r, shopify_barcodes).items():
+            flags[k] = flags[k] or v
+    sizes = sort_sizes(list(dict.fromkeys(r.size for r in rows if r.size)))
+    return {
+        "model_id": model_id,
+        "title": rep.title,
+        "image": first_image(rep.images),
+        "colors": json.dumps(list(colors.values()), ensure_ascii=False),
+        "sizes": json.dumps(sizes, ensure_ascii=False),
+        "variant_count": len(rows),
+        "total_stock": total_stock,
+        "min_price": min(prices, default=None),
+        "max_price": max(prices, default=None),
+        **flags,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def _source_query(sess):
+    # Yalnız gereken kolonlar: ORM nesnesi/identity map yükü yok
+    return sess.query(*(getattr(Product, f) for f in _SOURCE_FIELDS)).filter(
+        Product.product_main_id.isnot(None), Product.product_main_id != "")
+
+
+def _stock_and_shopify(sess, barcodes) -> tuple[dict, set]:
+    stock, shopify = {}, set()
+    barcodes = list(barcodes)
+    for i in range(0, len(barcodes), REFRESH_CHUNK_SIZE):
+        chunk = barcodes[i:i + REFRESH_CHUNK_SIZE]
+        stock.update(sess.query(CentralStock.barcode, CentralStock.qty)
+                     .filter(CentralStock.barcode.in_(chunk)).all())
+        shopify.update(b for (b,) in sess.query(ShopifyMapping.barcode)
+                       .filter(ShopifyMapping.barcode.in_(chunk)).distinct().all())
+    return stock, shopify
+
+
+def _write(sess, model_ids, by_model) -> int:
+    table = ProductModelSummary.__table__
+    stock, shopify = _stock_and_shopify(
+        sess, [r.barcode for rows in by_model.values() for r in rows])
+    rows = [r for r in (build_summary_row(m, by_model.get(m), stock, shopify) for m in model_ids) if r]
+    sess.execute(table.delete().where(table.c.model_id.in_(list(model_ids))))
+    if rows:
+        sess.execute(table.insert(), rows)
+    return len(rows)
+
+
+def refresh_models(model_ids, sess=None) -> int:
+    """Verilen modellerin özet satırlarını kaynak tablolardan yeniden yazar."""
+    sess = sess or db.session
+    ordered = sorted({m for m in model_ids if m})
+    written = 0
+    for i in range(0, len(ordered), REFRESH_CHUNK_SIZE):
+        chunk = ordered[i:i + REFRESH_CHUNK_SIZE]
+        by_model: dict[str, list] = {}
+        with sess.no_autoflush:
+            for r in _source_query(sess).filter(Product.product_main_id.in_(chunk)).all():
+                by_model.setdefault(r.product_main_id, []).append(r)
+            written += _write(sess, chunk, by_model)
+    return written
+
+
+def models_for_barcodes(barcodes, sess=None) -> set[str]:
+    sess = sess or db.session
+    barcodes = [b for b in barcodes if b]
+    found: set[str] = set()
+    for i in range(0, len(barcodes), REFRESH_CHUNK_SIZE):
+        found.update(m for (m,) in sess.query(Product.product_main_id)
+                     .filter(Product.barcode.in_(barcodes[i:i + REFRESH_CHUNK_SIZE])).distinct().all()
+                     if m)
+    return found
+
+
+# ---------------------------------------------------------------------------
+# Senkron: event'ler + toplu yollar
+# ---------------------------------------------------------------------------
+def _queue(sess, key, values) -> None:
+    if sess is None:
+        return
+    sess.info.setdefault(key, set()).update(v for v in values if v)
+
+
+def _track_product(mapper, connection, target):
+    _queue(object_session(target), _PENDING_MODELS_KEY, [target.product_main_id])
+
+
+def _track_barcode(mapper, connection, target):
+    _queue(object_session(target), _PENDING_BARCODES_KEY, [target.barcode])
+
+
+def _track_old_model(target, value, oldvalue, initiator):
+    # Model kodu değişirse eski grubun özeti de yenilenmeli (active_history: eski değer yüklenir)
+    if isinstance(oldvalue, str) and oldvalue != value:
+        _queue(object_session(target), _PENDING_MODELS_KEY, [oldvalue])
+
+
+def _track_old_barcode(target, value, oldvalue, initiator):
+    if isinstance(oldvalue, str) and oldvalue != value:
+        _queue(object_session(target), _PENDING_BARCODES_KEY, [oldvalue])
+
+
+def _on_orm_execute(state):
+    # Session üzerinden toplu DML (PG upsert, query.update/delete) mapper event'i tetiklemez
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    if state.execution_options.get(SUMMARY_QUEUED_OPTION):
+        return                            # çağıran modelleri queue_models ile zaten ekledi
+    table = getattr(getattr(state.statement, "table", None), "name", None)
+    if table in _WATCHED_TABLES:
+        state.session.info[_STALE_KEY] = True   # modeller bilinmiyor → zamanlanmış job
+
+
+def queue_models(model_ids) -> None:
+    """Event tetiklemeyen yollar (ham SQL) için commit ÖNCESİ çağrılır."""
+    _queue(db.session(), _PENDING_MODELS_KEY, model_ids)
+
+
+def queue_product_rows(rows) -> None:
+    """Product toplu upsert/silme ÖNCESİ çağrılır: satırların yeni ve (barkoda göre) mevcut modelleri.
+
+    DML'e ``SUMMARY_QUEUED_OPTION`` verilmelidir (yoksa özet bayat işaretlenir).
+    """
+    rows = list(rows)
+    queue_models(r.get("product_main_id") for r in rows)
+    queue_models(models_for_barcodes([r.get("barcode") for r in rows]))
+
+
+def _apply_pending(sess):
+    if not is_ready(sess):
+        _discard_pending(sess)
+        return
+    if sess.new or sess.dirty or sess.deleted:
+        sess.flush()
+    stale = sess.info.pop(_STALE_KEY, False)
+    models = sess.info.pop(_PENDING_MODELS_KEY, None) or set()
+    barcodes = sess.info.pop(_PENDING_BARCODES_KEY, None)
+    if stale:
+        _mark_stale(sess)
+    if barcodes:
+        models |= models_for_barcodes(barcodes, sess)
+    if models:
+        refresh_models(models, sess)
+
+
+def _discard_pending(sess):
+    for key in (_PENDING_MODELS_KEY, _PENDING_BARCODES_KEY, _STALE_KEY):
+        sess.info.pop(key, None)
+
+
+def _mark_stale(sess) -> None:
+    """Bayat işaretini çağıranın işleminde yazar (upsert: eşzamanlı ilk yazımda çakışma yok)."""
+    if sess.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    now = datetime.utcnow()
+    stmt = insert(PlatformConfig.__table__).values(
+        platform=STALE_PLATFORM, is_active=True, extra_config={"stale_since": now.isoformat()},
+        created_at=now, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["platform"],
+        set_={"extra_config": stmt.excluded.extra_config, "updated_at": now})
+    sess.execute(stmt)
+
+
+def refresh_stale() -> dict | None:
+    """Bayat işareti varsa özeti yeniden kurar; kurma sırasında gelen yeni işaret korunur."""
+    cfg = PlatformConfig.query.filter_by(platform=STALE_PLATFORM).first()
+    stamp = (cfg.extra_config or {}).get("stale_since") if cfg else None
+    if not stamp:
+        return None
+    result = rebuild_product_summary()
+    cfg = PlatformConfig.query.filter_by(platform=STALE_PLATFORM).with_for_update().first()
+    if cfg and (cfg.extra_config or {}).get("stale_since") == stamp:
+        cfg.extra_config = {}
+    db.session.commit()
+    return result
+
+
+def install_listeners() -> None:
+    """Bir kez çağrılır (tekrar çağrı no-op)."""
+    if event.contains(Product, "after_insert", _track_product):
+        return
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(Product, name, _track_product)
+        event.listen(CentralStock, name, _track_barcode)
+        event.listen(ShopifyMapping, name, _track_barcode)
+    event.listen(Product.product_main_id, "set", _track_old_model, active_history=True)
+    event.listen(ShopifyMapping.barcode, "set", _track_old_barcode, active_history=True)
+    event.listen(db.session, "do_orm_execute", _on_orm_execute)
+    event.listen(db.session, "before_commit", _apply_pending)
+    event.listen(db.session, "after_rollback", _discard_pending)
+    logger.info("[PRODUCT-SUMMARY] event listeners yüklendi.")
+
+
+# ---------------------------------------------------------------------------
+# Tam yeniden kurma + tablo garantisi
+# ---------------------------------------------------------------------------
+def rebuild_product_summary(commit: bool = True, sess=None) -> dict:
+    """Özeti tüm ürünlerden sıfırdan kurar."""
+    sess = sess or db.session
+    by_model: dict[str, list] = {}
+    with sess.no_autoflush:
+        for r in _source_query(sess).yield_per(2000):
+            by_model.setdefault(r.product_main_id, []).append(r)
+        stock = dict(sess.query(CentralStock.barcode, CentralStock.qty).all())
+        shopify = {b for (b,) in sess.query(ShopifyMapping.barcode).distinct().all()}
+    rows = [r for r in (build_summary_row(m, rs, stock, shopify) for m, rs in by_model.items()) if r]
+    sess.query(ProductModelSummary).delete(synchronize_session=False)
+    table = ProductModelSummary.__table__
+    for i in range(0, len(rows), REFRESH_CHUNK_SIZE):
+        sess.execute(table.insert(), rows[i:i + REFRESH_CHUNK_SIZE])
+    if commit:
+        sess.commit()
+    _mark_ready(sess)
+    logger.info(f"[PRODUCT-SUMMARY] özet yeniden kuruldu: {len(rows)} model")
+    return {"models": len(rows)}
+
+
+def _is_empty() -> bool:
+    return db.session.query(ProductModelSummary.model_id).first() is None
+
+
+def ensure_table_exists() -> None:
+    """Tablo yoksa oluşturup doldurur; varsa etkinleştirir."""
+    try:
+        bind = db.session.get_bind()
+        created = not sa_inspect(bind).has_table(ProductModelSummary.__tablename__)
+        if created:
+            ProductModelSummary.__table__.create(bind=bind, checkfirst=True)
+        # Tablo var: bakım bu süreçte de açık (doldurmayı başka worker yapsa bile)
+        _mark_ready(db.session)
+        # Migration ile boş açılan tablo da ilk açılışta doldurulur; worker'lar
+        # yarışmasın diye PG'de kilit alınıp boşluk kilit altında yeniden sorulur
+        if _is_empty():
+            if bind.dialect.name == "postgresql":
+                db.session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": REBUILD_LOCK_KEY})
+            if _is_empty():
+                rebuild_product_summary()
+            else:
+                db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("[PRODUCT-SUMMARY] product_model_summary hazırlanamadı (varyant listesine düşülür)")
+
+
+# ---------------------------------------------------------------------------
+# Liste sayfası
+# ---------------------------------------------------------------------------
+_MARKETPLACE_FLAGS = {
+    "amazon": ProductModelSummary.on_amazon,
+    "trendyol": ProductModelSummary.on_trendyol,
+    "idefix": ProductModelSummary.on_idefix,
+    "hepsiburada": ProductModelSummary.on_hepsiburada,
+    "shopify": ProductModelSummary.on_shopify,
+    "none": ProductModelSummary.unlisted,
+}
+
+
+def _summary_query(marketplace: str = ""):
+    q = ProductModelSummary.query
+    flag = _MARKETPLACE_FLAGS.get(marketplace)
+    return q.filter(flag.is_(True)) if flag is not None else q
+
+
+def count_models(marketplace: str = "") -> int:
+    return _summary_query(marketplace).count()
+
+
+def page_summaries(page: int, per_page: int, marketplace: str = "") -> list[dict]:
+    """Sayfadaki model özetleri — model koduna göre sıralı."""
+    rows = (_summary_query(marketplace).order_by(ProductModelSummary.model_id)
+            .offset(max(page - 1, 0) * per_page).limit(per_page).all())
+    return [to_view(r) for r in rows]
+
+
+def to_view(row: ProductModelSummary) -> dict:
+    return {
+        "model_id": row.model_id,
+        "title": row.title,
+        "image": row.image,
+        "colors": json.loads(row.colors or "[]"),
+        "sizes": json.loads(row.sizes or "[]"),
+        "variant_count": row.variant_count,
+        "total_stock": row.total_stock,
+        "min_price": row.min_price,
+        "max_price": row.max_price,
+        "platforms": {
+            "trendyol": row.on_trendyol, "amazon": row.on_amazon,
+            "idefix": row.on_idefix, "shopify": row.on_shopify,
+        },
+    }
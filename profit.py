@@ -241,6 +241,37 @@ def save_missing_costs():
 # --------------------------------------------------------------------------
 # Ana rapor
 # --------------------------------------------------------------------------
+def _kpi_summary(start_date_str, end_date_str, exchange_rate: Decimal):
+    """Seçili aralığın (tarih yoksa bu ayın) ``kpi_daily`` toplamları.
+
+    Tam analiz beklenmeden gösterilen hızlı özet; tablo hazır değilse / hata → None.
+    """
+    try:
+        import kpi_rollup
+        if not kpi_rollup.is_ready():
+            return None
+        if start_date_str and end_date_str:
+            start = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+        else:
+            start, end = kpi_rollup.month_bounds(kpi_rollup.today_ist())
+        if end < start:
+            return None
+        totals = kpi_rollup.range_totals(start, end)
+    except Exception as e:
+        db.session.rollback()
+        logging.warning("KPI özeti okunamadı: %s", e)
+        return None
+
+    summary = dict(totals, start=start.strftime("%d.%m.%Y"), end=end.strftime("%d.%m.%Y"))
+    cost_tl = d(totals["cost_usd"]) * exchange_rate if exchange_rate > 0 else None
+    summary["cost_tl"] = cost_tl
+    for key in ("gross", "discount", "net", "commission"):
+        summary[key + "_str"] = format_number(d(totals[key]))
+    summary["cost_tl_str"] = format_number(cost_tl) if cost_tl is not None else None
+    return summary
+
+
 @profit_bp.route("/", methods=["GET", "POST"])
 def profit_report():
     if request.method == "POST":
@@ -282,6 +313,9 @@ def profit_report():
     form_exchange_rate = d(context["exchange_rate"])
     context["exchange_rate_str"] = format_number(form_exchange_rate)
 
+    # Hızlı özet (günlük KPI tablosundan; sipariş taraması yok)
+    context["kpi_summary"] = _kpi_summary(context["start_date"], context["end_date"], form_exchange_rate)
+
     if request.method == "POST" or request.args.get("auto_reload") == "1":
         analysis_temp = []
         cancelled_orders_temp = []
@@ -0,0 +1,249 @@
+"""Sık yoklanan JSON uç noktaları için paylaşımlı yanıt önbelleği + ETag/304 + gzip.
+
+SORUN
+-----
+``/api/canli/ozet`` (canlı panel) her açık sekmeden periyodik yoklanıyor ve her
+çağrıda satış, iade, ürün bilgisi, stok ve kart gruplamasını baştan
+hesaplıyordu; ``/api/home/status-counts`` da her yoklamada statü sayımlarını ve
+Shopify API çağrısını tekrarlıyordu. Aynı parametrelerle N sekme = N kez aynı
+iş; yanıt değişmemiş olsa da her seferinde tam JSON gönderiliyordu.
+
+ÇÖZÜM
+-----
+``serve(name, compute, ...)``:
+- Anahtar: uç nokta adı + normalize parametreler (sıralı, boşlar atılmış) +
+  etiket nesilleri (``orders`` / ``stock``). Girdi: gzip'li JSON gövdesi,
+  içerik hash'i (ETag; ``volatile`` alanlar hariç) ve tazelik sınırı —
+  ``cache_config`` Redis'inde, tüm worker'lar arasında paylaşılır.
+- Geçersiz kılma: sipariş / iade / stok tablolarındaki ORM yazımları ve session
+  üzerinden DML (``query.delete()``, Core insert) commit sonrası ilgili
+  etiketin neslini artırır; eski girdilere artık erişilmez, TTL ile düşer.
+  ``bulk_insert_mappings`` event tetiklemez → commit öncesi ``invalidate(tag)``.
+- İzdiham kilidi: taze girdi yoksa ``SET NX`` kilidini alan TEK worker
+  hesaplar; diğerleri bayat girdiyi döner ya da (girdi hiç yoksa) kısa süre
+  bekleyip yazılanı okur.
+- Yanıt: ``If-None-Match`` eşleşirse 304; istemci kabul ediyorsa gzip gövde
+  olduğu gibi, etmiyorsa açılarak gönderilir.
+
+Redis'e ulaşılamazsa BACKEND_RETRY_SECONDS boyunca önbellek atlanır, her
+istek doğrudan hesaplanır (eski davranış). install_listeners() çağrılmamışsa
+(script, izole test) commit'ler nesil artırmaz; girdiler yalnız TTL ile tazelenir.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import time
+
+from flask import Response, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from cache_config import cache
+from models import (
+    db, OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped, OrderDelivered,
+    OrderCancelled, ReturnOrder, ReturnProduct, CentralStock, StockMovement,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "resp"
+LOCK_SECONDS = 30             # hesaplayan worker ölürse kilit en geç bu sürede düşer
+WAIT_SECONDS = 5.0            # girdi hiç yokken kilidi alamayan worker'ın bekleme üst sınırı
+WAIT_STEP = 0.05
+STALE_SECONDS = 120           # tazelik bittikten sonra yenilenirken bayat servis süresi
+BACKEND_RETRY_SECONDS = 30
+IGNORED_PARAMS = {"_", "t", "ts"}   # istemci cache-buster'ları
+
+TAG_MODELS = {
+    "orders": (OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped, OrderDelivered,
+               OrderCancelled, ReturnOrder, ReturnProduct),
+    "stock": (CentralStock, StockMovement),
+}
+_TAG_BY_TABLE = {m.__tablename__: tag for tag, models in TAG_MODELS.items() for m in models}
+_DIRTY_KEY = "_response_cache_dirty"
+
+_backend_down_until = 0.0
+
+
+# ---------------------------------------------------------------------------
+# Anahtar + girdi
+# ---------------------------------------------------------------------------
+def normalize_params(params) -> str:
+    """MultiDict/dict → sıralı, boşları ve cache-buster'ları atılmış sorgu dizgesi."""
+    items = params.items(multi=True) if hasattr(params, "getlist") else params.items()
+    pairs = sorted((str(k), str(v).strip()) for k, v in items
+                   if k not in IGNORED_PARAMS and v is not None and str(v).strip() != "")
+    return "&".join(f"{k}={v}" for k, v in pairs)
+
+
+def _gen_key(tag: str) -> str:
+    return f"{KEY_PREFIX}:gen:{tag}"
+
+
+def _entry_key(name: str, params, tags) -> str:
+    gens = cache.get_many(*(_gen_key(t) for t in tags)) if tags else []
+    gen = ".".join(str(g or 0) for g in gens)
+    digest = hashlib.sha1(normalize_params(params).encode("utf-8")).hexdigest()[:20]
+    return f"{KEY_PREFIX}:{name}:{gen}:{digest}"
+
+
+def _dumps(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def build_entry(payload, ttl: float, volatile=()) -> dict:
+    body = _dumps(payload)
+    hashed = body
+    if volatile and isinstance(payload, dict):
+        hashed = _dumps({k: v for k, v in payload.items() if k not in volatile})
+    return {
+        "body": gzip.compress(body, compresslevel=6, mtime=0),
+        "etag": hashlib.sha1(hashed).hexdigest(),
+        "fresh_until": time.time() + ttl,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Yanıt
+# ---------------------------------------------------------------------------
+def respond(entry: dict, state: str) -> Response:
+    headers = {
+        "ETag": f'"{entry["etag"]}"',
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Cache": state,
+    }
+    if request.if_none_match.contains(entry["etag"]):
+        return Response(status=304, headers=headers)
+    if "gzip" in request.accept_encodings:
+        resp = Response(entry["body"], mimetype="application/json", headers=headers)
+        resp.headers["Content-Encoding"] = "gzip"
+        return resp
+    return Response(gzip.decompress(entry["body"]), mimetype="application/json", headers=headers)
+
+
+def _backend_failed(exc) -> None:
+    global _backend_down_until
+    if time.time() >= _backend_down_until:
+        logger.warning(f"[RESP-CACHE] önbellek arka ucu kullanılamıyor, {BACKEND_RETRY_SECONDS} sn "
+                       f"doğrudan hesaplanacak: {exc}")
+    _backend_down_until = time.time() + BACKEND_RETRY_SECONDS
+
+
+def _wait_for(key: str, since: float):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry and entry["fresh_until"] > since:
+            return entry
+    return None
+
+
+def serve(name: str, compute, *, params=None, ttl: float = 20, tags=(), volatile=()) -> Response:
+    """``compute()`` sonucunu (JSON'a çevrilebilir) önbellekli, ETag'li yanıt olarak döner.
+
+    ``params`` verilmezse ``request.args`` kullanılır; çağıran eşdeğer istekleri
+    (ör. preset=today ile bugünün tarih aralığı) tek anahtara indirmek için
+    normalize edilmiş parametre sözlüğü verebilir.
+    """
+    if time.time() < _backend_down_until:
+        return respond(build_entry(compute(), ttl, volatile), "BYPASS")
+    try:
+        key = _entry_key(name, request.args if params is None else params, tags)
+        entry = cache.get(key)
+        now = time.time()
+        if entry and entry["fresh_until"] > now:
+            return respond(entry, "HIT")
+        lock_key = f"{key}:lock"
+        locked = cache.add(lock_key, 1, timeout=LOCK_SECONDS)
+    except Exception as e:
+        _backend_failed(e)
+        return respond(build_entry(compute(), ttl, volatile), "BYPASS")
+
+    if locked:
+        try:
+            entry = build_entry(compute(), ttl, volatile)
+            try:
+                cache.set(key, entry, timeout=int(ttl + STALE_SECONDS))
+            except Exception as e:
+                _backend_failed(e)
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass
+        return respond(entry, "MISS")
+
+    if entry:
+        return respond(entry, "STALE")           # başka worker yeniliyor
+    try:
+        waited = _wait_for(key, now)
+    except Exception as e:
+        _backend_failed(e)
+        waited = None
+    if waited:
+        return respond(waited, "WAIT")
+    return respond(build_entry(compute(), ttl, volatile), "BYPASS")
+
+
+# ---------------------------------------------------------------------------
+# Geçersiz kılma
+# ---------------------------------------------------------------------------
+def invalidate(*tags, sess=None) -> None:
+    """Event tetiklemeyen toplu yazımlarda (bulk_insert_mappings) commit ÖNCESİ çağrılır."""
+    (sess or db.session()).info.setdefault(_DIRTY_KEY, set()).update(tags)
+
+
+def bump(*tags) -> None:
+    """Etiketlerin neslini hemen artırır (uygulama bağlamı gerekir)."""
+    for tag in tags:
+        try:
+            cache.cache.inc(_gen_key(tag))    # Redis INCR: worker'lar arası atomik
+        except Exception as e:
+            _backend_failed(e)
+            return
+
+
+def _mark(mapper, connection, target):
+    tag = _TAG_BY_TABLE.get(mapper.local_table.name)
+    sess = object_session(target)
+    if tag and sess is not None:
+        sess.info.setdefault(_DIRTY_KEY, set()).add(tag)
+
+
+def _on_orm_execute(state):
+    # query(...).delete()/update() ve session üzerinden Core DML mapper event'i tetiklemez
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    tag = _TAG_BY_TABLE.get(getattr(getattr(state.statement, "table", None), "name", None))
+    if tag:
+        state.session.info.setdefault(_DIRTY_KEY, set()).add(tag)
+
+
+def _after_commit(sess):
+    tags = sess.info.pop(_DIRTY_KEY, None)
+    # Uygulama bağlamı dışı (script) commit'lerde girdiler TTL ile tazelenir
+    if tags and has_app_context():
+        bump(*sorted(tags))
+
+
+def _after_rollback(sess):
+    sess.info.pop(_DIRTY_KEY, None)
+
+
+def install_listeners() -> None:
+    """Bir kez çağrılır (tekrar çağrı no-op)."""
+    if event.contains(OrderCreated, "after_insert", _mark):
+        return
+    for models in TAG_MODELS.values():
+        for model in models:
+            for name in ("after_insert", "after_update", "after_delete"):
+                event.listen(model, name, _mark)
+    event.listen(db.session, "do_orm_execute", _on_orm_execute)
+    event.listen(db.session, "after_commit", _after_commit)
+    event.listen(db.session, "after_rollback", _after_rollback)
+    logger.info("[RESP-CACHE] geçersiz kılma listener'ları yüklendi.")
@@ -1,8 +1,55 @@
-from flask import Blueprint
+from flask import Blueprint, session
 
 health_bp = Blueprint('health', __name__)
 
+# Giriş gerektirmeyen yanıtlardan çıkarılan alanlar (süreç kimliği, ham hata metni)
+_PRIVATE_FIELDS = ('pid', 'host')
+_PRIVATE_JOB_FIELDS = ('last_error',)
+
+
+def _is_admin():
+    return session.get('role') == 'admin' and bool(session.get('totp_verified'))
+
+
 @health_bp.route('/health', methods=['GET'])
 def health_check():
     """Liveness/readiness probe endpoint"""
-    return {'status': 'ok'}, 200
\ No newline at end of file
+    return {'status': 'ok'}, 200
+
+@health_bp.route('/health/jobs', methods=['GET'])
+def job_status():
+    """Periyodik job'ların son durumu (job_runner heartbeat'inden).
+
+    Job'lar bu süreçte çalışmıyor olabilir (JOB_RUNNER=external); durum
+    PlatformConfig('job_runner') üzerinden okunur. Heartbeat bayatsa 503.
+    Probe'lar giriş yapmadan okur; pid/host ve ham hata metni yalnız admin'e.
+    """
+    import job_runner
+    status = job_runner.read_status()
+    code = 200 if status.get('alive') else 503
+    if _is_admin():
+        return status, code
+    public = {k: v for k, v in status.items() if k not in _PRIVATE_FIELDS}
+    public['jobs'] = {
+        job_id: {k: v for k, v in job.items() if k not in _PRIVATE_JOB_FIELDS}
+        for job_id, job in (status.get('jobs') or {}).items()
+    }
+    return public, code
+
+@health_bp.route('/health/log-writers', methods=['GET'])
+def log_writer_status():
+    """Bu süreçteki toplu log yazıcılarının kuyruk/yazım metrikleri.
+
+    Sayaçlar süreç başınadır (her gunicorn worker'ın kendi kuyruğu var);
+    hangi sürece ait olduğu (pid) yalnız admin'e gösterilir.
+    """
+    import os
+    import order_audit
+    import user_logs
+    data = {
+        'user_logs': user_logs.writer_metrics(),
+        'order_audit': order_audit.writer_metrics(),
+    }
+    if _is_admin():
+        data['pid'] = os.getpid()
+    return data, 200
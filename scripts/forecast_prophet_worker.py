@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""ForecastCache Prophet katmanı — web sürecinden AYRI çalışan worker.
+
+Toplu NumPy motoru (forecast_engine.run_batch_forecast) tüm barkodları web
+scheduler'ında dakikalar içinde günceller; Prophet ise yalnız en çok satan
+FORECAST_PROPHET_TOP_N (default 50) barkod için, CPU'yu web'den ayırmak adına
+bu süreçte çalışır ve sonucu avg_prophet / avg_final'e yazar.
+
+Çalıştırma (production DB'ye .env üzerinden bağlanır):
+    DISABLE_JOBS=1 python scripts/forecast_prophet_worker.py            # döngü
+    DISABLE_JOBS=1 python scripts/forecast_prophet_worker.py --once     # tek tur
+
+Ortam:
+    FORECAST_PROPHET_INTERVAL_MINUTES  iki tur arası bekleme (default 360)
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+os.environ.setdefault("DISABLE_JOBS", "1")
+os.environ.setdefault("WERKZEUG_RUN_MAIN", "false")
+
+logger = logging.getLogger("forecast_prophet_worker")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--once", action="store_true", help="tek tur çalış ve çık")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--top", type=int, default=None, help="FORECAST_PROPHET_TOP_N yerine")
+    args = parser.parse_args()
+    interval = int(os.environ.get("FORECAST_PROPHET_INTERVAL_MINUTES", "360")) * 60
+
+    from app import app
+    from models import db
+    from forecast_engine import run_prophet_tier
+
+    while True:
+        with app.app_context():
+            try:
+                result = run_prophet_tier(days=args.days, top_n=args.top)
+                print(f"✅ Prophet katmanı: {result['fitted']}/{result['barcodes']} barkod")
+            except Exception:
+                db.session.rollback()
+                logger.exception("Prophet katmanı hata")
+            finally:
+                db.session.remove()
+        if args.once:
+            break
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
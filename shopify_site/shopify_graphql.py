@@ -0,0 +1,287 @@
+"""Maliyet farkındalıklı asenkron Shopify GraphQL istemcisi.
+
+SORUN
+-----
+``ShopifyStockService._graphql`` her çağrıda yeni bağlantı açan bloklayan
+``requests.post`` kullanıyordu. ``push_stock`` 100'lük ``inventorySetQuantities``
+parçalarını sabit 0.25 sn uykuyla sırayla, ``_enable_tracking_for_mappings``
+ise 1000+ mutation'ı tek tek gönderiyordu. Shopify'ın sınırı istek sayısı değil
+sorgu MALİYETİ (leaky bucket) olduğundan bekleme süreleri ya boşa ya yetersizdi.
+
+ÇÖZÜM
+-----
+- Tek arka plan event loop thread'i + kalıcı aiohttp session (HTTP/1.1
+  keep-alive, bağlantı havuzu) — senkron çağıranlar ``query`` /
+  ``query_many`` ile coroutine'i bu loop'a gönderip sonucu bekler.
+- ``CostBucket`` yanıtlardaki ``extensions.cost.throttleStatus``
+  (maximumAvailable / currentlyAvailable / restoreRate) ile beslenir; her istek
+  göndermeden önce tahmini maliyetini ayırır, yanıtla birlikte fazla ayrılanı
+  (requested - actual) iade eder. Tahmin sorgu başına öğrenilir
+  (``requestedQueryCost``); ilk çağrıda ``DEFAULT_COST``.
+- ``query_many`` istekleri kovanın izin verdiği kadar eşzamanlı çalıştırır
+  (üst sınır ``SHOPIFY_GRAPHQL_MAX_IN_FLIGHT``). THROTTLED / 429 / 5xx /
+  bağlantı hataları backoff ile yeniden denenir; 401'de token yenilenir.
+  ``iter_many`` aynı işi sonuçları tamamlandıkça vererek yapar (çağıran her
+  parçayı hemen işleyip commit edebilir); ``call`` başka bir event loop'tan
+  (stock_sync adaptörü) aynı kova ve session ile await edilir.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import random
+import ssl
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import aiohttp
+import certifi
+
+from .shopify_config import ShopifyConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAXIMUM = 1000.0        # ilk yanıta kadar varsayılan kova (Standard plan)
+DEFAULT_RESTORE_RATE = 50.0     # puan/sn
+DEFAULT_COST = 10.0             # bilinmeyen sorgu için ilk tahmin
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.5          # saniye; 2^deneme ile büyür, ±%50 jitter
+
+
+def _max_in_flight() -> int:
+    try:
+        return max(1, int(os.environ.get("SHOPIFY_GRAPHQL_MAX_IN_FLIGHT", "8")))
+    except (TypeError, ValueError):
+        return 8
+
+
+class GraphQLError(RuntimeError):
+    """Yeniden denenmeyecek GraphQL / HTTP hatası."""
+
+
+class _Retryable(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CostBucket:
+    """Shopify maliyet kovasının yerel aynası (leaky bucket).
+
+    ``reserve`` yeterli puan birikene kadar bekler ve puanı düşer; ``settle``
+    sunucunun bildirdiği durumla yerel tahmini hizalar.
+    """
+
+    def __init__(self, maximum: float = DEFAULT_MAXIMUM, restore_rate: float = DEFAULT_RESTORE_RATE):
+        self.maximum = maximum
+        self.restore_rate = restore_rate
+        self.available = maximum
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.maximum, self.available + (now - self._updated) * self.restore_rate)
+        self._updated = now
+
+    async def reserve(self, cost: float) -> float:
+        """``cost`` kadar puan ayırır (gerekirse bekler); ayrılan puanı döndürür."""
+        cost = max(0.0, min(float(cost), self.maximum))
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available >= cost:
+                    self.available -= cost
+                    return cost
+                await asyncio.sleep((cost - self.available) / max(self.restore_rate, 1e-6))
+
+    def settle(self, reserved: float, cost: Optional[Dict[str, Any]]) -> None:
+        """Yanıt ``extensions.cost`` ile kovayı düzelt: iade + sunucu durumuna kırp."""
+        if not cost:
+            return
+        self._refill()
+        actual = cost.get("actualQueryCost")
+        if actual is not None:
+            self.available = min(self.maximum, self.available + max(0.0, reserved - float(actual)))
+        throttle = cost.get("throttleStatus") or {}
+        if throttle:
+            self.maximum = float(throttle.get("maximumAvailable") or self.maximum)
+            self.restore_rate = float(throttle.get("restoreRate") or self.restore_rate)
+            current = throttle.get("currentlyAvailable")
+            if current is not None:
+                self.available = min(self.available, float(current), self.maximum)
+
+
+class ShopifyGraphQLClient:
+    """Arka plan loop'unda çalışan, maliyet kovasıyla hızlanan GraphQL istemcisi."""
+
+    def __init__(self, config=ShopifyConfig):
+        self.config = config
+        self.bucket = CostBucket()
+        self._cost_hints: Dict[str, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0, "peak_in_flight": 0}
+        self._active = 0
+
+    # ── arka plan loop'u ──────────────────────────────────────────
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or not self._thread or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="shopify-graphql", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+                self._session, self._in_flight = None, None
+            return self._loop
+
+    def shutdown(self) -> None:
+        """Session'ı kapat, loop'u durdurup thread'i bekle (sonraki çağrı yenisini açar)."""
+        with self._start_lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+        if loop is None or thread is None or not thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        self._in_flight = None
+
+    def run(self, coro):
+        """Coroutine'i istemci loop'unda çalıştırıp sonucunu (bloklayarak) döndür."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def query(self, query: str, variables: Optional[Dict[str, Any]] = None,
+              cost: Optional[float] = None) -> Dict[str, Any]:
+        return self.run(self.execute(query, variables, cost=cost))
+
+    def query_many(self, requests: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+                   cost: Optional[float] = None) -> List[Any]:
+        """Her istek için ``data`` ya da hata (Exception) — sıra korunur."""
+        return self.run(self.execute_many(list(requests), cost=cost))
+
+    def iter_many(self, requests: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+                  cost: Optional[float] = None) -> Iterator[Tuple[int, Any]]:
+        """``query_many`` gibi eşzamanlı; ``(sıra, data ya da Exception)`` tamamlandıkça döner."""
+        loop = self._ensure_loop()
+        futures = {
+            asyncio.run_coroutine_threadsafe(self._execute_or_error(q, v, cost), loop): idx
+            for idx, (q, v) in enumerate(requests)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+    async def call(self, query: str, variables: Optional[Dict[str, Any]] = None,
+                   cost: Optional[float] = None) -> Dict[str, Any]:
+        """``execute``'u istemci loop'unda koşturur; herhangi bir event loop'tan await edilebilir."""
+        future = asyncio.run_coroutine_threadsafe(self.execute(query, variables, cost=cost), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            ssl_context = ssl.create_default_context(cafile=certifi.where())
+            connector = aiohttp.TCPConnector(ssl=ssl_context, limit=_max_in_flight(), keepalive_timeout=300)
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.config.TIMEOUT), connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ── HTTP ──────────────────────────────────────────────────────
+    async def _post(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, str], Any]:
+        """Tek POST: ``(status, headers, gövde)``. Token alma bloklayabilir → executor."""
+        loop = asyncio.get_running_loop()
+        headers = await loop.run_in_executor(None, self.config.get_headers)
+        session = await self._get_session()
+        async with session.post(self.config.graphql_url(), json=payload, headers=headers) as resp:
+            try:
+                body = await resp.json(content_type=None)
+            except Exception:
+                body = {"_text": (await resp.text())[:300]}
+            return resp.status, dict(resp.headers), body
+
+    async def _attempt(self, payload: Dict[str, Any], hint_key: str, estimate: float) -> Dict[str, Any]:
+        reserved = await self.bucket.reserve(estimate)
+        self._active += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self._active)
+        try:
+            status, headers, body = await self._post(payload)
+            if status == 401:
+                self.config.reset_token()
+                status, headers, body = await self._post(payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _Retryable(f"Bağlantı hatası: {e}")
+        finally:
+            self._active -= 1
+        self.stats["requests"] += 1
+
+        cost = (body.get("extensions") or {}).get("cost") if isinstance(body, dict) else None
+        self.bucket.settle(reserved, cost)
+        if cost and cost.get("requestedQueryCost") is not None:
+            self._cost_hints[hint_key] = float(cost["requestedQueryCost"])
+
+        if status == 429 or status >= 500:
+            try:
+                retry_after = float(headers.get("Retry-After") or 0) or None
+            except (TypeError, ValueError):
+                retry_after = None
+            raise _Retryable(f"Shopify GraphQL HTTP {status}", retry_after=retry_after)
+        if status != 200:
+            raise GraphQLError(f"Shopify GraphQL HTTP {status}: {str(body)[:300]}")
+
+        errors = body.get("errors")
+        if errors:
+            codes = {((e or {}).get("extensions") or {}).get("code") for e in errors if isinstance(e, dict)}
+            if "THROTTLED" in codes:
+                self.stats["throttled"] += 1
+                raise _Retryable("THROTTLED")
+            raise GraphQLError(f"GraphQL errors: {errors}")
+        return body.get("data") or {}
+
+    async def execute(self, query: str, variables: Optional[Dict[str, Any]] = None,
+                      cost: Optional[float] = None) -> Dict[str, Any]:
+        """Sorguyu kova izin verdiğinde gönder; geçici hatalarda yeniden dene."""
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(_max_in_flight())
+        payload = {"query": query, "variables": variables or {}}
+        for attempt in range(MAX_RETRIES + 1):
+            estimate = self._cost_hints.get(query, cost if cost is not None else DEFAULT_COST)
+            try:
+                async with self._in_flight:
+                    return await self._attempt(payload, query, estimate)
+            except _Retryable as e:
+                if attempt == MAX_RETRIES:
+                    raise GraphQLError(f"{e} ({MAX_RETRIES} yeniden denemeden sonra)")
+                self.stats["retries"] += 1
+                delay = e.retry_after or RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if str(e) == "THROTTLED":
+                    # Kova sunucu durumuna kırpıldı; reserve zaten bekleyecek
+                    delay = 0.0
+                logger.debug("[SHOPIFY-GQL] %s, %.2fs sonra tekrar (deneme %d)", e, delay, attempt + 1)
+                await asyncio.sleep(delay)
+
+    async def _execute_or_error(self, query: str, variables: Optional[Dict[str, Any]],
+                                cost: Optional[float] = None) -> Any:
+        try:
+            return await self.execute(query, variables, cost=cost)
+        except Exception as e:
+            return e
+
+    async def execute_many(self, requests: Sequence[Tuple[str, Optional[Dict[str, Any]]]],
+                           cost: Optional[float] = None) -> List[Any]:
+        return await asyncio.gather(*(self._execute_or_error(q, v, cost) for q, v in requests))
+
+
+shopify_graphql_client = ShopifyGraphQLClient()
@@ -364,9 +364,10 @@ def stock_sync_dashboard():
 @login_required
 @check_shopify_config
 def match_barcodes():
-    """Shopify barkodlarını panel barkodlarıyla eşleştir."""
+    """Shopify barkodlarını panel barkodlarıyla eşleştir (JSON ``mode``: bulk | paged)."""
     try:
-        result = shopify_stock_service.match_barcodes()
+        payload = request.get_json(silent=True) or {}
+        result = shopify_stock_service.match_barcodes(mode=payload.get("mode"))
         if result.get("success"):
             log_user_action("UPDATE", {"işlem_açıklaması": "Shopify barkod eşleştirmesi yapıldı", "sayfa": "Shopify Stok Sync"})
         return jsonify(result)
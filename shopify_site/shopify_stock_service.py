@@ -5,32 +5,117 @@ Shopify Stok Senkronizasyon Servisi
 Shopify Admin GraphQL API (2026-01) ile barkod eşleştirme ve stok güncelleme.
 
 Akış:
-1. Shopify'dan tüm variant'ları çek (barcode alanı ile)
-2. Panel'deki barkodlarla eşleştir -> ShopifyMapping tablosuna kaydet
+1. Shopify'dan tüm variant'ları çek (bulkOperationRunQuery JSONL akışı; olmazsa
+   ya da ``SHOPIFY_BULK_MAX_WAIT`` içinde bitmezse sayfalı)
+2. Panel'deki barkodlarla eşleştir -> ShopifyMapping'e yalnız farkı yaz
 3. CentralStock'tan mevcut stokları al -> Shopify'a gönder
+
+Tüm çağrılar ``shopify_graphql_client`` üzerinden gider (kalıcı bağlantı,
+throttleStatus'a göre maliyet kovası); stok parçaları ve tracking mutation'ları
+kovanın izin verdiği kadar eşzamanlı gönderilir.
 """
 
 from __future__ import annotations
 
 import logging
+import os
+import time as _time
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from .shopify_config import ShopifyConfig
+from .shopify_graphql import shopify_graphql_client
 
 logger = logging.getLogger(__name__)
 
+# Eşleştirme farkında karşılaştırılan ShopifyMapping alanları
+MAPPING_FIELDS = (
+    "barcode", "shopify_inventory_item_id", "shopify_product_title",
+    "shopify_variant_title", "shopify_sku", "shopify_barcode",
+)
+MAPPING_WRITE_CHUNK = 1000
+
+BULK_VARIANTS_QUERY = """
+{
+  productVariants {
+    edges {
+      node {
+        id
+        title
+        sku
+        barcode
+        inventoryQuantity
+        product { title }
+        inventoryItem { id }
+      }
+    }
+  }
+}
+"""
+
+BULK_RUN_MUTATION = """
+mutation RunBulkVariants($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+BULK_CANCEL_MUTATION = """
+mutation CancelBulk($id: ID!) {
+  bulkOperationCancel(id: $id) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+BULK_STATUS_QUERY = """
+query BulkStatus($id: ID!) {
+  node(id: $id) {
+    ... on BulkOperation { id status errorCode objectCount url }
+  }
+}
+"""
+
+
+class BulkOperationError(RuntimeError):
+    """Bulk dışa aktarım başlatılamadı / başarısız oldu / zaman aşımı."""
+
 
 class ShopifyStockService:
     """Shopify stok eşleştirme ve senkronizasyon servisi."""
 
     VARIANTS_PAGE_SIZE = 250
+    BULK_POLL_SECONDS = 2.0  # her yoklamada 1.5 katına çıkar
+    BULK_POLL_MAX_SECONDS = 15.0
+    # İstek thread'inde beklenir: gunicorn timeout'unun altında kalmalı,
+    # aşılırsa operasyon iptal edilip sayfalı çekime düşülür.
+    BULK_MAX_WAIT_SECONDS = 90.0
+    STOCK_BATCH_SIZE = 100  # inventorySetQuantities tek çağrıda en fazla 100 öğe
+    TRACKING_CHECK_CHUNK = 50
+
+    STOCK_MUTATION = """
+    mutation InventorySetQuantities($input: InventorySetQuantitiesInput!) {
+      inventorySetQuantities(input: $input) {
+        inventoryAdjustmentGroup {
+          createdAt
+          reason
+          changes { name delta }
+        }
+        userErrors { field message }
+      }
+    }
+    """
 
     def __init__(self):
         self.config = ShopifyConfig
+        self.client = shopify_graphql_client
         self._location_id: Optional[str] = None
         self._last_unmatched: List[Dict[str, Any]] = []  # Son eşleştirmede eşleşmeyenler
         self._tracking_checked_at: Optional[datetime] = None  # Tracking kontrolü cache
+        self._lookup_cache: Optional[Tuple[Any, Dict[str, str], Dict[str, str]]] = None  # (haritalar, panel, alias)
 
     def is_configured(self) -> bool:
         return self.config.is_configured()
@@ -39,33 +124,8 @@ class ShopifyStockService:
     # GraphQL helper
     # ─────────────────────────────────────────────────────────────
     def _graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        import requests
-
-        payload = {"query": query, "variables": variables or {}}
-        resp = requests.post(
-            self.config.graphql_url(),
-            headers=self.config.get_headers(),
-            json=payload,
-            timeout=self.config.TIMEOUT,
-        )
-
-        # 401 → token geçersiz, yenile ve tekrar dene
-        if resp.status_code == 401:
-            self.config.reset_token()
-            resp = requests.post(
-                self.config.graphql_url(),
-                headers=self.config.get_headers(),
-                json=payload,
-                timeout=self.config.TIMEOUT,
-            )
-
-        resp.raise_for_status()
-        body = resp.json()
-
-        if body.get("errors"):
-            raise RuntimeError(f"GraphQL errors: {body['errors']}")
-
-        return body.get("data", {})
+        """Tek GraphQL çağrısı (bloklayan sarmalayıcı; hatada GraphQLError)."""
+        return self.client.query(query, variables)
 
     # ─────────────────────────────────────────────────────────────
     # Location
@@ -103,6 +163,18 @@ class ShopifyStockService:
     # ─────────────────────────────────────────────────────────────
     # Tüm Variant'ları çek
     # ─────────────────────────────────────────────────────────────
+    @staticmethod
+    def _variant_from_node(node: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "variant_id": node["id"],
+            "title": node.get("title", ""),
+            "sku": (node.get("sku") or "").strip(),
+            "barcode": (node.get("barcode") or "").strip(),
+            "inventory_quantity": node.get("inventoryQuantity", 0),
+            "product_title": (node.get("product") or {}).get("title", ""),
+            "inventory_item_id": (node.get("inventoryItem") or {}).get("id", ""),
+        }
+
     def fetch_all_variants(self) -> List[Dict[str, Any]]:
         """
         Shopify'dan tüm product variant'ları çeker.
@@ -135,16 +207,7 @@ class ShopifyStockService:
             edges = block.get("edges", [])
 
             for edge in edges:
-                node = edge["node"]
-                all_variants.append({
-                    "variant_id": node["id"],
-                    "title": node.get("title", ""),
-                    "sku": (node.get("sku") or "").strip(),
-                    "barcode": (node.get("barcode") or "").strip(),
-                    "inventory_quantity": node.get("inventoryQuantity", 0),
-                    "product_title": (node.get("product") or {}).get("title", ""),
-                    "inventory_item_id": (node.get("inventoryItem") or {}).get("id", ""),
-                })
+                all_variants.append(self._variant_from_node(edge["node"]))
 
             page_info = block.get("pageInfo", {})
             if not page_info.get("hasNextPage"):
@@ -155,25 +218,111 @@ class ShopifyStockService:
         return all_variants
 
     # ─────────────────────────────────────────────────────────────
-    # Barkod Eşleştirme
+    # Bulk operation ile variant dışa aktarımı (JSONL)
     # ─────────────────────────────────────────────────────────────
-    def match_barcodes(self) -> Dict[str, Any]:
+    def _run_bulk_variant_export(self) -> Optional[str]:
+        """bulkOperationRunQuery başlat, bitene dek yokla; JSONL URL'ini döndür.
+
+        Hiç variant yoksa Shopify URL vermez → None. Bekleme
+        ``SHOPIFY_BULK_MAX_WAIT`` (sn, default ``BULK_MAX_WAIT_SECONDS``) ile
+        sınırlıdır; aşılırsa operasyon iptal edilir ve ``BulkOperationError``
+        yükselir (çağıran sayfalı yola düşer, sonraki çalıştırma bloklanmaz).
         """
-        Shopify variant barkodlarını panel barkodlarıyla eşleştir ve DB'ye kaydet.
-        Eşleştirme mantığı:
-        1. Shopify variant.barcode == Product.barcode (birebir)
-        2. Shopify variant.sku == Product.barcode (SKU olarak eşleşme)
-        3. BarcodeAlias üzerinden eşleşme
+        data = self._graphql(BULK_RUN_MUTATION, {"query": BULK_VARIANTS_QUERY})
+        payload = data.get("bulkOperationRunQuery") or {}
+        errors = payload.get("userErrors") or []
+        if errors:
+            raise BulkOperationError("; ".join(e.get("message", "") for e in errors))
+        operation_id = (payload.get("bulkOperation") or {}).get("id")
+        if not operation_id:
+            raise BulkOperationError("bulkOperation id dönmedi")
+        logger.info("[SHOPIFY] Bulk variant dışa aktarımı başladı: %s", operation_id)
+
+        try:
+            max_wait = float(os.environ.get("SHOPIFY_BULK_MAX_WAIT", self.BULK_MAX_WAIT_SECONDS))
+        except ValueError:
+            max_wait = self.BULK_MAX_WAIT_SECONDS
+        deadline = _time.monotonic() + max_wait
+        interval = self.BULK_POLL_SECONDS
+        while True:
+            node = self._graphql(BULK_STATUS_QUERY, {"id": operation_id}).get("node") or {}
+            status = node.get("status")
+            if status == "COMPLETED":
+                logger.info("[SHOPIFY] Bulk dışa aktarım tamamlandı: %s nesne", node.get("objectCount"))
+                return node.get("url")
+            if status in ("FAILED", "CANCELED", "CANCELING", "EXPIRED"):
+                raise BulkOperationError(f"Bulk operation {status}: {node.get('errorCode')}")
+            if _time.monotonic() + interval > deadline:
+                self._cancel_bulk_operation(operation_id)
+                raise BulkOperationError(f"Bulk operation {max_wait:.0f} sn içinde bitmedi (son durum: {status})")
+            _time.sleep(interval)
+            interval = min(interval * 1.5, self.BULK_POLL_MAX_SECONDS)
+
+    def _cancel_bulk_operation(self, operation_id: str) -> None:
+        """Yarım kalan dışa aktarımı iptal et (mağaza başına tek bulk sorgu çalışabilir)."""
+        try:
+            payload = self._graphql(BULK_CANCEL_MUTATION, {"id": operation_id}).get("bulkOperationCancel") or {}
+            errors = payload.get("userErrors") or []
+            if errors:
+                logger.warning("[SHOPIFY] Bulk operation iptal edilemedi: %s",
+                               "; ".join(e.get("message", "") for e in errors))
+        except Exception as exc:
+            logger.warning("[SHOPIFY] Bulk operation iptal hatası: %s", exc)
+
+    def iter_bulk_variants(self) -> Iterator[Dict[str, Any]]:
+        """Bulk dışa aktarımın JSONL dosyasını satır satır okuyup variant üretir.
+
+        Dosya belleğe alınmaz; her satır tek variant (product/inventoryItem
+        bağlantı değil nesne olduğundan ayrı satır oluşmaz).
+        """
+        import json
+        import requests
+
+        url = self._run_bulk_variant_export()
+        if not url:
+            return
+        count = 0
+        with requests.get(url, stream=True, timeout=self.config.TIMEOUT) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                node = json.loads(line)
+                if "id" not in node or node.get("__parentId"):
+                    continue
+                count += 1
+                yield self._variant_from_node(node)
+        logger.info("[SHOPIFY] %d variant bulk JSONL'den okundu", count)
+
+    # ─────────────────────────────────────────────────────────────
+    # Barkod Eşleştirme
+    # ─────────────────────────────────────────────────────────────
+    def _panel_lookup(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """(panel_barcodes, alias_map) arama tabloları.
+
+        Barkod önbelleği (barcode_alias_helper) açıksa onun haritalarından
+        türetilir ve haritalar yeniden yüklenene dek tekrar kullanılır; kapalıysa
+        (script / izole test) DB'den kurulur.
         """
-        from models import db, Product, BarcodeAlias, ShopifyMapping
+        from barcode_alias_helper import cached_maps
 
-        # 1. Shopify'dan tüm variant'ları çek
-        shopify_variants = self.fetch_all_variants()
+        maps = cached_maps()
+        if maps is not None and self._lookup_cache and self._lookup_cache[0] is maps:
+            return self._lookup_cache[1], self._lookup_cache[2]
 
-        # 2. Panel barkodlarını al (normal + leading-zero varyasyonları)
-        panel_barcodes = {}
-        for p in Product.query.with_entities(Product.barcode).all():
-            bc = p.barcode.strip()
+        if maps is not None:
+            aliases, lower, _ = maps
+            product_barcodes = lower.values()
+            alias_pairs = aliases.items()
+        else:
+            from models import Product, BarcodeAlias
+            product_barcodes = [bc for (bc,) in Product.query.with_entities(Product.barcode).all() if bc]
+            alias_pairs = [(a.alias_barcode, a.main_barcode) for a in BarcodeAlias.query.all()]
+
+        # Panel barkodları (normal + leading-zero varyasyonları)
+        panel_barcodes: Dict[str, str] = {}
+        for raw in product_barcodes:
+            bc = raw.strip()
             key = bc.lower()
             panel_barcodes[key] = bc
             # Leading-zero varyasyonları: "0123" -> "123" ve "123" -> "0123"
@@ -183,79 +332,158 @@ class ShopifyStockService:
             if key and not key.startswith("0"):
                 panel_barcodes["0" + key] = bc
 
-        # 3. Alias barkodlarını al
-        alias_map: Dict[str, str] = {}
-        for alias in BarcodeAlias.query.all():
-            alias_map[alias.alias_barcode.strip().lower()] = alias.main_barcode
+        alias_map = {alias.strip().lower(): main for alias, main in alias_pairs}
+        if maps is not None:
+            self._lookup_cache = (maps, panel_barcodes, alias_map)
+        return panel_barcodes, alias_map
 
-        # 4. Her Shopify varyantını ayrı ayrı eşleştir (varyant barkoduna göre)
-        matched = 0
-        unmatched_shopify = []
-        new_mappings: List[ShopifyMapping] = []
-        seen_variant_ids = set()  # Aynı Shopify varyantı tekrar eklemesin
+    def _resolve_variants(self, variants: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], int, int]:
+        """Variant akışını panel barkoduna çöz.
 
-        for variant in shopify_variants:
-            shopify_barcode = variant["barcode"]
-            shopify_sku = variant["sku"]
-            inventory_item_id = variant["inventory_item_id"]
-            variant_id = variant["variant_id"]
+        Returns:
+            (variant_id → mapping alanları, eşleşmeyenler, toplam variant, panel anahtar sayısı)
+        """
+        panel_barcodes, alias_map = self._panel_lookup()
 
-            if not inventory_item_id:
-                continue
+        def _find_panel(val):
+            """Değeri panel barkodlarında veya alias'larda ara (leading-zero dahil)."""
+            if not val:
+                return None
+            key = val.lower()
+            candidates = [key, key.lstrip("0")]
+            if not key.startswith("0"):
+                candidates.append("0" + key)
+            for c in candidates:
+                if not c:
+                    continue
+                if c in panel_barcodes:
+                    return panel_barcodes[c]
+                if c in alias_map:
+                    return alias_map[c]
+            return None
+
+        desired: Dict[str, Dict[str, Any]] = {}
+        unmatched: List[Dict[str, Any]] = []
+        seen_variant_ids = set()  # Aynı Shopify varyantı tekrar eklemesin
+        total = 0
 
-            # Aynı Shopify varyantı zaten işlendiyse atla
-            if variant_id in seen_variant_ids:
+        for variant in variants:
+            total += 1
+            variant_id = variant["variant_id"]
+            if not variant["inventory_item_id"] or variant_id in seen_variant_ids:
                 continue
             seen_variant_ids.add(variant_id)
 
-            # Panel barkodu bul
-            panel_barcode = None
-
-            def _find_panel(val):
-                """Değeri panel barkodlarında veya alias'larda ara (leading-zero dahil)."""
-                if not val:
-                    return None
-                key = val.lower()
-                candidates = [key, key.lstrip("0")]
-                if not key.startswith("0"):
-                    candidates.append("0" + key)
-                for c in candidates:
-                    if not c:
-                        continue
-                    if c in panel_barcodes:
-                        return panel_barcodes[c]
-                    if c in alias_map:
-                        return alias_map[c]
-                return None
-
-            # Yöntem 1: Barkod eşleşmesi
-            panel_barcode = _find_panel(shopify_barcode)
-
-            # Yöntem 2: SKU eşleşmesi
-            if not panel_barcode:
-                panel_barcode = _find_panel(shopify_sku)
-
+            # Yöntem 1: Barkod eşleşmesi, Yöntem 2: SKU eşleşmesi
+            panel_barcode = _find_panel(variant["barcode"]) or _find_panel(variant["sku"])
             if panel_barcode:
-                new_mappings.append(ShopifyMapping(
-                    barcode=panel_barcode,
-                    shopify_variant_id=variant_id,
-                    shopify_inventory_item_id=inventory_item_id,
-                    shopify_product_title=variant["product_title"],
-                    shopify_variant_title=variant["title"],
-                    shopify_sku=shopify_sku,
-                    shopify_barcode=shopify_barcode,
-                ))
-                matched += 1
+                desired[variant_id] = {
+                    "barcode": panel_barcode,
+                    "shopify_inventory_item_id": variant["inventory_item_id"],
+                    "shopify_product_title": variant["product_title"],
+                    "shopify_variant_title": variant["title"],
+                    "shopify_sku": variant["sku"],
+                    "shopify_barcode": variant["barcode"],
+                }
             else:
-                unmatched_shopify.append({
+                unmatched.append({
                     "variant_id": variant_id,
                     "product_title": variant["product_title"],
                     "variant_title": variant["title"],
-                    "sku": shopify_sku,
-                    "barcode": shopify_barcode,
+                    "sku": variant["sku"],
+                    "barcode": variant["barcode"],
                 })
 
-        # 5. Eski unique constraint varsa kaldır (barcode artık unique değil)
+        return desired, unmatched, total, len(panel_barcodes)
+
+    def _apply_mapping_diff(self, desired: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+        """Kayıtlı ShopifyMapping'i hedefe getir: yalnız ekle / güncelle / sil.
+
+        Değişmeyen eşleşmenin ``last_stock_sent``'i korunur (diff push defteri
+        sıfırlanmaz); panel barkodu değişen eşleşmede sıfırlanır.
+        """
+        from sqlalchemy import bindparam
+        from models import db, ShopifyMapping
+        import product_summary
+
+        table = ShopifyMapping.__table__
+        existing = {
+            row.shopify_variant_id: row
+            for row in db.session.query(ShopifyMapping.id, ShopifyMapping.shopify_variant_id,
+                                        *(getattr(ShopifyMapping, f) for f in MAPPING_FIELDS)).all()
+        }
+        now = datetime.utcnow()
+        inserts, updates, touched = [], [], set()
+        for variant_id, fields in desired.items():
+            row = existing.get(variant_id)
+            if row is None:
+                inserts.append({"shopify_variant_id": variant_id, **fields, "created_at": now, "updated_at": now})
+                touched.add(fields["barcode"])
+                continue
+            if all(getattr(row, f) == fields[f] for f in MAPPING_FIELDS):
+                continue
+            update = {"_id": row.id, **fields, "updated_at": now,
+                      "last_stock_sent": None, "last_sync_at": None}
+            if row.barcode == fields["barcode"]:
+                update.pop("last_stock_sent")
+                update.pop("last_sync_at")
+            updates.append(update)
+            touched.update((row.barcode, fields["barcode"]))
+        deletes = [row for variant_id, row in existing.items() if variant_id not in desired]
+        touched.update(row.barcode for row in deletes)
+
+        # Etkilenen modeller açıkça kuyruğa alınır → ürün özeti tam yeniden kurulmaz
+        options = {product_summary.SUMMARY_QUEUED_OPTION: True}
+        if touched:
+            product_summary.queue_models(product_summary.models_for_barcodes(list(touched)))
+        for i in range(0, len(deletes), MAPPING_WRITE_CHUNK):
+            ids = [row.id for row in deletes[i:i + MAPPING_WRITE_CHUNK]]
+            db.session.execute(table.delete().where(table.c.id.in_(ids)).execution_options(**options))
+        for i in range(0, len(inserts), MAPPING_WRITE_CHUNK):
+            db.session.execute(table.insert().execution_options(**options), inserts[i:i + MAPPING_WRITE_CHUNK])
+        # executemany'de tüm satırlar aynı kolonları taşımalı → barkod değişimine göre iki grup
+        for group in ([u for u in updates if "last_stock_sent" in u], [u for u in updates if "last_stock_sent" not in u]):
+            if not group:
+                continue
+            stmt = (table.update().where(table.c.id == bindparam("_id"))
+                    .values({k: bindparam(k) for k in group[0] if k != "_id"})
+                    .execution_options(**options))
+            for i in range(0, len(group), MAPPING_WRITE_CHUNK):
+                db.session.execute(stmt, group[i:i + MAPPING_WRITE_CHUNK])
+
+        return {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes),
+                "unchanged": len(desired) - len(inserts) - len(updates)}
+
+    def match_barcodes(self, mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Shopify variant barkodlarını panel barkodlarıyla eşleştir ve DB'ye kaydet.
+        Eşleştirme mantığı:
+        1. Shopify variant.barcode == Product.barcode (birebir)
+        2. Shopify variant.sku == Product.barcode (SKU olarak eşleşme)
+        3. BarcodeAlias üzerinden eşleşme
+
+        mode: ``bulk`` (bulkOperationRunQuery JSONL akışı) | ``paged`` (250'lik
+        sayfalar); None → ``SHOPIFY_MATCH_MODE`` env (default bulk). Bulk
+        dışa aktarım başarısız olursa ya da süre sınırında bitmezse sayfalı
+        yola düşülür. Kayıtlı eşleşmeler
+        silinip yeniden yazılmaz, yalnız fark uygulanır.
+        """
+        from models import db
+
+        mode = (mode or os.environ.get("SHOPIFY_MATCH_MODE", "bulk")).strip().lower()
+        resolved = None
+        source = "paged"
+        if mode == "bulk":
+            try:
+                resolved = self._resolve_variants(self.iter_bulk_variants())
+                source = "bulk"
+            except Exception as exc:
+                logger.warning("[SHOPIFY] Bulk variant dışa aktarımı başarısız, sayfalı çekime düşülüyor: %s", exc)
+        if resolved is None:
+            resolved = self._resolve_variants(self.fetch_all_variants())
+        desired, unmatched_shopify, total_shopify, total_panel = resolved
+
+        # Eski unique constraint varsa kaldır (barcode artık unique değil)
         from sqlalchemy import text
         try:
             db.session.execute(text("DROP INDEX IF EXISTS ix_shopify_mappings_barcode"))
@@ -267,17 +495,14 @@ class ShopifyStockService:
         except Exception:
             db.session.rollback()
 
-        # 6. Eski eşleştirmeleri temizle ve yenilerini kaydet
-        ShopifyMapping.query.delete()
-        db.session.flush()
-
-        for mapping in new_mappings:
-            db.session.add(mapping)
-
+        # Kayıtlı eşleştirmelere yalnız farkı uygula
+        diff = self._apply_mapping_diff(desired)
         db.session.commit()
 
-        logger.info("[SHOPIFY] Eşleştirme tamamlandı: %d eşleşti, %d eşleşmedi",
-                     matched, len(unmatched_shopify))
+        matched = len(desired)
+        logger.info("[SHOPIFY] Eşleştirme tamamlandı (%s): %d eşleşti, %d eşleşmedi — "
+                    "eklenen %d, güncellenen %d, silinen %d",
+                    source, matched, len(unmatched_shopify), diff["inserted"], diff["updated"], diff["deleted"])
 
         # Tüm eşleşmeyenleri cache'le (CSV export için)
         self._last_unmatched = unmatched_shopify
@@ -301,10 +526,12 @@ class ShopifyStockService:
 
         return {
             "success": True,
+            "source": source,
             "matched": matched,
             "unmatched": len(unmatched_shopify),
-            "total_shopify": len(shopify_variants),
-            "total_panel": len(panel_barcodes),
+            "total_shopify": total_shopify,
+            "total_panel": total_panel,
+            "changes": diff,
             "unmatched_reasons": {
                 "no_barcode_no_sku": no_barcode_no_sku,
                 "has_sku_not_in_panel": no_barcode_has_sku,
@@ -320,10 +547,11 @@ class ShopifyStockService:
     # ─────────────────────────────────────────────────────────────
     # Stok Gönderimi
     # ─────────────────────────────────────────────────────────────
-    def push_stock(self, barcodes: Optional[List[str]] = None) -> Dict[str, Any]:
+    def push_stock(self, barcodes: Optional[List[str]] = None, only_changed: bool = False) -> Dict[str, Any]:
         """
         CentralStock'taki stokları Shopify'a gönder.
         barcodes: Belirli barkodlar (None ise tüm eşleşenler)
+        only_changed: last_stock_sent ile aynı adetteki eşleşmeler atlanır (diff push)
         """
         from models import db, CentralStock, ShopifyMapping
 
@@ -362,7 +590,7 @@ class ShopifyStockService:
             URETIM_SABIT_ADET = 10
 
         # Envanter takibi kapalı olan ürünlerde tracking'i aç.
-        # Yavaş bir işlem (1000+ ardışık mutation olabilir); 6 saatte bir yeterli.
+        # 1000+ mutation olabilir (eşzamanlı ama maliyetli); 6 saatte bir yeterli.
         from datetime import timedelta
         now = datetime.utcnow()
         if self._tracking_checked_at is None or (now - self._tracking_checked_at) > timedelta(hours=6):
@@ -371,7 +599,7 @@ class ShopifyStockService:
         else:
             logger.info("[SHOPIFY] Tracking kontrolü atlandı (son kontrol %s)", self._tracking_checked_at.isoformat())
 
-        # Batch olarak gönder (aynı mutation ile max 100 öğe)
+        # Gönderilecekleri topla (aynı mutation ile max 100 öğe)
         results = {"success_count": 0, "error_count": 0, "skipped_count": 0, "details": [], "errors": []}
         batch: List[Dict] = []
 
@@ -381,30 +609,28 @@ class ShopifyStockService:
             qty = max(0, raw_qty - reserved - safety_buffer)
             if mapping.barcode in uretim_barcodes:
                 qty = URETIM_SABIT_ADET
+            if only_changed and mapping.last_stock_sent == qty:
+                results["skipped_count"] += 1
+                continue
             batch.append({
                 "mapping": mapping,
                 "qty": qty,
             })
 
-        # Shopify inventorySetQuantities max 100 item per call.
-        # Her batch sonrası commit + kısa sleep:
-        #  - kısmi ilerleme DB'ye yazılır (ortada kesilirse last_sync_at korunur)
-        #  - Shopify GraphQL cost-bucket'a nefes verir, 429/timeout azalır.
-        import time as _time
-        BATCH_SIZE = 100
-        BATCH_SLEEP = 0.25
-        total_batches = (len(batch) + BATCH_SIZE - 1) // BATCH_SIZE
-
-        for idx, i in enumerate(range(0, len(batch), BATCH_SIZE), start=1):
-            chunk = batch[i:i + BATCH_SIZE]
-            self._send_stock_batch(chunk, location_id, results)
+        # Parçalar eşzamanlı gider; hız sınırını istemcinin maliyet kovası yönetir.
+        # Her parçanın yanıtı geldikçe işlenip commit edilir: kısmi ilerleme
+        # DB'ye yazılır (ortada kesilirse gönderilenlerin last_stock_sent'i korunur).
+        chunks = [batch[i:i + self.STOCK_BATCH_SIZE] for i in range(0, len(batch), self.STOCK_BATCH_SIZE)]
+        responses = self.client.iter_many(
+            (self.STOCK_MUTATION, self._stock_batch_variables(chunk, location_id)) for chunk in chunks
+        )
+        for done, (idx, response) in enumerate(responses, 1):
+            self._apply_stock_batch(chunks[idx], response, results)
             try:
                 db.session.commit()
             except Exception as commit_exc:
                 db.session.rollback()
-                logger.warning("[SHOPIFY] Batch %d/%d commit hatası: %s", idx, total_batches, commit_exc)
-            if idx < total_batches:
-                _time.sleep(BATCH_SLEEP)
+                logger.warning("[SHOPIFY] Parça %d/%d commit hatası: %s", done, len(chunks), commit_exc)
 
         total = results["success_count"] + results["error_count"] + results["skipped_count"]
         logger.info("[SHOPIFY] Stok gönderimi: %d başarılı, %d hata, %d atlandı / %d toplam",
@@ -421,36 +647,35 @@ class ShopifyStockService:
 
     def _enable_tracking_for_mappings(self, mappings) -> None:
         """Envanter takibi (tracked) kapalı olan ürünlerde tracking'i toplu olarak açar."""
-        # Batch halinde tracked durumunu kontrol et
-        CHUNK = 50
         all_inv_ids = [m.shopify_inventory_item_id for m in mappings if m.shopify_inventory_item_id]
+        chunk = self.TRACKING_CHECK_CHUNK
 
+        # nodes sorgusuyla 50'şerli toplu kontrol — parçalar eşzamanlı
+        query = """
+        query TrackedStatus($ids: [ID!]!) {
+          nodes(ids: $ids) {
+            ... on InventoryItem { id tracked }
+          }
+        }
+        """
+        responses = self.client.query_many(
+            (query, {"ids": all_inv_ids[i:i + chunk]}) for i in range(0, len(all_inv_ids), chunk)
+        )
         untracked_ids: List[str] = []
-        for i in range(0, len(all_inv_ids), CHUNK):
-            chunk_ids = all_inv_ids[i:i + CHUNK]
-            # Shopify nodes query ile toplu kontrol
-            gid_list = ", ".join(f'"{gid}"' for gid in chunk_ids)
-            query = f"""
-            query {{
-              nodes(ids: [{gid_list}]) {{
-                ... on InventoryItem {{ id tracked }}
-              }}
-            }}
-            """
-            try:
-                data = self._graphql(query)
-                for node in (data.get("nodes") or []):
-                    if node and not node.get("tracked"):
-                        untracked_ids.append(node["id"])
-            except Exception as exc:
-                logger.warning("[SHOPIFY] Tracking kontrol hatası: %s", exc)
+        for data in responses:
+            if isinstance(data, Exception):
+                logger.warning("[SHOPIFY] Tracking kontrol hatası: %s", data)
+                continue
+            for node in (data.get("nodes") or []):
+                if node and not node.get("tracked"):
+                    untracked_ids.append(node["id"])
 
         if not untracked_ids:
             return
 
         logger.info("[SHOPIFY] %d üründe envanter takibi kapalı — açılıyor", len(untracked_ids))
 
-        # Tek tek tracking'i aç (mutation tek item alıyor)
+        # Mutation tek item alıyor; kovanın izin verdiği kadar eşzamanlı
         mutation = """
         mutation EnableTracking($id: ID!) {
           inventoryItemUpdate(id: $id, input: { tracked: true }) {
@@ -459,120 +684,106 @@ class ShopifyStockService:
           }
         }
         """
+        responses = self.client.query_many((mutation, {"id": inv_id}) for inv_id in untracked_ids)
         enabled = 0
-        for inv_id in untracked_ids:
-            try:
-                data = self._graphql(mutation, {"id": inv_id})
-                errors = (data.get("inventoryItemUpdate") or {}).get("userErrors") or []
-                if not errors:
-                    enabled += 1
-                else:
-                    logger.warning("[SHOPIFY] Tracking açılamadı %s: %s", inv_id,
-                                   "; ".join(e.get("message", "") for e in errors))
-            except Exception as exc:
-                logger.warning("[SHOPIFY] Tracking açma hatası %s: %s", inv_id, exc)
+        for inv_id, data in zip(untracked_ids, responses):
+            if isinstance(data, Exception):
+                logger.warning("[SHOPIFY] Tracking açma hatası %s: %s", inv_id, data)
+                continue
+            errors = (data.get("inventoryItemUpdate") or {}).get("userErrors") or []
+            if not errors:
+                enabled += 1
+            else:
+                logger.warning("[SHOPIFY] Tracking açılamadı %s: %s", inv_id,
+                               "; ".join(e.get("message", "") for e in errors))
 
         logger.info("[SHOPIFY] Envanter takibi açıldı: %d / %d", enabled, len(untracked_ids))
 
-    def _send_stock_batch(self, batch: List[Dict], location_id: str, results: Dict):
-        """Tek bir batch stok güncellemesi gönder (max 100 item tek API çağrısı)."""
-        mutation = """
-        mutation InventorySetQuantities($input: InventorySetQuantitiesInput!) {
-          inventorySetQuantities(input: $input) {
-            inventoryAdjustmentGroup {
-              createdAt
-              reason
-              changes { name delta }
-            }
-            userErrors { field message }
-          }
-        }
-        """
-
-        quantities = []
-        for item in batch:
-            mapping = item["mapping"]
-            quantities.append({
-                "inventoryItemId": mapping.shopify_inventory_item_id,
-                "locationId": location_id,
-                "quantity": item["qty"],
-            })
-
-        variables = {
+    def _stock_batch_variables(self, batch: List[Dict], location_id: str) -> Dict[str, Any]:
+        """Tek inventorySetQuantities çağrısının değişkenleri (max 100 item)."""
+        return {
             "input": {
                 "name": "available",
                 "reason": "correction",
                 "ignoreCompareQuantity": True,
-                "quantities": quantities,
+                "quantities": [
+                    {
+                        "inventoryItemId": item["mapping"].shopify_inventory_item_id,
+                        "locationId": location_id,
+                        "quantity": item["qty"],
+                    }
+                    for item in batch
+                ],
             }
         }
 
-        try:
-            data = self._graphql(mutation, variables)
-            payload = data.get("inventorySetQuantities", {})
-            errors = payload.get("userErrors") or []
+    def _apply_stock_batch(self, batch: List[Dict], data: Any, results: Dict):
+        """Bir parçanın yanıtını (``data`` ya da Exception) sonuçlara ve mapping'lere işle."""
+        if isinstance(data, Exception):
+            for item in batch:
+                results["error_count"] += 1
+                results["errors"].append({"barcode": item["mapping"].barcode, "error": str(data)})
+            logger.error("[SHOPIFY] Toplu stok gönderim hatası (%d item): %s", len(batch), data)
+            return
 
-            # userErrors içindeki field path'inden hangi quantities[index] başarısız olduğunu tespit et.
-            # Shopify field formatı: ["input", "quantities", "3", "inventoryItemId"] gibi.
-            failed_indices: Dict[int, str] = {}
-            global_errors: List[str] = []
-            for err in errors:
-                field = err.get("field") or []
-                msg = err.get("message", "")
-                idx = None
-                if isinstance(field, list):
-                    for i, part in enumerate(field):
-                        if part == "quantities" and i + 1 < len(field):
-                            try:
-                                idx = int(field[i + 1])
-                                break
-                            except (TypeError, ValueError):
-                                pass
-                if idx is not None and 0 <= idx < len(batch):
-                    failed_indices[idx] = msg
-                else:
-                    global_errors.append(msg)
-
-            # Global (batch-geneli) hata varsa tüm batch'i hata say — mutation hiç çalışmadı.
-            if global_errors:
-                err_msg = "; ".join(global_errors)
-                for item in batch:
-                    results["error_count"] += 1
-                    results["errors"].append({"barcode": item["mapping"].barcode, "error": err_msg})
-                logger.warning("[SHOPIFY] Batch-geneli hata (%d item): %s", len(batch), err_msg)
-                return
-
-            # Item-özel hatalar: sadece hatalıyı error say, kalanı başarılı kabul et ve güncelle.
-            now = datetime.utcnow()
-            for idx, item in enumerate(batch):
-                mapping = item["mapping"]
-                if idx in failed_indices:
-                    results["error_count"] += 1
-                    results["errors"].append({"barcode": mapping.barcode, "error": failed_indices[idx]})
-                else:
-                    results["success_count"] += 1
-                    mapping.last_stock_sent = item["qty"]
-                    mapping.last_sync_at = now
-
-            if failed_indices:
-                logger.warning(
-                    "[SHOPIFY] Batch kısmi: %d başarılı, %d hata (%d item)",
-                    len(batch) - len(failed_indices), len(failed_indices), len(batch),
-                )
-                for idx, msg in failed_indices.items():
-                    if 0 <= idx < len(batch):
-                        m = batch[idx]["mapping"]
-                        logger.warning(
-                            "[SHOPIFY] FAIL barcode=%s qty=%s inv_id=%s msg=%s",
-                            m.barcode, batch[idx]["qty"], m.shopify_inventory_item_id, msg,
-                        )
+        payload = data.get("inventorySetQuantities", {})
+        errors = payload.get("userErrors") or []
+
+        # userErrors içindeki field path'inden hangi quantities[index] başarısız olduğunu tespit et.
+        # Shopify field formatı: ["input", "quantities", "3", "inventoryItemId"] gibi.
+        failed_indices: Dict[int, str] = {}
+        global_errors: List[str] = []
+        for err in errors:
+            field = err.get("field") or []
+            msg = err.get("message", "")
+            idx = None
+            if isinstance(field, list):
+                for i, part in enumerate(field):
+                    if part == "quantities" and i + 1 < len(field):
+                        try:
+                            idx = int(field[i + 1])
+                            break
+                        except (TypeError, ValueError):
+                            pass
+            if idx is not None and 0 <= idx < len(batch):
+                failed_indices[idx] = msg
             else:
-                logger.info("[SHOPIFY] Toplu stok gönderildi: %d item başarılı", len(batch))
-        except Exception as exc:
+                global_errors.append(msg)
+
+        # Global (batch-geneli) hata varsa tüm batch'i hata say — mutation hiç çalışmadı.
+        if global_errors:
+            err_msg = "; ".join(global_errors)
             for item in batch:
                 results["error_count"] += 1
-                results["errors"].append({"barcode": item["mapping"].barcode, "error": str(exc)})
-            logger.error("[SHOPIFY] Toplu stok gönderim hatası (%d item): %s", len(batch), exc)
+                results["errors"].append({"barcode": item["mapping"].barcode, "error": err_msg})
+            logger.warning("[SHOPIFY] Batch-geneli hata (%d item): %s", len(batch), err_msg)
+            return
+
+        # Item-özel hatalar: sadece hatalıyı error say, kalanı başarılı kabul et ve güncelle.
+        now = datetime.utcnow()
+        for idx, item in enumerate(batch):
+            mapping = item["mapping"]
+            if idx in failed_indices:
+                results["error_count"] += 1
+                results["errors"].append({"barcode": mapping.barcode, "error": failed_indices[idx]})
+            else:
+                results["success_count"] += 1
+                mapping.last_stock_sent = item["qty"]
+                mapping.last_sync_at = now
+
+        if failed_indices:
+            logger.warning(
+                "[SHOPIFY] Batch kısmi: %d başarılı, %d hata (%d item)",
+                len(batch) - len(failed_indices), len(failed_indices), len(batch),
+            )
+            for idx, msg in failed_indices.items():
+                m = batch[idx]["mapping"]
+                logger.warning(
+                    "[SHOPIFY] FAIL barcode=%s qty=%s inv_id=%s msg=%s",
+                    m.barcode, batch[idx]["qty"], m.shopify_inventory_item_id, msg,
+                )
+        else:
+            logger.info("[SHOPIFY] Toplu stok gönderildi: %d item başarılı", len(batch))
 
     # ─────────────────────────────────────────────────────────────
     # Eşleştirme Listesi
@@ -19,6 +19,7 @@ from weather_service import get_weather_info, get_istanbul_time
 
 # 🔥 BARKOD ALIAS DESTEĞİ
 from barcode_alias_helper import normalize_barcode
+from image_pipeline import derived_url
 
 # 🛍️ SHOPIFY DESTEĞİ
 from shopify_site.shopify_service import shopify_service
@@ -709,7 +710,7 @@ def get_queue_orders():
                 "product_count": len(line_items),
                 "first_product_name": first_product_name,
                 "first_sku": first_sku,
-                "first_image": first_image,
+                "first_image": derived_url(first_image, "thumb", "webp"),
                 "first_raf": first_raf,
                 "order_date": s_order.get("createdAt"),
                 "total": float(price_set.get("amount", 0)),
@@ -780,7 +781,7 @@ def get_queue_orders():
                     "product_count": product_count,
                     "first_product_name": first_product_name,
                     "first_sku": first_sku,
-                    "first_image": first_image,
+                    "first_image": derived_url(first_image, "thumb", "webp"),
                     "first_raf": first_raf,
                     "order_date": order.order_date.isoformat() if order.order_date else None,
                     "total": float(order.amount) if order.amount else 0
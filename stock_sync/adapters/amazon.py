@@ -2,9 +2,24 @@
 """
 Amazon Platform Adapter
 Amazon SP-API Feeds API ile toplu stok senkronizasyonu
+
+SORUN: Listings API PATCH ürün başına bir istek; kota sıkı olduğundan
+eşzamanlılık 2 ve her istekten sonra 1 sn bekleme var → birkaç bin SKU'luk
+tam senkron saatler sürüyordu.
+
+ÇÖZÜM: Büyük gönderimler tek bir JSON_LISTINGS_FEED olarak yüklenir (her SKU
+bir PATCH mesajı). Feed oluşturulunca ürünler iyimser olarak başarılı döner
+(``response_data["feedId"]`` + ``messageId``); senkron feed'in işlenmesini
+beklemez. Gerçek sonuç ``stock_sync.batch_reconcile`` job'ında
+``check_batch_status`` ile yoklanır: işleme raporundaki messageId bazlı
+hatalar barkodlara geri eşlenir, hatalılar SyncDetail'de düzeltilip yeniden
+gönderilir. FEED_MIN_ITEMS ve altı küçük/acil farklar eskisi gibi Listings
+PATCH ile anında gider.
 """
 
 import os
+import gzip
+import json
 import asyncio
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
@@ -14,12 +29,90 @@ from .base import BasePlatformAdapter, StockItem, SyncResult
 from logger_config import app_logger as logger
 
 
+MISSING_SKU_ERROR = "Amazon seller SKU bulunamadı (products.amazon_sku boş)"
+FEED_TERMINAL_STATUSES = ("DONE", "CANCELLED", "FATAL")
+
+
+def build_listings_feed(seller_id: str, items: List[StockItem]) -> Dict[str, Any]:
+    """JSON_LISTINGS_FEED gövdesi: her ürün için fulfillment_availability PATCH mesajı.
+
+    messageId 1'den başlar ve ``items`` sırasını izler (rapor eşlemesi buna dayanır).
+    """
+    messages = []
+    for message_id, item in enumerate(items, 1):
+        messages.append({
+            "messageId": message_id,
+            "sku": item.sku,
+            "operationType": "PATCH",
+            "productType": "PRODUCT",
+            "patches": [{
+                "op": "replace",
+                "path": "/attributes/fulfillment_availability",
+                "value": [{"fulfillment_channel_code": "DEFAULT", "quantity": max(0, item.quantity)}],
+            }],
+        })
+    return {
+        "header": {"sellerId": seller_id, "version": "2.0", "issueLocale": "tr_TR"},
+        "messages": messages,
+    }
+
+
+def map_processing_report(items: List[StockItem], report: Dict[str, Any], feed_id: str,
+                          sent_at: Optional[datetime] = None,
+                          response_at: Optional[datetime] = None) -> List[SyncResult]:
+    """İşleme raporunu ürün sonuçlarına çevir.
+
+    ``issues`` içindeki ERROR seviyeli kayıtlar messageId ile ürüne bağlanır;
+    messageId'siz ERROR feed'in tamamını düşürür. WARNING başarıyı bozmaz,
+    response_data'da saklanır.
+    """
+    by_message: Dict[int, List[Dict[str, Any]]] = {}
+    feed_errors = []
+    for issue in report.get("issues") or []:
+        message_id = issue.get("messageId")
+        if message_id is None:
+            if issue.get("severity") == "ERROR":
+                feed_errors.append(issue)
+            continue
+        try:
+            by_message.setdefault(int(message_id), []).append(issue)
+        except (TypeError, ValueError):
+            continue
+
+    results = []
+    for message_id, item in enumerate(items, 1):
+        issues = by_message.get(message_id, [])
+        errors = feed_errors + [i for i in issues if i.get("severity") == "ERROR"]
+        error_message = None
+        if errors:
+            first = errors[0]
+            error_message = f"{first.get('code', 'ERROR')}: {first.get('message', '')}"[:500]
+        results.append(SyncResult(
+            barcode=item.barcode,
+            success=not errors,
+            quantity_sent=max(0, item.quantity),
+            error_message=error_message,
+            response_data={"feedId": feed_id, "messageId": message_id, "issues": issues} if issues
+            else {"feedId": feed_id, "messageId": message_id},
+            sent_at=sent_at,
+            response_at=response_at,
+        ))
+    return results
+
+
 class AmazonAdapter(BasePlatformAdapter):
-    """Amazon SP-API stok senkronizasyon adaptörü - Listings API ile güncelleme"""
+    """Amazon SP-API stok senkronizasyon adaptörü.
+
+    FEED_MIN_ITEMS üzeri gönderimler JSON_LISTINGS_FEED ile toplu, altı Listings
+    API PATCH ile tek tek gider (env: STOCK_SYNC_AMAZON_FEED_MIN_ITEMS). Feed
+    sonucu ``check_batch_status`` ile mutabakat job'ında okunur.
+    """
     
     PLATFORM_NAME = "amazon"
     BATCH_SIZE = 50  # 50 ürünlük batch'ler
     RATE_LIMIT_DELAY = 1.0  # Rate limit için 1 saniye bekleme
+    FEED_MIN_ITEMS = 50  # Bu sayının üzerinde feed modu
+    FEED_CONTENT_TYPE = "application/json; charset=UTF-8"
     LWA_ENDPOINT = "https://api.amazon.com/auth/o2/token"
     SP_API_ENDPOINT = "https://sellingpartnerapi-eu.amazon.com"
     
@@ -89,6 +182,158 @@ class AmazonAdapter(BasePlatformAdapter):
             'Content-Type': content_type
         }
     
+    async def send_all_stocks(self, items: List[StockItem], progress_callback=None) -> List[SyncResult]:
+        """Küçük farklar Listings PATCH ile, büyük gönderimler tek feed ile gider."""
+        feed_min = max(0, self._env_override("FEED_MIN_ITEMS", self.FEED_MIN_ITEMS, int))
+        if not self.is_configured or len(items) <= feed_min:
+            return await super().send_all_stocks(items, progress_callback=progress_callback)
+        return await self.send_inventory_feed(items, progress_callback=progress_callback)
+
+    async def send_inventory_feed(self, items: List[StockItem], progress_callback=None) -> List[SyncResult]:
+        """
+        Stokları tek JSON_LISTINGS_FEED olarak gönder; işlenmesini bekleme.
+
+        Akış: feed dokümanı oluştur → gövdeyi ön-imzalı URL'e yükle → feed'i
+        başlat. Feed'e giren ürünler iyimser olarak başarılı döner
+        (``response_data``: feedId + messageId); işleme raporu mutabakat
+        job'ında ``check_batch_status`` ile okunur. Sonuç sırası ``items`` ile aynıdır.
+        """
+        total = len(items)
+        feed_items = [item for item in items if item.sku]
+        results: Dict[int, SyncResult] = {
+            id(item): SyncResult(barcode=item.barcode, success=False, quantity_sent=max(0, item.quantity),
+                                 error_message=MISSING_SKU_ERROR)
+            for item in items if not item.sku
+        }
+
+        def _ordered() -> List[SyncResult]:
+            return [results[id(item)] for item in items]
+
+        def _fail_all(error: str) -> List[SyncResult]:
+            for item, res in zip(feed_items, self._failed_results(feed_items, error)):
+                results[id(item)] = res
+            return _ordered()
+
+        if not feed_items:
+            return _ordered()
+
+        access_token = await self._get_access_token()
+        if not access_token:
+            return _fail_all("Access token alınamadı")
+
+        sent_at = datetime.utcnow()
+        try:
+            body = json.dumps(build_listings_feed(self.seller_id, feed_items), ensure_ascii=False)
+            document_id = await self._upload_feed_document(access_token, body.encode("utf-8"))
+            feed_id = await self._create_feed(access_token, document_id)
+        except Exception as e:
+            logger.error(f"[AMAZON] ❌ Feed gönderilemedi: {e}")
+            return _fail_all(f"Feed gönderilemedi: {e}")
+
+        response_at = datetime.utcnow()
+        for message_id, item in enumerate(feed_items, 1):
+            results[id(item)] = SyncResult(
+                barcode=item.barcode, success=True, quantity_sent=max(0, item.quantity),
+                response_data={"feedId": feed_id, "messageId": message_id},
+                sent_at=sent_at, response_at=response_at,
+            )
+        if progress_callback:
+            progress_callback(total, total)
+        logger.info(f"[AMAZON] Feed {feed_id} gönderildi ({len(feed_items)} SKU); sonuç mutabakatta yoklanacak")
+        return _ordered()
+
+    async def check_batch_status(self, feed_id: str, items: Optional[List[list]] = None) -> Dict[str, Any]:
+        """Feed sonucunu ``batch_reconcile``'ın beklediği biçimde döndür.
+
+        ``items``: feed'e giren ``[messageId, barkod, adet]`` listesi (kayıt
+        anında saklanır). Dönüş Trendyol batch yanıtıyla aynı şekildedir:
+        bitmemişse ``{"status": <processingStatus>, "items": []}``, bitmişse
+        ``{"status": "COMPLETED", "items": [{"requestItem", "status", "failureReasons"}]}``.
+        """
+        status = await self.get_feed_status(feed_id)
+        if not status.get("success"):
+            return {"error": status.get("error") or "Feed durumu okunamadı"}
+        processing = status.get("processingStatus")
+        if processing not in FEED_TERMINAL_STATUSES:
+            return {"status": processing, "items": []}
+
+        ordered = sorted(items or [], key=lambda entry: int(entry[0]))
+        stock_items = [StockItem(barcode=barcode, quantity=int(qty or 0)) for _, barcode, qty in ordered]
+        if processing == "DONE":
+            try:
+                report = await self._download_feed_document(status["resultFeedDocumentId"])
+            except Exception as e:
+                return {"error": f"Feed {feed_id} işleme raporu alınamadı: {e}"}
+            mapped = map_processing_report(stock_items, report, feed_id)
+            summary = report.get("summary") or {}
+            logger.info(f"[AMAZON] Feed {feed_id} tamamlandı - kabul: {summary.get('messagesAccepted')}, "
+                        f"hatalı: {summary.get('messagesInvalid')}")
+        else:
+            mapped = self._failed_results(stock_items, f"Feed {feed_id} durumu: {processing}")
+            logger.error(f"[AMAZON] ❌ Feed {feed_id} durumu: {processing}")
+
+        return {"status": "COMPLETED", "items": [
+            {"requestItem": {"barcode": r.barcode, "quantity": r.quantity_sent},
+             "status": "SUCCESS" if r.success else "FAILED",
+             "failureReasons": [r.error_message] if r.error_message else []}
+            for r in mapped
+        ]}
+
+    async def _upload_feed_document(self, access_token: str, body: bytes) -> str:
+        """Feed dokümanı oluştur, gövdeyi ön-imzalı URL'e yükle; feedDocumentId döner."""
+        session = await self.get_session()
+        url = f"{self.SP_API_ENDPOINT}/feeds/2021-06-30/documents"
+        async with session.post(url, json={"contentType": self.FEED_CONTENT_TYPE},
+                                headers=self._get_headers(access_token)) as response:
+            if response.status not in (200, 201):
+                text = await response.text()
+                raise RuntimeError(f"createFeedDocument HTTP {response.status}: {text[:200]}")
+            document = await response.json()
+
+        async with session.put(document["url"], data=body,
+                               headers={"Content-Type": self.FEED_CONTENT_TYPE}) as response:
+            if response.status not in (200, 201):
+                text = await response.text()
+                raise RuntimeError(f"Feed yükleme HTTP {response.status}: {text[:200]}")
+        return document["feedDocumentId"]
+
+    async def _create_feed(self, access_token: str, document_id: str) -> str:
+        """Yüklenen dokümanla JSON_LISTINGS_FEED başlat; feedId döner."""
+        session = await self.get_session()
+        url = f"{self.SP_API_ENDPOINT}/feeds/2021-06-30/feeds"
+        payload = {
+            "feedType": "JSON_LISTINGS_FEED",
+            "marketplaceIds": [self.marketplace_id],
+            "inputFeedDocumentId": document_id,
+        }
+        async with session.post(url, json=payload, headers=self._get_headers(access_token)) as response:
+            if response.status not in (200, 202):
+                text = await response.text()
+                raise RuntimeError(f"createFeed HTTP {response.status}: {text[:200]}")
+            data = await response.json()
+        return data["feedId"]
+
+    async def _download_feed_document(self, document_id: str) -> Dict[str, Any]:
+        """İşleme raporu dokümanını indir (gerekirse GZIP aç) ve JSON olarak döndür."""
+        access_token = await self._get_access_token()
+        if not access_token:
+            raise RuntimeError("Access token alınamadı")
+        session = await self.get_session()
+        url = f"{self.SP_API_ENDPOINT}/feeds/2021-06-30/documents/{document_id}"
+        async with session.get(url, headers=self._get_headers(access_token)) as response:
+            if response.status != 200:
+                text = await response.text()
+                raise RuntimeError(f"getFeedDocument HTTP {response.status}: {text[:200]}")
+            document = await response.json()
+
+        async with session.get(document["url"]) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Rapor indirme HTTP {response.status}")
+            raw = await response.read()
+        if document.get("compressionAlgorithm") == "GZIP":
+            raw = gzip.decompress(raw)
+        return json.loads(raw.decode("utf-8"))
+
     async def send_stock_batch(self, items: List[StockItem]) -> List[SyncResult]:
         """
         Amazon Listings API ile stok güncellemesi.
@@ -147,7 +392,7 @@ class AmazonAdapter(BasePlatformAdapter):
                 barcode=item.barcode,
                 success=False,
                 quantity_sent=max(0, item.quantity),
-                error_message="Amazon seller SKU bulunamadı (products.amazon_sku boş)"
+                error_message=MISSING_SKU_ERROR
             )
         
         url = f"{self.SP_API_ENDPOINT}/listings/2021-08-01/items/{self.seller_id}/{sku}"
@@ -229,7 +474,7 @@ class AmazonAdapter(BasePlatformAdapter):
             )
     
     def _build_inventory_feed_xml(self, items: List[StockItem]) -> str:
-        """Amazon Inventory Feed XML oluştur"""
+        """Amazon Inventory Feed XML oluştur (eski POST_INVENTORY_AVAILABILITY_DATA; feed modu JSON_LISTINGS_FEED kullanır)"""
         messages = ""
         for i, item in enumerate(items, 1):
             sku = item.sku or item.barcode
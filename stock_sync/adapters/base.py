@@ -8,6 +8,11 @@ from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from datetime import datetime
 import asyncio
+import os
+import random
+import threading
+import time
+import weakref
 import aiohttp
 import ssl
 import certifi
@@ -37,21 +42,100 @@ class SyncResult:
     response_at: Optional[datetime] = None
 
 
+class RetryableBatchError(Exception):
+    """Batch'in tekrar denenmesi gereken geçici hata (429, 5xx, timeout).
+
+    ``send_stock_batch`` bu hatayı fırlatırsa ``send_all_stocks`` batch'i
+    jitter'lı backoff ile yeniden dener; kalıcı hatalar SyncResult olarak döner.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket: saniyede ``rate`` istek, ``capacity`` kadar patlama.
+
+    Sayaç thread kilidiyle korunur, bekleme ``asyncio.sleep`` ile yapılır; aynı
+    kova farklı thread/event loop'larda koşan senkronlar (otomatik, manuel,
+    dispatcher) arasında paylaşılabilir.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = None
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, capacity: float) -> None:
+        with self._lock:
+            self.rate = rate
+            self.capacity = max(1.0, capacity)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def _take(self) -> float:
+        """Token varsa alır ve 0 döner; yoksa beklenecek süre."""
+        with self._lock:
+            now = time.monotonic()
+            if self._updated is not None:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    async def acquire(self):
+        while self.rate > 0:
+            wait = self._take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+# Platform başına tek kova: aynı platforma eşzamanlı senkronlar hız sınırını paylaşır
+_platform_buckets: Dict[str, TokenBucket] = {}
+_platform_buckets_lock = threading.Lock()
+
+
+def platform_bucket(platform: str, rate: float, capacity: float) -> TokenBucket:
+    with _platform_buckets_lock:
+        bucket = _platform_buckets.get(platform)
+        if bucket is None:
+            bucket = _platform_buckets[platform] = TokenBucket(rate, capacity=capacity)
+    if bucket.rate != rate or bucket.capacity != max(1.0, capacity):
+        bucket.configure(rate, capacity)   # env ile değişen ayar
+    return bucket
+
+
 class BasePlatformAdapter(ABC):
     """
     Tüm platform adaptörlerinin temel sınıfı.
     Her platform bu sınıftan türetilmeli ve gerekli metodları implement etmeli.
+
+    Gönderim hızı iki ayarla sınırlanır (env ile ezilebilir, örn.
+    ``STOCK_SYNC_TRENDYOL_RPS`` / ``STOCK_SYNC_TRENDYOL_IN_FLIGHT``):
+    - REQUESTS_PER_SECOND: token bucket hızı (None → 1 / RATE_LIMIT_DELAY)
+    - MAX_IN_FLIGHT: aynı anda uçuşta olabilecek batch sayısı
     """
     
     PLATFORM_NAME: str = "base"
     BATCH_SIZE: int = 100
     RATE_LIMIT_DELAY: float = 0.1  # saniye
+    REQUESTS_PER_SECOND: Optional[float] = None
+    MAX_IN_FLIGHT: int = 1
     MAX_RETRIES: int = 3
+    RETRY_BASE_DELAY: float = 1.0  # saniye; 2^deneme ile büyür, ±%50 jitter
     TIMEOUT: int = 60
     
     def __init__(self):
         self.is_configured = False
-        self._session: Optional[aiohttp.ClientSession] = None
+        # Event loop başına kalıcı HTTP session (connection pool senkronlar
+        # arası korunur; aiohttp session'ı oluşturulduğu loop'a bağlıdır)
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = \
+            weakref.WeakKeyDictionary()
         self._init_config()
     
     @abstractmethod
@@ -83,23 +167,53 @@ class BasePlatformAdapter(ABC):
         pass
     
     async def get_session(self) -> aiohttp.ClientSession:
-        """HTTP session al veya oluştur"""
-        if self._session is None or self._session.closed:
+        """Çalışan event loop'un HTTP session'ını al veya oluştur"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
             timeout = aiohttp.ClientTimeout(total=self.TIMEOUT)
             ssl_context = ssl.create_default_context(cafile=certifi.where())
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            self._session = aiohttp.ClientSession(timeout=timeout, connector=connector)
-        return self._session
+            connector = aiohttp.TCPConnector(ssl=ssl_context, limit_per_host=max(self._max_in_flight(), 10),
+                                             keepalive_timeout=300)
+            session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+            self._sessions[loop] = session
+        return session
     
     async def close_session(self):
-        """HTTP session'ı kapat"""
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        """Çalışan event loop'un HTTP session'ını kapat"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session and not session.closed:
+            await session.close()
+
+    def _env_override(self, suffix: str, default, cast):
+        raw = os.environ.get(f"STOCK_SYNC_{self.PLATFORM_NAME.upper()}_{suffix}")
+        if raw is None:
+            return default
+        try:
+            return cast(raw)
+        except (TypeError, ValueError):
+            return default
+
+    def _requests_per_second(self) -> float:
+        default = self.REQUESTS_PER_SECOND
+        if default is None:
+            default = 1.0 / self.RATE_LIMIT_DELAY if self.RATE_LIMIT_DELAY > 0 else 0.0
+        return max(0.0, self._env_override("RPS", default, float))
+
+    def _max_in_flight(self) -> int:
+        return max(1, self._env_override("IN_FLIGHT", self.MAX_IN_FLIGHT, int))
+
+    def _failed_results(self, batch: List[StockItem], error: str) -> List[SyncResult]:
+        return [SyncResult(barcode=item.barcode, success=False, quantity_sent=max(0, item.quantity),
+                           error_message=error) for item in batch]
     
     async def send_all_stocks(self, items: List[StockItem], progress_callback=None) -> List[SyncResult]:
         """
         Tüm stokları batch'ler halinde gönder.
+
+        Batch'ler MAX_IN_FLIGHT kadar eşzamanlı, token bucket hızında gider;
+        her batch kendi retry/backoff döngüsünü yürütür. HTTP session açık
+        kalır (bir sonraki senkron aynı connection pool'u kullanır).
         
         Args:
             items: Tüm ürünler
@@ -113,50 +227,45 @@ class BasePlatformAdapter(ABC):
             return [SyncResult(barcode=item.barcode, success=False, error_message="Platform yapılandırılmamış") 
                     for item in items]
         
-        all_results: List[SyncResult] = []
         total = len(items)
+        batches = [items[i:i + self.BATCH_SIZE] for i in range(0, total, self.BATCH_SIZE)]
+        batch_results: List[Optional[List[SyncResult]]] = [None] * len(batches)
+        bucket = platform_bucket(self.PLATFORM_NAME, self._requests_per_second(), self._max_in_flight())
+        in_flight = asyncio.Semaphore(self._max_in_flight())
         sent = 0
-        
-        # Batch'lere böl
-        for i in range(0, total, self.BATCH_SIZE):
-            batch = items[i:i + self.BATCH_SIZE]
-            
-            # Retry mekanizması
+
+        async def _run_batch(idx: int, batch: List[StockItem]):
+            nonlocal sent
             for attempt in range(self.MAX_RETRIES):
                 try:
-                    results = await self.send_stock_batch(batch)
-                    all_results.extend(results)
-                    sent += len(batch)
-                    
-                    if progress_callback:
-                        progress_callback(sent, total)
-                    
-                    # Rate limit
-                    if self.RATE_LIMIT_DELAY > 0 and i + self.BATCH_SIZE < total:
-                        await asyncio.sleep(self.RATE_LIMIT_DELAY)
-                    
-                    break  # Başarılı, retry'dan çık
-                    
+                    async with in_flight:
+                        await bucket.acquire()
+                        results = await self.send_stock_batch(batch)
+                    break
                 except Exception as e:
-                    logger.error(f"[{self.PLATFORM_NAME.upper()}] Batch {i//self.BATCH_SIZE + 1} hatası (deneme {attempt + 1}): {e}")
-                    
+                    logger.error(f"[{self.PLATFORM_NAME.upper()}] Batch {idx + 1}/{len(batches)} hatası (deneme {attempt + 1}): {e}")
                     if attempt == self.MAX_RETRIES - 1:
-                        # Son deneme de başarısız
-                        for item in batch:
-                            all_results.append(SyncResult(
-                                barcode=item.barcode,
-                                success=False,
-                                error_message=str(e)
-                            ))
-                        sent += len(batch)
-                        if progress_callback:
-                            progress_callback(sent, total)
-                    else:
-                        # Bekle ve tekrar dene
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
-        
-        await self.close_session()
-        return all_results
+                        results = self._failed_results(batch, str(e))
+                        break
+                    # Backoff sırasında uçuş slotu bırakılmış olur — diğer batch'ler durmaz
+                    delay = self.RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    retry_after = getattr(e, "retry_after", None)
+                    if retry_after:
+                        delay = max(delay, retry_after)
+                    await asyncio.sleep(delay)
+            batch_results[idx] = results
+            sent += len(batch)
+            if progress_callback:
+                progress_callback(sent, total)
+
+        logger.info(
+            f"[{self.PLATFORM_NAME.upper()}] {len(batches)} batch gönderiliyor "
+            f"(uçuşta en fazla {self._max_in_flight()}, {self._requests_per_second():.1f} istek/sn)"
+        )
+        await asyncio.gather(*(_run_batch(i, b) for i, b in enumerate(batches)))
+
+        # Sonuçlar batch sırasıyla döner (tamamlanma sırasından bağımsız)
+        return [r for results in batch_results for r in (results or [])]
     
     def validate_config(self) -> bool:
         """Yapılandırmanın geçerli olup olmadığını kontrol et"""
@@ -22,6 +22,7 @@ class HepsiburadaAdapter(BasePlatformAdapter):
     PLATFORM_NAME = "hepsiburada"
     BATCH_SIZE = 50  # Listing API batch boyutu
     RATE_LIMIT_DELAY = 0.3  # 300ms (240 req/min limit)
+    MAX_IN_FLIGHT = 2
     TIMEOUT = 30
 
     def _init_config(self):
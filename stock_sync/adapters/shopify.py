@@ -3,6 +3,10 @@
 Shopify Platform Adapter
 Shopify Admin GraphQL API (2026-01) stock sync adapter.
 client_id + client_secret ile OAuth token alır.
+
+Tüm çağrılar ``shopify_graphql_client`` üzerinden gider (panel stok gönderimiyle
+aynı maliyet kovası ve kalıcı session); sabit uyku yok, batch'ler kovanın
+izin verdiği kadar eşzamanlı gider.
 """
 
 import asyncio
@@ -10,6 +14,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from shopify_site.shopify_config import ShopifyConfig
+from shopify_site.shopify_graphql import shopify_graphql_client
 
 from .base import BasePlatformAdapter, StockItem, SyncResult
 from logger_config import app_logger as logger
@@ -20,7 +25,8 @@ class ShopifyAdapter(BasePlatformAdapter):
 
     PLATFORM_NAME = "shopify"
     BATCH_SIZE = 100
-    RATE_LIMIT_DELAY = 0.3
+    REQUESTS_PER_SECOND = 0.0  # hız sınırını istemcinin maliyet kovası yönetir
+    MAX_IN_FLIGHT = 4
 
     def _init_config(self):
         self.store_domain = ShopifyConfig.normalized_store_domain()
@@ -44,35 +50,8 @@ class ShopifyAdapter(BasePlatformAdapter):
         return ShopifyConfig.get_headers()
 
     async def _graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        session = await self.get_session()
-        payload = {"query": query, "variables": variables or {}}
-
-        async with session.post(ShopifyConfig.graphql_url(), json=payload, headers=self._get_headers()) as response:
-            response_at = datetime.utcnow()
-            text = await response.text()
-
-            if response.status == 401:
-                ShopifyConfig.reset_token()
-                async with session.post(ShopifyConfig.graphql_url(), json=payload, headers=self._get_headers()) as retry:
-                    response_at = datetime.utcnow()
-                    text = await retry.text()
-                    if retry.status != 200:
-                        raise RuntimeError(f"Shopify GraphQL HTTP {retry.status}: {text[:300]}")
-                    data = await retry.json()
-                    if data.get("errors"):
-                        raise RuntimeError(f"Shopify GraphQL error: {data['errors']}")
-                    return {"data": data["data"], "response_at": response_at}
-
-            if response.status != 200:
-                raise RuntimeError(f"Shopify GraphQL HTTP {response.status}: {text[:300]}")
-
-            data = await response.json()
-            if data.get("errors"):
-                raise RuntimeError(f"Shopify GraphQL error: {data['errors']}")
-            if data.get("data") is None:
-                raise RuntimeError("Shopify GraphQL returned empty data")
-
-            return {"data": data["data"], "response_at": response_at}
+        data = await shopify_graphql_client.call(query, variables)
+        return {"data": data, "response_at": datetime.utcnow()}
 
     async def _ensure_location_id(self) -> Optional[str]:
         if self._active_location_id:
@@ -165,10 +144,19 @@ class ShopifyAdapter(BasePlatformAdapter):
             if not page_info.get("hasNextPage"):
                 break
             after = page_info.get("endCursor")
-            await asyncio.sleep(0.1)
 
         logger.info(f"[SHOPIFY] Loaded {total} variant mappings")
 
+    async def send_all_stocks(self, items: List[StockItem], progress_callback=None) -> List[SyncResult]:
+        # Variant haritası eşzamanlı batch'lerden önce bir kez yüklenir
+        if self.is_configured and items:
+            try:
+                await self._ensure_variant_map()
+                await self._ensure_location_id()
+            except Exception as e:
+                logger.warning(f"[SHOPIFY] Variant/location ön yüklemesi başarısız, batch'lerde yeniden denenecek: {e}")
+        return await super().send_all_stocks(items, progress_callback=progress_callback)
+
     async def send_stock_batch(self, items: List[StockItem]) -> List[SyncResult]:
         if not items:
             return []
@@ -213,15 +201,11 @@ class ShopifyAdapter(BasePlatformAdapter):
                 continue
             matched_items.append((item, match["inventory_item_id"]))
 
-        # Toplu gönderim: max 100 item tek API çağrısı
+        # Toplu gönderim: max 100 item tek API çağrısı; parçalar eşzamanlı, kova sınırlar
         BULK_SIZE = 100
-        if matched_items:
-            for i in range(0, len(matched_items), BULK_SIZE):
-                chunk = matched_items[i:i + BULK_SIZE]
-                chunk_results = await self._set_inventory_bulk(chunk, location_id)
-                results.extend(chunk_results)
-                if i + BULK_SIZE < len(matched_items):
-                    await asyncio.sleep(self.RATE_LIMIT_DELAY)
+        chunks = [matched_items[i:i + BULK_SIZE] for i in range(0, len(matched_items), BULK_SIZE)]
+        for chunk_results in await asyncio.gather(*(self._set_inventory_bulk(c, location_id) for c in chunks)):
+            results.extend(chunk_results)
 
         ok = sum(1 for r in results if r.success)
         fail = len(results) - ok
@@ -11,7 +11,7 @@ from datetime import datetime
 from typing import List, Dict, Any
 import aiohttp
 
-from .base import BasePlatformAdapter, StockItem, SyncResult
+from .base import BasePlatformAdapter, StockItem, SyncResult, RetryableBatchError
 from logger_config import app_logger as logger
 from trendyol_v2 import flatten_v2_page, V2_MAX_PAGE_SIZE
 
@@ -21,7 +21,8 @@ class TrendyolAdapter(BasePlatformAdapter):
     
     PLATFORM_NAME = "trendyol"
     BATCH_SIZE = 100  # Trendyol max 100 ürün/istek
-    RATE_LIMIT_DELAY = 0.2  # 200ms bekleme
+    RATE_LIMIT_DELAY = 0.2  # 200ms → 5 istek/sn (token bucket)
+    MAX_IN_FLIGHT = 4
     BASE_URL = "https://apigw.trendyol.com/integration"
     
     def _init_config(self):
@@ -54,6 +55,10 @@ class TrendyolAdapter(BasePlatformAdapter):
         """
         Trendyol'a stok batch'i gönder.
         API: POST /integration/inventory/sellers/{sellerId}/products/price-and-inventory
+
+        200 yanıtı yalnız kabuldür: ürünler iyimser olarak başarılı döner,
+        ``response_data["batchRequestId"]`` ile gerçek sonuç sonradan
+        ``stock_sync.batch_reconcile`` tarafından yoklanır.
         """
         results: List[SyncResult] = []
         
@@ -103,6 +108,13 @@ class TrendyolAdapter(BasePlatformAdapter):
                     # Hata
                     error_msg = f"HTTP {response.status}: {response_text[:300]}"
                     logger.error(f"[TRENDYOL] ❌ Batch hatası: {error_msg}")
+                    # Rate limit / sunucu hatası geçicidir → send_all_stocks yeniden dener
+                    if response.status == 429 or response.status >= 500:
+                        try:
+                            retry_after = float(response.headers.get("Retry-After") or 0) or None
+                        except (TypeError, ValueError):
+                            retry_after = None
+                        raise RetryableBatchError(error_msg, retry_after=retry_after)
                     
                     for item in items:
                         results.append(SyncResult(
@@ -114,17 +126,18 @@ class TrendyolAdapter(BasePlatformAdapter):
                             response_at=response_at
                         ))
                         
+        except RetryableBatchError:
+            raise
+
         except asyncio.TimeoutError:
             error_msg = "İstek zaman aşımı (timeout)"
             logger.error(f"[TRENDYOL] ❌ {error_msg}")
-            for item in items:
-                results.append(SyncResult(barcode=item.barcode, success=False, quantity_sent=max(0, item.quantity), error_message=error_msg))
+            raise RetryableBatchError(error_msg)
                 
         except aiohttp.ClientError as e:
             error_msg = f"Bağlantı hatası: {str(e)}"
             logger.error(f"[TRENDYOL] ❌ {error_msg}")
-            for item in items:
-                results.append(SyncResult(barcode=item.barcode, success=False, quantity_sent=max(0, item.quantity), error_message=error_msg))
+            raise RetryableBatchError(error_msg)
                 
         except Exception as e:
             error_msg = f"Beklenmeyen hata: {str(e)}"
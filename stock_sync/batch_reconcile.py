@@ -0,0 +1,287 @@
+"""Batch / feed mutabakatı — asenkron işlenen stok gönderimlerinin gerçek sonucu.
+
+SORUN
+-----
+``TrendyolAdapter.send_stock_batch`` POST 200 dönünce batch'teki her ürünü
+başarılı sayıyordu; oysa Trendyol batch'i sonradan işler ve ürün bazında
+reddedebilir (barkod bulunamadı, kilitli ürün...). ``check_batch_status``
+hiç çağrılmadığından başarı oranı şişik, hatalı barkodlar ise diff push
+defterine "gönderildi" diye giriyor ve bir sonraki tam push'a kadar düzelmiyordu.
+
+Amazon JSON_LISTINGS_FEED'inde ise senkron feed işlenene dek (20 dk'ya kadar)
+yokluyordu; ``sync_all_platforms`` tüm platformları beklediği için her tam
+senkron Amazon'a takılıyor, zaman aşımında tüm feed hatalı yazılıyordu.
+
+ÇÖZÜM
+-----
+- ``sync_platform`` detayları yazarken yanıtlardaki batch kimliklerini
+  (Trendyol ``batchRequestId``, Amazon ``feedId``) ``SyncBatchRequest`` olarak
+  aynı commit'e ekler (``record_batches``). Amazon raporu yalnız messageId
+  verdiğinden feed'in ``[messageId, barkod, adet]`` listesi ``items``'ta saklanır.
+- ``reconcile_pending_batches`` (dakikalık job) vadesi gelen kayıtları
+  eşzamanlı yoklar; bitmeyenler üstel backoff ile (``POLL_BASE_SECONDS`` →
+  ``POLL_MAX_SECONDS``) ertelenir, ``MAX_AGE_HOURS``'u aşan ``expired`` olur.
+- Biten batch'te FAILED ürünlerin ``SyncDetail`` satırı ``error``'a çekilir
+  (sadece-hata modunda özetten çıkarılıp hata satırı eklenir), session
+  sayaçları düzeltilir. Böylece diff defteri bu barkodları değişmiş sayar.
+- Yalnız hatalı barkodlar o platforma yeniden gönderilir
+  (``triggered_by="batch_retry"``); retry session'ının hataları tekrar
+  kuyruğa alınmaz — kalıcı hatalar döngüye girmez, 3 dakikalık senkron
+  ve tam push güvenlik ağı olarak kalır.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect as sa_inspect, text
+
+from models import db, SyncSession, SyncDetail, SyncSessionSummary, SyncBatchRequest
+from . import detail_writer
+
+logger = logging.getLogger(__name__)
+
+# Sonucu sonradan yoklanan platformlar → yanıttaki batch kimliği anahtarı
+BATCH_ID_KEYS = {"trendyol": "batchRequestId", "amazon": "feedId"}
+PLATFORMS = tuple(BATCH_ID_KEYS)
+RETRY_TRIGGER = "batch_retry"
+POLL_BASE_SECONDS = 30
+POLL_MAX_SECONDS = 15 * 60
+MAX_AGE_HOURS = 4                   # Trendyol batch sonuçlarını ~4 saat tutar
+BATCH_LIMIT = 100
+CONCURRENCY = 4
+_DONE_ITEM_STATUSES = ("SUCCESS", "FAILED")
+
+
+def record_batches(session_pk: int, platform: str, results) -> int:
+    """Sonuçlardaki ``batchRequestId``'leri mutabakat kuyruğuna ekler. Commit çağırana aittir."""
+    key = BATCH_ID_KEYS.get(platform)
+    if not key:
+        return 0
+    counts: dict[str, int] = {}
+    messages: dict[str, list] = {}
+    for result in results:
+        data = result.response_data if isinstance(result.response_data, dict) else None
+        batch_id = data.get(key) if data else None
+        if result.success and batch_id:
+            counts[str(batch_id)] = counts.get(str(batch_id), 0) + 1
+            if data.get("messageId") is not None:
+                messages.setdefault(str(batch_id), []).append(
+                    [int(data["messageId"]), result.barcode, result.quantity_sent])
+    now = datetime.utcnow()
+    for batch_id, count in counts.items():
+        db.session.add(SyncBatchRequest(
+            session_id=session_pk, platform=platform, batch_request_id=batch_id,
+            item_count=count, items=messages.get(batch_id), status="pending", attempts=0,
+            next_check_at=now + timedelta(seconds=POLL_BASE_SECONDS), created_at=now,
+        ))
+    return len(counts)
+
+
+def _backoff_seconds(attempts: int) -> float:
+    return min(POLL_BASE_SECONDS * (2 ** max(0, attempts - 1)), POLL_MAX_SECONDS)
+
+
+def _item_barcode(entry: dict):
+    request_item = entry.get("requestItem") or {}
+    return request_item.get("barcode") or entry.get("barcode")
+
+
+def _item_reason(entry: dict, platform: str) -> str:
+    reasons = entry.get("failureReasons") or []
+    text = "; ".join(str(r.get("message", r)) if isinstance(r, dict) else str(r) for r in reasons)
+    return (text or f"{platform.capitalize()} batch: FAILED")[:500]
+
+
+def is_finished(data: dict, item_count: int) -> bool:
+    """Batch işlemesi bitti mi? (genel durum COMPLETED ya da tüm ürünler sonuçlanmış)"""
+    if str(data.get("status") or "").upper() == "COMPLETED":
+        return True
+    items = data.get("items") or []
+    return bool(items) and len(items) >= item_count and all(
+        str(i.get("status") or "").upper() in _DONE_ITEM_STATUSES for i in items)
+
+
+def apply_batch_result(batch: SyncBatchRequest, data: dict, now: datetime | None = None) -> list[str]:
+    """Biten batch'in ürün sonuçlarını SyncDetail/özet/session'a işler. Commit çağırana aittir.
+
+    Returns:
+        FAILED dönen barkodlar.
+    """
+    now = now or datetime.utcnow()
+    failed: dict[str, str] = {}
+    quantities: dict[str, int] = {}
+    succeeded = 0
+    for entry in data.get("items") or []:
+        barcode = _item_barcode(entry)
+        if not barcode:
+            continue
+        if str(entry.get("status") or "").upper() == "FAILED":
+            failed[barcode] = _item_reason(entry, batch.platform)
+            quantities[barcode] = (entry.get("requestItem") or {}).get("quantity")
+        else:
+            succeeded += 1
+
+    flipped = 0
+    if failed:
+        response_data = {BATCH_ID_KEYS.get(batch.platform, "batchRequestId"): batch.batch_request_id,
+                         "status": "FAILED"}
+        rows = (SyncDetail.query
+                .filter(SyncDetail.session_id == batch.session_id,
+                        SyncDetail.platform == batch.platform,
+                        SyncDetail.barcode.in_(list(failed)))
+                .all())
+        for row in rows:
+            if row.status != "error":
+                flipped += 1
+            row.status = "error"
+            row.error_message = failed[row.barcode]
+            row.response_data = {**response_data, "failureReasons": failed[row.barcode]}
+            row.response_at = now
+
+        # Sadece-hata modu: başarılı satır özetteydi → özetten çıkar, hata satırı ekle
+        missing = set(failed) - {row.barcode for row in rows}
+        summary = db.session.get(SyncSessionSummary, batch.session_id) if missing else None
+        stocks = dict(summary.stocks or {}) if summary else {}
+        for barcode in sorted(missing):
+            sent = stocks.pop(barcode, None)
+            if sent is not None:
+                flipped += 1
+            db.session.add(SyncDetail(
+                session_id=batch.session_id, barcode=barcode, platform=batch.platform,
+                stock_sent=int(sent if sent is not None else quantities.get(barcode) or 0),
+                status="error", error_message=failed[barcode],
+                response_data={**response_data, "failureReasons": failed[barcode]},
+                response_at=now, created_at=now,
+            ))
+        if summary:
+            summary.stocks = stocks  # JSON kolonu: yeni dict ata ki değişiklik algılansın
+            summary.success_count = len(stocks)
+
+    session = db.session.get(SyncSession, batch.session_id)
+    if session and flipped:
+        session.success_count = max(0, (session.success_count or 0) - flipped)
+        session.error_count = (session.error_count or 0) + flipped
+
+    batch.status = "completed"
+    batch.success_count = succeeded
+    batch.failed_count = len(failed)
+    batch.completed_at = now
+    batch.error_message = None
+    return sorted(failed)
+
+
+def _status_checker(platform: str):
+    from .service import stock_sync_service
+    return stock_sync_service._adapters[platform].check_batch_status
+
+
+async def _check_all(batches: list[SyncBatchRequest]) -> list[dict]:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def _one(batch):
+        async with semaphore:
+            args = (batch.batch_request_id,) if batch.items is None else (batch.batch_request_id, batch.items)
+            try:
+                return await _status_checker(batch.platform)(*args)
+            except Exception as e:
+                return {"error": str(e)}
+
+    return await asyncio.gather(*(_one(b) for b in batches))
+
+
+def _run(coro):
+    from .service import _auto_sync_lock, _get_auto_sync_loop
+    with _auto_sync_lock:
+        return _get_auto_sync_loop().run_until_complete(coro)
+
+
+def _requeue(platform: str, barcodes: list[str]) -> dict:
+    from .service import stock_sync_service
+    return _run(stock_sync_service.sync_specific_barcodes(
+        barcodes, platforms=[platform], triggered_by=RETRY_TRIGGER))
+
+
+def reconcile_pending_batches(limit: int = BATCH_LIMIT, now: datetime | None = None) -> dict:
+    """Vadesi gelen batch'leri yoklar, bitenleri işler, hatalı barkodları yeniden gönderir."""
+    now = now or datetime.utcnow()
+    batches = (SyncBatchRequest.query
+               .filter(SyncBatchRequest.status == "pending", SyncBatchRequest.next_check_at <= now)
+               .order_by(SyncBatchRequest.next_check_at)
+               .limit(limit)
+               .all())
+    stats = {"checked": len(batches), "completed": 0, "pending": 0, "expired": 0,
+             "failed_items": 0, "requeued": 0}
+    if not batches:
+        return stats
+
+    responses = _run(_check_all(batches))
+    retry: dict[str, set[str]] = {}
+    retry_batches: dict[str, list[SyncBatchRequest]] = {}
+    for batch, data in zip(batches, responses):
+        batch.attempts = (batch.attempts or 0) + 1
+        batch.last_checked_at = now
+        data = data if isinstance(data, dict) else {"error": "geçersiz yanıt"}
+        if not data.get("error") and is_finished(data, batch.item_count or 0):
+            failed = apply_batch_result(batch, data, now=now)
+            stats["completed"] += 1
+            stats["failed_items"] += len(failed)
+            session = db.session.get(SyncSession, batch.session_id)
+            if failed and not (session and session.triggered_by == RETRY_TRIGGER):
+                retry.setdefault(batch.platform, set()).update(failed)
+                retry_batches.setdefault(batch.platform, []).append(batch)
+            continue
+        if data.get("error"):
+            batch.error_message = str(data["error"])[:500]
+        if now - (batch.created_at or now) >= timedelta(hours=MAX_AGE_HOURS):
+            batch.status = "expired"
+            stats["expired"] += 1
+            logger.warning(f"[BATCH-MUTABAKAT] {batch.platform} {batch.batch_request_id} süresi doldu "
+                           f"({batch.attempts} yoklama): {batch.error_message or data.get('status')}")
+        else:
+            batch.next_check_at = now + timedelta(seconds=_backoff_seconds(batch.attempts))
+            stats["pending"] += 1
+    db.session.commit()
+
+    for platform, barcodes in retry.items():
+        try:
+            _requeue(platform, sorted(barcodes))
+        except Exception:
+            db.session.rollback()
+            logger.exception(f"[BATCH-MUTABAKAT] {platform} {len(barcodes)} hatalı barkod yeniden gönderilemedi")
+            continue
+        for batch in retry_batches[platform]:
+            batch.requeued_count = batch.failed_count
+        db.session.commit()
+        stats["requeued"] += len(barcodes)
+
+    if stats["completed"] or stats["expired"]:
+        logger.info(f"[BATCH-MUTABAKAT] {stats}")
+    return stats
+
+
+def prune_batch_requests(days: int | None = None, now: datetime | None = None) -> int:
+    """Saklama süresini (``SYNC_DETAIL_RETENTION_DAYS``) aşan batch kayıtlarını siler."""
+    days = days or detail_writer.retention_days()
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    deleted = (SyncBatchRequest.query
+               .filter(SyncBatchRequest.created_at < cutoff)
+               .delete(synchronize_session=False))
+    db.session.commit()
+    return deleted
+
+
+def ensure_table_exists() -> None:
+    """sync_batch_requests yoksa oluşturur, ``items`` kolonu yoksa ekler (migration yapılmamış ortam)."""
+    try:
+        bind = db.session.get_bind()
+        insp = sa_inspect(bind)
+        if not insp.has_table(SyncBatchRequest.__tablename__):
+            SyncBatchRequest.__table__.create(bind=bind, checkfirst=True)
+        elif "items" not in {c["name"] for c in insp.get_columns(SyncBatchRequest.__tablename__)}:
+            db.session.execute(text(f"ALTER TABLE {SyncBatchRequest.__tablename__} ADD COLUMN items JSON"))
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("[BATCH-MUTABAKAT] sync_batch_requests oluşturulamadı")
@@ -0,0 +1,193 @@
+"""SyncDetail toplu yazıcı + saklama (retention) temizliği.
+
+SORUN
+-----
+``_save_sync_details`` her barkod için ayrı ORM ``SyncDetail`` nesnesi kurup
+session üzerinden commit ediyordu; tam katalog senkronunda 3 dakikada bir
+on binlerce ORM insert'i. Tablo da hiç budanmadığından sürekli büyüyordu.
+
+ÇÖZÜM
+-----
+- PostgreSQL'de satırlar tek ``COPY ... FROM STDIN`` ile, diğer dialect'lerde
+  ``CHUNK_SIZE``'lık çok satırlı insert'lerle yazılır (ORM nesnesi yok).
+- ``SYNC_DETAIL_MODE=errors_only``: yalnız hatalı satırlar ``sync_details``'e
+  yazılır; başarılılar session başına tek ``SyncSessionSummary`` kaydında
+  ``{barkod: adet}`` olarak tutulur (diff push defteri bunu da okur).
+- ``prune_sync_details``: ``SYNC_DETAIL_RETENTION_DAYS`` (default 14) günden eski
+  session'ların detay/özet satırlarını parça parça siler. Session kayıtları
+  (geçmiş ekranı) korunur.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect as sa_inspect
+
+from models import db, SyncSession, SyncDetail, SyncSessionSummary
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+PRUNE_CHUNK_SIZE = 5000
+DEFAULT_RETENTION_DAYS = 14
+
+_COLUMNS = (
+    "session_id", "barcode", "platform", "stock_sent", "status",
+    "error_message", "response_data", "sent_at", "response_at", "created_at",
+)
+
+
+def errors_only_mode() -> bool:
+    return os.environ.get("SYNC_DETAIL_MODE", "full").strip().lower() == "errors_only"
+
+
+def retention_days() -> int:
+    try:
+        return max(1, int(os.environ.get("SYNC_DETAIL_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)))
+    except (TypeError, ValueError):
+        return DEFAULT_RETENTION_DAYS
+
+
+def _detail_row(session_pk: int, result, platform: str, now: datetime) -> dict:
+    return {
+        "session_id": session_pk,
+        "barcode": result.barcode,
+        "platform": platform,
+        "stock_sent": result.quantity_sent,  # Gönderilen gerçek stok değeri
+        "status": "success" if result.success else "error",
+        "error_message": result.error_message,
+        "response_data": result.response_data,
+        "sent_at": result.sent_at,
+        "response_at": result.response_at,
+        "created_at": now,
+    }
+
+
+def _csv_value(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return value
+
+
+def _copy_rows(rows: list[dict]) -> bool:
+    """PostgreSQL COPY ile yazar (session transaction'ı içinde). Olmazsa False."""
+    dbapi_conn = db.session.connection().connection
+    cursor = dbapi_conn.cursor()
+    if not hasattr(cursor, "copy_expert"):  # psycopg2 değil
+        cursor.close()
+        return False
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        # csv: None → tırnaksız boş alan → COPY'de NULL
+        writer.writerow([_csv_value(row[c]) for c in _COLUMNS])
+    buf.seek(0)
+    try:
+        cursor.copy_expert(
+            f"COPY {SyncDetail.__tablename__} ({', '.join(_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buf,
+        )
+    finally:
+        cursor.close()
+    return True
+
+
+def _insert_rows(rows: list[dict]) -> None:
+    table = SyncDetail.__table__
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(table.insert(), rows[i:i + CHUNK_SIZE])
+
+
+def write_sync_details(session_pk: int, results, platform: str,
+                       errors_only: bool | None = None) -> dict:
+    """Senkron sonuçlarını toplu yazar. Commit çağırana aittir.
+
+    Args:
+        errors_only: ``None`` → ``SYNC_DETAIL_MODE`` env'i.
+
+    Returns:
+        ``{"details": yazılan_detay, "summarized": özete_giren_başarılı}``
+    """
+    if errors_only is None:
+        errors_only = errors_only_mode()
+    now = datetime.utcnow()
+
+    rows = []
+    summary: dict[str, int] = {}
+    for result in results:
+        if errors_only and result.success:
+            summary[result.barcode] = result.quantity_sent
+            continue
+        rows.append(_detail_row(session_pk, result, platform, now))
+
+    if rows:
+        copied = False
+        if db.session.get_bind().dialect.name == "postgresql":
+            # Savepoint: COPY hatası dış transaction'ı bozmasın, insert'e düşülebilsin
+            try:
+                with db.session.begin_nested():
+                    copied = _copy_rows(rows)
+            except Exception as e:
+                logger.warning(f"[SYNC] COPY başarısız, çok satırlı insert'e düşülüyor: {e}")
+                copied = False
+        if not copied:
+            _insert_rows(rows)
+
+    if summary:
+        db.session.merge(SyncSessionSummary(
+            session_id=session_pk, platform=platform,
+            success_count=len(summary), stocks=summary, created_at=now,
+        ))
+
+    return {"details": len(rows), "summarized": len(summary)}
+
+
+def prune_sync_details(days: int | None = None, now: datetime | None = None) -> dict:
+    """``days`` günden eski session'ların detay ve özet satırlarını siler.
+
+    Uzun kilit/WAL patlamasını önlemek için ``PRUNE_CHUNK_SIZE``'lık parçalar
+    halinde siler, her parçadan sonra commit eder.
+    """
+    days = days or retention_days()
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    old_sessions = db.session.query(SyncSession.id).filter(SyncSession.created_at < cutoff)
+
+    deleted_details = 0
+    while True:
+        ids = [r[0] for r in db.session.query(SyncDetail.id)
+               .filter(SyncDetail.session_id.in_(old_sessions.scalar_subquery()))
+               .limit(PRUNE_CHUNK_SIZE).all()]
+        if not ids:
+            break
+        SyncDetail.query.filter(SyncDetail.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted_details += len(ids)
+
+    deleted_summaries = (SyncSessionSummary.query
+                         .filter(SyncSessionSummary.session_id.in_(old_sessions.scalar_subquery()))
+                         .delete(synchronize_session=False))
+    db.session.commit()
+
+    if deleted_details or deleted_summaries:
+        logger.info(f"[SYNC] Saklama temizliği: {deleted_details} detay, {deleted_summaries} özet silindi (>{days} gün)")
+    return {"details": deleted_details, "summaries": deleted_summaries, "days": days}
+
+
+def ensure_table_exists() -> None:
+    """sync_session_summaries yoksa oluşturur (migration yapılmamış ortam)."""
+    try:
+        bind = db.session.get_bind()
+        if not sa_inspect(bind).has_table(SyncSessionSummary.__tablename__):
+            SyncSessionSummary.__table__.create(bind=bind, checkfirst=True)
+    except Exception:
+        db.session.rollback()
+        logger.exception("[SYNC] sync_session_summaries oluşturulamadı")
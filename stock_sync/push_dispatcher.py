@@ -0,0 +1,202 @@
+"""Stok hareketiyle tetiklenen, debounce'lu anlık stok push'u.
+
+SORUN
+-----
+Stok pazaryerlerine yalnız 3 dakikalık ``stock_sync_auto`` job'ıyla gidiyordu:
+son adedin satışı dakikalarca ilanda kalıp overselling'e yol açabiliyor, boşta
+geçen dakikalar ise yine tam senkron maliyeti ödüyordu.
+
+ÇÖZÜM
+-----
+- ``StockMovement`` insert'i (stock_ledger) ve rezerv değişimi
+  (``reservation._apply_pending``) barkodu session'daki "kirli" kümeye ekler.
+- Commit olunca küme süreç genelindeki kuyruğa aktarılır; rollback'te atılır.
+- Dispatcher thread'i ilk kirli barkoddan sonra ``DEBOUNCE_SECONDS`` sessizlik
+  bekler (patlamaları birleştirir, en fazla ``MAX_DELAY_SECONDS``), sonra yalnız o
+  barkodları ``sync_specific_barcodes(..., differential=True)`` ile gönderir.
+  Adedi fiilen değişmeyenler diff defteri sayesinde atlanır.
+- İki dispatch arasında en az ``MIN_INTERVAL_SECONDS`` beklenir; platform içi
+  hız sınırı adaptörlerin token bucket'ındadır.
+
+Her web/worker süreci kendi commit'lerini kendi dispatcher'ıyla gönderir.
+``STOCK_EVENT_PUSH=0`` ile kapatılır; 3 dakikalık job güvenlik ağı olarak kalır.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from models import db, StockMovement
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = "_stock_push_dirty"
+
+DEBOUNCE_SECONDS = 2.0
+MAX_DELAY_SECONDS = 10.0
+MIN_INTERVAL_SECONDS = 5.0
+PLATFORMS = ("trendyol", "amazon", "shopify")  # auto sync ile aynı (Idefix hariç)
+
+
+def is_enabled() -> bool:
+    return os.environ.get("STOCK_EVENT_PUSH", "1").lower() not in ("0", "false", "no")
+
+
+def mark_dirty(sess, barcodes) -> None:
+    """Barkodları session'ın kirli kümesine ekler (commit'te kuyruğa geçer)."""
+    if sess is None or not _dispatcher.running:
+        return
+    sess.info.setdefault(_SESSION_KEY, set()).update(bc for bc in barcodes if bc)
+
+
+class _PushDispatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._dirty: set[str] = set()
+        self._first_dirty_at: float | None = None
+        self._thread: threading.Thread | None = None
+        self._app = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.stats = {"dispatches": 0, "barcodes": 0, "errors": 0, "last_at": None}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app) -> None:
+        if self.running:
+            return
+        self._app = app
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._calis, name="stock-push-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info("[EVENT-PUSH] dispatcher başlatıldı")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self._take()
+
+    def enqueue(self, barcodes) -> None:
+        with self._lock:
+            if not self._dirty:
+                self._first_dirty_at = time.monotonic()
+            self._dirty.update(barcodes)
+        self._wake.set()
+
+    def _take(self) -> list[str]:
+        with self._lock:
+            barcodes = sorted(self._dirty)
+            self._dirty.clear()
+            self._first_dirty_at = None
+        return barcodes
+
+    def _debounce(self) -> None:
+        """Sessizlik penceresi dolana ya da MAX_DELAY aşılana kadar bekle."""
+        while True:
+            self._wake.clear()
+            if not self._wake.wait(DEBOUNCE_SECONDS):
+                return
+            with self._lock:
+                first = self._first_dirty_at
+            if first is not None and time.monotonic() - first >= MAX_DELAY_SECONDS:
+                return
+
+    def _calis(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        last_dispatch = 0.0
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.is_set():
+                break
+            self._debounce()
+            wait = MIN_INTERVAL_SECONDS - (time.monotonic() - last_dispatch)
+            if wait > 0:
+                time.sleep(wait)
+            barcodes = self._take()
+            if not barcodes:
+                continue
+            last_dispatch = time.monotonic()
+            self._dispatch(barcodes)
+        self._loop.close()
+
+    def _dispatch(self, barcodes: list[str]) -> None:
+        from models import PlatformConfig
+        from stock_sync.service import stock_sync_service
+
+        with self._app.app_context():
+            try:
+                global_config = PlatformConfig.query.filter_by(platform='global').first()
+                if global_config and not global_config.is_active:
+                    return
+                result = self._loop.run_until_complete(stock_sync_service.sync_specific_barcodes(
+                    barcodes, platforms=list(PLATFORMS), triggered_by="stock_event", differential=True,
+                ))
+                self.stats["dispatches"] += 1
+                self.stats["barcodes"] += len(barcodes)
+                self.stats["last_at"] = time.time()
+                sent = {p: r.get("sent", 0) for p, r in (result.get("platforms") or {}).items()}
+                logger.info(f"[EVENT-PUSH] {len(barcodes)} barkod → gönderilen: {sent}")
+            except Exception:
+                # Kaçan barkodları 3 dakikalık diff senkronu yakalar
+                self.stats["errors"] += 1
+                db.session.rollback()
+                logger.exception(f"[EVENT-PUSH] {len(barcodes)} barkod gönderilemedi")
+            finally:
+                db.session.remove()
+
+
+_dispatcher = _PushDispatcher()
+
+
+def _track_movement(mapper, connection, target):
+    mark_dirty(object_session(target), [target.barcode])
+
+
+def _after_commit(sess):
+    barcodes = sess.info.pop(_SESSION_KEY, None)
+    if barcodes:
+        _dispatcher.enqueue(barcodes)
+
+
+def _after_rollback(sess):
+    sess.info.pop(_SESSION_KEY, None)
+
+
+def install_listeners() -> None:
+    """Bir kez çağrılır (tekrar çağrı no-op)."""
+    if event.contains(StockMovement, "after_insert", _track_movement):
+        return
+    event.listen(StockMovement, "after_insert", _track_movement)
+    event.listen(db.session, "after_commit", _after_commit)
+    event.listen(db.session, "after_rollback", _after_rollback)
+
+
+def start(app) -> None:
+    """Listener'ları kurar ve dispatcher thread'ini başlatır (STOCK_EVENT_PUSH=0 → kapalı)."""
+    if not is_enabled():
+        logger.info("[EVENT-PUSH] STOCK_EVENT_PUSH=0 — anlık push kapalı")
+        return
+    install_listeners()
+    _dispatcher.start(app)
+
+
+def stop() -> None:
+    _dispatcher.stop()
+
+
+def get_stats() -> dict:
+    with _dispatcher._lock:
+        pending = len(_dispatcher._dirty)
+    return {**_dispatcher.stats, "running": _dispatcher.running, "pending": pending}
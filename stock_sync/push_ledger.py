@@ -0,0 +1,154 @@
+"""Platform başına "son gönderilen adet" defteri — farklılık (diff) push'u.
+
+SORUN
+-----
+``auto_sync_platforms_except_idefix`` 3 dakikada bir tüm CentralStock kataloğunu
+Trendyol/Amazon/Shopify'a gönderiyordu; hiçbir şey değişmemişken bile binlerce
+satır, onlarca batch ve rate-limit baskısı.
+
+ÇÖZÜM
+-----
+Her senkron ``max(0, stok - rezerv - tampon)`` değerini yine tüm barkodlar için
+hesaplar, ama yalnız platforma en son gönderilenden FARKLI olanları yollar.
+Defter ayrı tablo tutmaz, mevcut kayıtları kullanır:
+
+- Trendyol/Amazon/HB/Idefix: son tam push session'ından bu yana başarılı
+  ``SyncDetail`` satırları ve (sadece-hata modunda) ``SyncSessionSummary``
+  kayıtları — barkod başına en yenisi.
+- Shopify: ``ShopifyMapping.last_stock_sent`` (``push_stock(only_changed=True)``).
+
+Tam push'un session id'si ve zamanı ``PlatformConfig.extra_config``'e yazılır.
+Kayıt yoksa ya da ``STOCK_FULL_PUSH_INTERVAL_MINUTES`` (default 60) dolduysa
+tam push zorlanır — platform panelinde elle yapılan değişiklikler, hata alıp
+deftere girmeyen satırlar bu yavaş döngüde düzelir. ``0`` → her senkron tam push
+(eski davranış).
+"""
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+from models import db, PlatformConfig, SyncDetail, SyncSessionSummary
+
+logger = logging.getLogger(__name__)
+
+FULL_PUSH_SESSION_KEY = "last_full_push_session_id"
+FULL_PUSH_AT_KEY = "last_full_push_at"
+DEFAULT_FULL_PUSH_INTERVAL_MINUTES = 60
+BARCODE_CHUNK = 500                 # get_last_pushed_map(barcodes=...) IN listesi parçası
+
+
+def full_push_interval_minutes() -> int:
+    try:
+        return max(0, int(os.environ.get("STOCK_FULL_PUSH_INTERVAL_MINUTES",
+                                         DEFAULT_FULL_PUSH_INTERVAL_MINUTES)))
+    except (TypeError, ValueError):
+        return DEFAULT_FULL_PUSH_INTERVAL_MINUTES
+
+
+def _extra(platform: str) -> dict:
+    cfg = PlatformConfig.query.filter_by(platform=platform).first()
+    return dict(cfg.extra_config or {}) if cfg else {}
+
+
+def mark_full_push(platform: str, session_pk: int | None = None,
+                   at: datetime | None = None) -> None:
+    """Tam push tamamlandı: defterin başlangıç noktasını kaydeder.
+
+    Args:
+        session_pk: ``SyncSession.id`` — SyncDetail defteri bu id'den itibaren
+            okunur. Shopify'da defter mapping üzerinde olduğundan ``None``.
+    """
+    try:
+        cfg = PlatformConfig.query.filter_by(platform=platform).first()
+        if not cfg:
+            cfg = PlatformConfig(platform=platform)
+            db.session.add(cfg)
+        extra = dict(cfg.extra_config or {})
+        extra[FULL_PUSH_AT_KEY] = (at or datetime.utcnow()).isoformat()
+        if session_pk is not None:
+            extra[FULL_PUSH_SESSION_KEY] = session_pk
+        cfg.extra_config = extra  # JSON kolonu: yeni dict ata ki değişiklik algılansın
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"[SYNC] {platform} tam push kaydı yazılamadı: {e}")
+
+
+def is_full_push_due(platform: str, now: datetime | None = None) -> bool:
+    """Bu senkron tam push mu olmalı? (kayıt yok / aralık doldu / diff kapalı)"""
+    interval = full_push_interval_minutes()
+    if interval == 0:
+        return True
+    raw = _extra(platform).get(FULL_PUSH_AT_KEY)
+    if not raw:
+        return True
+    try:
+        last = datetime.fromisoformat(raw)
+    except (TypeError, ValueError):
+        return True
+    return (now or datetime.utcnow()) - last >= timedelta(minutes=interval)
+
+
+def get_last_pushed_map(platform: str, barcodes=None) -> dict[str, int] | None:
+    """Barkod → platforma en son BAŞARIYLA gönderilen adet.
+
+    Args:
+        barcodes: Verilirse defter yalnız bu barkodlar için kurulur (dispatcher
+            olayı birkaç barkoda dokunur; tüm SyncDetail geçmişi okunmaz).
+
+    Returns:
+        ``None`` — tam push kaydı yok (defter kurulamaz, tam push gerekli).
+    """
+    since = _extra(platform).get(FULL_PUSH_SESSION_KEY)
+    if not since:
+        return None
+    since = int(since)
+    wanted = None if barcodes is None else list(dict.fromkeys(b for b in barcodes if b))
+    if wanted is not None and not wanted:
+        return {}
+    sent_by_session: dict[int, dict[str, int]] = {}
+    base = (
+        db.session.query(SyncDetail.session_id, SyncDetail.barcode, SyncDetail.stock_sent)
+        .filter(
+            SyncDetail.session_id >= since,
+            SyncDetail.platform == platform,
+            SyncDetail.status == "success",
+        )
+    )
+    if wanted is None:
+        queries = [base]
+    else:
+        queries = [base.filter(SyncDetail.barcode.in_(wanted[i:i + BARCODE_CHUNK]))
+                   for i in range(0, len(wanted), BARCODE_CHUNK)]
+    rows = [row for q in queries for row in q.order_by(SyncDetail.id).all()]
+    for session_pk, bc, sent in rows:
+        sent_by_session.setdefault(session_pk, {})[bc] = int(sent)
+    summaries = (
+        db.session.query(SyncSessionSummary.session_id, SyncSessionSummary.stocks)
+        .filter(SyncSessionSummary.session_id >= since, SyncSessionSummary.platform == platform)
+        .all()
+    )
+    keep = None if wanted is None else set(wanted)
+    for session_pk, stocks in summaries:
+        sent_by_session.setdefault(session_pk, {}).update(
+            {bc: int(q) for bc, q in (stocks or {}).items() if keep is None or bc in keep})
+
+    # Session sırasıyla: aynı barkodun sonraki gönderimi öncekinin üzerine yazar
+    ledger: dict[str, int] = {}
+    for session_pk in sorted(sent_by_session):
+        ledger.update(sent_by_session[session_pk])
+    return ledger
+
+
+def filter_changed(items, ledger: dict[str, int]):
+    """Defterdeki adetle aynı olan StockItem'ları ayıklar.
+
+    Deftere hiç girmemiş barkod (yeni ürün, önceki gönderimi hatalı) değişmiş sayılır.
+
+    Returns:
+        ``(değişenler, değişmeyen_sayısı)``
+    """
+    changed = [it for it in items if ledger.get(it.barcode) != it.quantity]
+    return changed, len(items) - len(changed)
@@ -0,0 +1,309 @@
+"""Açık sipariş rezervi için ``reserved_stock`` projeksiyonu.
+
+SORUN
+-----
+``get_reserved_barcodes`` her senkronda, her ``_get_stocks_by_barcodes``
+çağrısında, sağlık kontrolünde ve session detay ekranında tüm ``OrderCreated`` +
+toplanmamış ``OrderHazirlaniyor`` satırlarını yükleyip ``details`` JSON'unu
+parse ediyor, satır başına ``normalize_barcode`` sorguluyordu
+(açık sipariş × satır sayısı kadar iş).
+
+ÇÖZÜM
+-----
+``reserved_stock(barcode, qty)`` tablosu sipariş geçişleriyle AYNI transaction
+içinde güncellenir:
+
+- ORM yolları (``session.add/delete``, ``toplandi_at`` damgası, ``details``
+  değişimi) mapper event'leriyle yakalanır.
+- ``bulk_insert_mappings`` / ``query.delete()`` event tetiklemez; bu yollar
+  ``queue_bulk_insert`` / ``queue_bulk_delete`` ile açıkça bildirir.
+
+Birikmiş değişimler ``before_commit`` anında barkod başına tek upsert ile
+yazılır; rollback'te atılır. ``rebuild_reserved_stock`` tabloyu sipariş
+tablolarından sıfırdan kurar ve sapmayı (drift) raporlar — periyodik job olarak
+güvenlik ağıdır.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, inspect as sa_inspect, text
+from sqlalchemy.orm import object_session
+
+from models import db, OrderCreated, OrderHazirlaniyor, ReservedStock
+from stock_sync.push_dispatcher import mark_dirty as mark_push_dirty
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "_reserved_stock_deltas"
+
+# Tablo hazır (var + bir kez dolduruldu) değilse okuma eski taramaya düşer ve
+# commit anında upsert denenmez — migration'ı yapılmamış ortam kırılmaz.
+# Engine URL bazında tutulur (aynı süreçte farklı DB'ye bağlanan uygulamalar için).
+_ready_urls: set[str] = set()
+
+
+def _is_ready(sess) -> bool:
+    return str(sess.get_bind().url) in _ready_urls
+
+
+def _mark_ready(sess) -> None:
+    _ready_urls.add(str(sess.get_bind().url))
+
+
+def _details_lines(details) -> list[tuple[str, int]]:
+    """details (JSON string veya list) → [(ham_barkod, adet)]. Bozuk veri → []."""
+    if not details:
+        return []
+    try:
+        items = json.loads(details) if isinstance(details, str) else details
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return []
+    if not isinstance(items, list):
+        return []
+    lines = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        barcode = str(item.get('barcode', '') or '').strip()
+        try:
+            qty = int(item.get('quantity', 1) or 1)
+        except (TypeError, ValueError):
+            qty = 1
+        if barcode:
+            lines.append((barcode, qty))
+    return lines
+
+
+def _queue(sess, details, sign: int) -> None:
+    if sess is None:
+        return
+    pending = sess.info.setdefault(_PENDING_KEY, {})
+    for barcode, qty in _details_lines(details):
+        pending[barcode] = pending.get(barcode, 0) + sign * qty
+
+
+def _attr_change(target, name):
+    """(eski, yeni, değişti_mi) — flush sırasında attribute history'den."""
+    hist = sa_inspect(target).attrs[name].history
+    if not hist.has_changes():
+        value = getattr(target, name)
+        return value, value, False
+    old = hist.deleted[0] if hist.deleted else None
+    new = hist.added[0] if hist.added else None
+    return old, new, True
+
+
+def _is_reserving(target, toplandi_at=None) -> bool:
+    if isinstance(target, OrderCreated):
+        return True
+    return toplandi_at is None
+
+
+def _track_insert(mapper, connection, target):
+    if _is_reserving(target, getattr(target, 'toplandi_at', None)):
+        _queue(object_session(target), target.details, +1)
+
+
+def _track_delete(mapper, connection, target):
+    if _is_reserving(target, getattr(target, 'toplandi_at', None)):
+        _queue(object_session(target), target.details, -1)
+
+
+def _track_update(mapper, connection, target):
+    old_details, new_details, details_changed = _attr_change(target, 'details')
+    if isinstance(target, OrderHazirlaniyor):
+        old_at, new_at, at_changed = _attr_change(target, 'toplandi_at')
+    else:
+        old_at = new_at = None
+        at_changed = False
+    if not details_changed and not at_changed:
+        return
+    sess = object_session(target)
+    if _is_reserving(target, old_at):
+        _queue(sess, old_details, -1)
+    if _is_reserving(target, new_at):
+        _queue(sess, new_details, +1)
+
+
+def queue_bulk_insert(model, mappings) -> None:
+    """``bulk_insert_mappings`` öncesi/sonrası çağrılır (event tetiklenmez)."""
+    if model is not OrderCreated:
+        return
+    for m in mappings:
+        _queue(db.session(), m.get('details'), +1)
+
+
+def queue_bulk_delete(model, ids) -> None:
+    """``query.filter(id.in_(ids)).delete()`` ÖNCESİ çağrılır; silinecek satırların
+    rezervini düşer (event tetiklenmez)."""
+    if model not in (OrderCreated, OrderHazirlaniyor) or not ids:
+        return
+    q = db.session.query(model.details).filter(model.id.in_(ids))
+    if model is OrderHazirlaniyor:
+        q = q.filter(OrderHazirlaniyor.toplandi_at.is_(None))
+    for (details,) in q.all():
+        _queue(db.session(), details, -1)
+
+
+def _upsert_deltas(sess, deltas: dict[str, int]) -> None:
+    dialect = sess.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    now = datetime.utcnow()
+    table = ReservedStock.__table__
+    stmt = insert(table).values([
+        {"barcode": bc, "qty": d, "updated_at": now} for bc, d in deltas.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["barcode"],
+        set_={"qty": table.c.qty + stmt.excluded.qty, "updated_at": stmt.excluded.updated_at},
+    )
+    sess.execute(stmt)
+
+
+def _normalize_deltas(raw: dict[str, int]) -> dict[str, int]:
+    from barcode_alias_helper import normalize_many
+    resolved = normalize_many(bc for bc, d in raw.items() if d)
+    deltas: dict[str, int] = {}
+    for barcode, d in raw.items():
+        if not d:
+            continue
+        bc = resolved[barcode]
+        deltas[bc] = deltas.get(bc, 0) + d
+    return {bc: d for bc, d in deltas.items() if d}
+
+
+def _apply_pending(sess):
+    if not _is_ready(sess):
+        sess.info.pop(_PENDING_KEY, None)
+        return
+    # Bekleyen ORM değişiklikleri önce flush edilsin ki mapper event'leri kuyruğa düşsün
+    if sess.new or sess.dirty or sess.deleted:
+        sess.flush()
+    raw = sess.info.pop(_PENDING_KEY, None)
+    if not raw:
+        return
+    with sess.no_autoflush:
+        deltas = _normalize_deltas(raw)
+    if deltas:
+        _upsert_deltas(sess, deltas)
+        # Rezerv değişen barkodun platform adedi de değişir → anlık push kuyruğu
+        mark_push_dirty(sess, deltas.keys())
+
+
+def _discard_pending(sess):
+    sess.info.pop(_PENDING_KEY, None)
+
+
+def scan_reserved_map() -> dict[str, int]:
+    """Rezervi sipariş tablolarından sıfırdan hesaplar (eski get_reserved_barcodes).
+
+    REZERV = Yeni (Created) + Hazırlanıyor (henüz TOPLANMAMIŞ). Toplanan
+    Hazırlanıyor siparişin stoğu CentralStock'tan zaten düşüldüğü için sayılmaz.
+    """
+    from barcode_alias_helper import normalize_many
+
+    rows = (db.session.query(OrderCreated.order_number, OrderCreated.details).all()
+            + db.session.query(OrderHazirlaniyor.order_number, OrderHazirlaniyor.details)
+                .filter(OrderHazirlaniyor.toplandi_at.is_(None)).all())
+    reserved_map: dict[str, int] = {}
+    parse_errors = 0
+
+    parsed = []
+    for order_number, details_str in rows:
+        if not details_str:
+            continue
+        lines = _details_lines(details_str)
+        if not lines:
+            parse_errors += 1
+            logger.warning(f"[REZERV] Sipariş {order_number}: details parse edilemedi, atlanıyor")
+            continue
+        parsed.extend(lines)
+
+    normalized = normalize_many(barcode for barcode, _ in parsed)
+    for barcode, qty in parsed:
+        bc = normalized[barcode]
+        reserved_map[bc] = reserved_map.get(bc, 0) + qty
+
+    if parse_errors > 0:
+        logger.warning(f"[REZERV] Toplam {parse_errors} sipariş detayı parse edilemedi")
+    return reserved_map
+
+
+def get_reserved_map() -> dict[str, int]:
+    """Barkod → rezerv adedi (yalnız >0). Projeksiyon hazır değilse tarama."""
+    if not _is_ready(db.session):
+        return scan_reserved_map()
+    rows = (db.session.query(ReservedStock.barcode, ReservedStock.qty)
+            .filter(ReservedStock.qty > 0).all())
+    return {bc: int(qty) for bc, qty in rows}
+
+
+def rebuild_reserved_stock(commit: bool = True) -> dict:
+    """Projeksiyonu sipariş tablolarından yeniden kurar, sapmayı raporlar.
+
+    PostgreSQL'de tablo EXCLUSIVE kilitlenir: eşzamanlı commit'lerin upsert'leri
+    yeniden kurma bitene kadar bekler, tarama da kilit alındıktan sonraki
+    snapshot'ı görür — ara değişim kaybolmaz.
+
+    Returns:
+        ``{"barcodes": n, "total": n, "drift": {barkod: [tablo, gerçek]}}``
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(text("LOCK TABLE reserved_stock IN EXCLUSIVE MODE"))
+    current = {bc: int(q or 0) for bc, q in db.session.query(ReservedStock.barcode, ReservedStock.qty).all()}
+    actual = scan_reserved_map()
+
+    drift = {}
+    for bc in set(current) | set(actual):
+        have, want = current.get(bc, 0), actual.get(bc, 0)
+        if have != want:
+            drift[bc] = [have, want]
+
+    if drift:
+        db.session.query(ReservedStock).delete(synchronize_session=False)
+        now = datetime.utcnow()
+        rows = [{"barcode": bc, "qty": q, "updated_at": now} for bc, q in actual.items() if q]
+        if rows:
+            db.session.execute(ReservedStock.__table__.insert(), rows)
+    if commit:
+        db.session.commit()
+    _mark_ready(db.session)
+
+    if drift and current:
+        logger.warning(f"[REZERV] Projeksiyon sapması düzeltildi: {len(drift)} barkod — {dict(list(drift.items())[:20])}")
+    return {"barcodes": len(actual), "total": sum(actual.values()), "drift": drift}
+
+
+def ensure_table_exists() -> None:
+    """Tablo yoksa oluşturup doldurur; varsa projeksiyonu bu süreçte etkinleştirir."""
+    try:
+        bind = db.session.get_bind()
+        created = not sa_inspect(bind).has_table(ReservedStock.__tablename__)
+        if created:
+            ReservedStock.__table__.create(bind=bind, checkfirst=True)
+        # Migration ile boş açılan tablo da ilk açılışta doldurulur (yoksa rezerv {} → oversell)
+        if created or db.session.query(ReservedStock.barcode).first() is None:
+            rebuild_reserved_stock()
+        _mark_ready(db.session)
+    except Exception:
+        db.session.rollback()
+        logger.exception("[REZERV] reserved_stock hazırlanamadı (eski taramaya düşülür)")
+
+
+def install_listeners() -> None:
+    """app context içinde bir kez çağrılır (tekrar çağrı no-op)."""
+    if event.contains(OrderCreated, "after_insert", _track_insert):
+        return
+    for model in (OrderCreated, OrderHazirlaniyor):
+        event.listen(model, "after_insert", _track_insert)
+        event.listen(model, "after_update", _track_update)
+        event.listen(model, "after_delete", _track_delete)
+    event.listen(db.session, "before_commit", _apply_pending)
+    event.listen(db.session, "after_rollback", _discard_pending)
+    logger.info("[REZERV] event listeners yüklendi.")
@@ -463,6 +463,8 @@ def api_sync_barcodes():
             )
         )
     finally:
+        # Adaptörlerin bu loop'a bağlı HTTP session'ları kapatılmazsa sızar
+        loop.run_until_complete(stock_sync_service.close_adapter_sessions())
         loop.close()
     
     return jsonify(result)
@@ -7,12 +7,14 @@ Tüm platformlara stok gönderimini yöneten ana servis.
 
 import asyncio
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Callable
 from concurrent.futures import ThreadPoolExecutor
 
-from models import db, CentralStock, Product, SyncSession, SyncDetail, PlatformConfig, OrderCreated, OrderHazirlaniyor
+from models import db, CentralStock, Product, SyncSession, SyncDetail, SyncSessionSummary, PlatformConfig, OrderCreated
 from logger_config import app_logger as logger
 
 from .adapters.base import StockItem, SyncResult
@@ -20,6 +22,7 @@ from .adapters.trendyol import TrendyolAdapter
 from .adapters.idefix import IdefixAdapter
 from .adapters.amazon import AmazonAdapter
 from .adapters.hepsiburada import HepsiburadaAdapter
+from . import push_ledger, detail_writer, batch_reconcile
 
 
 def get_safety_stock_buffer() -> int:
@@ -59,6 +62,9 @@ class StockSyncService:
         "hepsiburada": HepsiburadaAdapter,
     }
     
+    # İlerleme (sent_count) en fazla bu aralıkla commit edilir
+    PROGRESS_COMMIT_INTERVAL = 2.0  # saniye
+
     def __init__(self):
         self._adapters: Dict[str, Any] = {}
         self._executor = ThreadPoolExecutor(max_workers=4)
@@ -136,7 +142,7 @@ class StockSyncService:
         return status
     
     def get_reserved_barcodes(self) -> Dict[str, int]:
-        """orders_hazirlaniyor tablosundaki siparişlerin details JSON'undan rezerv barkodlarını ve miktarları çıkar.
+        """Açık siparişlerin barkod bazlı rezervi (reserved_stock projeksiyonu).
 
         REZERV = Yeni (Created) + Hazırlanıyor (henüz TOPLANMAMIŞ).
         Fiziksel stok rafta dururken sipariş kesintisiz rezerve kalır; oversatış olmaz.
@@ -145,44 +151,12 @@ class StockSyncService:
         stok raftan/ CentralStock'tan ZATEN düşülür. O yüzden toplanmış siparişler
         rezervden ÇIKARILIR — yoksa hem CentralStock düşer hem rezerv sayar = ÇİFT
         düşüm = available olduğundan az = satış kaybı.
-        """
-        import json
-
-        rows = (db.session.query(OrderCreated.order_number, OrderCreated.details).all()
-                + db.session.query(OrderHazirlaniyor.order_number, OrderHazirlaniyor.details)
-                    .filter(OrderHazirlaniyor.toplandi_at.is_(None)).all())
-        reserved_map = {}
-        parse_errors = 0
-
-        for order_number, details_str in rows:
-            if not details_str:
-                continue
-            try:
-                details = json.loads(details_str) if isinstance(details_str, str) else details_str
-                if not isinstance(details, list):
-                    logger.warning(
-                        f"[REZERV] Sipariş {order_number}: details alanı list değil, atlanıyor"
-                    )
-                    parse_errors += 1
-                    continue
-                for item in details:
-                    barcode = str(item.get('barcode', '') or '').strip()
-                    qty = int(item.get('quantity', 1) or 1)
-                    if barcode:
-                        from barcode_alias_helper import normalize_barcode
-                        normalized = normalize_barcode(barcode)
-                        reserved_map[normalized] = reserved_map.get(normalized, 0) + qty
-            except (json.JSONDecodeError, TypeError, ValueError) as e:
-                parse_errors += 1
-                logger.error(
-                    f"[REZERV] Sipariş {order_number}: details JSON parse hatası — {e}"
-                )
-                continue
-
-        if parse_errors > 0:
-            logger.warning(f"[REZERV] Toplam {parse_errors} sipariş detayı parse edilemedi")
 
-        return reserved_map
+        Projeksiyon sipariş geçişleriyle aynı transaction'da güncellenir; tablo
+        hazır değilse details JSON'u eskisi gibi taranır (bkz. stock_sync.reservation).
+        """
+        from .reservation import get_reserved_map
+        return get_reserved_map()
     
     def get_reserved_count(self) -> int:
         """Toplam rezerv edilen ürün sayısı"""
@@ -366,33 +340,27 @@ class StockSyncService:
                 setattr(session, key, value)
         db.session.commit()
     
-    def _save_sync_details(self, session: SyncSession, results: List[SyncResult], platform: str):
-        """Sync detaylarını kaydet"""
-        for result in results:
-            detail = SyncDetail(
-                session_id=session.id,
-                barcode=result.barcode,
-                platform=platform,
-                stock_sent=result.quantity_sent,  # Gönderilen gerçek stok değeri
-                status="success" if result.success else "error",
-                error_message=result.error_message,
-                response_data=result.response_data,
-                sent_at=result.sent_at,
-                response_at=result.response_at
-            )
-            db.session.add(detail)
-        
-        db.session.commit()
+    def _save_sync_details(self, session: SyncSession, results: List[SyncResult], platform: str,
+                           commit: bool = True):
+        """Sync detaylarını toplu yaz (COPY / çok satırlı insert, bkz. detail_writer)"""
+        written = detail_writer.write_sync_details(session.id, results, platform)
+        if written["summarized"]:
+            logger.info(f"[SYNC] {platform.upper()} sadece-hata modu: {written['details']} detay, "
+                        f"{written['summarized']} başarılı satır özete yazıldı")
+        if commit:
+            db.session.commit()
     
     def _sync_shopify(
         self,
         triggered_by: str = "manual",
         triggered_by_user: Optional[str] = None,
-        barcodes: Optional[List[str]] = None
+        barcodes: Optional[List[str]] = None,
+        differential: bool = False
     ) -> Dict[str, Any]:
         """
         Shopify stok senkronizasyonu - Yeni dedicated servis üzerinden.
         ShopifyStockService.push_stock() kullanır.
+        differential: yalnız ShopifyMapping.last_stock_sent'ten farklı olanlar gönderilir.
         """
         from shopify_site.shopify_stock_service import shopify_stock_service
 
@@ -404,13 +372,14 @@ class StockSyncService:
         self._active_sessions[session.session_id] = session
 
         try:
-            result = shopify_stock_service.push_stock(barcodes=barcodes)
+            result = shopify_stock_service.push_stock(barcodes=barcodes, only_changed=differential)
 
             completed_at = datetime.utcnow()
             duration = (completed_at - session.started_at).total_seconds()
 
             success_count = result.get("success_count", 0)
             error_count = result.get("error_count", 0)
+            skipped_count = result.get("skipped_count", 0)
             total = result.get("total", 0)
 
             self._update_session(session,
@@ -418,23 +387,27 @@ class StockSyncService:
                                  completed_at=completed_at,
                                  duration_seconds=duration,
                                  total_products=total,
-                                 sent_count=total,
+                                 sent_count=total - skipped_count,
                                  success_count=success_count,
-                                 error_count=error_count)
+                                 error_count=error_count,
+                                 skipped_count=skipped_count)
 
             # Platform config güncelle
             self._update_platform_last_sync("shopify")
+            if not barcodes and not differential and result.get("success"):
+                push_ledger.mark_full_push("shopify", at=session.started_at)
 
-            logger.info(f"[SYNC] SHOPIFY tamamlandı - Başarılı: {success_count}, Hata: {error_count}, Süre: {duration:.1f}s")
+            logger.info(f"[SYNC] SHOPIFY tamamlandı - Başarılı: {success_count}, Hata: {error_count}, Aynı: {skipped_count}, Süre: {duration:.1f}s")
 
             return {
                 "success": True,
                 "session_id": session.session_id,
                 "platform": "shopify",
                 "total": total,
-                "sent": total,
+                "sent": total - skipped_count,
                 "success_count": success_count,
                 "error_count": error_count,
+                "skipped_count": skipped_count,
                 "duration_seconds": duration,
                 "success_rate": f"{(success_count / total * 100):.1f}%" if total else "0%"
             }
@@ -460,7 +433,8 @@ class StockSyncService:
         barcodes: Optional[List[str]] = None,
         triggered_by: str = "manual",
         triggered_by_user: Optional[str] = None,
-        progress_callback: Optional[Callable[[int, int, str], None]] = None
+        progress_callback: Optional[Callable[[int, int, str], None]] = None,
+        differential: bool = False
     ) -> Dict[str, Any]:
         """
         Tek bir platforma stok senkronizasyonu.
@@ -471,13 +445,16 @@ class StockSyncService:
             triggered_by: Tetikleyici (manual, scheduler, webhook)
             triggered_by_user: Tetikleyen kullanıcı
             progress_callback: İlerleme callback'i (sent, total, message)
+            differential: Yalnız son gönderilenden farklı adetleri gönder
+                (bkz. push_ledger). Tam push kaydı yoksa tam gönderime düşer.
             
         Returns:
             Senkronizasyon sonuç raporu
         """
         # Shopify dedicated servis üzerinden çalışır
         if platform == "shopify":
-            return self._sync_shopify(triggered_by, triggered_by_user, barcodes=barcodes)
+            return self._sync_shopify(triggered_by, triggered_by_user, barcodes=barcodes,
+                                      differential=differential)
 
         if platform not in self._adapters:
             return {"success": False, "error": f"Bilinmeyen platform: {platform}"}
@@ -497,11 +474,26 @@ class StockSyncService:
                 items = self._get_stocks_by_barcodes(barcodes, platform=platform)
             else:
                 items = self._get_all_stocks(platform=platform)
+
+            # Diff: son gönderilen adetle aynı olanları ayıkla
+            unchanged = 0
+            if differential:
+                # Belirli barkod senkronunda (dispatcher) defter yalnız o barkodlar için okunur
+                ledger = push_ledger.get_last_pushed_map(
+                    platform, barcodes=[it.barcode for it in items] if barcodes else None)
+                if ledger is None:
+                    differential = False
+                    logger.info(f"[SYNC] {platform.upper()} tam push kaydı yok — tüm ürünler gönderilecek")
+                else:
+                    items, unchanged = push_ledger.filter_changed(items, ledger)
+                    logger.info(f"[SYNC] {platform.upper()} diff: {len(items)} değişen, {unchanged} aynı (atlandı)")
+            full_push = not barcodes and not differential
             
             self._update_session(session, 
                                  status="running",
                                  started_at=datetime.utcnow(),
-                                 total_products=len(items))
+                                 total_products=len(items) + unchanged,
+                                 skipped_count=unchanged)
             
             if not items:
                 self._update_session(session, 
@@ -511,13 +503,20 @@ class StockSyncService:
                 return {
                     "success": True,
                     "session_id": session.session_id,
-                    "message": "Gönderilecek ürün yok",
-                    "total": 0
+                    "message": "Değişen stok yok" if unchanged else "Gönderilecek ürün yok",
+                    "total": unchanged,
+                    "skipped_count": unchanged
                 }
             
             # İlerleme callback wrapper
+            # Batch başına commit yerine birleştirilmiş ilerleme yazımı
+            last_progress_commit = [0.0]
+
             def _progress(sent: int, total: int):
-                self._update_session(session, sent_count=sent)
+                now_mono = time.monotonic()
+                if sent >= total or now_mono - last_progress_commit[0] >= self.PROGRESS_COMMIT_INTERVAL:
+                    last_progress_commit[0] = now_mono
+                    self._update_session(session, sent_count=sent)
                 if progress_callback:
                     progress_callback(sent, total, f"{platform}: {sent}/{total}")
             
@@ -533,6 +532,9 @@ class StockSyncService:
             completed_at = datetime.utcnow()
             duration = (completed_at - session.started_at).total_seconds() if session.started_at else 0
             
+            # Detaylar + session sonucu tek commit'te
+            self._save_sync_details(session, results, platform, commit=False)
+            batch_reconcile.record_batches(session.id, platform, results)
             self._update_session(session,
                                  status="completed",
                                  completed_at=completed_at,
@@ -541,11 +543,10 @@ class StockSyncService:
                                  success_count=success_count,
                                  error_count=error_count)
             
-            # Detayları kaydet
-            self._save_sync_details(session, results, platform)
-            
             # Platform config güncelle
             self._update_platform_last_sync(platform)
+            if full_push:
+                push_ledger.mark_full_push(platform, session.id, at=session.started_at)
             
             logger.info(f"[SYNC] {platform.upper()} tamamlandı - Başarılı: {success_count}, Hata: {error_count}, Süre: {duration:.1f}s")
             
@@ -553,10 +554,11 @@ class StockSyncService:
                 "success": True,
                 "session_id": session.session_id,
                 "platform": platform,
-                "total": len(items),
+                "total": len(items) + unchanged,
                 "sent": len(results),
                 "success_count": success_count,
                 "error_count": error_count,
+                "skipped_count": unchanged,
                 "duration_seconds": duration,
                 "success_rate": f"{(success_count/len(results)*100):.1f}%" if results else "0%"
             }
@@ -663,7 +665,8 @@ class StockSyncService:
         barcodes: List[str],
         platforms: Optional[List[str]] = None,
         triggered_by: str = "manual",
-        triggered_by_user: Optional[str] = None
+        triggered_by_user: Optional[str] = None,
+        differential: bool = False
     ) -> Dict[str, Any]:
         """
         Belirli barkodları belirli platformlara sync et.
@@ -673,6 +676,7 @@ class StockSyncService:
             platforms: Hedef platformlar (None ise tümü)
             triggered_by: Tetikleyici
             triggered_by_user: Tetikleyen kullanıcı
+            differential: Son gönderilenle aynı adettekileri atla (bkz. push_ledger)
         """
         if not barcodes:
             return {"success": False, "error": "Barkod listesi boş"}
@@ -692,7 +696,8 @@ class StockSyncService:
                 platform=platform,
                 barcodes=barcodes,
                 triggered_by=triggered_by,
-                triggered_by_user=triggered_by_user
+                triggered_by_user=triggered_by_user,
+                differential=differential
             )
             results[platform] = result
         
@@ -702,6 +707,15 @@ class StockSyncService:
             "platforms": results
         }
     
+    async def close_adapter_sessions(self):
+        """Çalışan event loop'a ait adaptör HTTP session'larını kapatır.
+        Tek seferlik loop açan çağıranlar loop'u kapatmadan önce çağırmalı."""
+        for adapter in self._adapters.values():
+            try:
+                await adapter.close_session()
+            except Exception as e:
+                logger.warning(f"[SYNC] {adapter.PLATFORM_NAME} session kapatılamadı: {e}")
+
     def _update_platform_last_sync(self, platform: str):
         """Platform son sync zamanını güncelle"""
         try:
@@ -736,22 +750,29 @@ class StockSyncService:
         if not session:
             return None
         
-        details = SyncDetail.query.filter_by(session_id=session.id).all()
+        details = [d.to_dict() for d in SyncDetail.query.filter_by(session_id=session.id).all()]
+
+        # Sadece-hata modunda başarılı satırlar session özetinde
+        summary = db.session.get(SyncSessionSummary, session.id)
+        if summary and summary.stocks:
+            for barcode, qty in summary.stocks.items():
+                details.append({
+                    'id': None, 'barcode': barcode, 'platform': summary.platform,
+                    'stock_before': None, 'stock_sent': qty, 'status': 'success',
+                    'error_message': None, 'sent_at': None,
+                })
         
         # Rezerv bilgilerini al
         reserved_barcodes = self.get_reserved_barcodes()
         
         # Her detaya rezerv sayısını ekle
-        details_with_reserve = []
-        for d in details:
-            detail_dict = d.to_dict()
-            detail_dict['reserved_qty'] = reserved_barcodes.get(d.barcode, 0)
-            details_with_reserve.append(detail_dict)
+        for detail_dict in details:
+            detail_dict['reserved_qty'] = reserved_barcodes.get(detail_dict['barcode'], 0)
         
         return {
             **session.to_dict(),
-            "details": details_with_reserve,
-            "total_reserved": sum(reserved_barcodes.get(d.barcode, 0) for d in details)
+            "details": details,
+            "total_reserved": sum(d['reserved_qty'] for d in details)
         }
     
     def cancel_session(self, session_id: str) -> bool:
@@ -786,6 +807,7 @@ class StockSyncService:
                 except Exception as exc:
                     logger.error(f"[BG-SYNC] {platform} hata: {exc}", exc_info=True)
                 finally:
+                    loop.run_until_complete(self.close_adapter_sessions())
                     loop.close()
 
         self._executor.submit(_run)
@@ -803,6 +825,7 @@ def sync_all_platforms_sync(**kwargs) -> Dict[str, Any]:
     try:
         return loop.run_until_complete(stock_sync_service.sync_all_platforms(**kwargs))
     finally:
+        loop.run_until_complete(stock_sync_service.close_adapter_sessions())
         loop.close()
 
 
@@ -812,9 +835,23 @@ def sync_platform_sync(platform: str, **kwargs) -> Dict[str, Any]:
     try:
         return loop.run_until_complete(stock_sync_service.sync_platform(platform=platform, **kwargs))
     finally:
+        loop.run_until_complete(stock_sync_service.close_adapter_sessions())
         loop.close()
 
 
+# Otomatik senkronun kalıcı event loop'u: adaptör HTTP session'ları (connection
+# pool, TLS oturumları) 3 dakikalık çalışmalar arasında korunur.
+_auto_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_auto_sync_lock = threading.Lock()
+
+
+def _get_auto_sync_loop() -> asyncio.AbstractEventLoop:
+    global _auto_sync_loop
+    if _auto_sync_loop is None or _auto_sync_loop.is_closed():
+        _auto_sync_loop = asyncio.new_event_loop()
+    return _auto_sync_loop
+
+
 def _sync_central_stock_from_raf():
     """
     CentralStock tablosunu raf stoklarıyla otomatik senkronize eder.
@@ -866,8 +903,10 @@ def _sync_central_stock_from_raf():
 def auto_sync_platforms_except_idefix() -> Dict[str, Any]:
     """
     Otomatik stok senkronizasyonu - Idefix HARİÇ tüm platformlar.
-    APScheduler tarafından 15 dakikada bir çağrılır.
+    APScheduler tarafından 3 dakikada bir çağrılır.
     Önce CentralStock'u raf toplamlarıyla senkronize eder, sonra platformlara gönderir.
+    Yalnız adedi değişen barkodlar gönderilir; tam push push_ledger'daki daha
+    yavaş aralıkla (STOCK_FULL_PUSH_INTERVAL_MINUTES) zorlanır.
     """
     # Global otomatik sync kontrolü
     global_config = PlatformConfig.query.filter_by(platform='global').first()
@@ -886,24 +925,28 @@ def auto_sync_platforms_except_idefix() -> Dict[str, Any]:
     platforms_to_sync = ["trendyol", "amazon", "shopify"]
     
     results = {}
-    loop = asyncio.new_event_loop()
-    
-    try:
+
+    with _auto_sync_lock:
+        loop = _get_auto_sync_loop()
         for platform in platforms_to_sync:
             try:
+                differential = not push_ledger.is_full_push_due(platform)
                 result = loop.run_until_complete(
                     stock_sync_service.sync_platform(
                         platform=platform,
-                        triggered_by="auto_scheduler"
+                        triggered_by="auto_scheduler",
+                        differential=differential
                     )
                 )
                 results[platform] = result
-                logger.info(f"[AUTO-SYNC] {platform.upper()}: success={result.get('success_count', 0)}, error={result.get('error_count', 0)}")
+                logger.info(
+                    f"[AUTO-SYNC] {platform.upper()} ({'diff' if differential else 'tam'}): "
+                    f"success={result.get('success_count', 0)}, error={result.get('error_count', 0)}, "
+                    f"aynı={result.get('skipped_count', 0)}"
+                )
             except Exception as e:
                 logger.error(f"[AUTO-SYNC] {platform.upper()} hatası: {e}")
                 results[platform] = {"success": False, "error": str(e)}
-    finally:
-        loop.close()
     
     logger.info(f"[AUTO-SYNC] Otomatik senkronizasyon tamamlandı: {len(results)} platform")
     return results
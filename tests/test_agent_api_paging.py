@@ -0,0 +1,151 @@
+"""agent_api liste endpoint'leri — SQL tarafı sayfalama, cursor, fields, ETag.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_agent_api_paging.py -v
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_agent_paging_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import (  # noqa: E402
+    db, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled,
+    Product, CentralStock, Kasa, Odeme, KasaDurum,
+)
+import agent_api  # noqa: E402
+
+_TABLES = (OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled,
+           Product, CentralStock, Kasa, Odeme)
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+app.register_blueprint(agent_api.agent_api)
+
+with app.app_context():
+    for _m in _TABLES:
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+HEADERS = {"X-Agent-Key": agent_api.AGENT_API_KEY}
+BASE = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in _TABLES:
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def _orders():
+    # Aynı order_date'li satırlar farklı tablolarda → (tarih, tablo, id) kuyruğu
+    for i in range(5):
+        db.session.add(OrderCreated(order_number=f"C{i}", order_date=BASE + timedelta(hours=i),
+                                    customer_name="Ayşe", product_barcode=f"BC{i}"))
+        db.session.add(OrderShipped(order_number=f"S{i}", order_date=BASE + timedelta(hours=i),
+                                    customer_name="Ali", product_barcode=f"BS{i}"))
+    db.session.add(OrderDelivered(order_number="D0", order_date=None, customer_name="Veli"))
+    db.session.commit()
+
+
+def test_siparisler_cursor_ile_tum_kayitlar_tekrarsiz_gelir(client):
+    _orders()
+    first = client.get("/agent/api/v1/orders?per_page=4", headers=HEADERS).get_json()
+    assert first["total"] == 11 and first["total_pages"] == 3
+    seen = [o["order_number"] for o in first["orders"]]
+    assert seen[:2] in (["C4", "S4"], ["S4", "C4"])
+
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get(f"/agent/api/v1/orders?per_page=4&cursor={cursor}", headers=HEADERS).get_json()
+        assert page["total"] is None
+        seen += [o["order_number"] for o in page["orders"]]
+        cursor = page["next_cursor"]
+
+    assert len(seen) == 11 and len(set(seen)) == 11
+    assert seen[-1] == "D0"  # tarihi olmayan en sonda
+
+
+def test_offset_sayfasi_ve_filtreler_sqlde(client):
+    _orders()
+    res = client.get("/agent/api/v1/orders?status=Kargoda&sort=date_asc&page=2&per_page=2",
+                     headers=HEADERS).get_json()
+    assert [o["order_number"] for o in res["orders"]] == ["S2", "S3"]
+    assert res["orders"][0]["status"] == "Kargoda"
+
+    res = client.get("/agent/api/v1/orders?search=BC3", headers=HEADERS).get_json()
+    assert [o["order_number"] for o in res["orders"]] == ["C3"]
+
+
+def test_fields_projeksiyonu_ve_etag(client):
+    _orders()
+    url = "/agent/api/v1/orders?per_page=3&fields=order_number,status,yok"
+    resp = client.get(url, headers=HEADERS)
+    assert resp.status_code == 200
+    assert set(resp.get_json()["orders"][0]) == {"order_number", "status"}
+
+    etag = resp.headers["ETag"]
+    again = client.get(url, headers={**HEADERS, "If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+
+    db.session.add(OrderCreated(order_number="YENI", order_date=BASE + timedelta(days=1)))
+    db.session.commit()
+    changed = client.get(url, headers={**HEADERS, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_cursor_baska_filtreye_tasinamaz(client):
+    _orders()
+    cursor = client.get("/agent/api/v1/orders?per_page=2", headers=HEADERS).get_json()["next_cursor"]
+    resp = client.get(f"/agent/api/v1/orders?status=Kargoda&cursor={cursor}", headers=HEADERS)
+    assert resp.status_code == 400
+    assert client.get("/agent/api/v1/orders?cursor=bozuk!!", headers=HEADERS).status_code == 400
+
+
+def test_urun_fiyat_siralamasi_ve_kasa_odenen_tutar(client):
+    for i, price in enumerate([30.0, None, 10.0, 20.0]):
+        db.session.add(Product(barcode=f"P{i}", title=f"Ürün {i}", sale_price=price))
+    k = Kasa(tip="gider", aciklama="Kira", tutar=100, tarih=BASE, kullanici_id=1,
+             durum=KasaDurum.KISMI_ODENDI)
+    db.session.add(k)
+    db.session.flush()
+    db.session.add_all([Odeme(kasa_id=k.id, tutar=30, kullanici_id=1),
+                        Odeme(kasa_id=k.id, tutar=15, kullanici_id=1)])
+    db.session.commit()
+
+    p1 = client.get("/agent/api/v1/products?sort=price_desc&per_page=2&fields=barcode",
+                    headers=HEADERS).get_json()
+    p2 = client.get(f"/agent/api/v1/products?sort=price_desc&per_page=2&fields=barcode&cursor={p1['next_cursor']}",
+                    headers=HEADERS).get_json()
+    assert [p["barcode"] for p in p1["products"] + p2["products"]] == ["P0", "P3", "P2", "P1"]
+    assert p2["next_cursor"] is None
+
+    tx = client.get("/agent/api/v1/finance/transactions", headers=HEADERS).get_json()["transactions"][0]
+    assert tx["odenen_tutar"] == 45.0 and tx["kalan_tutar"] == 55.0
@@ -0,0 +1,140 @@
+"""AmazonAdapter feed modu — JSON_LISTINGS_FEED gövdesi, beklemeden iyimser sonuç,
+mutabakat için feed durumu/işleme raporu eşlemesi, küçük farkta Listings PATCH'e dönüş.
+
+Ağ kullanmaz; SP-API çağrıları adaptör örneği üzerinde sahtelenir.
+
+Çalıştırma:
+    pytest tests/test_amazon_feed.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from stock_sync.adapters.amazon import (  # noqa: E402
+    AmazonAdapter, build_listings_feed, map_processing_report,
+)
+from stock_sync.adapters.base import StockItem, SyncResult  # noqa: E402
+
+
+def _items(n, sku=True):
+    return [StockItem(barcode=f"B{i}", quantity=i - 1, sku=f"SKU-{i}" if sku else None) for i in range(n)]
+
+
+class _FakeAmazon(AmazonAdapter):
+    FEED_MIN_ITEMS = 3
+    REQUESTS_PER_SECOND = 1000
+
+    def _init_config(self):
+        super()._init_config()
+        self.is_configured = True
+        self.seller_id = "SELLER"
+        self.statuses = ["IN_QUEUE", "IN_PROGRESS", "DONE"]
+        self.report = {"issues": []}
+        self.uploaded = None
+        self.patched = []
+
+    async def _get_access_token(self):
+        return "tok"
+
+    async def _upload_feed_document(self, access_token, body):
+        self.uploaded = json.loads(body)
+        return "doc-1"
+
+    async def _create_feed(self, access_token, document_id):
+        assert document_id == "doc-1"
+        return "feed-9"
+
+    async def get_feed_status(self, feed_id):
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return {"success": True, "feedId": feed_id, "processingStatus": status,
+                "resultFeedDocumentId": "rep-1" if status == "DONE" else None}
+
+    async def _download_feed_document(self, document_id):
+        assert document_id == "rep-1"
+        return self.report
+
+    async def send_stock_batch(self, items):
+        self.patched.extend(it.barcode for it in items)
+        return [SyncResult(barcode=it.barcode, success=True, quantity_sent=it.quantity) for it in items]
+
+
+def test_feed_govdesi_sku_basina_patch_mesaji():
+    feed = build_listings_feed("SELLER", _items(2))
+    assert feed["header"]["sellerId"] == "SELLER"
+    first, second = feed["messages"]
+    assert (first["messageId"], first["sku"], first["operationType"]) == (1, "SKU-0", "PATCH")
+    assert first["patches"][0]["path"] == "/attributes/fulfillment_availability"
+    assert first["patches"][0]["value"][0]["quantity"] == 0          # negatif stok 0'a kırpılır
+    assert second["patches"][0]["value"][0]["quantity"] == 0 and second["messageId"] == 2
+
+
+def test_rapor_mesaj_bazinda_eslenir_uyari_basariyi_bozmaz():
+    items = _items(3)
+    report = {"issues": [
+        {"messageId": 2, "code": "90220", "severity": "ERROR", "message": "SKU bulunamadı"},
+        {"messageId": 3, "code": "18027", "severity": "WARNING", "message": "uyarı"},
+    ]}
+    results = map_processing_report(items, report, "feed-9")
+    assert [r.success for r in results] == [True, False, True]
+    assert results[1].error_message.startswith("90220")
+    assert results[2].response_data["issues"][0]["severity"] == "WARNING"
+    assert all(r.response_data["feedId"] == "feed-9" for r in results)
+
+    feed_level = map_processing_report(items, {"issues": [{"code": "X", "severity": "ERROR", "message": "şema"}]}, "f")
+    assert not any(r.success for r in feed_level)
+
+
+def test_buyuk_gonderim_tek_feed_ile_gider_islenmeyi_beklemez():
+    adapter = _FakeAmazon()
+    items = _items(5)
+    items[1].sku = None
+    progress = []
+    results = asyncio.run(adapter.send_all_stocks(items, progress_callback=lambda s, t: progress.append((s, t))))
+
+    assert [r.barcode for r in results] == [f"B{i}" for i in range(5)]
+    assert [m["sku"] for m in adapter.uploaded["messages"]] == ["SKU-0", "SKU-2", "SKU-3", "SKU-4"]
+    assert "SKU" in results[1].error_message                         # SKU'suz ürün feed'e girmez
+    assert [r.success for r in results] == [True, False, True, True, True]
+    assert results[2].response_data == {"feedId": "feed-9", "messageId": 2}
+    assert adapter.statuses == ["IN_QUEUE", "IN_PROGRESS", "DONE"]   # durum yoklanmadı
+    assert adapter.patched == [] and progress[-1] == (5, 5)
+
+
+def test_kucuk_fark_listings_patch_ile_gider():
+    adapter = _FakeAmazon()
+    results = asyncio.run(adapter.send_all_stocks(_items(3)))
+    assert adapter.patched == ["B0", "B1", "B2"] and adapter.uploaded is None
+    assert all(r.success for r in results)
+
+
+FEED_ITEMS = [[2, "B2", 1], [1, "B0", 0], [3, "B3", 2]]
+
+
+def test_mutabakat_durumu_rapordan_mesaj_bazinda_eslenir():
+    adapter = _FakeAmazon()
+    adapter.report = {"issues": [{"messageId": 2, "code": "E", "severity": "ERROR", "message": "red"}]}
+
+    assert asyncio.run(adapter.check_batch_status("feed-9", FEED_ITEMS)) == {"status": "IN_QUEUE", "items": []}
+    asyncio.run(adapter.check_batch_status("feed-9", FEED_ITEMS))
+    data = asyncio.run(adapter.check_batch_status("feed-9", FEED_ITEMS))
+
+    assert data["status"] == "COMPLETED"
+    assert [(i["requestItem"]["barcode"], i["status"]) for i in data["items"]] == [
+        ("B0", "SUCCESS"), ("B2", "FAILED"), ("B3", "SUCCESS")]
+    assert data["items"][1]["failureReasons"] == ["E: red"]
+    assert data["items"][2]["requestItem"]["quantity"] == 2
+
+
+def test_fatal_feed_tum_urunleri_hatali_dondurur():
+    adapter = _FakeAmazon()
+    adapter.statuses = ["FATAL"]
+    data = asyncio.run(adapter.check_batch_status("feed-9", FEED_ITEMS))
+    assert data["status"] == "COMPLETED"
+    assert {i["status"] for i in data["items"]} == {"FAILED"}
+    assert "FATAL" in data["items"][0]["failureReasons"][0]
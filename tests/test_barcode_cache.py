@@ -0,0 +1,126 @@
+"""normalize_barcode süreç içi çözümleme önbelleği — barcode_alias_helper.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_barcode_cache.py -v
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_barcode_cache_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from models import db, BarcodeAlias, Product, PlatformConfig  # noqa: E402
+import barcode_alias_helper as bah  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in (BarcodeAlias, Product, PlatformConfig):
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+    bah.install_listeners()
+
+
+@pytest.fixture(autouse=True)
+def _ctx(monkeypatch):
+    monkeypatch.setattr(bah, "VERSION_CHECK_SECONDS", 3600)
+    with app.app_context():
+        for m in (BarcodeAlias, Product, PlatformConfig):
+            m.query.delete()
+        db.session.commit()
+        db.session.add_all([Product(barcode="Güllüayakkabı741"), Product(barcode="ABC100")])
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+@pytest.fixture
+def statements():
+    """Engine'e giden SQL'leri toplar; listener test sonunda kaldırılır."""
+    seen = []
+
+    def _record(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    yield seen
+    event.remove(db.engine, "before_cursor_execute", _record)
+
+
+def _token():
+    cfg = PlatformConfig.query.filter_by(platform="barcode_cache").first()
+    return (cfg.extra_config or {}).get("token") if cfg else None
+
+
+def test_isinmis_onbellek_sorgusuz_cozer(statements):
+    assert bah.normalize_barcode("abc100") == "ABC100"
+    statements.clear()
+    assert bah.normalize_barcode(" gulluayakkabi741 ") == "Güllüayakkabı741"
+    assert bah.normalize_barcode("Gulluayakkabı741") == "Güllüayakkabı741"
+    assert bah.normalize_barcode("YOK1") == "YOK1"
+    assert bah.normalize_many(["abc100", "YOK1", "abc100", ""]) == {
+        "abc100": "ABC100", "YOK1": "YOK1", "": ""}
+    assert statements == []
+
+
+def test_alias_ekleme_silme_aninda_gorunur_ve_surum_degisir():
+    assert bah.normalize_barcode("ALT1") == "ALT1"
+    assert bah.add_alias("ALT1", "ABC100", merge_stocks=False)["success"]
+    first = _token()
+    assert first and bah.normalize_barcode("ALT1") == "ABC100"
+
+    assert bah.remove_alias("ALT1")["success"]
+    assert _token() != first
+    assert bah.normalize_barcode("ALT1") == "ALT1"
+
+
+def test_diger_worker_surum_belirteciyle_tazelenir(monkeypatch):
+    other = bah.BarcodeResolver(db.engine)   # başka gunicorn worker'ı
+    assert other.resolve("ALT2") == "ALT2"
+
+    db.session.add(BarcodeAlias(alias_barcode="ALT2", main_barcode="ABC100"))
+    db.session.commit()
+    assert other.resolve("ALT2") == "ALT2"   # kontrol aralığı dolmadı
+
+    monkeypatch.setattr(bah, "VERSION_CHECK_SECONDS", 0)
+    assert other.resolve("ALT2") == "ABC100"
+
+
+def test_commit_edilmemis_alias_ve_toplu_silme():
+    assert bah.normalize_barcode("ALT3") == "ALT3"
+    db.session.add(BarcodeAlias(alias_barcode="ALT3", main_barcode="ABC100"))
+    db.session.flush()
+    assert bah.normalize_barcode("ALT3") == "ABC100"   # aynı session kendi yazdığını görür
+    db.session.commit()
+    assert bah.normalize_barcode("ALT3") == "ABC100"
+
+    BarcodeAlias.query.filter_by(alias_barcode="ALT3").delete()
+    db.session.commit()
+    assert bah.normalize_barcode("ALT3") == "ALT3"
+
+
+def test_toplu_upsert_sonrasi_yeni_urun_gorunur():
+    assert bah.normalize_barcode("yeni500") == "yeni500"
+    db.session.execute(Product.__table__.insert().values(barcode="YENI500"))
+    bah.invalidate_barcode_cache()
+    db.session.commit()
+    assert bah.normalize_barcode("yeni500") == "YENI500"
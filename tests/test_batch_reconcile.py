@@ -0,0 +1,200 @@
+"""batch_reconcile — Trendyol batchRequestId / Amazon feedId yoklama, SyncDetail düzeltme, yeniden kuyruk.
+
+İzole tempfile-sqlite + sahte durum ucu; GERÇEK DB'ye / Trendyol'a dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_batch_reconcile.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_batch_reconcile_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import db, PlatformConfig, SyncSession, SyncDetail, SyncSessionSummary, SyncBatchRequest  # noqa: E402
+from stock_sync import batch_reconcile as br, detail_writer, push_ledger  # noqa: E402
+from stock_sync.adapters.base import SyncResult  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+TABLES = (PlatformConfig, SyncSession, SyncDetail, SyncSessionSummary, SyncBatchRequest)
+
+with app.app_context():
+    for _m in TABLES:
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+STATUS = {}
+REQUEUED = []
+
+
+@pytest.fixture(autouse=True)
+def _ctx(monkeypatch):
+    async def _check(batch_id):
+        return STATUS.get(batch_id, {"status": "IN_PROGRESS", "items": []})
+
+    monkeypatch.setattr(br, "_status_checker", lambda platform: _check)
+    monkeypatch.setattr(br, "_run", asyncio.run)
+    monkeypatch.setattr(br, "_requeue", lambda platform, barcodes: REQUEUED.append((platform, barcodes)))
+    STATUS.clear()
+    REQUEUED.clear()
+    with app.app_context():
+        for m in (SyncBatchRequest, SyncDetail, SyncSessionSummary, SyncSession, PlatformConfig):
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _sync(name="s1", barcodes=("A", "B", "C"), errors_only=False, triggered_by="auto_scheduler"):
+    """sync_platform'un yazdığı gibi: detaylar + batch kaydı + session sayaçları tek commit."""
+    s = SyncSession(session_id=name, platform="trendyol", status="completed", triggered_by=triggered_by,
+                    sent_count=len(barcodes), success_count=len(barcodes), error_count=0)
+    db.session.add(s)
+    db.session.flush()
+    results = [SyncResult(barcode=bc, success=True, quantity_sent=5,
+                          response_data={"batchRequestId": f"{name}-batch"}) for bc in barcodes]
+    detail_writer.write_sync_details(s.id, results, "trendyol", errors_only=errors_only)
+    assert br.record_batches(s.id, "trendyol", results) == 1
+    db.session.commit()
+    return s
+
+
+def _completed(name, failed=(), ok=()):
+    items = [{"requestItem": {"barcode": bc, "quantity": 5}, "status": "FAILED",
+              "failureReasons": ["Ürün bulunamadı"]} for bc in failed]
+    items += [{"requestItem": {"barcode": bc, "quantity": 5}, "status": "SUCCESS", "failureReasons": []}
+              for bc in ok]
+    STATUS[f"{name}-batch"] = {"batchRequestId": f"{name}-batch", "status": "COMPLETED", "items": items}
+
+
+def _later(minutes=1):
+    return datetime.utcnow() + timedelta(minutes=minutes)
+
+
+def test_bitmeyen_batch_backoff_ile_ertelenir_sure_dolunca_expired():
+    _sync()
+    batch = SyncBatchRequest.query.one()
+    assert batch.item_count == 3 and batch.status == "pending"
+
+    assert br.reconcile_pending_batches(now=datetime.utcnow())["checked"] == 0   # vadesi gelmedi
+    stats = br.reconcile_pending_batches(now=_later())
+    assert stats["pending"] == 1
+    first_delay = batch.next_check_at
+    br.reconcile_pending_batches(now=first_delay)
+    assert batch.attempts == 2 and batch.next_check_at - first_delay == timedelta(seconds=60)
+
+    stats = br.reconcile_pending_batches(now=_later(br.MAX_AGE_HOURS * 60 + 1))
+    assert stats["expired"] == 1 and batch.status == "expired"
+
+
+def test_hatali_urunler_detaya_islenir_ve_yalniz_onlar_kuyruga_alinir():
+    s = _sync()
+    _completed("s1", failed=["B"], ok=["A", "C"])
+    stats = br.reconcile_pending_batches(now=_later())
+    assert stats["completed"] == 1 and stats["failed_items"] == 1 and stats["requeued"] == 1
+
+    db.session.expire_all()
+    by_bc = {d.barcode: d for d in SyncDetail.query.all()}
+    assert by_bc["B"].status == "error" and "bulunamadı" in by_bc["B"].error_message
+    assert by_bc["A"].status == by_bc["C"].status == "success"
+    assert (s.success_count, s.error_count) == (2, 1)
+    batch = SyncBatchRequest.query.one()
+    assert (batch.status, batch.success_count, batch.failed_count, batch.requeued_count) == ("completed", 2, 1, 1)
+    assert REQUEUED == [("trendyol", ["B"])]
+
+    assert br.reconcile_pending_batches(now=_later(60))["checked"] == 0                # tekrar işlenmez
+
+
+def test_sadece_hata_modunda_ozetten_cikarilip_hata_satiri_eklenir():
+    s = _sync(errors_only=True)
+    assert SyncDetail.query.count() == 0
+    _completed("s1", failed=["A"], ok=["B", "C"])
+    br.reconcile_pending_batches(now=_later())
+
+    db.session.expire_all()
+    summary = db.session.get(SyncSessionSummary, s.id)
+    assert summary.stocks == {"B": 5, "C": 5} and summary.success_count == 2
+    detail = SyncDetail.query.one()
+    assert (detail.barcode, detail.status, detail.stock_sent) == ("A", "error", 5)
+    assert (s.success_count, s.error_count) == (2, 1)
+
+    push_ledger.mark_full_push("trendyol", s.id)
+    assert push_ledger.get_last_pushed_map("trendyol") == {"B": 5, "C": 5}   # A bir sonraki diff'te gider
+
+
+def test_retry_session_hatalari_tekrar_kuyruga_alinmaz():
+    _sync(name="r1", triggered_by=br.RETRY_TRIGGER)
+    _completed("r1", failed=["A"], ok=["B", "C"])
+    stats = br.reconcile_pending_batches(now=_later())
+    assert stats["failed_items"] == 1 and stats["requeued"] == 0 and REQUEUED == []
+
+
+def test_batch_id_olmayan_ve_diger_platform_kaydedilmez():
+    results = [SyncResult(barcode="A", success=True, response_data={"raw": "ok"}),
+               SyncResult(barcode="B", success=False, response_data={"batchRequestId": "x"})]
+    assert br.record_batches(1, "trendyol", results) == 0
+    assert br.record_batches(1, "amazon", [SyncResult(barcode="A", success=True,
+                                                      response_data={"batchRequestId": "y"})]) == 0
+    assert br.record_batches(1, "woocommerce", [SyncResult(barcode="A", success=True,
+                                                           response_data={"feedId": "z"})]) == 0
+
+
+def test_amazon_feed_mesaj_listesiyle_kaydedilir_rapordan_duzeltilir(monkeypatch):
+    from stock_sync.adapters.amazon import AmazonAdapter
+
+    class _Feed(AmazonAdapter):
+        async def _get_access_token(self):
+            return "tok"
+
+        async def get_feed_status(self, feed_id):
+            return {"success": True, "processingStatus": "DONE", "resultFeedDocumentId": "rep"}
+
+        async def _download_feed_document(self, document_id):
+            return {"issues": [{"messageId": 2, "code": "90220", "severity": "ERROR", "message": "SKU yok"}]}
+
+    monkeypatch.setattr(br, "_status_checker", lambda platform: _Feed().check_batch_status)
+    s = SyncSession(session_id="am1", platform="amazon", status="completed", triggered_by="auto_scheduler",
+                    sent_count=3, success_count=3, error_count=0)
+    db.session.add(s)
+    db.session.flush()
+    results = [SyncResult(barcode=bc, success=True, quantity_sent=q,
+                          response_data={"feedId": "feed-1", "messageId": i})
+               for i, (bc, q) in enumerate((("A", 1), ("B", 2), ("C", 3)), 1)]
+    detail_writer.write_sync_details(s.id, results, "amazon")
+    assert br.record_batches(s.id, "amazon", results) == 1
+    db.session.commit()
+    assert SyncBatchRequest.query.one().items == [[1, "A", 1], [2, "B", 2], [3, "C", 3]]
+
+    stats = br.reconcile_pending_batches(now=_later())
+    assert stats["completed"] == 1 and stats["failed_items"] == 1
+    db.session.expire_all()
+    detail = SyncDetail.query.filter_by(barcode="B").one()
+    assert detail.status == "error" and detail.error_message.startswith("90220")
+    assert detail.response_data["feedId"] == "feed-1"
+    assert REQUEUED == [("amazon", ["B"])]
+
+
+def test_nedensiz_hata_metni_platform_adindan_kurulur():
+    entry = {"status": "FAILED", "failureReasons": []}
+    assert br._item_reason(entry, "amazon") == "Amazon batch: FAILED"
+    assert br._item_reason(entry, "trendyol") == "Trendyol batch: FAILED"
+    assert br._item_reason({"failureReasons": [{"message": "stok yok"}]}, "amazon") == "stok yok"
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import canli_panel as panel
@@ -143,3 +143,53 @@ def test_shopify_api_orders_are_aggregated_without_refunded_or_unpaid_orders():
     assert quantities == {"BC-1": 1, "BC-2": 1}
     assert amounts == {"BC-1": 150.0, "BC-2": 500.0}
     assert order_ids == {"SH-1", "SH-2"}
+
+
+def test_sse_subscribers_share_one_computation_per_key(monkeypatch):
+    from app import app as flask_app
+
+    calls = []
+
+    def fake_payload(*args):
+        calls.append(args)
+        return {"kartlar": [], "tick": len(calls)}
+
+    monkeypatch.setattr(panel, "_akis_payload", fake_payload)
+    monkeypatch.setattr(panel, "AKIS_ARALIGI_SANIYE", 0.05)
+    monkeypatch.setattr(panel, "AKIS_BOSTA_TUTMA_SANIYE", 0)
+
+    yayin = panel._AkisYayini()
+    key = ("", "2026-08-05", "2026-08-05", "all", False, None)
+    q1 = yayin.abone_ol(key, flask_app)
+    q2 = yayin.abone_ol(key, flask_app)
+
+    frame1 = q1.get(timeout=2)
+    frame2 = q2.get(timeout=2)
+    assert frame1 == frame2
+    assert frame1.startswith("data: ")
+    assert len(yayin.durum()) == 1
+
+    yayin.abone_birak(key, q1)
+    yayin.abone_birak(key, q2)
+    kanal_thread = next(iter(yayin._kanallar.values())).thread if yayin._kanallar else None
+    if kanal_thread:
+        kanal_thread.join(timeout=2)
+
+    assert yayin.durum() == []
+    assert all(c[0] == datetime(2026, 8, 5, tzinfo=IST) and c[2] == "all" for c in calls)
+
+
+def test_sse_kanali_araligi_her_tickte_yeniden_cozer(monkeypatch):
+    from app import app as flask_app
+
+    days = iter([datetime(2026, 8, 5, tzinfo=IST), datetime(2026, 8, 6, tzinfo=IST)])
+    calls = []
+    monkeypatch.setattr(panel, "_tr_range_from_params",
+                        lambda args: (lambda d: (d, d + timedelta(days=1)))(next(days)))
+    monkeypatch.setattr(panel, "_akis_payload", lambda *args: calls.append(args) or {"kartlar": []})
+
+    kanal = panel._AkisKanali(panel._AkisYayini(), ("today", "", "", "all", False, None), flask_app)
+    with flask_app.app_context():
+        kanal._hesapla()
+        kanal._hesapla()                                  # gece yarısı geçti
+    assert [c[0].day for c in calls] == [5, 6]
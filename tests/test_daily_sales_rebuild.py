@@ -0,0 +1,122 @@
+"""DailySales toplu/artımlı yeniden kurulum (uretim_oneri.rebuild_daily_sales).
+
+İzole tempfile-sqlite; sqlite'ta Python toplama yolu çalışır.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_daily_sales_rebuild.py -v
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_daily_sales_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import (  # noqa: E402
+    db, DailySales, DailySalesStatus, OrderCreated, OrderHazirlaniyor, OrderPicking,
+    OrderShipped, OrderDelivered, OrderCancelled, OrderArchived, OrderReadyToShip,
+)
+from time_utils import IST, ist_to_utc  # noqa: E402
+import uretim_oneri  # noqa: E402
+
+_ORDER_MODELS = (OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped,
+                 OrderDelivered, OrderCancelled, OrderArchived, OrderReadyToShip)
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in (DailySales, DailySalesStatus) + _ORDER_MODELS:
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in (DailySales, DailySalesStatus) + _ORDER_MODELS:
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _ist_day(days_ago: int, hour: int):
+    """Bugünden days_ago gün önce, İstanbul saatiyle hour:00 → naive UTC."""
+    local = (datetime.now(IST) - timedelta(days=days_ago)).replace(
+        hour=hour, minute=0, second=0, microsecond=0, tzinfo=None)
+    return ist_to_utc(local), local.date()
+
+
+def _order(cls, no, order_date, items, **kw):
+    o = cls(order_number=no, order_date=order_date, details=json.dumps(items), **kw)
+    db.session.add(o)
+    return o
+
+
+def _sales():
+    return {(r.barcode, r.date): r.qty for r in DailySales.query.all()}
+
+
+def test_tam_kurulum_gunleri_istanbul_saatine_gore_toplar():
+    # İstanbul 01:00 → UTC'de önceki gün 22:00; gün İstanbul'a göre sayılmalı
+    gece, gece_gun = _ist_day(2, 1)
+    ogle, ogle_gun = _ist_day(2, 13)
+    _order(OrderCreated, "1", gece, [{"barcode": "A", "quantity": 2}])
+    _order(OrderShipped, "2", ogle, {"lines": [{"productBarcode": "A", "qty": "3"}, {"barcode": "B", "quantity": 1}]})
+    _order(OrderCancelled, "3", ogle, [{"barcode": "A", "quantity": 50}])
+    _order(OrderCreated, "4", ogle, "bozuk")
+    db.session.add(DailySales(barcode="ESKI", date=ogle_gun, qty=9))
+    db.session.commit()
+
+    res = uretim_oneri.rebuild_daily_sales(days=5)
+
+    assert gece_gun == ogle_gun
+    assert _sales() == {("A", ogle_gun): 5, ("B", ogle_gun): 1}
+    assert res["incremental"] is False
+    st = DailySalesStatus.query.one()
+    assert st.status == "done" and st.processed_days == 5
+
+
+def test_artimli_yalniz_dokunulan_gunleri_yeniler():
+    d1, gun1 = _ist_day(1, 12)
+    d3, gun3 = _ist_day(3, 12)
+    _order(OrderCreated, "1", d1, [{"barcode": "A", "quantity": 1}])
+    _order(OrderCreated, "2", d3, [{"barcode": "A", "quantity": 4}])
+    db.session.commit()
+    uretim_oneri.rebuild_daily_sales(days=5)
+    assert _sales() == {("A", gun1): 1, ("A", gun3): 4}
+
+    # gün3'e elle bir değer yaz: dokunulmayan gün artımlı modda korunmalı
+    DailySales.query.filter_by(date=gun3).update({"qty": 99})
+    _order(OrderPicking, "3", d1, [{"barcode": "C", "quantity": 2}],
+           updated_at=datetime.utcnow() + timedelta(minutes=1))
+    db.session.commit()
+
+    res = uretim_oneri.rebuild_daily_sales(days=5, incremental=True)
+
+    assert res["incremental"] is True and res["days"] == 1
+    assert _sales() == {("A", gun1): 1, ("C", gun1): 2, ("A", gun3): 99}
+
+
+def test_artimli_calisma_devam_ederken_atlanir():
+    db.session.add(DailySalesStatus(status="running", processed_days=0, total_days=30,
+                                    updated_at=datetime.now(IST)))
+    db.session.commit()
+    assert uretim_oneri.rebuild_daily_sales(days=5, incremental=True) == {"skipped": True, "reason": "running"}
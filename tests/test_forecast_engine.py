@@ -0,0 +1,135 @@
+"""ForecastCache toplu (NumPy) tahmin motoru — forecast_engine.
+
+İzole tempfile-sqlite; Prophet çalıştırılmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_forecast_engine.py -v
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_forecast_engine_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import db, DailySales, ForecastCache  # noqa: E402
+import forecast_engine as fe  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in (DailySales, ForecastCache):
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+END = date(2026, 3, 1)
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in (DailySales, ForecastCache):
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _sales(barcode, qty_by_days_ago):
+    for ago, q in qty_by_days_ago.items():
+        db.session.add(DailySales(barcode=barcode, date=END - timedelta(days=ago), qty=q))
+    db.session.commit()
+
+
+def _cache(days=14):
+    return {r.barcode: r for r in ForecastCache.query.filter_by(days=days)}
+
+
+def test_sabit_satis_tahmini_sabit_kalir():
+    matrix = np.full((2, 56), 3.0)
+    matrix[1] = 0
+    res = fe.batch_forecast(matrix, 14, END)
+    assert np.allclose(res["avg_base"], [3.0, 0.0])
+    assert np.allclose(res["avg_final"], [3.0, 0.0])
+
+
+def test_haftalik_mevsimsellik_ufuktaki_gunlere_gore_olceklenir():
+    # Cumartesi 10, diğer günler 2 satan ürün: ertesi gün cumartesiyse tahmin yüksek
+    def _fc(end_day):
+        start = end_day - timedelta(days=55)
+        matrix = np.array([[10.0 if (start + timedelta(days=j)).weekday() == 5 else 2.0 for j in range(56)]])
+        return fe.batch_forecast(matrix, 1, end_day)["avg_smooth"][0]
+
+    friday = END + timedelta(days=(4 - END.weekday()) % 7)
+    assert _fc(friday) > 1.5 * _fc(friday + timedelta(days=1))
+
+
+def test_toplu_yazim_az_satisli_barkodda_ortalamaya_duser():
+    _sales("A", {i: 4 for i in range(30)})
+    _sales("B", {0: 7})
+    res = fe.run_batch_forecast(days=14, end_day=END)
+    cache = _cache()
+    assert res["written"] == 2
+    assert cache["A"].avg_final == pytest.approx(4.0)
+    assert cache["B"].avg_final == pytest.approx(0.5)
+    assert cache["B"].avg_base == pytest.approx(0.5)
+
+
+def test_satisi_biten_barkod_sifirlanir_prophet_degeri_ust_katmanda_korunur(monkeypatch):
+    monkeypatch.setenv("FORECAST_PROPHET_TOP_N", "1")
+    _sales("A", {i: 10 for i in range(20)})
+    _sales("C", {i: 1 for i in range(20)})
+    db.session.add_all([
+        ForecastCache(barcode="A", days=14, avg_base=1, avg_prophet=12.0, avg_final=12.0),
+        ForecastCache(barcode="C", days=14, avg_base=1, avg_prophet=3.0, avg_final=3.0),
+        ForecastCache(barcode="ESKI", days=14, avg_base=5, avg_final=5),
+    ])
+    db.session.commit()
+
+    res = fe.run_batch_forecast(days=14, end_day=END)
+    db.session.expire_all()
+    cache = _cache()
+
+    assert res["prophet_kept"] == 1
+    assert cache["A"].avg_final == pytest.approx(12.0)
+    assert cache["C"].avg_prophet is None and cache["C"].avg_final == pytest.approx(1.0)
+    assert cache["ESKI"].avg_final == 0.0
+
+
+def test_alt_kume_kosusu_prophet_katmanini_yeniden_hesaplamaz(monkeypatch):
+    # Worker katmanı top_n=2 ile doldurmuş; alt küme koşusu env'deki 1'le
+    # kendi içinde yeniden sıralayıp A'nın Prophet değerini düşürmemeli.
+    monkeypatch.setenv("FORECAST_PROPHET_TOP_N", "1")
+    _sales("A", {i: 5 for i in range(20)})
+    _sales("B", {i: 10 for i in range(20)})
+    db.session.add_all([
+        ForecastCache(barcode="A", days=14, avg_base=1, avg_prophet=6.0, avg_final=6.0),
+        ForecastCache(barcode="B", days=14, avg_base=1, avg_prophet=11.0, avg_final=11.0),
+    ])
+    db.session.commit()
+
+    res = fe.run_batch_forecast(days=14, barcodes=["A", "B"], end_day=END)
+    db.session.expire_all()
+    cache = _cache()
+
+    assert res["prophet_kept"] == 2
+    assert cache["A"].avg_prophet == pytest.approx(6.0)
+    assert cache["A"].avg_final == pytest.approx(6.0)
+    assert cache["B"].avg_final == pytest.approx(11.0)
@@ -0,0 +1,110 @@
+"""image_pipeline — içerik özetli thumb/medium türevleri, manifest, koşullu GET.
+
+Geçici static kökü üzerinde çalışır; GERÇEK static/ dizinine dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_image_pipeline.py -v
+"""
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+from flask import Flask, render_template_string  # noqa: E402
+
+import image_pipeline as ip  # noqa: E402
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(ip, "STATIC_ROOT", str(tmp_path))
+    monkeypatch.setattr(ip, "_manifests", {})
+    monkeypatch.setattr(ip, "MANIFEST_CHECK_SECONDS", 0)
+    (tmp_path / ip.SOURCE_SUBDIR).mkdir()
+    return tmp_path
+
+
+def _image(root, name, color=(200, 30, 30), size=(1200, 800)):
+    path = root / ip.SOURCE_SUBDIR / name
+    Image.new("RGB", size, color).save(path, "JPEG")
+    return str(path)
+
+
+def test_turevler_boyut_ve_ozetli_ad(root):
+    src = _image(root, "8680001.jpg")
+    assert ip.process_sources([src], workers=1) == {"processed": 1, "failed": 0}
+
+    entry = ip.manifest().get("images/8680001.jpg")
+    thumb = entry["variants"]["thumb"]["webp"]
+    assert thumb == f"images/derived/8680001-thumb-{entry['hash']}.webp"
+    with Image.open(root / thumb) as im:
+        assert im.format == "WEBP" and max(im.size) == ip.SIZES["thumb"]
+    with Image.open(root / entry["variants"]["medium"]["jpg"]) as im:
+        assert im.format == "JPEG" and im.size == (640, 427)
+
+
+def test_derived_url_ve_geri_donus(root):
+    src = _image(root, "8680002.jpg")
+    assert ip.derived_url("/static/images/8680002.jpg") == "/static/images/8680002.jpg"
+    ip.process_sources([src], workers=1)
+
+    url = ip.derived_url("/static/images/8680002.jpg", "thumb", "webp")
+    assert url.startswith("/static/images/derived/8680002-thumb-") and url.endswith(".webp")
+    assert ip.derived_url("https://cdn.example.com/x.jpg") == "https://cdn.example.com/x.jpg"
+    assert ip.derived_url(None) == ""
+
+    app = Flask(__name__, static_folder=str(root), static_url_path="/static")
+    ip.init_app(app)
+    with app.test_request_context():
+        html = render_template_string("{{ src|derived('medium') }}", src="/static/images/8680002.jpg")
+    assert "-medium-" in html and html.endswith(".jpg")
+
+    resp = app.test_client().get(url)
+    assert resp.status_code == 200 and "immutable" in resp.headers["Cache-Control"]
+
+
+def test_degismeyen_kaynak_atlanir_degisen_yeniden_uretilir(root):
+    src = _image(root, "8680003.jpg")
+    assert ip.pending_sources() == [src]
+    ip.backfill(workers=1)
+    assert ip.pending_sources() == []
+
+    old = ip.manifest().get("images/8680003.jpg")
+    old_thumb = root / old["variants"]["thumb"]["jpg"]
+    _image(root, "8680003.jpg", color=(10, 120, 10))
+    os.utime(src, (old["mtime"] + 10, old["mtime"] + 10))
+    assert ip.pending_sources() == [src]
+    ip.backfill(workers=1)
+
+    new = ip.manifest().get("images/8680003.jpg")
+    assert new["hash"] != old["hash"]
+    assert not old_thumb.exists() and (root / new["variants"]["thumb"]["jpg"]).exists()
+
+
+def test_bozuk_gorsel_partiyi_dusurmez(root):
+    bad = root / ip.SOURCE_SUBDIR / "bozuk.jpg"
+    bad.write_bytes(b"not an image")
+    good = _image(root, "8680004.jpg")
+    assert ip.process_sources([str(bad), good], workers=1) == {"processed": 1, "failed": 1}
+
+
+def test_kosullu_get_basliklari(root):
+    missing = str(root / ip.SOURCE_SUBDIR / "yok.jpg")
+    assert ip.conditional_headers(missing) == {}
+
+    src = _image(root, "8680005.jpg")
+    assert "If-None-Match" not in ip.conditional_headers(src)
+    assert ip.conditional_headers(src)["If-Modified-Since"].endswith("GMT")
+
+    ip.record_validators({src: ('"abc"', "Wed, 01 Jan 2025 00:00:00 GMT")})
+    ip.process_sources([src], workers=1)   # türev kaydı doğrulayıcıları silmez
+    assert ip.conditional_headers(src) == {
+        "If-None-Match": '"abc"', "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"}
@@ -0,0 +1,140 @@
+"""job_runner — kuyruklu scheduler, job metrikleri ve durum yayını.
+
+İzole tempfile-sqlite; gerçek job'lar çalıştırılmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_job_runner.py -v
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_job_runner_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import db, PlatformConfig  # noqa: E402
+import job_runner  # noqa: E402
+from routes.common.health import health_bp  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.secret_key = "test"
+db.init_app(app)
+app.register_blueprint(health_bp)
+
+with app.app_context():
+    PlatformConfig.__table__.create(bind=db.engine, checkfirst=True)
+
+
+@pytest.fixture(autouse=True)
+def _ctx(monkeypatch):
+    monkeypatch.setattr(job_runner, "metrics", job_runner.JobMetrics())
+    with app.app_context():
+        PlatformConfig.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def test_sure_hata_ve_aralik_asimi_kaydedilir():
+    calls = []
+
+    def _job(fail):
+        calls.append(fail)
+        time.sleep(0.03)
+        if fail:
+            raise RuntimeError("patladı")
+
+    wrapped = job_runner.timed("ornek", _job, interval=0.01)
+    wrapped(False)
+    with pytest.raises(RuntimeError):
+        wrapped(True)
+
+    m = job_runner.metrics.snapshot()["ornek"]
+    assert calls == [False, True]
+    assert m["runs"] == 2 and m["errors"] == 1 and m["overruns"] == 2
+    assert m["running"] == 0
+    assert m["last_error"] == "RuntimeError: patladı"
+    assert m["max_duration"] >= 0.03
+
+
+def test_kuyruklar_ayri_havuzda_kosar_ve_atlanan_tur_asim_sayilir():
+    sched = job_runner.build_scheduler()
+    release = threading.Event()
+    assert set(sched._executors) == set(job_runner.QUEUES)
+
+    def _uzun():
+        release.wait(2)
+
+    sched.add_job(job_runner.timed("pull_orders", _uzun), trigger="interval", seconds=60,
+                  id="pull_orders", executor=job_runner.queue_for("pull_orders"),
+                  next_run_time=datetime.now(sched.timezone))
+    sched.start()
+    try:
+        time.sleep(0.2)
+        job = sched.get_job("pull_orders")
+        job.modify(next_run_time=datetime.now(sched.timezone))  # ilki bitmeden ikinci tur
+        time.sleep(0.2)
+        m = job_runner.metrics.snapshot()["pull_orders"]
+        assert m["queue"] == "pull" and m["running"] == 1
+        assert m["skipped"] == 1 and m["overruns"] == 1
+    finally:
+        release.set()
+        sched.shutdown(wait=True)
+
+
+def test_durum_yayini_ve_bayat_heartbeat(monkeypatch):
+    job_runner.timed("stock_sync_auto", lambda: None, interval=180)()
+    job_runner.publish_status()
+
+    status = job_runner.read_status()
+    assert status["alive"] is True
+    assert status["jobs"]["stock_sync_auto"]["runs"] == 1
+    assert status["jobs"]["stock_sync_auto"]["queue"] == "sync"
+
+    later = datetime.utcnow() + timedelta(seconds=job_runner.STALE_SECONDS + 5)
+    assert job_runner.read_status(now=later)["alive"] is False
+
+
+def test_health_jobs_pid_ve_hata_metnini_yalniz_admine_gosterir():
+    def _job():
+        raise RuntimeError("db şifresi: gizli")
+    with pytest.raises(RuntimeError):
+        job_runner.timed("stock_sync_auto", _job, interval=180)()
+    job_runner.publish_status()
+
+    client = app.test_client()
+    resp = client.get("/health/jobs")
+    public = resp.get_json()
+    assert resp.status_code == 200 and public["alive"] is True
+    assert "pid" not in public and "host" not in public
+    assert "last_error" not in public["jobs"]["stock_sync_auto"]
+    assert public["jobs"]["stock_sync_auto"]["errors"] == 1
+
+    with client.session_transaction() as sess:
+        sess["role"], sess["totp_verified"] = "admin", True
+    full = client.get("/health/jobs").get_json()
+    assert "pid" in full and "gizli" in full["jobs"]["stock_sync_auto"]["last_error"]
+
+
+def test_interval_suresi():
+    assert job_runner.interval_seconds("interval", {"minutes": 3}) == 180
+    assert job_runner.interval_seconds("interval", {"hours": 1, "seconds": 10}) == 3610
+    assert job_runner.interval_seconds("cron", {"hour": 3}) is None
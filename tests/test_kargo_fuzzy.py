@@ -0,0 +1,257 @@
+"""kargo_fuzzy — bloklu n-gram bulanık eşleştirme + kargo mutabakatı arka plan çalışması.
+
+İzole tempfile-sqlite; GERÇEK DB'ye / Shopify'a dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_kargo_fuzzy.py -v
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_kargo_fuzzy_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+import pandas as pd  # noqa: E402
+from flask import Flask  # noqa: E402
+from openpyxl import load_workbook  # noqa: E402
+
+from models import (  # noqa: E402
+    db, User, OrderDelivered, Archive, ReturnOrder, Degisim, YeniSiparis,
+    Order, UretimSiparis, KargoMutabakatRun,
+)
+import kargo_fuzzy as kf  # noqa: E402
+import kargo_mutabakat as km  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.secret_key = "test"
+db.init_app(app)
+app.register_blueprint(km.kargo_mutabakat_bp)
+
+TABLES = (User, *km.ORDER_TABLES, Archive, ReturnOrder, Degisim, YeniSiparis, Order, UretimSiparis)
+
+with app.app_context():
+    for _m in TABLES:
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+    km.ensure_table_exists()
+
+BASE = datetime(2026, 9, 15)
+
+
+def _brute_force(name, date, candidates):
+    """Tam tarama referansı (eski _best_fuzzy_match, eşikten türeyen uzunluk sınırıyla)."""
+    for cand in candidates:
+        if cand[0] == name and (date is None or cand[1] is None or abs((date - cand[1]).days) <= kf.DATE_WINDOW_DAYS):
+            return (cand[0], 1.0, cand[2], cand[3])
+    best = None
+    for cand_name, cand_date, label, on in candidates:
+        if 2 * min(len(cand_name), len(name)) < kf.NAME_SIMILARITY_THRESHOLD * (len(cand_name) + len(name)):
+            continue
+        if date is not None and cand_date is not None and abs((date - cand_date).days) > kf.DATE_WINDOW_DAYS:
+            continue
+        ratio = SequenceMatcher(None, cand_name, name).ratio()
+        if ratio >= kf.NAME_SIMILARITY_THRESHOLD and (best is None or ratio > best[1]):
+            best = (cand_name, ratio, label, on)
+    return best
+
+
+def _synthetic(n_candidates=600, n_queries=300, seed=7):
+    rnd = random.Random(seed)
+    first = ["AYŞE", "FATMA", "MEHMET", "ALİ", "ZEYNEP", "ELİF", "MUSTAFA", "HATİCE", "EMRE", "BURAK"]
+    last = ["YILMAZ", "KAYA", "DEMİR", "ŞAHİN", "ÇELİK", "YILDIZ", "ÖZTÜRK", "AYDIN", "ARSLAN", "KOÇ"]
+    candidates = []
+    for i in range(n_candidates):
+        name = f"{rnd.choice(first)} {rnd.choice(last)} {rnd.choice(last)[:rnd.randint(0, 4)]}".strip()
+        date = None if i % 50 == 0 else BASE + timedelta(days=rnd.randint(-60, 30))
+        candidates.append((name, date, "Trendyol Siparişi (Teslim)", f"TY{i}"))
+    queries = []
+    for _ in range(n_queries):
+        name = rnd.choice(candidates)[0]
+        if rnd.random() < 0.6:                                   # yazım hatası
+            pos = rnd.randrange(len(name))
+            name = name[:pos] + rnd.choice("AEIKLMNRSTY") + name[pos + 1:]
+        date = None if rnd.random() < 0.05 else BASE + timedelta(days=rnd.randint(-40, 20))
+        queries.append((name, date))
+    return candidates, queries
+
+
+def test_bloklu_sonuc_tam_taramayla_ayni():
+    candidates, queries = _synthetic()
+    index = kf.CandidateIndex(candidates)
+    assert len(index) == len(candidates) and len(index.names) < len(candidates)   # adlar tekilleşti
+    for name, date in queries:
+        got, want = index.best_match(name, date), _brute_force(name, date, candidates)
+        assert (got and (got[0], round(got[1], 6), got[3])) == (want and (want[0], round(want[1], 6), want[3]))
+
+
+def test_uzun_adda_uzunluk_farki_esigin_izin_verdigi_kadar_tolere_edilir():
+    long_name = "ayse nur yildirim karadeniz ltd sti"
+    index = kf.CandidateIndex([(long_name, BASE, "A", "TY1")])
+    match = index.best_match("ayse nur yildirim karadeniz", BASE)
+    assert match and match[0] == long_name and match[1] >= kf.NAME_SIMILARITY_THRESHOLD
+    assert index.best_match("ayse nur", BASE) is None
+
+
+def test_tarih_penceresi_disi_kovalar_taranmaz():
+    candidates = [("AYŞE YILMAZ", BASE - timedelta(days=40), "A", "eski"),
+                  ("AYSE YILMAZ", BASE - timedelta(days=3), "B", "yakın"),
+                  ("AYŞE YILMAZ", None, "C", "tarihsiz")]
+    index = kf.CandidateIndex(candidates)
+    assert index.best_match("AYŞE YILMAZ", BASE) == ("AYŞE YILMAZ", 1.0, "C", "tarihsiz")
+    assert index.best_match("AYSE YILMAZ", BASE)[3] == "yakın"
+    assert not any(b is not None and b < kf._bucket((BASE - timedelta(days=kf.DATE_WINDOW_DAYS)).toordinal())
+                   for b in index._query_buckets(BASE.toordinal()))
+    assert index.best_match("MEHMET KAYA", BASE) is None
+
+
+def test_surec_havuzu_ayni_sonucu_ve_ilerlemeyi_verir():
+    candidates, queries = _synthetic(n_queries=kf.PARALLEL_MIN_ROWS + 40)
+    index = kf.CandidateIndex(candidates)
+    seen = []
+    parallel = kf.match_all(index, queries, workers=2, progress=lambda d, t: seen.append((d, t)))
+    assert parallel == kf.match_all(index, queries, workers=1)
+    assert seen[-1] == (len(queries), len(queries)) and len(seen) == -(-len(queries) // kf.CHUNK_ROWS)
+
+
+_APP_MAIN_POOL = """
+import sys
+sys.path.insert(0, {root!r})
+# `python app.py` ile aynı durum: spawn worker'ları app.py'yi __mp_main__ olarak çalıştırır
+sys.modules["__main__"].__file__ = {app!r}
+import kargo_fuzzy as kf
+candidates = [(f"MUSTERI {{i:04d}}", None, "A", str(i)) for i in range(200)]
+queries = [(f"MUSTERI {{i % 200:04d}}X", None) for i in range(kf.PARALLEL_MIN_ROWS)]
+index = kf.CandidateIndex(candidates)
+assert kf.match_all(index, queries, workers=2) == kf.match_all(index, queries, workers=1)
+print("HAVUZ-TAMAM")
+"""
+
+
+def test_app_ana_betikken_spawn_worker_app_yan_etkilerini_calistirmaz(tmp_path):
+    script = _APP_MAIN_POOL.format(root=str(PROJECT_ROOT), app=str(PROJECT_ROOT / "app.py"))
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'pool.db'}", DISABLE_JOBS="1")
+    proc = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                          capture_output=True, text=True, timeout=300)
+    output = proc.stdout + proc.stderr
+    assert proc.returncode == 0, output[-2000:]
+    assert "HAVUZ-TAMAM" in proc.stdout
+    assert "bağlantı ayarı yüklendi" in output          # worker'lar app.py'yi gerçekten yükledi
+    assert "Neon veritabanına" not in output and "Veritabanı bağlantı hatası" not in output
+    assert "Scheduler" not in output                     # job/push bloğu worker'da atlandı
+
+
+_APP_INIT_PROBE = """
+import json, runpy, sys
+sys.path.insert(0, {root!r})
+import kpi_rollup, log_partitions, order_audit, order_search, product_summary, user_logs
+calls = []
+for mod, name in ((order_audit, "ensure_table_exists"), (order_audit, "start_writer"),
+                  (user_logs, "start_writer"), (log_partitions, "ensure_partitions"),
+                  (order_search, "ensure_table_exists"), (product_summary, "ensure_table_exists"),
+                  (kpi_rollup, "ensure_table_exists")):
+    setattr(mod, name, lambda *a, _n=f"{{mod.__name__}}.{{name}}", **kw: calls.append(_n))
+runpy.run_path({app!r}, run_name=sys.argv[1])
+print("INIT=" + json.dumps(calls))
+"""
+
+
+@pytest.mark.parametrize("run_name, expect_init", [("__mp_main__", False), ("app_probe", True)])
+def test_spawn_worker_olarak_yuklenen_app_surec_initini_atlar(tmp_path, run_name, expect_init):
+    script = _APP_INIT_PROBE.format(root=str(PROJECT_ROOT), app=str(PROJECT_ROOT / "app.py"))
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'init.db'}", DISABLE_JOBS="1")
+    proc = subprocess.run([sys.executable, "-c", script, run_name], cwd=tmp_path, env=env,
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, (proc.stdout + proc.stderr)[-2000:]
+    line = next(ln for ln in proc.stdout.splitlines() if ln.startswith("INIT="))
+    calls = json.loads(line[len("INIT="):])
+    assert bool(calls) is expect_init, calls
+    if expect_init:
+        assert {"order_audit.start_writer", "user_logs.start_writer", "log_partitions.ensure_partitions"} <= set(calls)
+
+
+def _invoice(path, rows):
+    header = ["SIRA NO", "FATURA NO", "FATURA KESIM TARIHI", "GONDERI NO", "ALICI MUSTERI", "ALICI IL",
+              "MUSTERI REF NO", "KG DESI", "TASIMA UCRETI", "GENEL TOPLAM"]
+    frame = pd.DataFrame([["MNG Fatura Listesi"] + [""] * (len(header) - 1), header] + rows)
+    frame.to_excel(path, header=False, index=False)
+
+
+@pytest.fixture
+def _ctx(monkeypatch, tmp_path):
+    monkeypatch.setattr(km, "MUTABAKAT_UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(km, "TARIFE_FILE", str(tmp_path / "tarife.json"))
+    monkeypatch.setattr(km, "_shopify_live_sources", lambda start: ({}, []))
+    with app.app_context():
+        for m in (KargoMutabakatRun, OrderDelivered, Archive):
+            m.query.delete()
+        db.session.commit()
+        yield tmp_path
+        db.session.rollback()
+
+
+def test_arka_plan_calismasi_ilerleme_ve_indirilebilir_sonuc(_ctx):
+    db.session.add(OrderDelivered(order_number="S1", cargo_tracking_number="111", customer_name="Ali",
+                                  customer_surname="Veli", order_date=BASE))
+    db.session.add(OrderDelivered(order_number="S2", cargo_tracking_number="999", customer_name="Zeynep",
+                                  customer_surname="Kaya", order_date=BASE - timedelta(days=2)))
+    db.session.commit()
+    _invoice(_ctx / "fatura.xlsx", [
+        ["1", "F1", "15.09.2026", "111", "ALI VELI", "İST", "", "1", "117,98", "140,00"],
+        ["2", "F1", "15.09.2026", "222", "ZEYNEP KAYAA", "ANK", "", "2", "117,98", "140,00"],
+        ["3", "F1", "15.09.2026", "333", "BİLİNMEYEN KİŞİ", "İZM", "", "3", "117,98", "150,50"],
+    ])
+    run = KargoMutabakatRun(filename="fatura.xlsx", status="queued")
+    db.session.add(run)
+    db.session.commit()
+
+    km.run_analysis(run.id)
+    db.session.expire_all()
+    run = db.session.get(KargoMutabakatRun, run.id)
+    assert run.status == "completed" and run.progress_percent == 100.0
+    assert (run.total_rows, run.fuzzy_total, run.fuzzy_done) == (3, 2, 2)
+    assert (run.matched, run.suspicious, run.missing) == (1, 1, 1)
+
+    sonuc = km._load_result(km.latest_completed_run("fatura.xlsx"))
+    assert sonuc["supheli"][0]["siparis_no"] == "S2" and sonuc["itiraz_tutari"] == 150.5
+    wb = load_workbook(km._itiraz_workbook(sonuc))
+    assert [r[3] for r in wb["Bizde Yok"].iter_rows(min_row=2, values_only=True)] == ["333"]
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess.update(user_id=1, role="admin", totp_verified=True)
+        data = client.get(f"/kargo-mutabakat/durum/{run.id}").get_json()
+        assert data["run"]["status"] == "completed" and data["run"]["suspicious"] == 1
+        resp = client.get("/kargo-mutabakat/itiraz-excel/fatura.xlsx")
+        assert resp.status_code == 200 and resp.data[:2] == b"PK"
+
+
+def test_hatali_dosya_failed_ve_olu_calisma_isaretlenir(_ctx):
+    (_ctx / "bozuk.xlsx").write_bytes(b"xlsx degil")
+    run = KargoMutabakatRun(filename="bozuk.xlsx", status="queued")
+    db.session.add(run)
+    db.session.commit()
+    assert km.run_analysis(run.id).status == "failed" and run.error_message
+
+    stuck = KargoMutabakatRun(filename="x.xlsx", status="running",
+                              updated_at=datetime.utcnow() - km.STALE_RUN - timedelta(minutes=1))
+    db.session.add(stuck)
+    db.session.commit()
+    assert km._mark_stale(stuck).status == "failed"
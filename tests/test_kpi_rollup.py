@@ -0,0 +1,227 @@
+"""kpi_daily — günlük KPI özeti: gün hesabı, okuma yolu, artımlı / tam yenileme.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_kpi_rollup.py -v
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_kpi_rollup_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import (  # noqa: E402
+    db, KpiDaily, OrderCancelled, ReturnOrder, Product, ModelMaliyet, ModelDirekMaliyet,
+    PlatformConfig,
+)
+import kpi_rollup as kr  # noqa: E402
+from time_utils import ist_to_utc  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+TABLES = (*kr.PRIORITY_TABLES, OrderCancelled, ReturnOrder, Product, ModelMaliyet, ModelDirekMaliyet,
+          PlatformConfig)
+
+with app.app_context():
+    for _m in TABLES:
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+    kr.ensure_table_exists()
+
+TODAY = kr.today_ist()
+D1 = TODAY - timedelta(days=3)
+D2 = TODAY - timedelta(days=2)
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in (*TABLES, KpiDaily):
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _at(day, hour, minute=0):
+    """İstanbul duvar saati → naive UTC (DB konvansiyonu)."""
+    return ist_to_utc(datetime.combine(day, time(hour, minute)))
+
+
+def _order(model, number, day, hour=12, minute=0, *, amount=100.0, discount=0.0, commission=10.0,
+           items=(("BC1", 1),)):
+    db.session.add(model(
+        order_number=number, order_date=_at(day, hour, minute), amount=amount, discount=discount,
+        commission=commission, product_barcode=",".join(bc for bc, _ in items),
+        details=json.dumps([{"barcode": bc, "quantity": q} for bc, q in items]),
+    ))
+
+
+def _seed_costs():
+    db.session.add(Product(barcode="BC1", product_main_id="M1"))
+    db.session.add(Product(barcode="BC2", product_main_id="M2"))
+    db.session.add(ModelDirekMaliyet(model_id="M1", deger=5.0))
+    db.session.add(ModelMaliyet(model_id="M2", kalem_id=1, deger=2.0))
+    db.session.add(ModelMaliyet(model_id="M2", kalem_id=2, deger=1.5))
+
+
+def test_gun_hesabi_tekil_siparis_ist_siniri_maliyet_iade_iptal():
+    from models import OrderCreated, OrderShipped, OrderDelivered
+    _seed_costs()
+    _order(OrderDelivered, "A", D1, amount=300, discount=50, items=(("BC1", 2), ("BC2", 1)))
+    _order(OrderShipped, "A", D1, amount=999)                 # düşük öncelikli kopya → sayılmaz
+    _order(OrderCreated, "B", D1, 0, 30, amount=80)           # İstanbul 00:30 → D1 (UTC'de önceki gün)
+    _order(OrderCreated, "C", D2, 0, 0, amount=60)
+    _order(OrderCancelled, "X", D1)
+    db.session.add(ReturnOrder(order_number="A", return_date=_at(D1, 15)))
+    db.session.add(ReturnOrder(order_number="A", return_date=_at(D1, 16)))   # aynı sipariş bir kez
+    db.session.commit()
+
+    res = kr.compute_days([D1, D2])
+    k = res[D1]
+    assert k["orders"] == 2 and k["units"] == 4
+    assert k["gross"] == 380.0 and k["discount"] == 50.0 and k["net"] == 330.0
+    assert k["commission"] == 20.0
+    assert k["cost_usd"] == 5.0 + 3.5 + 5.0                   # sipariş başına model bir kez
+    assert k["cancelled"] == 1 and k["returns"] == 1
+    assert res[D2]["orders"] == 1 and res[D2]["net"] == 60.0
+
+
+def test_okuma_eksik_gunleri_yazar_bugunu_canli_hesaplar():
+    from models import OrderCreated
+    _order(OrderCreated, "A", D1, amount=100)
+    _order(OrderCreated, "T1", TODAY, 0, 5, amount=40)
+    db.session.commit()
+
+    rows = kr.day_rows(D1, TODAY)
+    assert rows[D1]["orders"] == 1 and rows[TODAY]["orders"] == 1
+    assert KpiDaily.query.count() == 3                         # D1..dün, boş günler dahil; bugün yazılmaz
+
+    # Geçmiş gün kayıtlı satırdan okunur (kaynağa eklenen sipariş yansımaz) …
+    _order(OrderCreated, "A2", D1, amount=100)
+    # … bugün ise her okumada canlı hesaplanır
+    _order(OrderCreated, "T2", TODAY, 0, 10, amount=60)
+    db.session.commit()
+    totals = kr.range_totals(D1, TODAY)
+    assert totals["orders"] == 3 and totals["net"] == 200.0 and totals["avg_unit_net"] == round(200 / 3, 2)
+
+    month, today = kr.month_and_day_totals(TODAY)
+    assert today["orders"] == 2 and today["net"] == 100.0
+    assert month["orders"] >= today["orders"]
+
+
+def test_okuma_isteğin_session_ını_commit_etmez():
+    from models import OrderCreated
+    _order(OrderCreated, "A", D1)
+    db.session.commit()
+    _order(OrderCreated, "BEKLEYEN", D2)          # isteğin commit'lenmemiş durumu
+
+    # no_autoflush: sqlite'ta flush edilmiş satır dosya kilidini tutar ve ayrı
+    # bağlantının yazmasını bekletir (PostgreSQL'de böyle bir çakışma yok)
+    with db.session.no_autoflush:
+        rows = kr.day_rows(D1, TODAY)
+    assert rows[D1]["orders"] == 1
+    assert {d for (d,) in db.session.query(KpiDaily.day)} == {D1, D2, TODAY - timedelta(days=1)}
+    db.session.rollback()
+    assert OrderCreated.query.filter_by(order_number="BEKLEYEN").count() == 0
+
+
+def test_artimli_yenileme_dokunulan_gunu_yeniden_yazar(monkeypatch):
+    from models import OrderCreated, OrderPicking
+    monkeypatch.setattr(kr, "TOUCH_OVERLAP", timedelta(0))   # test satırları aynı saniyede yazılıyor
+    _order(OrderCreated, "A", D1, amount=100)
+    _order(OrderCreated, "B", D2, amount=50)
+    db.session.commit()
+
+    assert kr.refresh_touched()["days"] == kr.rebuild_window_days()   # ilk çalışma: tam kurulum
+    assert db.session.get(KpiDaily, ("trendyol", D1)).orders == 1
+
+    # Created → Picking geçişi + aynı güne yeni sipariş; D2'ye dokunulmaz
+    OrderCreated.query.filter_by(order_number="A").delete()
+    _order(OrderPicking, "A", D1, amount=100)
+    _order(OrderCreated, "A3", D1, amount=20)
+    db.session.commit()
+    before_d2 = db.session.get(KpiDaily, ("trendyol", D2)).computed_at
+
+    assert kr.refresh_touched()["days"] == 1
+    db.session.expire_all()
+    assert db.session.get(KpiDaily, ("trendyol", D1)).orders == 2
+    assert db.session.get(KpiDaily, ("trendyol", D1)).net == 120.0
+    assert db.session.get(KpiDaily, ("trendyol", D2)).computed_at == before_d2
+
+
+def test_gec_gelen_iade_eski_gununu_yeniler(monkeypatch):
+    from models import OrderCreated
+    monkeypatch.setattr(kr, "TOUCH_OVERLAP", timedelta(0))
+    _order(OrderCreated, "A", D1)
+    db.session.commit()
+    kr.refresh_touched()
+    assert db.session.get(KpiDaily, ("trendyol", D1)).returns == 0
+
+    # İade tarihi filigrandan eski ama kayıt şimdi eklendi (geç çekilen talep)
+    db.session.add(ReturnOrder(order_number="A", return_date=_at(D1, 15)))
+    db.session.commit()
+    assert kr.refresh_touched()["days"] == 1
+    db.session.expire_all()
+    assert db.session.get(KpiDaily, ("trendyol", D1)).returns == 1
+
+
+def test_artimli_tarama_kolonlari_indeksli():
+    from sqlalchemy import inspect as sa_inspect
+    insp = sa_inspect(db.engine)
+    for model in (*kr.TOUCH_TABLES, ReturnOrder):
+        cols = [ix["column_names"] for ix in insp.get_indexes(model.__tablename__)]
+        assert ["updated_at"] in cols, model.__tablename__
+
+
+def test_okuma_yolu_artimli_filigrani_ilerletmez(monkeypatch):
+    from models import OrderCreated
+    monkeypatch.setattr(kr, "TOUCH_OVERLAP", timedelta(0))
+    _order(OrderCreated, "A", D1, amount=100)
+    db.session.commit()
+    kr.refresh_touched()
+
+    _order(OrderCreated, "A2", D1, amount=30)
+    db.session.commit()
+    kr.day_rows(TODAY, TODAY)          # sayfa açılışı: bugünün computed_at'i ilerler
+
+    assert kr.refresh_touched()["days"] == 1
+    db.session.expire_all()
+    assert db.session.get(KpiDaily, ("trendyol", D1)).orders == 2
+
+
+def test_gece_yeniden_kurma_silinen_siparisi_dusurur(monkeypatch):
+    from models import OrderCreated
+    monkeypatch.setattr(kr, "TOUCH_OVERLAP", timedelta(0))
+    _order(OrderCreated, "A", D1)
+    _order(OrderCreated, "B", D1)
+    db.session.commit()
+    kr.rebuild_days(days=5)
+    assert db.session.get(KpiDaily, ("trendyol", D1)).orders == 2
+
+    OrderCreated.query.filter_by(order_number="B").delete()   # arşiv/ham SQL: updated_at izi yok
+    db.session.commit()
+    assert kr.refresh_touched()["days"] == 0
+    kr.rebuild_days(days=5)
+    db.session.expire_all()
+    assert db.session.get(KpiDaily, ("trendyol", D1)).orders == 1
+    assert KpiDaily.query.count() == 5
@@ -0,0 +1,163 @@
+"""Audit / kullanıcı logu saklama-arşiv (log_partitions) + toplu audit yazıcı.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz. sqlite'ta bölümleme yok →
+satır bazlı arşiv yolu test edilir (PostgreSQL bölüm yolu migration'la gelir).
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_log_retention.py -v
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_log_retention_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import db, CentralStock, OrderAuditLog, RafUrun, UserLog, User  # noqa: E402
+import log_partitions as lp  # noqa: E402
+import order_audit  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in (User, UserLog, OrderAuditLog, CentralStock, RafUrun):
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def _ctx(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOG_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setenv("AUDIT_LOG_RETENTION_MONTHS", "3")
+    monkeypatch.setenv("USER_LOG_RETENTION_MONTHS", "1")
+    order_audit.stop_writer()  # app import'unun başlattığı yazıcı başka engine'e bağlı
+    with app.app_context():
+        for m in (UserLog, OrderAuditLog, CentralStock, RafUrun):
+            m.query.delete()
+        db.session.commit()
+        yield
+        order_audit.stop_writer()
+        db.session.rollback()
+
+
+def _audit(ts, number):
+    db.session.add(OrderAuditLog(ts=ts, event_type="status_changed", order_number=number,
+                                 details={"not": "ğüş"}))
+
+
+def _rows(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_saklama_sinirindan_eski_satirlar_arsivlenip_silinir(tmp_path):
+    _audit(datetime(2026, 5, 3), "A1")
+    _audit(datetime(2026, 6, 20), "A2")
+    _audit(datetime(2026, 6, 30, 23, 59), "A3")
+    _audit(datetime(2026, 7, 1), "A4")          # sınır (2026-07-01) → kalır
+    db.session.add(UserLog(action="PAGE_VIEW", timestamp=datetime(2026, 8, 31)))
+    db.session.add(UserLog(action="PAGE_VIEW", timestamp=datetime(2026, 9, 2)))
+    db.session.commit()
+
+    res = lp.archive_expired(now=NOW)
+
+    assert res["order_audit_logs"]["rows"] == 3
+    assert res["order_audit_logs"]["cutoff"] == "2026-07-01T00:00:00"
+    assert res["user_logs"]["rows"] == 1
+    assert [r.order_number for r in OrderAuditLog.query.all()] == ["A4"]
+    assert UserLog.query.count() == 1
+
+    files = sorted(os.listdir(tmp_path / "order_audit_logs"))
+    assert files == ["order_audit_logs_y2026m05_rows.csv.gz", "order_audit_logs_y2026m06_rows.csv.gz"]
+    june = _rows(tmp_path / "order_audit_logs" / files[1])
+    assert [r["order_number"] for r in june] == ["A2", "A3"]
+    assert '"not": "ğüş"' in june[0]["details"]
+
+    # Tekrar çalıştırma no-op
+    assert lp.archive_expired(now=NOW)["order_audit_logs"]["rows"] == 0
+
+
+def test_sqlite_bolum_acma_noop_ve_retention_floor():
+    assert lp.ensure_partitions(now=NOW) == []
+    assert lp.retention_floor("order_audit_logs", NOW) == datetime(2026, 7, 1)
+    assert lp.add_months(datetime(2026, 11, 1), 2) == datetime(2027, 1, 1)
+    assert lp.partition_name("user_logs", datetime(2027, 1, 1)) == "user_logs_y2027m01"
+
+
+def test_toplu_yazici_istek_disinda_parti_halinde_yazar():
+    writer = order_audit.start_writer(db.engine, flush_interval=3600, max_batch=10_000)
+    assert order_audit.log_event("manual_note", order_number=123, message="not") is None
+    assert order_audit.log_many([{"event_type": "raf_changed", "barcode": "BC1", "snapshot": False}]) == 1
+    assert OrderAuditLog.query.count() == 0          # henüz kuyrukta
+    assert writer.depth() == 2
+
+    assert writer.flush() == 2
+    rows = OrderAuditLog.query.order_by(OrderAuditLog.id).all()
+    assert [(r.event_type, r.order_number) for r in rows] == [("manual_note", "123"), ("raf_changed", None)]
+    assert all(r.ts is not None and r.severity == "info" for r in rows)
+
+
+def test_kuyruktaki_snapshot_olay_anindaki_stoku_yazar():
+    db.session.add(CentralStock(barcode="BC2", qty=5))
+    db.session.commit()
+    writer = order_audit.start_writer(db.engine, flush_interval=3600, max_batch=10_000)
+    order_audit.log_event("manual_note", barcode="BC2", snapshot=True)
+    order_audit.log_many([{"event_type": "raf_changed", "barcode": "BC2", "snapshot": True}])
+
+    db.session.get(CentralStock, "BC2").qty = 1     # flush'tan önceki sonraki hareket
+    db.session.commit()
+    writer.flush()
+
+    rows = (OrderAuditLog.query.filter(OrderAuditLog.event_type.in_(["manual_note", "raf_changed"]))
+            .order_by(OrderAuditLog.id).all())
+    assert [(r.central_qty_after, r.raf_total_after) for r in rows] == [(5, 0), (5, 0)]
+
+
+def test_bozuk_kayit_yalniz_kendisini_dusurur_parti_kayit_kayit_yazilir():
+    writer = order_audit.start_writer(db.engine, flush_interval=3600, max_batch=10_000)
+    order_audit.log_many([
+        {"event_type": "manual_note", "order_number": "P1", "snapshot": False},
+        {"event_type": None, "order_number": "BOZUK", "snapshot": False},   # NOT NULL ihlali
+        {"event_type": "manual_note", "order_number": "P2", "snapshot": False},
+    ])
+    writer.flush()
+    rows = OrderAuditLog.query.filter(OrderAuditLog.order_number.in_(["P1", "P2", "BOZUK"])).all()
+    assert sorted(r.order_number for r in rows) == ["P1", "P2"]
+    assert (writer.written, writer.failed, writer.retried_batches) == (2, 1, 1)
+
+
+def test_kuyruk_dolunca_en_eski_atilir():
+    from batch_writer import BatchWriter
+    seen = []
+    w = BatchWriter("TEST", seen.extend, max_batch=100, flush_interval=3600, max_queue=3)
+    for i in range(5):
+        w.submit(i)
+    assert w.dropped == 2
+    w.flush()
+    assert seen == [2, 3, 4] and w.written == 3
+
+
+def test_yazici_yoksa_senkron_yazim_id_doner():
+    order_audit.stop_writer()
+    assert isinstance(order_audit.log_event("manual_note", order_number="S1"), int)
+    assert OrderAuditLog.query.filter_by(order_number="S1").count() == 1
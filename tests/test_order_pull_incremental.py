@@ -0,0 +1,129 @@
+"""Artımlı sipariş çekme: filigran eşiği ve sayfalama durdurma kararı."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from order_service import _filter_since  # noqa: E402
+
+ESIK = 1_784_553_000_000
+
+
+def _pkg(no, modified):
+    return {'orderNumber': no, 'lastModifiedDate': modified}
+
+
+def test_esikten_eski_paketler_ayiklanir_sayfa_devam_eder():
+    content = [_pkg('1', ESIK + 5), _pkg('2', ESIK), _pkg('3', ESIK - 1)]
+    kept, page_is_old = _filter_since(content, ESIK)
+    assert [o['orderNumber'] for o in kept] == ['1', '2']
+    assert page_is_old is False
+
+
+def test_tumu_eski_sayfa_sayfalamayi_durdurur():
+    kept, page_is_old = _filter_since([_pkg('1', ESIK - 10), _pkg('2', ESIK - 20)], ESIK)
+    assert kept == []
+    assert page_is_old is True
+
+
+def test_tarihsiz_paket_islenir_ve_sayfayi_eski_saydirmaz():
+    kept, page_is_old = _filter_since([{'orderNumber': '9'}], ESIK)
+    assert [o['orderNumber'] for o in kept] == ['9']
+    assert page_is_old is False
+
+
+class _Resp:
+    def __init__(self, status, body):
+        self.status, self._body = status, body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self):
+        return self._body
+
+    async def text(self):
+        return str(self._body)
+
+
+class _Session:
+    """page → (status, content); sayfa 0 totalPages taşır."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        status, content = self.pages[params["page"]]
+        return _Resp(status, {"content": content, "totalPages": len(self.pages), "totalElements": 0})
+
+
+def test_sayfa_hatasi_bos_sayfadan_ayrilir():
+    import asyncio
+    import order_service as os_mod
+
+    async def _run(status):
+        return await os_mod.fetch_orders_page(_Session({0: (status, [])}), "u", {}, {"page": 0},
+                                              asyncio.Semaphore(1))
+
+    assert asyncio.run(_run(200)) == []
+    assert asyncio.run(_run(500)) is None
+
+
+def test_okunamayan_sayfa_filigrani_ilerletmez(monkeypatch):
+    import asyncio
+    import types
+    from flask import Flask
+    import order_service as os_mod
+
+    saved, processed = [], []
+    pages = {0: (200, [_pkg('1', ESIK + 500), _pkg('2', ESIK + 400)]), 1: (500, []), 2: (200, [])}
+    monkeypatch.setattr(os_mod.aiohttp, "ClientSession", lambda: _Session(pages))
+    monkeypatch.setattr(os_mod, "_load_order_pull_watermark", lambda: ESIK)
+    monkeypatch.setattr(os_mod, "_save_order_pull_watermark", saved.append)
+    monkeypatch.setattr(os_mod, "process_all_orders", processed.extend)
+
+    async def _promote():
+        return None
+
+    monkeypatch.setitem(sys.modules, "promotion_service", types.SimpleNamespace(promote_eligible_orders=_promote))
+    with Flask(__name__).app_context():
+        asyncio.run(os_mod.fetch_trendyol_orders_async())
+        assert [o['orderNumber'] for o in processed] == ['1', '2']   # okunanlar yine işlenir
+        assert saved == []
+
+        pages[1] = (200, [_pkg('3', ESIK + 300)])
+        processed.clear()
+        asyncio.run(os_mod.fetch_trendyol_orders_async())
+        assert saved == [ESIK + 500]
+
+
+def test_mutabakat_suresince_artimli_cekme_atlanir(monkeypatch):
+    import app as app_mod
+    import order_service as os_mod
+    from models import db, PlatformConfig
+
+    with app_mod.app.app_context():
+        PlatformConfig.__table__.create(bind=db.engine, checkfirst=True)
+
+    calls = []
+
+    async def _fetch(full=False):
+        calls.append(full)
+
+    monkeypatch.setattr(os_mod, "fetch_trendyol_orders_async", _fetch)
+    with os_mod.order_pull_lock:                 # reconcile_orders_job çalışıyor
+        app_mod.pull_orders_job()
+    assert calls == []
+    app_mod.pull_orders_job()
+    assert calls == [False] and not os_mod.order_pull_lock.locked()
@@ -0,0 +1,203 @@
+"""order_search_index — sipariş listesi arama indeksi ve keyset sayfalama.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_order_search.py -v
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_order_search_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import db, OrderCreated, OrderPicking, OrderShipped, OrderSearchIndex  # noqa: E402
+import order_search as osi  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in osi.STATUS_BY_MODEL:
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+    osi.install_listeners()
+    osi.ensure_table_exists()
+
+BASE = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in (*osi.STATUS_BY_MODEL, OrderSearchIndex):
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _order(model, number, *, minutes=0, barcode="BC1", name="Ayşe", deadline=None):
+    o = model(order_number=number, order_date=BASE + timedelta(minutes=minutes),
+              product_barcode=barcode, merchant_sku=f"SKU-{barcode}",
+              customer_name=name, customer_surname="Yılmaz",
+              agreed_delivery_date=deadline,
+              details=json.dumps([{"barcode": barcode, "quantity": 1}]))
+    db.session.add(o)
+    return o
+
+
+def _row(number):
+    return db.session.get(OrderSearchIndex, number)
+
+
+def test_orm_gecisi_commit_aninda_indekse_yansir():
+    o = _order(OrderCreated, "1001", barcode="8680001")
+    db.session.commit()
+    assert _row("1001").status == "Created"
+    assert "8680001" in _row("1001").search_text
+
+    # Created → Picking (ORM delete + insert)
+    db.session.delete(o)
+    _order(OrderPicking, "1001", minutes=5, barcode="8680001")
+    db.session.commit()
+    db.session.expire_all()
+    assert _row("1001").status == "Picking"
+
+    db.session.delete(OrderPicking.query.filter_by(order_number="1001").one())
+    db.session.commit()
+    db.session.expire_all()
+    assert _row("1001") is None
+
+
+def test_toplu_yol_ve_rollback():
+    mappings = [{"order_number": "2001", "order_date": BASE, "product_barcode": "X1",
+                 "customer_name": "Mehmet", "details": "[]"}]
+    db.session.bulk_insert_mappings(OrderShipped, mappings)
+    osi.queue_bulk_insert(OrderShipped, mappings)
+    db.session.commit()
+    assert _row("2001").status == "Shipped"
+
+    ids = [r.id for r in OrderShipped.query.filter_by(order_number="2001")]
+    osi.queue_bulk_delete(OrderShipped, ids)
+    OrderShipped.query.filter(OrderShipped.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    assert _row("2001") is None
+
+    _order(OrderCreated, "2002")
+    db.session.rollback()
+    _order(OrderCreated, "2003")
+    db.session.commit()
+    assert _row("2002") is None and _row("2003") is not None
+
+
+def test_barkod_ve_musteri_aramasi():
+    _order(OrderCreated, "3001", barcode="8681111", name="Zeynep")
+    _order(OrderShipped, "3002", barcode="8682222", name="Ali")
+    db.session.commit()
+
+    assert osi.page_orders("date_desc", 50, search="8682222")["order_numbers"] == ["3002"]
+    assert osi.page_orders("date_desc", 50, search="ZEYNEP yıl")["order_numbers"] == ["3001"]
+    assert osi.estimate_total(search="yılmaz") == (2, False)
+
+
+def test_keyset_ileri_geri_sayfalama():
+    for i in range(7):
+        _order(OrderCreated, f"40{i:02d}", minutes=i)
+    db.session.commit()
+
+    p1 = osi.page_orders("date_desc", 3)
+    assert p1["order_numbers"] == ["4006", "4005", "4004"] and p1["page"] == 1
+    assert p1["prev_cursor"] is None
+
+    p2 = osi.page_orders("date_desc", 3, after=p1["next_cursor"])
+    assert p2["order_numbers"] == ["4003", "4002", "4001"] and p2["page"] == 2
+
+    p3 = osi.page_orders("date_desc", 3, after=p2["next_cursor"])
+    assert p3["order_numbers"] == ["4000"] and p3["next_cursor"] is None
+
+    back = osi.page_orders("date_desc", 3, before=p3["prev_cursor"])
+    assert back["order_numbers"] == p2["order_numbers"] and back["page"] == 2
+    back1 = osi.page_orders("date_desc", 3, before=back["prev_cursor"])
+    assert back1["order_numbers"] == p1["order_numbers"] and back1["prev_cursor"] is None
+
+
+def test_teslim_suresi_siralamasi_ve_geciken_haric_tutma():
+    _order(OrderCreated, "5001", deadline=BASE + timedelta(days=3))
+    _order(OrderPicking, "5002", deadline=BASE + timedelta(days=1))
+    _order(OrderShipped, "5003", deadline=BASE - timedelta(days=1))
+    _order(OrderCreated, "5004")  # teslim tarihi yok → en sona
+    db.session.commit()
+
+    assert osi.page_orders("deadline_asc", 10)["order_numbers"] == ["5003", "5002", "5001", "5004"]
+
+    active = ("Created", "Hazirlaniyor", "Picking")
+    # Geciken = aktif statüde olan; kargodaki 5003 listede kalır
+    visible = osi.page_orders("deadline_asc", 10, exclude_numbers={"5002", "5003"}, active_statuses=active)
+    assert visible["order_numbers"] == ["5003", "5001", "5004"]
+    only = osi.page_orders("deadline_asc", 10, only_numbers={"5002", "5003"}, active_statuses=active)
+    assert only["order_numbers"] == ["5002"]
+
+
+def test_yenileme_upsert_eder_yalniz_kaybolan_siparisi_siler():
+    from sqlalchemy import event
+
+    _order(OrderCreated, "6001", barcode="8683333")
+    _order(OrderCreated, "6002")
+    db.session.commit()
+    OrderCreated.query.filter_by(order_number="6002").delete()
+    db.session.commit()                       # toplu silme: indeks satırı bayat kaldı
+
+    statements = []
+
+    def _record(conn, cursor, statement, params, context, executemany):
+        statements.append(statement.upper())
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    try:
+        assert osi.refresh_orders({"6001", "6002"}) == 1
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _record)
+    db.session.commit()
+    assert any("ON CONFLICT" in s for s in statements)
+    deletes = [s for s in statements if s.startswith("DELETE")]
+    assert len(deletes) == 1                  # yalnız kaynağı kalmayan 6002 için
+    assert _row("6001").status == "Created" and _row("6002") is None
+
+
+def test_bos_tablo_doldurulamasa_da_bakim_acik_kalir(monkeypatch):
+    def _fail(commit=True):
+        raise RuntimeError("başka worker kilitte")
+
+    osi._ready_urls.clear()
+    monkeypatch.setattr(osi, "rebuild_order_search_index", _fail)
+    osi.ensure_table_exists()
+    assert osi.is_ready()
+
+
+def test_tam_yeniden_kurma_parca_parca_yazar(monkeypatch):
+    monkeypatch.setattr(osi, "REBUILD_CHUNK_SIZE", 2)
+    for i in range(5):
+        _order(OrderCreated if i % 2 else OrderShipped, f"70{i:02d}", minutes=i)
+    db.session.commit()
+    OrderSearchIndex.query.delete()
+    db.session.commit()
+    assert osi.rebuild_order_search_index() == {"orders": 5}
+    assert _row("7003").status == "Created" and _row("7004").status == "Shipped"
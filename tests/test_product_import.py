@@ -0,0 +1,160 @@
+"""product_import — akışlı katalog içe aktarma: parça yazımı, hash farkı, devam, silme.
+
+İzole tempfile-sqlite + sahte sayfa çekici; GERÇEK DB'ye / Trendyol'a dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_product_import.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_product_import_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import (  # noqa: E402
+    db, Product, ProductArchive, ProductImportRun, ProductImportHash, OrderItem,
+)
+import product_import as pi  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+TABLES = (Product, ProductArchive, ProductImportRun, ProductImportHash)
+
+with app.app_context():
+    for _m in (*TABLES, OrderItem):                                  # OrderItem: Product silme ilişkisi
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+
+@pytest.fixture(autouse=True)
+def _ctx(monkeypatch):
+    monkeypatch.setattr(pi, "CHUNK_ROWS", 4)
+    monkeypatch.setattr(pi, "PAGE_RETRIES", 1)
+    with app.app_context():
+        for m in TABLES:
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _variant(barcode, model="M1", price=100.0):
+    return {"barcode": barcode, "productMainId": model, "title": f"{model} Ayakkabı",
+            "salePrice": price, "listPrice": price, "approved": True, "archived": False,
+            "attributes": [{"attributeName": "Beden", "attributeValue": "38"}]}
+
+
+class Catalogue:
+    """V2 sayfa çekici yerine: pages[i] → düz varyant listesi; fail_at sayfasında hata."""
+
+    def __init__(self, pages, fail_at=None):
+        self.pages, self.fail_at, self.calls = pages, fail_at, []
+
+    async def __call__(self, page):
+        self.calls.append(page)
+        if page == self.fail_at:
+            raise ConnectionError("trendyol 503")
+        items = self.pages[page] if page < len(self.pages) else []
+        return {"totalPages": len(self.pages), "totalElements": sum(map(len, self.pages)),
+                "content": [{"_flat": items}]}
+
+
+@pytest.fixture(autouse=True)
+def _flat(monkeypatch):
+    # Sahte content zaten düz varyant listesi taşır
+    monkeypatch.setattr(pi, "flatten_v2_page", lambda data: data["content"][0]["_flat"])
+
+
+def _run(fetcher, **kw):
+    return asyncio.run(pi.run_import(fetcher, **kw))
+
+
+def test_parca_parca_yazar_ve_ilerleme_raporlar():
+    pages = [[_variant(f"B{p}{i}", model=f"M{p}") for i in range(3)] for p in range(3)]
+    res = _run(Catalogue(pages))
+    assert res["status"] == "completed"
+    assert res["total_pages"] == 3 and res["last_page"] == 2 and res["progress_percent"] == 100.0
+    assert res["fetched"] == 9 and res["changed"] == 9 and res["unchanged"] == 0
+    assert Product.query.count() == 9
+    assert ProductImportHash.query.count() == 9
+
+
+def test_degismeyen_satir_atlanir_degisen_yazilir():
+    pages = [[_variant("A1"), _variant("A2")], [_variant("A3")]]
+    _run(Catalogue(pages))
+
+    pages[0][1] = _variant("A2", price=150)
+    res = _run(Catalogue(pages))
+    assert res["changed"] == 1 and res["unchanged"] == 2
+    db.session.expire_all()
+    assert db.session.get(Product, "A2").sale_price == 150
+
+
+def test_gecersiz_arsivli_ve_tekrar_eden_satirlar_atlanir():
+    db.session.add(ProductArchive(barcode="ARS"))
+    db.session.commit()
+    archived_variant = {**_variant("X9"), "archived": True}
+    pages = [[_variant("A1"), _variant("A1"), {"barcode": ""}, _variant("ARS"), archived_variant]]
+    res = _run(Catalogue(pages))
+    assert res["fetched"] == 4                                   # arşivli varyant akıştan elenir
+    assert res["changed"] == 1 and res["skipped"] == 3
+    assert [p.barcode for p in Product.query.all()] == ["A1"]
+
+
+def test_hata_sonrasi_son_commit_edilen_sayfadan_devam_eder():
+    pages = [[_variant(f"P{p}{i}") for i in range(4)] for p in range(4)]   # sayfa başına bir parça
+    first = _run(Catalogue(pages, fail_at=2))
+    assert first["status"] == "failed" and first["last_page"] == 1
+    assert "503" in first["error_message"]
+    assert Product.query.count() == 8
+
+    retry = Catalogue(pages)
+    second = _run(retry)
+    assert second["id"] == first["id"] and second["attempts"] == 2
+    assert second["status"] == "completed" and retry.calls[0] == 2
+    assert Product.query.count() == 16
+
+
+def test_aktif_listede_olmayan_silinir_devam_eden_calismada_silinmez():
+    _run(Catalogue([[_variant("A1"), _variant("A2"), _variant("A3")]]))
+
+    res = _run(Catalogue([[_variant("A1"), _variant("A3")]]), delete_missing=True)
+    assert res["deleted"] == 1
+    assert {p.barcode for p in Product.query.all()} == {"A1", "A3"}
+
+    pages = [[_variant("A1")], [_variant("A3")]]
+    _run(Catalogue(pages, fail_at=1), delete_missing=True)
+    res = _run(Catalogue(pages), delete_missing=True)
+    assert res["status"] == "completed" and res["deleted"] == 0
+
+
+def test_silinen_urun_ayni_icerikle_donunce_yeniden_yazilir():
+    _run(Catalogue([[_variant("A1"), _variant("A2")]]))
+
+    # Aktif listeden düşen ürünün hash'i de gider
+    _run(Catalogue([[_variant("A1")]]), delete_missing=True)
+    assert {h.barcode for h in ProductImportHash.query.all()} == {"A1"}
+
+    # Panelden/ham SQL ile silinen ürün: hash kalsa da satır yoksa yeniden yazılır
+    Product.query.filter_by(barcode="A1").delete()
+    db.session.commit()
+    res = _run(Catalogue([[_variant("A1"), _variant("A2")]]))
+    assert res["changed"] == 2 and res["unchanged"] == 0
+    assert {p.barcode for p in Product.query.all()} == {"A1", "A2"}
@@ -0,0 +1,207 @@
+"""product_model_summary — ürün listesi model özeti ve beden detay uç noktası.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_product_summary.py -v
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_product_summary_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import (  # noqa: E402
+    db, Product, CentralStock, ShopifyMapping, RafUrun, OrderItem, ProductModelSummary, PlatformConfig,
+)
+import product_summary as ps  # noqa: E402
+from get_products import get_products_bp  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.secret_key = "test"
+db.init_app(app)
+app.register_blueprint(get_products_bp)
+
+SOURCES = (Product, CentralStock, ShopifyMapping, RafUrun)
+
+with app.app_context():
+    for _m in (*SOURCES, OrderItem, PlatformConfig):                # OrderItem: Product silme ilişkisi
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+    ps.install_listeners()
+    ps.ensure_table_exists()
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in (*SOURCES, ProductModelSummary, PlatformConfig):
+            m.query.delete()
+        db.session.commit()
+        PlatformConfig.query.delete()                                 # temizlik DML'inin bayat işareti
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _variant(barcode, model="M1", color="Siyah", size="38", price=100.0, **kw):
+    p = Product(barcode=barcode, product_main_id=model, color=color, size=size,
+                sale_price=price, title=f"{model} Ayakkabı", images=f"/static/images/{barcode}.jpg",
+                platforms=kw.pop("platforms", '["trendyol"]'), **kw)
+    db.session.add(p)
+    return p
+
+
+def _summary(model):
+    db.session.expire_all()
+    return db.session.get(ProductModelSummary, model)
+
+
+def test_ozet_renk_beden_stok_fiyat_ve_platform():
+    _variant("B1", size="37", price=90)
+    _variant("B2", size="39", price=110)
+    _variant("B3", color="Beyaz", size="38", price=100, amazon_asin="ASIN1")
+    db.session.add(CentralStock(barcode="B1", qty=2))
+    db.session.add(CentralStock(barcode="B3", qty=5))
+    db.session.commit()
+
+    s = _summary("M1")
+    assert s.variant_count == 3 and s.total_stock == 7
+    assert (s.min_price, s.max_price) == (90.0, 110.0)
+    assert json.loads(s.sizes) == ["39", "38", "37"]
+    colors = {c["color"]: c for c in json.loads(s.colors)}
+    assert colors["Siyah"]["stock"] == 2 and colors["Siyah"]["variants"] == 2
+    assert colors["Beyaz"]["image"] == "/static/images/B3.jpg"
+    assert s.title == "M1 Ayakkabı" and s.image == "/static/images/B3.jpg"   # renk sırasında ilk varyant
+    assert s.on_trendyol and s.on_amazon and not s.on_shopify and not s.unlisted
+
+
+def test_stok_ve_shopify_degisikligi_modeli_yeniler():
+    _variant("B1")
+    _variant("X1", model="M2")
+    db.session.commit()
+    other_before = _summary("M2").updated_at
+
+    db.session.add(CentralStock(barcode="B1", qty=4))
+    db.session.add(ShopifyMapping(barcode="B1", shopify_variant_id="v1", shopify_inventory_item_id="i1"))
+    db.session.commit()
+    s = _summary("M1")
+    assert s.total_stock == 4 and s.on_shopify
+    assert _summary("M2").updated_at == other_before                       # dokunulmayan model
+
+    cs = db.session.get(CentralStock, "B1")
+    cs.qty = 1
+    db.session.commit()
+    assert _summary("M1").total_stock == 1
+
+
+def test_model_degisimi_ve_silme_eski_grubu_da_yeniler():
+    p = _variant("B1")
+    _variant("B2")
+    db.session.commit()
+
+    p.product_main_id = "M9"
+    db.session.commit()
+    assert _summary("M1").variant_count == 1
+    assert _summary("M9").variant_count == 1
+
+    db.session.delete(db.session.get(Product, "B2"))
+    db.session.commit()
+    assert _summary("M1") is None
+
+
+def test_toplu_dml_commit_icinde_kurmaz_zamanlanmis_job_kurar(monkeypatch):
+    _variant("B1")
+    _variant("C1", model="M2")
+    db.session.add(CentralStock(barcode="C1", qty=3))
+    db.session.commit()
+    assert ps.refresh_stale() is None
+
+    calls = []
+    real_rebuild = ps.rebuild_product_summary
+    monkeypatch.setattr(ps, "rebuild_product_summary", lambda *a, **kw: calls.append(1) or real_rebuild(*a, **kw))
+    CentralStock.query.update({CentralStock.qty: 0})                   # query-level DML, model bilinmiyor
+    db.session.commit()
+    assert calls == [] and _summary("M2").total_stock == 3              # çağıranın commit'i kurmadı
+    assert ps.refresh_stale() == {"models": 2} and calls == [1]
+    assert _summary("M2").total_stock == 0
+    assert ps.refresh_stale() is None                                   # işaret temizlendi
+
+    _variant("B9")
+    db.session.flush()
+    db.session.rollback()
+    assert _summary("M1").variant_count == 1
+
+
+def test_bilinen_toplu_yollar_yalniz_etkilenen_modelleri_yeniler():
+    from get_products import delete_archived_in_db
+
+    _variant("A1", model="A")
+    _variant("A2", model="A", size="39")
+    _variant("B1", model="B")
+    db.session.commit()
+    assert delete_archived_in_db({"A2", "B1"}) == 2
+    assert _summary("A").variant_count == 1 and _summary("B") is None
+    assert ps.refresh_stale() is None                                   # bayat işareti yok
+
+
+def test_bos_tablo_doldurulamasa_da_bakim_acik_kalir(monkeypatch):
+    def _fail(*a, **kw):
+        raise RuntimeError("başka worker kilitte")
+
+    ps._ready_urls.clear()
+    monkeypatch.setattr(ps, "rebuild_product_summary", _fail)
+    ps.ensure_table_exists()
+    assert ps.is_ready()
+
+
+def test_pazaryeri_filtresi_ve_sayfalama():
+    _variant("A1", model="A")
+    _variant("B1", model="B", platforms="[]", amazon_asin="ASIN")
+    _variant("C1", model="C", platforms="[]")
+    db.session.commit()
+
+    assert ps.count_models() == 3
+    assert [m["model_id"] for m in ps.page_summaries(1, 2)] == ["A", "B"]
+    assert [m["model_id"] for m in ps.page_summaries(2, 2)] == ["C"]
+    assert [m["model_id"] for m in ps.page_summaries(1, 10, "amazon")] == ["B"]
+    assert [m["model_id"] for m in ps.page_summaries(1, 10, "none")] == ["C"]
+
+    db.session.query(ProductModelSummary).delete()
+    db.session.commit()
+    assert ps.rebuild_product_summary()["models"] == 3
+
+
+def test_beden_detay_ucu():
+    _variant("B1", size="37")
+    _variant("B2", size="40")
+    _variant("B3", color="Beyaz")
+    db.session.add(CentralStock(barcode="B2", qty=6))
+    db.session.add(RafUrun(urun_barkodu="B2", raf_kodu="A-01", adet=6))
+    db.session.commit()
+
+    res = app.test_client().get("/api/product_model_variants?model=M1&color=Siyah").get_json()
+    assert res["success"]
+    assert [c["color"] for c in res["colors"]] == ["Siyah"]
+    variants = res["colors"][0]["variants"]
+    assert [v["size"] for v in variants] == ["40", "37"]
+    assert variants[0]["quantity"] == 6 and variants[0]["raf"] == "A-01"
+
+    all_colors = app.test_client().get("/api/product_model_variants?model=M1").get_json()
+    assert {c["color"] for c in all_colors["colors"]} == {"Siyah", "Beyaz"}
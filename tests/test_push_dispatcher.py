@@ -0,0 +1,91 @@
+"""Stok hareketiyle tetiklenen debounce'lu push (push_dispatcher).
+
+İzole tempfile-sqlite; platform API'leri sahte servisle değiştirilir.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_push_dispatcher.py -v
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_push_dispatch_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import db, PlatformConfig, StockMovement  # noqa: E402
+from stock_sync import push_dispatcher as pd  # noqa: E402
+from stock_sync.service import stock_sync_service  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in (PlatformConfig, StockMovement):
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+_calls: list[list[str]] = []
+
+
+async def _fake_sync(barcodes, **kwargs):
+    _calls.append(list(barcodes))
+    return {"success": True, "platforms": {}}
+
+
+@pytest.fixture(autouse=True)
+def _ctx(monkeypatch):
+    monkeypatch.setattr(pd, "DEBOUNCE_SECONDS", 0.2)
+    monkeypatch.setattr(pd, "MIN_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(stock_sync_service, "sync_specific_barcodes", _fake_sync)
+    pd.start(app)
+    _calls.clear()
+    with app.app_context():
+        yield
+        db.session.rollback()
+    pd.stop()
+
+
+def _move(barcode, delta=-1):
+    db.session.add(StockMovement(barcode=barcode, delta=delta, reason="manual_adjust"))
+
+
+def _wait_calls(n, timeout=3.0):
+    end = time.time() + timeout
+    while len(_calls) < n and time.time() < end:
+        time.sleep(0.05)
+
+
+def test_ard_arda_hareketler_tek_pushta_birlesir():
+    _move("A")
+    db.session.commit()
+    _move("B")
+    _move("A", +2)
+    db.session.commit()
+    _wait_calls(1)
+    time.sleep(0.4)
+    assert _calls == [["A", "B"]]
+
+
+def test_rollback_edilen_hareket_gonderilmez():
+    _move("X")
+    db.session.flush()
+    db.session.rollback()
+    _move("Y")
+    db.session.commit()
+    _wait_calls(1)
+    assert _calls == [["Y"]]
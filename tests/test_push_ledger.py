@@ -0,0 +1,139 @@
+"""Diff stok push'u — son gönderilen adet defteri (push_ledger).
+
+İzole tempfile-sqlite; GERÇEK DB'ye ve platform API'lerine dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_push_ledger.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_push_ledger_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import db, PlatformConfig, SyncSession, SyncDetail, SyncSessionSummary  # noqa: E402
+from stock_sync import push_ledger  # noqa: E402
+from stock_sync.adapters.base import StockItem, SyncResult  # noqa: E402
+from stock_sync.service import StockSyncService  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in (PlatformConfig, SyncSession, SyncDetail, SyncSessionSummary):
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in (SyncDetail, SyncSessionSummary, SyncSession, PlatformConfig):
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+class _FakeAdapter:
+    is_configured = True
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_all_stocks(self, items, progress_callback=None):
+        self.sent.append({it.barcode: it.quantity for it in items})
+        now = datetime.utcnow()
+        return [SyncResult(barcode=it.barcode, success=True, quantity_sent=it.quantity,
+                           sent_at=now, response_at=now) for it in items]
+
+
+def _service(monkeypatch, stocks):
+    svc = StockSyncService.__new__(StockSyncService)
+    svc._active_sessions = {}
+    svc._adapters = {"trendyol": _FakeAdapter()}
+    monkeypatch.setattr(svc, "_get_all_stocks",
+                        lambda platform=None: [StockItem(barcode=b, quantity=q) for b, q in stocks.items()])
+    return svc
+
+
+def _run(svc, **kw):
+    return asyncio.run(svc.sync_platform("trendyol", triggered_by="test", **kw))
+
+
+def test_diff_yalniz_degisen_barkodlari_gonderir(monkeypatch):
+    stocks = {"A": 5, "B": 0, "C": 2}
+    svc = _service(monkeypatch, stocks)
+    adapter = svc._adapters["trendyol"]
+
+    # Tam push kaydı yokken diff istense de tam gönderime düşer
+    res = _run(svc, differential=True)
+    assert adapter.sent[-1] == stocks
+    assert res["skipped_count"] == 0
+    assert not push_ledger.is_full_push_due("trendyol")
+
+    stocks.update({"A": 4, "D": 1})
+    res = _run(svc, differential=True)
+    assert adapter.sent[-1] == {"A": 4, "D": 1}
+    assert res["skipped_count"] == 2
+
+    # Gönderilen diff de deftere girer → ikinci turda gönderilecek yok
+    res = _run(svc, differential=True)
+    assert len(adapter.sent) == 2
+    assert res["message"] == "Değişen stok yok"
+    assert push_ledger.get_last_pushed_map("trendyol") == {"A": 4, "B": 0, "C": 2, "D": 1}
+    assert push_ledger.get_last_pushed_map("trendyol", barcodes=["A", "C", "X"]) == {"A": 4, "C": 2}
+    assert push_ledger.get_last_pushed_map("trendyol", barcodes=[]) == {}
+
+
+def test_hatali_gonderim_defterde_yer_almaz(monkeypatch):
+    svc = _service(monkeypatch, {"A": 1})
+    _run(svc)
+    sess = SyncSession(session_id="x", platform="trendyol", status="completed")
+    db.session.add(sess)
+    db.session.flush()
+    db.session.add(SyncDetail(session_id=sess.id, barcode="A", platform="trendyol",
+                              stock_sent=9, status="error"))
+    db.session.commit()
+    assert push_ledger.get_last_pushed_map("trendyol") == {"A": 1}
+
+
+def test_tam_push_araligi(monkeypatch):
+    assert push_ledger.is_full_push_due("trendyol")
+    push_ledger.mark_full_push("trendyol", 1, at=datetime.utcnow() - timedelta(minutes=61))
+    assert push_ledger.is_full_push_due("trendyol")
+    push_ledger.mark_full_push("trendyol", 1)
+    assert not push_ledger.is_full_push_due("trendyol")
+    monkeypatch.setenv("STOCK_FULL_PUSH_INTERVAL_MINUTES", "0")
+    assert push_ledger.is_full_push_due("trendyol")
+
+
+def test_sadece_hata_modunda_defter_ozetten_okunur(monkeypatch):
+    monkeypatch.setenv("SYNC_DETAIL_MODE", "errors_only")
+    stocks = {"A": 5, "B": 1}
+    svc = _service(monkeypatch, stocks)
+    _run(svc)
+    assert SyncDetail.query.count() == 0
+    stocks["A"] = 3
+    res = _run(svc, differential=True)
+    assert svc._adapters["trendyol"].sent[-1] == {"A": 3}
+    assert res["skipped_count"] == 1
+    assert push_ledger.get_last_pushed_map("trendyol") == {"A": 3, "B": 1}
+    assert push_ledger.get_last_pushed_map("trendyol", barcodes=["B"]) == {"B": 1}
@@ -0,0 +1,153 @@
+"""reserved_stock projeksiyonu — sipariş geçişleriyle transactional güncelleme.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_reserved_stock.py -v
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_reserved_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from models import (  # noqa: E402
+    db, OrderCreated, OrderHazirlaniyor, ReservedStock, Product, BarcodeAlias,
+)
+from stock_sync import reservation as rs  # noqa: E402
+
+_NEEDED = (OrderCreated, OrderHazirlaniyor, ReservedStock, Product, BarcodeAlias)
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    @event.listens_for(db.engine, "connect")
+    def _on_connect(dbapi_conn, _):
+        if isinstance(dbapi_conn, sqlite3.Connection):
+            dbapi_conn.create_function(
+                "translate", 3,
+                lambda s, f, t: None if s is None else s.translate(str.maketrans(f, t)),
+            )
+
+    for _m in _NEEDED:
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+    rs.install_listeners()
+    rs.ensure_table_exists()
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in (OrderCreated, OrderHazirlaniyor, ReservedStock, BarcodeAlias):
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _details(*lines):
+    return json.dumps([{"barcode": bc, "quantity": q} for bc, q in lines])
+
+
+def _created(order_number, *lines):
+    o = OrderCreated(order_number=order_number, details=_details(*lines), source="TRENDYOL")
+    db.session.add(o)
+    db.session.commit()
+    return o
+
+
+def _table():
+    return {r.barcode: r.qty for r in ReservedStock.query.all() if r.qty}
+
+
+def test_yeni_siparis_rezerv_ekler_ve_hazirlaniyora_gecis_rezervi_korur():
+    o = _created("R1", ("BC1", 2), ("BC2", 1))
+    assert _table() == {"BC1": 2, "BC2": 1}
+
+    details = o.details
+    db.session.delete(o)
+    db.session.add(OrderHazirlaniyor(order_number="R1", details=details, source="TRENDYOL"))
+    db.session.commit()
+    assert _table() == {"BC1": 2, "BC2": 1}
+
+
+def test_toplandi_damgasi_rezervi_dusurur():
+    h = OrderHazirlaniyor(order_number="R2", details=_details(("BC1", 3)), source="TRENDYOL")
+    db.session.add(h)
+    db.session.commit()
+    assert _table() == {"BC1": 3}
+
+    h.toplandi_at = datetime.utcnow()
+    db.session.commit()
+    assert _table() == {}
+
+
+def test_alias_barkod_ana_barkoda_yazilir():
+    db.session.add(BarcodeAlias(alias_barcode="ESKI1", main_barcode="ANA1"))
+    db.session.commit()
+    _created("R3", ("ESKI1", 1))
+    assert _table() == {"ANA1": 1}
+
+
+def test_toplu_insert_ve_toplu_silme_acikca_bildirilir():
+    mappings = [{"order_number": "B1", "details": _details(("BC9", 4)), "source": "TRENDYOL",
+                 "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()}]
+    db.session.bulk_insert_mappings(OrderCreated, mappings)
+    rs.queue_bulk_insert(OrderCreated, mappings)
+    db.session.commit()
+    assert _table() == {"BC9": 4}
+
+    ids = [o.id for o in OrderCreated.query.all()]
+    rs.queue_bulk_delete(OrderCreated, ids)
+    OrderCreated.query.filter(OrderCreated.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    assert _table() == {}
+
+
+def test_rollback_bekleyen_degisimi_atar():
+    db.session.add(OrderCreated(order_number="R4", details=_details(("BC1", 1)), source="TRENDYOL"))
+    db.session.flush()
+    db.session.rollback()
+    _created("R5", ("BC2", 1))
+    assert _table() == {"BC2": 1}
+
+
+def test_dogrulayici_sapmayi_raporlar_ve_duzeltir():
+    _created("R6", ("BC1", 2))
+    ReservedStock.query.filter_by(barcode="BC1").update({"qty": 7})
+    db.session.add(ReservedStock(barcode="HAYALET", qty=1))
+    db.session.commit()
+
+    res = rs.rebuild_reserved_stock()
+    assert res["drift"] == {"BC1": [7, 2], "HAYALET": [1, 0]}
+    assert _table() == {"BC1": 2}
+    assert rs.get_reserved_map() == rs.scan_reserved_map() == {"BC1": 2}
+
+
+def test_migration_ile_bos_acilan_tablo_ilk_acilista_doldurulur():
+    _created("R7", ("BC9", 3))
+    ReservedStock.query.delete()                         # migration: tablo var ama boş
+    db.session.commit()
+    rs.ensure_table_exists()
+    assert _table() == {"BC9": 3} and rs.get_reserved_map() == {"BC9": 3}
@@ -0,0 +1,219 @@
+"""response_cache — paylaşımlı JSON yanıt önbelleği: HIT/MISS, ETag/304, gzip,
+commit sonrası geçersiz kılma, izdiham kilidi, arka uç hatasında atlama.
+
+İzole tempfile-sqlite + SimpleCache; GERÇEK DB'ye / Redis'e dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_response_cache.py -v
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_response_cache_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask, request  # noqa: E402
+from flask_caching import Cache  # noqa: E402
+
+from models import db, OrderCreated, Product  # noqa: E402
+import response_cache as rc  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+# cache_config.cache Redis'e bağlı; testte aynı nesne bellek içi arka uçla başlatılır
+_local_cache = Cache(config={"CACHE_TYPE": "SimpleCache", "CACHE_DEFAULT_TIMEOUT": 300})
+_local_cache.init_app(app)
+
+with app.app_context():
+    OrderCreated.__table__.create(bind=db.engine, checkfirst=True)
+    Product.__table__.create(bind=db.engine, checkfirst=True)
+
+CALLS = {"n": 0}
+
+
+def _payload():
+    CALLS["n"] += 1
+    return {"count": OrderCreated.query.count(), "guncellendi": f"t{CALLS['n']}"}
+
+
+@app.route("/t/ozet")
+def _ozet():
+    return rc.serve("test_ozet", _payload, ttl=float(request.args.get("ttl", 20)),
+                    tags=("orders",), volatile=("guncellendi",))
+
+
+SLOW = {"fn": _payload}
+
+
+@app.route("/t/yavas")
+def _yavas():
+    return rc.serve("test_yavas", SLOW["fn"], ttl=20)
+
+
+@pytest.fixture(autouse=True)
+def _env(monkeypatch):
+    monkeypatch.setattr(rc, "cache", _local_cache)
+    monkeypatch.setattr(rc, "_backend_down_until", 0.0)
+    rc.install_listeners()
+    CALLS["n"] = 0
+    with app.app_context():
+        _local_cache.clear()
+        OrderCreated.query.delete()
+        db.session.commit()
+    yield
+
+
+def _get(client, url="/t/ozet", **headers):
+    return client.get(url, headers=headers)
+
+
+def _json(resp):
+    data = resp.data
+    if resp.headers.get("Content-Encoding") == "gzip":
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+def test_miss_sonra_hit_parametre_normalizasyonu():
+    c = app.test_client()
+    r1 = _get(c, "/t/ozet?model=A&start=2026-01-01")
+    r2 = _get(c, "/t/ozet?start=2026-01-01&model=A&_=123")   # sıra + cache-buster farkı
+    r3 = _get(c, "/t/ozet?model=B&start=2026-01-01")
+    assert r1.headers["X-Cache"] == "MISS"
+    assert r2.headers["X-Cache"] == "HIT"
+    assert r3.headers["X-Cache"] == "MISS"
+    assert CALLS["n"] == 2
+    assert _json(r1) == _json(r2)
+
+
+def test_etag_304_ve_gzip_pazarligi():
+    c = app.test_client()
+    plain = _get(c)
+    assert "Content-Encoding" not in plain.headers
+    assert _json(plain)["count"] == 0
+    etag = plain.headers["ETag"]
+
+    zipped = _get(c, **{"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.headers["ETag"] == etag
+    assert _json(zipped) == _json(plain)
+
+    not_modified = _get(c, **{"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.data == b""
+
+
+def test_volatile_alan_etagi_degistirmez():
+    e1 = rc.build_entry({"count": 1, "guncellendi": "10:00"}, 20, volatile=("guncellendi",))
+    e2 = rc.build_entry({"count": 1, "guncellendi": "10:05"}, 20, volatile=("guncellendi",))
+    e3 = rc.build_entry({"count": 2, "guncellendi": "10:05"}, 20, volatile=("guncellendi",))
+    assert e1["etag"] == e2["etag"] != e3["etag"]
+
+
+def test_commit_sonrasi_gecersiz_kilma_rollback_dokunmaz():
+    c = app.test_client()
+    assert _json(_get(c))["count"] == 0
+
+    with app.app_context():
+        db.session.add(OrderCreated(order_number="R1"))
+        db.session.flush()
+        db.session.rollback()                                 # geri alınan yazım nesli artırmaz
+    assert _get(c).headers["X-Cache"] == "HIT"
+
+    with app.app_context():
+        db.session.add(OrderCreated(order_number="A1"))
+        db.session.commit()
+    r = _get(c)
+    assert r.headers["X-Cache"] == "MISS" and _json(r)["count"] == 1
+
+    with app.app_context():
+        OrderCreated.query.filter_by(order_number="A1").delete()   # query-level DML
+        db.session.commit()
+    assert _json(_get(c))["count"] == 0
+
+    with app.app_context():
+        db.session.add(Product(barcode="X1"))                  # ilgisiz tablo
+        db.session.commit()
+    assert _get(c).headers["X-Cache"] == "HIT"
+
+
+def test_bulk_insert_icin_acik_invalidate():
+    c = app.test_client()
+    _get(c)
+    with app.app_context():
+        db.session.bulk_insert_mappings(OrderCreated, [{"order_number": "B1"}])
+        rc.invalidate("orders")
+        db.session.commit()
+    r = _get(c)
+    assert r.headers["X-Cache"] == "MISS" and _json(r)["count"] == 1
+
+
+def test_bayat_girdi_yenilenirken_servis_edilir(monkeypatch):
+    c = app.test_client()
+    _get(c, "/t/ozet?ttl=0")
+    with app.test_request_context("/t/ozet?ttl=0"):
+        key = rc._entry_key("test_ozet", request.args, ("orders",))
+        _local_cache.add(f"{key}:lock", 1)                     # başka worker hesaplıyor
+    r = _get(c, "/t/ozet?ttl=0")
+    assert r.headers["X-Cache"] == "STALE"
+    assert CALLS["n"] == 1
+
+
+def test_izdiham_kilidi_tek_hesaplama(monkeypatch):
+    gate = threading.Event()
+
+    def slow():
+        gate.wait(2)
+        CALLS["n"] += 1
+        return {"v": 1}
+
+    monkeypatch.setitem(SLOW, "fn", slow)
+    results = []
+
+    def hit():
+        results.append(app.test_client().get("/t/yavas").headers["X-Cache"])
+
+    threads = [threading.Thread(target=hit) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    gate.set()
+    for t in threads:
+        t.join(5)
+    assert CALLS["n"] == 1
+    assert sorted(results) == ["MISS", "WAIT", "WAIT", "WAIT"]
+
+
+def test_arka_uc_hatasinda_dogrudan_hesaplanir(monkeypatch):
+    class Broken:
+        def __getattr__(self, name):
+            def fail(*a, **kw):
+                raise ConnectionError("redis yok")
+            return fail
+
+    monkeypatch.setattr(rc, "cache", Broken())
+    c = app.test_client()
+    r1 = _get(c)
+    r2 = _get(c)
+    assert r1.status_code == r2.status_code == 200
+    assert r1.headers["X-Cache"] == r2.headers["X-Cache"] == "BYPASS"
+    assert CALLS["n"] == 2
+    assert rc._backend_down_until > time.time()
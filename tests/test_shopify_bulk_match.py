@@ -0,0 +1,231 @@
+"""Shopify bulk variant dışa aktarımı → barkod eşleştirme → ShopifyMapping farkı.
+
+İzole tempfile-sqlite + yerel sahte Shopify sunucusu (GraphQL ucu + JSONL
+dosyası, ``tests/fixtures/shopify_bulk_variants.jsonl``); ağa çıkmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_shopify_bulk_match.py -v
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_shopify_bulk_match_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import (  # noqa: E402
+    db, Product, BarcodeAlias, CentralStock, ShopifyMapping, RafUrun, OrderItem, ProductModelSummary,
+    PlatformConfig,
+)
+import product_summary as ps  # noqa: E402
+from shopify_site.shopify_graphql import ShopifyGraphQLClient  # noqa: E402
+from shopify_site.shopify_stock_service import ShopifyStockService  # noqa: E402
+
+FIXTURE = PROJECT_ROOT / "tests" / "fixtures" / "shopify_bulk_variants.jsonl"
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in (Product, BarcodeAlias, CentralStock, ShopifyMapping, RafUrun, OrderItem, PlatformConfig):
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+    ps.install_listeners()
+    ps.ensure_table_exists()
+
+
+class StandInShopify(BaseHTTPRequestHandler):
+    """bulkOperationRunQuery → RUNNING → COMPLETED(url) ve sayfalı productVariants."""
+
+    state = {"polls": 0, "fail_bulk": False, "stuck": False, "requests": []}
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, body, status=200):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        raw = FIXTURE.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        query, state = payload["query"], self.state
+        state["requests"].append(query.split("(")[0].split()[-1])
+        if "bulkOperationRunQuery" in query:
+            if state["fail_bulk"]:
+                return self._json({"data": {"bulkOperationRunQuery": {
+                    "bulkOperation": None, "userErrors": [{"field": None, "message": "zaten çalışıyor"}]}}})
+            return self._json({"data": {"bulkOperationRunQuery": {
+                "bulkOperation": {"id": "gid://shopify/BulkOperation/1", "status": "CREATED"}, "userErrors": []}}})
+        if "bulkOperationCancel" in query:
+            return self._json({"data": {"bulkOperationCancel": {
+                "bulkOperation": {"id": payload["variables"]["id"], "status": "CANCELING"}, "userErrors": []}}})
+        if "BulkOperation" in query:
+            state["polls"] += 1
+            done = state["polls"] >= 2 and not state["stuck"]
+            return self._json({"data": {"node": {
+                "id": payload["variables"]["id"], "status": "COMPLETED" if done else "RUNNING",
+                "errorCode": None, "objectCount": "6" if done else "0",
+                "url": f"http://127.0.0.1:{self.server.server_port}/bulk.jsonl" if done else None}}})
+        nodes = [json.loads(line) for line in FIXTURE.read_text().splitlines()]
+        edges = [{"node": n} for n in nodes if "__parentId" not in n]
+        return self._json({"data": {"productVariants": {
+            "edges": edges, "pageInfo": {"hasNextPage": False, "endCursor": None}}}})
+
+
+_server = ThreadingHTTPServer(("127.0.0.1", 0), StandInShopify)
+threading.Thread(target=_server.serve_forever, daemon=True).start()
+
+
+class StandInConfig:
+    TIMEOUT = 5
+    LOCATION_ID = "gid://shopify/Location/1"
+
+    @classmethod
+    def graphql_url(cls):
+        return f"http://127.0.0.1:{_server.server_port}/graphql.json"
+
+    @classmethod
+    def get_headers(cls):
+        return {"Content-Type": "application/json"}
+
+    @classmethod
+    def reset_token(cls):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def _ctx(monkeypatch):
+    StandInShopify.state.update(polls=0, fail_bulk=False, stuck=False, requests=[])
+    with app.app_context():
+        for m in (ShopifyMapping, BarcodeAlias, Product, ProductModelSummary):
+            m.query.delete()
+        for bc, model in (("8690000000011", "M1"), ("555", "M1"), ("0123", "M2"), ("MAIN1", "M3")):
+            db.session.add(Product(barcode=bc, product_main_id=model, title=model, size="38", color="Siyah"))
+        db.session.add(BarcodeAlias(alias_barcode="ALIAS1", main_barcode="MAIN1"))
+        _mapping("gid://shopify/ProductVariant/1", "8690000000011", "38", sku="S-1", sent=7)
+        _mapping("gid://shopify/ProductVariant/2", "555", "39", sku="S-2", sent=3)
+        _mapping("gid://shopify/ProductVariant/3", "555", "40", sku="S-3", sent=9, product="Sandalet")
+        _mapping("gid://shopify/ProductVariant/9", "555", "eski", sku="S-9", sent=1)
+        db.session.commit()
+        ps.rebuild_product_summary()
+
+        def _no_full_rebuild(*a, **kw):
+            raise AssertionError("tam özet yeniden kurulumu beklenmiyordu")
+
+        monkeypatch.setattr(ps, "rebuild_product_summary", _no_full_rebuild)
+        yield
+        db.session.rollback()
+
+
+def _mapping(variant_id, barcode, title, sku, sent, product="Bot"):
+    n = variant_id.rsplit("/", 1)[1]
+    db.session.add(ShopifyMapping(
+        barcode=barcode, shopify_variant_id=variant_id,
+        shopify_inventory_item_id=f"gid://shopify/InventoryItem/{n}",
+        shopify_product_title=product, shopify_variant_title=title,
+        shopify_sku=sku, shopify_barcode=barcode if n != "3" else "123", last_stock_sent=sent))
+
+
+@pytest.fixture
+def _service():
+    """Her testin kendi istemcisi; loop thread'i ve session test sonunda kapanır."""
+    client = ShopifyGraphQLClient(config=StandInConfig)
+
+    def _make():
+        svc = ShopifyStockService()
+        svc.config = StandInConfig
+        svc.client = client
+        svc.BULK_POLL_SECONDS = 0.01
+        return svc
+
+    yield _make
+    client.shutdown()
+    assert client._thread is None
+
+
+def _by_variant():
+    db.session.expire_all()
+    return {m.shopify_variant_id.rsplit("/", 1)[1]: m for m in ShopifyMapping.query.all()}
+
+
+def test_bulk_jsonl_akisi_yalniz_farki_uygular(_service):
+    result = _service().match_barcodes(mode="bulk")
+
+    assert result["source"] == "bulk" and StandInShopify.state["polls"] == 2
+    assert "GetVariants" not in StandInShopify.state["requests"]
+    assert result["changes"] == {"inserted": 1, "updated": 2, "deleted": 1, "unchanged": 1}
+    assert (result["matched"], result["unmatched"], result["total_shopify"]) == (4, 1, 6)
+    assert result["unmatched_items"][0]["barcode"] == "YOK-999"
+
+    rows = _by_variant()
+    assert set(rows) == {"1", "2", "3", "4"}
+    assert rows["1"].last_stock_sent == 7                                   # değişmedi
+    assert (rows["2"].shopify_variant_title, rows["2"].last_stock_sent) == ("39 Yeni", 3)
+    assert (rows["3"].barcode, rows["3"].last_stock_sent) == ("0123", None)  # leading-zero, barkod değişti
+    assert (rows["4"].barcode, rows["4"].shopify_sku) == ("MAIN1", "alias1")  # SKU alias üzerinden
+
+
+def test_etkilenen_modellerin_ozeti_yenilenir(_service):
+    _service().match_barcodes(mode="bulk")
+    db.session.expire_all()
+    assert db.session.get(ProductModelSummary, "M3").on_shopify is True
+    assert db.session.get(ProductModelSummary, "M2").on_shopify is True
+
+
+def test_ikinci_calistirma_degisiklik_yazmaz(_service):
+    svc = _service()
+    svc.match_barcodes(mode="bulk")
+    StandInShopify.state["polls"] = 0
+    assert svc.match_barcodes(mode="bulk")["changes"] == {
+        "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 4}
+
+
+def test_bulk_basarisizsa_sayfali_cekime_duser(_service):
+    StandInShopify.state["fail_bulk"] = True
+    result = _service().match_barcodes(mode="bulk")
+    assert result["source"] == "paged" and "GetVariants" in StandInShopify.state["requests"]
+    assert set(_by_variant()) == {"1", "2", "3", "4"}
+
+
+def test_bulk_sure_sinirini_asarsa_iptal_edip_sayfali_cekime_duser(_service, monkeypatch):
+    StandInShopify.state["stuck"] = True
+    monkeypatch.setenv("SHOPIFY_BULK_MAX_WAIT", "0.05")
+    result = _service().match_barcodes(mode="bulk")
+    assert result["source"] == "paged" and StandInShopify.state["polls"] >= 1
+    assert "CancelBulk" in StandInShopify.state["requests"]
+    assert set(_by_variant()) == {"1", "2", "3", "4"}
+
+
+def test_sayfali_mod_env_ile_secilir(_service, monkeypatch):
+    monkeypatch.setenv("SHOPIFY_MATCH_MODE", "paged")
+    result = _service().match_barcodes()
+    assert result["source"] == "paged" and StandInShopify.state["polls"] == 0
+    assert result["changes"]["deleted"] == 1
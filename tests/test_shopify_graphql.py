@@ -0,0 +1,180 @@
+"""shopify_graphql — maliyet kovası, eşzamanlı istek, THROTTLED yeniden deneme;
+ShopifyStockService'in stok/tracking yollarının istemciyi kullanması.
+
+Ağ kullanmaz; Shopify sahte bir leaky-bucket sunucusuyla taklit edilir.
+
+Çalıştırma:
+    pytest tests/test_shopify_graphql.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from shopify_site import shopify_graphql as sg  # noqa: E402
+from shopify_site.shopify_stock_service import ShopifyStockService  # noqa: E402
+
+
+class FakeShopify:
+    """maximum puanlık kova, restore puan/sn dolum; yetmezse THROTTLED döner."""
+
+    def __init__(self, maximum=40.0, restore=400.0, cost=10.0, actual=8.0, fail_ids=()):
+        self.maximum, self.restore, self.cost, self.actual = maximum, restore, cost, actual
+        self.available, self.updated = maximum, time.monotonic()
+        self.active = self.peak = self.throttled = self.calls = 0
+        self.fail_ids = set(fail_ids)
+
+    def _ext(self, actual):
+        return {"cost": {"requestedQueryCost": self.cost, "actualQueryCost": actual,
+                         "throttleStatus": {"maximumAvailable": self.maximum,
+                                            "currentlyAvailable": self.available,
+                                            "restoreRate": self.restore}}}
+
+    async def post(self, payload):
+        self.calls += 1
+        now = time.monotonic()
+        self.available = min(self.maximum, self.available + (now - self.updated) * self.restore)
+        self.updated = now
+        if self.available < self.cost:
+            self.throttled += 1
+            return 200, {}, {"errors": [{"message": "Throttled", "extensions": {"code": "THROTTLED"}}],
+                             "extensions": self._ext(None)}
+        self.available -= self.actual
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.02)
+        self.active -= 1
+        item_id = (payload["variables"] or {}).get("id")
+        if item_id in self.fail_ids:
+            return 200, {}, {"errors": [{"message": "Invalid id"}], "extensions": self._ext(self.actual)}
+        return 200, {}, {"data": {"echo": item_id}, "extensions": self._ext(self.actual)}
+
+
+def _client(server):
+    client = sg.ShopifyGraphQLClient()
+    client._post = server.post
+    return client
+
+
+def test_kova_bekletir_ve_iade_eder():
+    async def _run():
+        bucket = sg.CostBucket(maximum=10, restore_rate=100)
+        start = time.monotonic()
+        await bucket.reserve(10)
+        await bucket.reserve(10)                       # ~0.1 sn dolum beklenir
+        waited = time.monotonic() - start
+        bucket.settle(10, {"actualQueryCost": 4, "throttleStatus": {
+            "maximumAvailable": 20, "currentlyAvailable": 15, "restoreRate": 5}})
+        return waited, bucket
+
+    waited, bucket = asyncio.run(_run())
+    assert waited >= 0.09
+    assert bucket.maximum == 20 and bucket.restore_rate == 5
+    assert 6 <= bucket.available <= 7                   # 6 puan iade, sunucu değerine kırpılmış
+
+
+def test_esazamanli_istekler_kovaya_uyar_throttle_yeniden_denenir():
+    server = FakeShopify()
+    client = _client(server)
+    results = client.query_many(("mutation M($id: ID!) { x }", {"id": f"g{i}"}) for i in range(30))
+    assert [r["echo"] for r in results] == [f"g{i}" for i in range(30)]
+    assert server.peak > 1                              # sıralı değil
+    assert client.bucket.maximum == 40                  # throttleStatus'tan öğrenildi
+    assert client._cost_hints["mutation M($id: ID!) { x }"] == 10
+    assert client.stats["throttled"] == server.throttled
+
+
+def test_kalici_hata_istisna_olarak_doner_digerleri_etkilenmez():
+    server = FakeShopify(maximum=1000, fail_ids={"bad"})
+    client = _client(server)
+    results = client.query_many([("q", {"id": "ok"}), ("q", {"id": "bad"})])
+    assert results[0] == {"echo": "ok"}
+    assert isinstance(results[1], sg.GraphQLError) and "Invalid id" in str(results[1])
+    assert server.calls == 2                            # kalıcı hata yeniden denenmez
+
+
+def test_iter_many_sonuclari_tamamlandikca_sirasiyla_verir():
+    server = FakeShopify(maximum=1000, fail_ids={"g3"})
+    client = _client(server)
+    seen = dict(client.iter_many(("q", {"id": f"g{i}"}) for i in range(6)))
+    assert sorted(seen) == list(range(6))
+    assert isinstance(seen[3], sg.GraphQLError)
+    assert all(seen[i] == {"echo": f"g{i}"} for i in range(6) if i != 3)
+
+
+def test_adaptor_baska_loop_tan_istemci_kovasini_kullanir(monkeypatch):
+    from stock_sync.adapters import shopify as adapter_mod
+
+    server = FakeShopify(maximum=1000)
+    client = _client(server)
+    monkeypatch.setattr(adapter_mod, "shopify_graphql_client", client)
+
+    async def _run():
+        adapter = adapter_mod.ShopifyAdapter()
+        return await asyncio.gather(*(adapter._graphql("q", {"id": f"a{i}"}) for i in range(4)))
+
+    results = asyncio.run(_run())
+    assert [r["data"] for r in results] == [{"echo": f"a{i}"} for i in range(4)]
+    assert server.calls == 4 and server.peak > 1          # istemcinin loop'unda eşzamanlı
+
+
+class _FakeClient:
+    def __init__(self, responder):
+        self.responder, self.requests = responder, []
+
+    def query_many(self, requests):
+        requests = list(requests)
+        self.requests.extend(requests)
+        return [self.responder(q, v) for q, v in requests]
+
+    def iter_many(self, requests):
+        return enumerate(self.query_many(requests))
+
+
+def test_tracking_kontrol_ve_acma_toplu_istemciden_gider():
+    svc = ShopifyStockService()
+    mappings = [SimpleNamespace(shopify_inventory_item_id=f"inv{i}") for i in range(120)]
+
+    def responder(query, variables):
+        if "nodes" in query:
+            return {"nodes": [{"id": gid, "tracked": gid != "inv7"} for gid in variables["ids"]]}
+        return {"inventoryItemUpdate": {"userErrors": []}}
+
+    svc.client = _FakeClient(responder)
+    svc._enable_tracking_for_mappings(mappings)
+    node_calls = [v for q, v in svc.client.requests if "nodes" in q]
+    assert [len(v["ids"]) for v in node_calls] == [50, 50, 20]
+    assert [v for q, v in svc.client.requests if "inventoryItemUpdate" in q] == [{"id": "inv7"}]
+
+
+def test_stok_parcasi_kismi_hata_ve_istisna_islenir():
+    svc = ShopifyStockService()
+    batch = [{"mapping": SimpleNamespace(barcode=f"B{i}", shopify_inventory_item_id=f"inv{i}",
+                                         last_stock_sent=None, last_sync_at=None), "qty": i} for i in range(3)]
+    variables = svc._stock_batch_variables(batch, "gid://shopify/Location/1")
+    assert [q["quantity"] for q in variables["input"]["quantities"]] == [0, 1, 2]
+
+    results = {"success_count": 0, "error_count": 0, "skipped_count": 0, "errors": []}
+    svc._apply_stock_batch(batch, {"inventorySetQuantities": {"userErrors": [
+        {"field": ["input", "quantities", "1", "inventoryItemId"], "message": "yok"}]}}, results)
+    assert (results["success_count"], results["error_count"]) == (2, 1)
+    assert batch[2]["mapping"].last_stock_sent == 2 and batch[1]["mapping"].last_stock_sent is None
+
+    svc._apply_stock_batch(batch, sg.GraphQLError("HTTP 500"), results)
+    assert results["error_count"] == 4
+
+
+def test_shutdown_loop_thread_ini_ve_session_i_kapatir():
+    client = _client(FakeShopify(maximum=1000))
+    assert client.query("q", {"id": "x"}) == {"echo": "x"}
+    thread = client._thread
+    client.shutdown()
+    assert not thread.is_alive() and client._loop is None and client._session is None
+    assert client.query("q", {"id": "y"}) == {"echo": "y"}    # gerekirse yeniden açılır
+    client.shutdown()
@@ -0,0 +1,103 @@
+"""SyncDetail toplu yazıcı (detail_writer) — sadece-hata modu ve saklama temizliği.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_sync_detail_writer.py -v
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_sync_detail_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+
+from models import db, SyncSession, SyncDetail, SyncSessionSummary  # noqa: E402
+from stock_sync import detail_writer  # noqa: E402
+from stock_sync.adapters.base import SyncResult  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+db.init_app(app)
+
+with app.app_context():
+    for _m in (SyncSession, SyncDetail, SyncSessionSummary):
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+
+@pytest.fixture(autouse=True)
+def _ctx():
+    with app.app_context():
+        for m in (SyncDetail, SyncSessionSummary, SyncSession):
+            m.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _session(name, created_at=None):
+    s = SyncSession(session_id=name, platform="trendyol", status="completed",
+                    created_at=created_at or datetime.utcnow())
+    db.session.add(s)
+    db.session.commit()
+    return s
+
+
+def _results(n_ok, n_err):
+    ok = [SyncResult(barcode=f"OK{i}", success=True, quantity_sent=i, response_data={"batchRequestId": "x"})
+          for i in range(n_ok)]
+    err = [SyncResult(barcode=f"ERR{i}", success=False, quantity_sent=1, error_message="HTTP 400")
+           for i in range(n_err)]
+    return ok + err
+
+
+def test_tam_mod_tum_satirlari_parca_parca_yazar(monkeypatch):
+    monkeypatch.setattr(detail_writer, "CHUNK_SIZE", 3)
+    s = _session("s1")
+    res = detail_writer.write_sync_details(s.id, _results(5, 2), "trendyol", errors_only=False)
+    db.session.commit()
+    assert res == {"details": 7, "summarized": 0}
+    rows = SyncDetail.query.filter_by(session_id=s.id).all()
+    assert len(rows) == 7
+    assert {r.status for r in rows} == {"success", "error"}
+    assert next(r for r in rows if r.barcode == "OK1").response_data == {"batchRequestId": "x"}
+
+
+def test_sadece_hata_modu_basarililari_ozetler():
+    s = _session("s2")
+    res = detail_writer.write_sync_details(s.id, _results(3, 1), "trendyol", errors_only=True)
+    db.session.commit()
+    assert res == {"details": 1, "summarized": 3}
+    assert [d.barcode for d in SyncDetail.query.all()] == ["ERR0"]
+    summary = db.session.get(SyncSessionSummary, s.id)
+    assert summary.success_count == 3
+    assert summary.stocks == {"OK0": 0, "OK1": 1, "OK2": 2}
+
+
+def test_saklama_temizligi_eski_sessionlari_budar(monkeypatch):
+    monkeypatch.setattr(detail_writer, "PRUNE_CHUNK_SIZE", 2)
+    old = _session("eski", created_at=datetime.utcnow() - timedelta(days=30))
+    new = _session("yeni")
+    detail_writer.write_sync_details(old.id, _results(2, 3), "trendyol", errors_only=True)
+    detail_writer.write_sync_details(new.id, _results(1, 1), "trendyol", errors_only=False)
+    db.session.commit()
+
+    res = detail_writer.prune_sync_details(days=14)
+    assert res["details"] == 3 and res["summaries"] == 1
+    assert {d.session_id for d in SyncDetail.query.all()} == {new.id}
+    assert SyncSession.query.count() == 2  # session geçmişi korunur
@@ -0,0 +1,126 @@
+"""user_logs toplu (asenkron) yazıcı — kuyruk, parti yazımı, geri basınç, metrikler.
+
+İzole tempfile-sqlite; GERÇEK DB'ye dokunmaz.
+
+Çalıştırma:
+    DISABLE_JOBS=1 pytest tests/test_user_log_writer.py -v
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_tmp_db = tempfile.NamedTemporaryFile(suffix="_user_log_writer_test.db", delete=False)
+_tmp_db.close()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_db.name}")
+os.environ["DISABLE_JOBS"] = "1"
+os.environ["WERKZEUG_RUN_MAIN"] = "false"
+
+from flask import Flask  # noqa: E402
+from flask_login import LoginManager  # noqa: E402
+
+from models import db, UserLog, User  # noqa: E402
+import user_logs  # noqa: E402
+from batch_writer import BatchWriter  # noqa: E402
+from routes.common.health import health_bp  # noqa: E402
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp_db.name}"
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.secret_key = "test"
+db.init_app(app)
+LoginManager(app).user_loader(lambda _id: None)
+app.register_blueprint(user_logs.user_logs_bp)
+app.register_blueprint(health_bp)
+
+with app.app_context():
+    for _m in (User, UserLog):
+        _m.__table__.create(bind=db.engine, checkfirst=True)
+
+
+@pytest.fixture(autouse=True)
+def _ctx(monkeypatch):
+    monkeypatch.setenv("USER_LOG_FLUSH_MS", "3600000")
+    user_logs.stop_writer()  # app import'unun başlattığı yazıcı başka engine'e bağlı
+    with app.app_context():
+        UserLog.query.delete()
+        db.session.commit()
+        yield
+        user_logs.stop_writer()
+        db.session.rollback()
+
+
+def test_istek_yolunda_yazim_yok_flush_ile_tek_parti():
+    writer = user_logs.start_writer(db.engine)
+    with app.test_request_context("/siparisler?x=" + "a" * 400, environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        user_logs.log_user_action("PAGE_VIEW: home", {"yol": "/"}, force_log=True)
+        user_logs.log_user_action("UPDATE: product_list", "fiyat", force_log=True)
+    assert UserLog.query.count() == 0 and writer.depth() == 2
+
+    assert writer.flush() == 2
+    rows = UserLog.query.order_by(UserLog.id).all()
+    assert [r.action for r in rows] == ["PAGE_VIEW: home", "UPDATE: product_list"]
+    assert rows[0].ip_address == "10.0.0.1" and len(rows[0].page_url) == 255
+    assert json.loads(rows[1].details)["Detay"] == "fiyat"
+    assert rows[0].timestamp is not None
+
+    m = writer.metrics()
+    assert m["written"] == 2 and m["batches"] == 1 and m["last_flush_ms"] is not None
+
+
+def test_js_toplu_log_api_kuyruga_birakir():
+    writer = user_logs.start_writer(db.engine)
+    client = app.test_client()
+    resp = client.post("/api/log-user-activity", json={"logs": [
+        {"action": "CLICK", "details": {"page_url": "/a"}},
+        {"action": "SEARCH", "details": {"q": "ayakkabı"}},
+    ]})
+    assert resp.get_json()["saved_count"] == 2
+    writer.flush()
+    assert {r.action for r in UserLog.query} == {"CLICK", "SEARCH"}
+
+
+def test_arka_plan_thread_parti_dolunca_yazar():
+    writer = user_logs.start_writer(db.engine)
+    writer.max_batch = 3
+    with app.test_request_context("/"):
+        for i in range(3):
+            user_logs.log_user_action(f"VIEW: {i}", force_log=True)
+    deadline = time.time() + 5
+    while UserLog.query.count() < 3 and time.time() < deadline:
+        time.sleep(0.02)
+    assert UserLog.query.count() == 3
+
+
+def test_geri_basinc_en_eskiyi_atar_ve_metrik_uc_noktasi():
+    written = []
+    w = BatchWriter("TEST", written.extend, max_batch=100, flush_interval=3600, max_queue=2)
+    for i in range(4):
+        w.submit(i)
+    assert w.metrics()["queue_depth"] == 2 and w.metrics()["dropped"] == 2
+    w.flush()
+    assert written == [2, 3]
+
+    user_logs.start_writer(db.engine)
+    client = app.test_client()
+    data = client.get("/health/log-writers").get_json()
+    assert data["user_logs"]["queue_max"] == 10000 and "dropped" in data["user_logs"]
+    assert "pid" not in data                      # süreç kimliği yalnız admin'e
+    with client.session_transaction() as sess:
+        sess["role"], sess["totp_verified"] = "admin", True
+    assert "pid" in client.get("/health/log-writers").get_json()
+
+
+def test_yazici_yoksa_senkron():
+    with app.test_request_context("/"):
+        user_logs.log_user_action("LOGIN", force_log=True)
+    assert UserLog.query.count() == 1
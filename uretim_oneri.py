@@ -17,7 +17,8 @@ from models import (
     db,
     Product, CentralStock,
     UretimOneriDefaults, UretimPlan, UretimOneriWatch,
-    OrderCreated, OrderPicking, OrderShipped,
+    OrderCreated, OrderHazirlaniyor, OrderPicking, OrderShipped, OrderCancelled,
+    OrderArchived, OrderReadyToShip,
     UretimSecimPreset,          # 👈 preset modelini ekledik
     DailySales, DailySalesStatus
 )
@@ -226,13 +227,125 @@ def update_daily_from_event(event_type: str, ts: datetime, items: list):
 # ------------------------------------------------------------------------------
 # DailySales: toplu yeniden kur (gece güvenlik senkronu)
 # ------------------------------------------------------------------------------
-def rebuild_daily_sales(days: int = 30):
+# Satış sayılan tablolar ve artımlı modda "dokunulan gün" tespiti için bakılan
+# tablolar (iptal/hazırlanıyor geçişi de bir günün satışını değiştirir).
+_SALES_TABLES = (OrderCreated, OrderPicking, OrderShipped, OrderDelivered)
+_TOUCH_TABLES = _SALES_TABLES + (OrderHazirlaniyor, OrderCancelled, OrderArchived, OrderReadyToShip)
+
+def _json_coalesce(keys, src="it"):
+    return "COALESCE(" + ", ".join(f"NULLIF(btrim({src}->>'{k}'), '')" for k in keys) + ")"
+
+def _json_items_expr(src="j"):
+    """details kökü liste ya da {items|lines|...: [...]} sözlüğü → jsonb dizi."""
+    dict_keys = " ".join(
+        f"WHEN jsonb_typeof({src}->'{k}') = 'array' THEN {src}->'{k}'" for k in ORD_DTL_CANDS
+    )
+    return (f"CASE WHEN jsonb_typeof({src}) = 'array' THEN {src} "
+            f"WHEN jsonb_typeof({src}) = 'object' THEN CASE {dict_keys} ELSE '[]'::jsonb END "
+            f"ELSE '[]'::jsonb END")
+
+# Tablo başına TEK sorgu: details satırlara açılır, barkod + İstanbul günü bazında
+# toplanır. order_date naive UTC → çift timezone() çevrimi (bkz. rapor_gir._ist).
+# Aralık filtresi ham order_date üzerinde (indeks kullanılır).
+_DAILY_SALES_SQL = """
+    WITH src AS (
+        SELECT timezone('Europe/Istanbul', timezone('UTC', o.order_date))::date AS d,
+               o.details::jsonb AS j
+        FROM {table} o
+        WHERE o.order_date >= :start AND o.order_date < :end
+          AND o.details IS NOT NULL AND o.details <> ''
+    ), lines AS (
+        SELECT src.d, {barcode} AS barcode, {qty} AS q
+        FROM src CROSS JOIN LATERAL jsonb_array_elements({items}) AS it
+        WHERE jsonb_typeof(it) = 'object'
+    )
+    SELECT barcode, d,
+           SUM(CASE WHEN q ~ '^[0-9]+([.,][0-9]+)?$'
+                    THEN floor(replace(q, ',', '.')::numeric)::int ELSE 0 END) AS qty
+    FROM lines
+    WHERE barcode IS NOT NULL
+    GROUP BY barcode, d
+"""
+
+def _aggregate_sql(cls, start_utc, end_utc):
+    sql = _DAILY_SALES_SQL.format(
+        table=cls.__tablename__,
+        barcode=_json_coalesce(BARCODE_CANDS),
+        qty=_json_coalesce(ITEM_QTY_CANDS),
+        items=_json_items_expr("src.j"),
+    )
+    # Savepoint: bozuk JSON satırı (::jsonb hatası) dış transaction'ı bozmasın
+    with db.session.begin_nested():
+        rows = db.session.execute(text(sql), {"start": start_utc, "end": end_utc}).all()
+    return [(bc, d, int(q)) for bc, d, q in rows if q and q > 0]
+
+def _aggregate_py(cls, start_utc, end_utc):
+    """Yedek yol (PostgreSQL dışı / bozuk JSON): yalnız 2 kolon, tek aralık sorgusu."""
+    from time_utils import to_ist
+    bucket = {}
+    q = (db.session.query(cls.order_date, cls.details)
+         .filter(cls.order_date >= start_utc, cls.order_date < end_utc))
+    for ts_val, payload in q.yield_per(2000):
+        if not ts_val: continue
+        d = to_ist(ts_val).date()
+        for it in _iter_items_once(payload) or []:
+            bc = _pick(it, BARCODE_CANDS)
+            qt = int(_to_number(_pick(it, ITEM_QTY_CANDS, 0), 0) or 0)
+            if not bc or qt <= 0: continue
+            key = (str(bc).strip(), d)
+            bucket[key] = bucket.get(key, 0) + qt
+    return [(bc, d, q) for (bc, d), q in bucket.items()]
+
+def _aggregate_daily_sales(start_utc, end_utc, on_table=None):
+    """(barkod, gün) → adet; satış tablolarının hepsi üzerinden."""
+    use_sql = db.session.get_bind().dialect.name == "postgresql"
+    totals = {}
+    for i, cls in enumerate(_SALES_TABLES, start=1):
+        rows = None
+        if use_sql:
+            try:
+                rows = _aggregate_sql(cls, start_utc, end_utc)
+            except Exception as e:
+                current_app.logger.warning(f"[DAILY_SALES] {cls.__tablename__} SQL toplama başarısız, Python'a düşülüyor: {e}")
+        if rows is None:
+            rows = _aggregate_py(cls, start_utc, end_utc)
+        for bc, d, q in rows:
+            totals[(bc, d)] = totals.get((bc, d), 0) + q
+        if on_table: on_table(i, len(_SALES_TABLES))
+    return totals
+
+def _touched_days(since_utc, start_utc, end_utc):
+    """since_utc'den beri güncellenen siparişlerin İstanbul günleri (aralık içinde)."""
+    from time_utils import to_ist
+    days_set = set()
+    for cls in _TOUCH_TABLES:
+        q = (db.session.query(cls.order_date).distinct()
+             .filter(cls.updated_at >= since_utc,
+                     cls.order_date >= start_utc, cls.order_date < end_utc))
+        days_set.update(to_ist(ts).date() for (ts,) in q if ts)
+    return days_set
+
+def _replace_daily_sales(days_set, totals):
+    """Verilen günlerin daily_sales satırlarını toplu sil + toplu yaz."""
+    if not days_set: return 0
+    days_list = sorted(days_set)
+    db.session.query(DailySales).filter(DailySales.date.in_(days_list)).delete(synchronize_session=False)
+    rows = [{"barcode": bc, "date": d, "qty": q} for (bc, d), q in totals.items() if d in days_set]
+    for i in range(0, len(rows), 1000):
+        db.session.execute(DailySales.__table__.insert(), rows[i:i + 1000])
+    return len(rows)
+
+def rebuild_daily_sales(days: int = 30, incremental: bool = False):
     """
     Geçmiş 'days' gününü baştan hesaplar ve o aralığı daily_sales'ta yeniler.
+    incremental=True: yalnız son başarılı çalışmadan beri siparişi güncellenen
+    günler yeniden toplanır (ilk çalışmada / önceki çalışma yoksa tam kurulum).
     Progress için DailySalesStatus güncellenir.
     """
+    from time_utils import ist_to_utc
     end_ist = datetime.now(IST).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
     start_ist = end_ist - timedelta(days=days)
+    start_utc, end_utc = ist_to_utc(start_ist), ist_to_utc(end_ist)
     total_days = days
     # status row (tek satır mantığı)
     st = DailySalesStatus.query.order_by(DailySalesStatus.id.asc()).first()
@@ -240,60 +353,55 @@ def rebuild_daily_sales(days: int = 30):
         st = DailySalesStatus(status="idle", processed_days=0, total_days=0)
         db.session.add(st); db.session.commit()
 
-    st.last_run_start = datetime.now(IST)
+    since_utc = None
+    if incremental:
+        last_touch = st.updated_at
+        if last_touch and last_touch.tzinfo is None:
+            last_touch = last_touch.replace(tzinfo=IST)  # sqlite tz'yi düşürür
+        if st.status == "running" and last_touch and datetime.now(IST) - last_touch < timedelta(hours=1):
+            return {"skipped": True, "reason": "running"}
+        if st.status == "done" and st.last_run_start:
+            since_utc = ist_to_utc(st.last_run_start)
+
+    run_start = datetime.now(IST)
+    st.last_run_start = run_start
     st.status = "running"
     st.processed_days = 0
     st.total_days = total_days
     st.updated_at = datetime.now(IST)
     db.session.commit()
 
-    # seçilen aralığı temizle
-    cutoff = (end_ist.date() - timedelta(days=days))
-    db.session.query(DailySales).filter(DailySales.date >= cutoff).delete()
-    db.session.flush()
-
-    # gün gün ilerle (hafif RAM tüketimi)
-    for i in range(days):
-        day_start = (start_ist + timedelta(days=i))
-        day_end   = day_start + timedelta(days=1)
-        bucket = {}  # barcode -> qty
-
-        def _scan(cls):
-            ts_col, _, TS = _col(cls, ORD_TS_CANDS, "ts")
-            if ts_col is None: return
-            det_name = next((n for n in ORD_DTL_CANDS if hasattr(cls, n)), None)
-            q = db.session.query(cls).filter(
-                func.timezone('Europe/Istanbul', ts_col) >= day_start,
-                func.timezone('Europe/Istanbul', ts_col) <  day_end
-            )
-            for row in q:
-                payload = getattr(row, det_name) if (det_name and hasattr(row, det_name)) else None
-                ts_val = getattr(row, TS, None)
-                if not ts_val: continue
-                for it in _iter_items_once(payload) or []:
-                    bc = _pick(it, BARCODE_CANDS)
-                    qt = int(_to_number(_pick(it, ITEM_QTY_CANDS, 0), 0) or 0)
-                    if not bc or qt <= 0: continue
-                    s = str(bc).strip()
-                    bucket[s] = bucket.get(s, 0) + qt
-
-        for cls in (OrderCreated, OrderPicking, OrderShipped, OrderDelivered):
-            _scan(cls)
-
-        if bucket:
-            rows = [DailySales(barcode=bc, date=day_start.date(), qty=qty) for bc, qty in bucket.items()]
-            db.session.bulk_save_objects(rows)
-            db.session.flush()
-
-        # progress
-        st.processed_days = i + 1
+    try:
+        if since_utc is not None:
+            days_set = _touched_days(since_utc, start_utc, end_utc)
+            if days_set:
+                span_start = ist_to_utc(datetime.combine(min(days_set), datetime.min.time()))
+                span_end = ist_to_utc(datetime.combine(max(days_set) + timedelta(days=1), datetime.min.time()))
+            else:
+                span_start = span_end = None
+        else:
+            days_set = {(start_ist + timedelta(days=i)).date() for i in range(days)}
+            span_start, span_end = start_utc, end_utc
+
+        def _progress(i, n):
+            st.processed_days = int(total_days * i / n)
+            st.updated_at = datetime.now(IST)
+
+        totals = _aggregate_daily_sales(span_start, span_end, on_table=_progress) if days_set else {}
+        written = _replace_daily_sales(days_set, totals)
+    except Exception:
+        db.session.rollback()
+        st.status = "error"
         st.updated_at = datetime.now(IST)
         db.session.commit()
+        raise
 
+    st.processed_days = total_days
     st.last_run_end = datetime.now(IST)
     st.status = "done"
     st.updated_at = datetime.now(IST)
     db.session.commit()
+    return {"days": len(days_set), "rows": written, "incremental": since_utc is not None}
 
 # ------------------------------------------------------------------------------
 # DailySales: hızlı okuma yardımcıları
@@ -447,9 +555,11 @@ def daily_sales_status():
 
 @uretim_oneri_bp.route("/api/daily-sales/rebuild", methods=["POST"])
 def daily_sales_rebuild():
-    days = int((request.get_json(silent=True) or {}).get("days") or request.args.get("days") or 30)
-    rebuild_daily_sales(days=days)
-    return jsonify({"ok": True, "days": days})
+    payload = request.get_json(silent=True) or {}
+    days = int(payload.get("days") or request.args.get("days") or 30)
+    incremental = str(payload.get("incremental") or request.args.get("incremental") or "").lower() in ("1", "true", "yes")
+    result = rebuild_daily_sales(days=days, incremental=incremental)
+    return jsonify({"ok": True, "days": days, **(result or {})})
 
 # ------------------------------------------------------------------------------
 # Watchlist basit API (değişmedi)
@@ -1142,34 +1252,21 @@ def pop_dirty_batch(n=50):
     return [r[0] for r in rows]
 
 def build_cache_for_barcode(barcode:str, days:int=14):
-    end_day = datetime.now(IST).date()
-    series  = _daily_series_from_cache(barcode, days, end_day)   # daily_sales’tan
-    avg_base = _moving_average(series, days)
-
-    # hafif koşullar (hız)
-    nonzero = sum(1 for r in series if (r.get("qty") or 0)>0)
-    use_prophet_local = (nonzero>=5 and avg_base>0)
-    avg_prophet = prophet_forecast(series, days) if use_prophet_local else None
-
-    avg_ai_used = None  # ister ekle: ai_forecast_sales(...) + band clip
-    avg_final = avg_prophet if (avg_prophet is not None) else avg_base
-
-    db.session.execute(text("""
-      INSERT INTO forecast_cache (barcode, days, avg_base, avg_prophet, avg_ai_used, avg_final, updated_at)
-      VALUES (:bc, :dy, :ab, :pp, :ai, :af, NOW())
-      ON CONFLICT (barcode, days)
-      DO UPDATE SET avg_base=:ab, avg_prophet=:pp, avg_ai_used=:ai, avg_final=:af, updated_at=NOW()
-    """), {"bc": barcode.strip(), "dy": days, "ab": avg_base, "pp": avg_prophet, "ai": avg_ai_used, "af": avg_final})
-    db.session.commit()
+    # Tekil yenileme de toplu motordan geçer (Prophet yalnız ayrı worker'da)
+    from forecast_engine import run_batch_forecast
+    run_batch_forecast(days=days, barcodes=[barcode])
 
 def forecast_worker_loop(days:int=14, batch:int=50):
     barcodes = pop_dirty_batch(batch)
+    if not barcodes:
+        return
     current_app.logger.info(f"[FCACHE] batch pop={len(barcodes)} days={days}")
-    for bc in barcodes:
-        try:
-            build_cache_for_barcode(bc, days=days)
-        except Exception as e:
-            current_app.logger.warning(f"FCACHE fail {bc}: {e}")
+    from forecast_engine import run_batch_forecast
+    try:
+        run_batch_forecast(days=days, barcodes=barcodes)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f"FCACHE fail ({len(barcodes)} barkod): {e}")
 
 
 
@@ -5,7 +5,9 @@ from models import db, UserLog, User
 from login_logout import roles_required
 from time_utils import fmt_ist, ist_to_utc
 from datetime import datetime, timedelta
+from batch_writer import BatchWriter
 import json
+import os
 import urllib.parse
 import logging
 
@@ -145,6 +147,78 @@ ACTION_TYPE_MAP = {
 
 user_logs_bp = Blueprint('user_logs', __name__)
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Toplu (asenkron) yazım
+# Satır istek thread'inde hazırlanıp BatchWriter kuyruğuna bırakılır; arka plan
+# thread'i USER_LOG_FLUSH_MS'de bir ya da USER_LOG_BATCH satır birikince tek
+# çok satırlı INSERT yapar. Kuyruk (USER_LOG_QUEUE_MAX) doluysa en eski satır
+# atılır (dropped sayacı). start_writer çağrılmadıysa (script/test) senkron.
+# ──────────────────────────────────────────────────────────────────────────────
+_writer = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def start_writer(engine=None) -> BatchWriter:
+    """Arka plan yazıcıyı başlatır (app context içinde, bir kez)."""
+    global _writer
+    if _writer is None:
+        engine = engine or db.engine
+        table = UserLog.__table__
+
+        def _write(rows):
+            with engine.begin() as conn:
+                conn.execute(table.insert(), rows)
+
+        _writer = BatchWriter(
+            "USER_LOG", _write,
+            max_batch=_env_int("USER_LOG_BATCH", 500),
+            flush_interval=_env_int("USER_LOG_FLUSH_MS", 500) / 1000.0,
+            max_queue=_env_int("USER_LOG_QUEUE_MAX", 10000),
+        )
+    return _writer
+
+
+def stop_writer() -> None:
+    """Kuyruğu boşaltıp senkron yazıma döner."""
+    global _writer
+    if _writer is not None:
+        _writer.flush()
+        _writer = None
+
+
+def writer_metrics() -> dict | None:
+    return _writer.metrics() if _writer is not None else None
+
+
+def _log_row(user_id, action, details: dict, page_url) -> dict:
+    # Kolon sınırlarına kırp: partide tek uzun URL tüm partiyi düşürmesin
+    return {
+        'user_id': user_id,
+        'action': (action or '')[:255],
+        'details': json.dumps(details, ensure_ascii=False, default=str),
+        'timestamp': datetime.utcnow(),
+        'ip_address': (request.remote_addr or '')[:45] or None,
+        'page_url': (page_url or '')[:255] or None,
+        'status_code': None,
+    }
+
+
+def _save_rows(rows: list) -> None:
+    if not rows:
+        return
+    if _writer is not None:
+        for row in rows:
+            _writer.submit(row)
+        return
+    db.session.execute(UserLog.__table__.insert(), rows)
+    db.session.commit()
+
 def translate_page_name(page: str) -> str:
     return PAGE_NAME_MAP.get(page, page or 'Ana Sayfa')
 
@@ -230,15 +304,7 @@ def log_user_action(action: str, details = None, force_log: bool = False, log_le
                 extended_details['Detay'] = str(details)
 
         try:
-            new_log = UserLog(
-                user_id=user_id,
-                action=action,
-                details=json.dumps(extended_details, ensure_ascii=False),
-                ip_address=request.remote_addr,
-                page_url=request.url
-            )
-            db.session.add(new_log)
-            db.session.commit()
+            _save_rows([_log_row(user_id, action, extended_details, request.url)])
         except Exception as e:
             db.session.rollback()
             logging.error(f"Log kaydedilemedi: {e}")
@@ -260,7 +326,7 @@ def log_user_activity_api():
         user_id = current_user.id if current_user.is_authenticated else None
         user_role = getattr(current_user, 'role', 'anonymous')
         
-        saved_count = 0
+        rows = []
         for log_entry in logs:
             try:
                 action = log_entry.get('action', 'UNKNOWN')
@@ -282,21 +348,15 @@ def log_user_activity_api():
                 # JavaScript'ten gelen detayları ekle
                 extended_details.update(details)
                 
-                new_log = UserLog(
-                    user_id=user_id,
-                    action=action,
-                    details=json.dumps(extended_details, ensure_ascii=False),
-                    ip_address=request.remote_addr,
-                    page_url=details.get('page_url', request.referrer)
-                )
-                db.session.add(new_log)
-                saved_count += 1
-                
+                rows.append(_log_row(user_id, action, extended_details,
+                                     details.get('page_url', request.referrer)))
+
             except Exception as e:
                 logging.error(f"Tekil log kaydedilemedi: {e}")
                 continue
-        
-        db.session.commit()
+
+        _save_rows(rows)
+        saved_count = len(rows)
         return {'success': True, 'message': f'{saved_count} hareket kaydedildi', 'saved_count': saved_count}
         
     except Exception as e: